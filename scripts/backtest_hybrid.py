@@ -4,6 +4,7 @@ scripts/backtest_hybrid.py
 
 Backtest the Hybrid ICT+XGB strategy on historical XAUUSD M1 data for the past 6–12 months.
 Generates a trade log CSV and prints key metrics: Win Rate, Profit Factor, Max Drawdown, Expectancy.
+Fills come from src/execution_sim.py (spread, slippage, intrabar ordering, partial TP ladder).
 """
 
 import pandas as pd
@@ -17,8 +18,14 @@ import sys
 project_root = Path(__file__).resolve().parents[1]
 sys.path.append(str(project_root))
 
+import src.execution_sim as execution_sim
+import src.ict_signal as ict_signal
 from src.features import compute_features
-from src.ict_signal import generate_ict_signal
+from src.ict_signal import add_ict_columns, generate_ict_signal, signal_candidates
+from src.execution_sim import MarketArrays, simulate_trade
+from src.schema import read_feature_csv
+from src.journal import Journal
+from src.stage_cache import StageCache, stage_cache_from_config, cached_features
 
 # ─── โหลด config ─────────────────────────────────────────────────────────────────
 _cfg_path = project_root / "config" / "config.yaml"
@@ -27,7 +34,10 @@ with open(_cfg_path, "r", encoding="utf-8") as f:
 
 HIST_PATH = Path(cfg["historical_data_path"])
 FEAT_PATH = Path(cfg["features_data_path"])
+JOURNAL_CFG = cfg.get("journal", {}) or {}
 TRADE_LOG_PATH = project_root / "data" / "backtest_trade_log.csv"
+TRADE_COLUMNS = ["entry_time", "exit_time", "side", "entry_price", "exit_price", "pnl",
+                 "mae", "mfe", "exit_reason", "bars_held", "atr_entry", "vwap_entry"]
 
 # ─── ฟังก์ชันช่วยคำนวณ metrics ────────────────────────────────────────────────────
 def compute_metrics(trades_df: pd.DataFrame):
@@ -67,136 +77,102 @@ def compute_metrics(trades_df: pd.DataFrame):
     }
 
 # ─── ฟังก์ชันหลักสำหรับ backtest ───────────────────────────────────────────────────
-def backtest_hybrid():
-    # 1) โหลดข้อมูลย้อนหลัง
-    if not HIST_PATH.exists():
-        print(f"[{datetime.now()}] Historical data not found at {HIST_PATH}")
-        return
-    df_hist = pd.read_csv(HIST_PATH, parse_dates=["time"])
-    df_hist = df_hist.sort_values("time").reset_index(drop=True)
-
-    # 2) คำนวณฟีเจอร์ใหม่ (เขียนกี่ครั้งก็ได้ เพื่อให้แน่ใจว่าล่าสุด)
-    compute_features(str(HIST_PATH), str(FEAT_PATH))
-
-    # 3) โหลด DataFrame ฟีเจอร์
-    if not FEAT_PATH.exists():
-        print(f"[{datetime.now()}] Features file not found at {FEAT_PATH}")
-        return
-    df_feat = pd.read_csv(FEAT_PATH, parse_dates=["time"])
-    df_feat = df_feat.sort_values("time").reset_index(drop=True)
-
-    # 4) เตรียมเก็บ trade log
-    trades = []  # แต่ละรายการเป็น dict: entry_time, exit_time, side, entry_price, exit_price, pnl
-
-    n = len(df_feat)
-    idx = 0
-    while idx < n:
-        # 4.1) ตรวจ ICT signal ที่ idx
-        sig = generate_ict_signal(df_feat, idx)
+def simulate_trades(df_feat: pd.DataFrame, journal: Journal = None) -> pd.DataFrame:
+    """
+    เพิ่มคอลัมน์ ICT แล้วจำลองทุกเทรดด้วย fill model → คืน trade log (คอลัมน์ตาม TRADE_COLUMNS)
+    journal: บันทึกสัญญาณ + fill ขาเข้า/ขาออกของแต่ละเทรดระหว่างจำลอง (ไม่ต้องรอเขียน CSV ตอนจบ)
+    """
+    # คอลัมน์ ICT (swing / MSS / last_swing_* / FVG) มาจาก feature stage; คำนวณเองถ้าไฟล์เก่ายังไม่มี
+    df_feat = add_ict_columns(df_feat)
+    market = MarketArrays(df_feat, "mss_bullish", "mss_bearish")
+
+    # วนเฉพาะแถวที่ผ่านเงื่อนไขจำเป็นของ ICT แล้วจำลองการถือด้วย fill model
+    # (spread / slippage / intrabar rule / BE + TP1–TP3 ladder / reverse MSS)
+    trades = []
+    next_free = 0  # ไม่เปิดเทรดซ้อนกัน: เทรดถัดไปต้องเริ่มหลัง exit ของเทรดก่อน
+    for idx in signal_candidates(df_feat):
+        if idx < next_free:
+            continue
+        sig = generate_ict_signal(df_feat, int(idx))
         if sig is None:
-            idx += 1
             continue
 
-        # 4.2) เก็บข้อมูล entry
         entry_idx = sig["entry_index"]
-        entry_time = sig["entry_time"]
-        entry_price = sig["entry_price"]
-        side = sig["side"]
-        sl = sig["sl"]
-        tp1 = sig["tp1"]
-        tp2 = sig["tp2"]
-        tp3 = sig["tp3"]
-
-        # 4.3) เริ่ม scan bar ถัดไปเพื่อหาจุดออก
-        exit_idx = None
-        exit_price = None
-        pnl = 0.0
-
-        for j in range(entry_idx + 1, n):
-            high_j = df_feat.at[j, "high"]
-            low_j = df_feat.at[j, "low"]
-
-            # หากเป็น Buy
-            if side == "Buy":
-                # 4.3.1) TP1 ก่อน
-                if high_j >= tp1:
-                    exit_idx = j
-                    exit_price = tp1
-                    pnl = tp1 - entry_price
-                    break
-                # 4.3.2) TP2
-                if high_j >= tp2:
-                    exit_idx = j
-                    exit_price = tp2
-                    pnl = tp2 - entry_price
-                    break
-                # 4.3.3) TP3
-                if high_j >= tp3:
-                    exit_idx = j
-                    exit_price = tp3
-                    pnl = tp3 - entry_price
-                    break
-                # 4.3.4) SL
-                if low_j <= sl:
-                    exit_idx = j
-                    exit_price = sl
-                    pnl = sl - entry_price
-                    break
-            # หากเป็น Sell
-            else:  # side == "Sell"
-                # TP1 ก่อน (reverse logic)
-                if low_j <= tp1:
-                    exit_idx = j
-                    exit_price = tp1
-                    pnl = entry_price - tp1
-                    break
-                # TP2
-                if low_j <= tp2:
-                    exit_idx = j
-                    exit_price = tp2
-                    pnl = entry_price - tp2
-                    break
-                # TP3
-                if low_j <= tp3:
-                    exit_idx = j
-                    exit_price = tp3
-                    pnl = entry_price - tp3
-                    break
-                # SL
-                if high_j >= sl:
-                    exit_idx = j
-                    exit_price = sl
-                    pnl = entry_price - sl
-                    break
-
-        # 4.4) ถ้าไม่เจอ exit ในอนาคต ให้ใช้ราคาปิดสุดท้าย
-        if exit_idx is None:
-            exit_idx = n - 1
-            exit_price = df_feat.at[exit_idx, "close"]
-            pnl = (exit_price - entry_price) if side == "Buy" else (entry_price - exit_price)
-
-        exit_time = df_feat.at[exit_idx, "time"]
+        fill = simulate_trade(market, sig["side"], entry_idx, sig["entry_price"],
+                              sig["sl"], sig["tp1"], sig["tp2"])
+        exit_idx = fill["exit_index"]
+        if journal is not None:
+            pos_id = len(trades) + 1
+            journal.decision(sig["entry_time"], dict(sig, source="ICT"))
+            journal.log("fill", "entry", sig["entry_time"], "ICT", sig["side"], pos_id,
+                        price=fill["entry_price"], sl=sig["sl"], tp1=sig["tp1"], tp2=sig["tp2"], tp3=sig["tp3"])
+            journal.log("fill", "exit", df_feat.at[exit_idx, "time"], "ICT", sig["side"], pos_id,
+                        price=fill["exit_price"], pnl=fill["pnl"])
         trades.append({
-            "entry_time": entry_time,
-            "exit_time": exit_time,
-            "side": side,
-            "entry_price": entry_price,
-            "exit_price": exit_price,
-            "pnl": round(pnl, 5),
+            "entry_time": sig["entry_time"],
+            "exit_time": df_feat.at[exit_idx, "time"],
+            "side": sig["side"],
+            "entry_price": round(fill["entry_price"], 5),
+            "exit_price": round(fill["exit_price"], 5),
+            "pnl": round(fill["pnl"], 5),
+            "mae": round(fill["mae"], 5),
+            "mfe": round(fill["mfe"], 5),
+            "exit_reason": fill["exit_reason"],
+            "bars_held": fill["bars_held"],
             # เก็บฟีเจอร์ entry สำคัญไว้ด้วย (เช่น ATR, VWAP)
             "atr_entry": df_feat.at[entry_idx, "atr"],
             "vwap_entry": df_feat.at[entry_idx, "vwap"]
         })
+        next_free = exit_idx + 1
+
+    return pd.DataFrame(trades, columns=TRADE_COLUMNS)
 
-        # 4.5) กระโดดไปหลัง exit_idx เพื่อไม่ให้เกิดทับซ้อน
-        idx = exit_idx + 1
 
-    # 5) สร้าง DataFrame ของ trade log
-    df_trades = pd.DataFrame(trades)
-    df_trades.to_csv(TRADE_LOG_PATH, index=False)
-    print(f"[{datetime.now()}] Backtest completed. Trade log saved to {TRADE_LOG_PATH}")
+def backtest_hybrid(cache: StageCache = None):
+    """
+    historical → features → จำลองเทรด → trade log + metrics
+    ถ้าส่ง cache มา: features คำนวณเฉพาะแถวใหม่ และข้ามการจำลองถ้า features/config/code ไม่เปลี่ยน
+    """
+    # 1) โหลดข้อมูลย้อนหลัง
+    if not HIST_PATH.exists():
+        print(f"[{datetime.now()}] Historical data not found at {HIST_PATH}")
+        return
+
+    # 2) คำนวณฟีเจอร์ (ผ่าน cache ถ้ามี ไม่เช่นนั้นเขียนใหม่ทุกครั้งเพื่อให้แน่ใจว่าล่าสุด)
+    if cache is not None:
+        cached_features(cache, str(HIST_PATH), str(FEAT_PATH))
+    else:
+        compute_features(str(HIST_PATH), str(FEAT_PATH))
+
+    if not FEAT_PATH.exists():
+        print(f"[{datetime.now()}] Features file not found at {FEAT_PATH}")
+        return
 
-    # 6) คำนวณและแสดง metrics
+    # 3) จำลองเทรดแล้วบันทึก trade log
+    def _run():
+        df_feat = read_feature_csv(FEAT_PATH)
+        df_feat = df_feat.sort_values("time").reset_index(drop=True)
+        if JOURNAL_CFG.get("enabled", False):
+            with Journal(JOURNAL_CFG.get("backtest_path", "logs/backtest_journal.bin"),
+                         batch_records=4096, fsync="none", fresh=True) as journal:
+                trades = simulate_trades(df_feat, journal)
+        else:
+            trades = simulate_trades(df_feat)
+        trades.to_csv(TRADE_LOG_PATH, index=False)
+        print(f"[{datetime.now()}] Backtest completed. Trade log saved to {TRADE_LOG_PATH}")
+
+    if cache is not None:
+        params = {k: v for k, v in vars(execution_sim).items() if k.isupper()}
+        params.update({k: v for k, v in vars(ict_signal).items() if k.isupper()})
+        status = cache.run("backtest", [TRADE_LOG_PATH], [FEAT_PATH], params,
+                           [ict_signal, execution_sim, sys.modules[__name__]], _run)
+        if status == "hit":
+            print(f"[{datetime.now()}] Backtest inputs unchanged (cache hit). Using {TRADE_LOG_PATH}")
+    else:
+        _run()
+    df_trades = pd.read_csv(TRADE_LOG_PATH, parse_dates=["entry_time", "exit_time"])
+
+    # 4) คำนวณและแสดง metrics
     metrics = compute_metrics(df_trades)
     print("\n===== Backtest Metrics =====")
     print(f"Total Trades   : {len(df_trades)}")
@@ -204,8 +180,12 @@ def backtest_hybrid():
     print(f"Profit Factor  : {metrics['profit_factor']:.3f}")
     print(f"Max Drawdown   : {metrics['max_drawdown']:.5f}")
     print(f"Expectancy     : {metrics['expectancy']:.5f}")
+    if len(df_trades) > 0:
+        print(f"Avg MAE / MFE  : {df_trades['mae'].mean():.5f} / {df_trades['mfe'].mean():.5f}")
     print("============================\n")
+    if cache is not None:
+        cache.report()
 
 
 if __name__ == "__main__":
-    backtest_hybrid()
+    backtest_hybrid(stage_cache_from_config(cfg))
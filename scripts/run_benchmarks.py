@@ -0,0 +1,396 @@
+# ไฟล์: scripts/run_benchmarks.py
+"""
+Benchmark suite ของ hot path (data / signal / model / backtest) บนข้อมูล XAUUSD M1 สังเคราะห์
+
+    python scripts/run_benchmarks.py run --sizes 10k 100k 1m --save-baseline main
+    python scripts/run_benchmarks.py compare benchmarks/baselines/main.json benchmarks/results/latest.json
+
+ผลลัพธ์ต่อ benchmark@size: seconds (best-of-repeat), rows_per_s, peak_mb (tracemalloc)
+compare จะ flag ทุกรายการที่ช้าลง/ใช้หน่วยความจำมากขึ้นเกิน threshold และคืน exit code 1
+"""
+
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, List, Callable, Optional
+
+# ─── เพิ่ม project root (folder บนสุด) ใน sys.path ───
+project_root = Path(__file__).resolve().parents[1]
+sys.path.append(str(project_root))
+
+import numpy as np
+import pandas as pd
+
+from src.synthetic_data import parse_size, write_synthetic_csv
+
+BENCH_DIR = project_root / "benchmarks"
+DATA_DIR = BENCH_DIR / "data"
+RESULTS_DIR = BENCH_DIR / "results"
+BASELINE_DIR = BENCH_DIR / "baselines"
+DEFAULT_SIZES = ["10k", "100k", "1m"]
+DEFAULT_THRESHOLD = 0.20
+
+# ─── Registry ของ benchmark ─────────────────────────────────────────────────────
+# name → (setup(ctx) → callable ที่จะถูกจับเวลา, max_bars)
+# max_bars: จำกัดขนาดสำหรับฟังก์ชันที่ยังเป็น loop ต่อแถว (ปลดได้ด้วย --no-cap)
+BENCHMARKS: Dict[str, Dict[str, Any]] = {}
+
+
+def benchmark(name: str, max_bars: Optional[int] = None):
+    def decorator(setup):
+        BENCHMARKS[name] = {"setup": setup, "max_bars": max_bars}
+        return setup
+    return decorator
+
+
+class BenchContext:
+    """
+    เตรียมไฟล์/DataFrame ที่ benchmark ใช้ร่วมกันสำหรับขนาดหนึ่ง (สร้างแบบ lazy และ cache ไว้)
+    """
+
+    def __init__(self, n_bars: int, workdir: Path, seed: int = 42):
+        self.n_bars = n_bars
+        self.workdir = workdir
+        self.seed = seed
+        self.workdir.mkdir(parents=True, exist_ok=True)
+        self._cache: Dict[str, Any] = {}
+
+    @property
+    def hist_path(self) -> Path:
+        return write_synthetic_csv(DATA_DIR / f"xauusd_m1_{self.n_bars}_s{self.seed}.csv",
+                                   self.n_bars, seed=self.seed)
+
+    @property
+    def features_path(self) -> Path:
+        if "features_path" not in self._cache:
+            from src.features import compute_features
+            out = self.workdir / "features.csv"
+            with contextlib.redirect_stdout(io.StringIO()):
+                compute_features(str(self.hist_path), str(out))
+            self._cache["features_path"] = out
+        return self._cache["features_path"]
+
+    @property
+    def features_df(self) -> pd.DataFrame:
+        if "features_df" not in self._cache:
+            from src.schema import read_feature_csv
+            self._cache["features_df"] = read_feature_csv(self.features_path)
+        return self._cache["features_df"]
+
+    @property
+    def ict_df(self) -> pd.DataFrame:
+        """
+        features + คอลัมน์ ICT (swing/MSS/FVG) สำหรับ generate_ict_signal / DecisionEngine
+        (feature stage เขียนไว้แล้ว; add_ict_columns เติมให้เฉพาะไฟล์ที่ยังไม่มี)
+        """
+        if "ict_df" not in self._cache:
+            from src.ict_signal import add_ict_columns
+            self._cache["ict_df"] = add_ict_columns(self.features_df)
+        return self._cache["ict_df"]
+
+
+# ─── Benchmarks ─────────────────────────────────────────────────────────────────
+@benchmark("compute_features")
+def _bench_compute_features(ctx: BenchContext) -> Callable:
+    from src.features import compute_features
+    hist, out = str(ctx.hist_path), str(ctx.workdir / "bench_features.csv")
+    return lambda: compute_features(hist, out, chunk_size=0)
+
+
+@benchmark("compute_features_chunked")
+def _bench_compute_features_chunked(ctx: BenchContext) -> Callable:
+    from src.features import compute_features_chunked
+    hist, out = str(ctx.hist_path), str(ctx.workdir / "bench_features_chunked.csv")
+    return lambda: compute_features_chunked(hist, out, chunk_size=100_000)
+
+
+@benchmark("detect_swing_points", max_bars=100_000)
+def _bench_detect_swing_points(ctx: BenchContext) -> Callable:
+    from src.ict_signal import detect_swing_points
+    df = ctx.features_df
+    return lambda: detect_swing_points(df, window=5)
+
+
+@benchmark("detect_mss", max_bars=100_000)
+def _bench_detect_mss(ctx: BenchContext) -> Callable:
+    from src.ict_signal import detect_swing_points, detect_mss
+    df = detect_swing_points(ctx.features_df, window=5)
+    return lambda: detect_mss(df)
+
+
+@benchmark("compute_fvg", max_bars=100_000)
+def _bench_compute_fvg(ctx: BenchContext) -> Callable:
+    from src.ict_signal import compute_fvg
+    df = ctx.features_df
+    return lambda: compute_fvg(df)
+
+
+@benchmark("ict_feature_arrays")
+def _bench_ict_feature_arrays(ctx: BenchContext) -> Callable:
+    """
+    swing + MSS + FVG + fib zone + pullback แบบ vectorized รอบเดียว (แทน 3 ฟังก์ชันข้างบน)
+    """
+    from src.ict_signal import ict_feature_arrays
+    cols = [ctx.features_df[c].to_numpy(dtype=np.float64) for c in ("open", "high", "low", "close", "atr")]
+    return lambda: ict_feature_arrays(*cols)
+
+
+@benchmark("build_labels")
+def _bench_build_labels(ctx: BenchContext) -> Callable:
+    from src.build_labels import build_labels
+    inp, out = str(ctx.features_path), str(ctx.workdir / "bench_labels.csv")
+    return lambda: build_labels(inp, out)
+
+
+@benchmark("label_matrix")
+def _bench_label_matrix(ctx: BenchContext) -> Callable:
+    """
+    4 horizons × 3 ATR multipliers (12 ชุด label) ในรอบเดียว ไม่รวม I/O
+    """
+    from src.build_labels import label_matrix
+    df = ctx.features_df
+    return lambda: label_matrix(df, [3, 5, 10, 20], [0.25, 0.5, 1.0])
+
+
+@benchmark("label_ict", max_bars=100_000)
+def _bench_label_ict(ctx: BenchContext) -> Callable:
+    from src.label_ict import label_ict
+    inp, out = str(ctx.features_path), str(ctx.workdir / "bench_labels_ict.csv")
+    return lambda: label_ict(inp, out)
+
+
+@benchmark("triple_barrier")
+def _bench_triple_barrier(ctx: BenchContext) -> Callable:
+    """
+    triple-barrier label ของทุกสัญญาณ ICT (max_bars 120) ไม่รวม I/O
+    """
+    from src.triple_barrier import triple_barrier_labels
+    df = ctx.features_df
+    return lambda: triple_barrier_labels(df.copy(), 120)
+
+
+@benchmark("decision_engine_predict", max_bars=100_000)
+def _bench_decision_engine_predict(ctx: BenchContext) -> Callable:
+    """
+    เรียก DecisionEngine.predict กับ 200 แท่งท้ายสุด (โมเดล XGB ขนาดเล็กที่ train บนข้อมูลสังเคราะห์)
+    """
+    import xgboost as xgb
+    import src.decision_engine as de
+
+    df = ctx.ict_df
+    feats = df[de.FEATURE_COLS].astype(float)
+    y = np.random.default_rng(0).integers(0, 3, size=len(feats))
+    clf = xgb.XGBClassifier(n_estimators=50, max_depth=4, eval_metric="mlogloss")
+    clf.fit(feats, y)
+    model_path = ctx.workdir / "bench_xgb.json"
+    clf.save_model(str(model_path))
+    de.MODEL_PATH = str(model_path)
+    engine = de.DecisionEngine()
+
+    idxs = range(max(0, len(df) - 200), len(df))
+
+    def run():
+        for i in idxs:
+            engine.predict(df, i)
+    run.rows = len(idxs)
+    return run
+
+
+@benchmark("backtest_hybrid", max_bars=100_000)
+def _bench_backtest_hybrid(ctx: BenchContext) -> Callable:
+    spec = importlib.util.spec_from_file_location("backtest_hybrid",
+                                                  project_root / "scripts" / "backtest_hybrid.py")
+    bt = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(bt)
+    bt.HIST_PATH = ctx.hist_path
+    bt.FEAT_PATH = ctx.workdir / "bench_bt_features.csv"
+    bt.TRADE_LOG_PATH = ctx.workdir / "bench_trade_log.csv"
+    return bt.backtest_hybrid
+
+
+# ─── Measurement ────────────────────────────────────────────────────────────────
+def measure(fn: Callable, repeat: int = 1, memory: bool = True) -> Dict[str, Any]:
+    """
+    จับเวลา fn (best-of-repeat) แล้ววัด peak memory อีกรอบด้วย tracemalloc
+    (แยกรอบเพราะ tracemalloc ทำให้ช้าลงหลายเท่า)
+    """
+    times = []
+    for _ in range(max(1, repeat)):
+        t0 = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            fn()
+        times.append(time.perf_counter() - t0)
+    result = {"seconds": min(times), "runs": len(times)}
+
+    if memory:
+        tracemalloc.start()
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                fn()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        result["peak_mb"] = peak / 1e6
+    return result
+
+
+def environment_info() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=project_root,
+                                capture_output=True, text=True, timeout=10).stdout.strip()
+    except Exception:
+        commit = ""
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def run_suite(names: Optional[List[str]] = None, sizes: Optional[List[str]] = None,
+              repeat: int = 1, memory: bool = True, no_cap: bool = False,
+              seed: int = 42, workdir: Optional[Path] = None) -> Dict[str, Any]:
+    """
+    รัน benchmark ที่เลือกทุกขนาด แล้วคืน dict {"meta": ..., "results": {"name@size": {...}}}
+    """
+    names = names or list(BENCHMARKS)
+    sizes = sizes or DEFAULT_SIZES
+    workdir = Path(workdir or BENCH_DIR / "work")
+    results: Dict[str, Any] = {}
+
+    for size in sizes:
+        n_bars = parse_size(size)
+        ctx = BenchContext(n_bars, workdir / str(n_bars), seed=seed)
+        for name in names:
+            spec = BENCHMARKS[name]
+            key = f"{name}@{size}"
+            if not no_cap and spec["max_bars"] and n_bars > spec["max_bars"]:
+                results[key] = {"skipped": f"n_bars > max_bars ({spec['max_bars']})"}
+                print(f"{key:<40} skipped")
+                continue
+            try:
+                fn = spec["setup"](ctx)
+                res = measure(fn, repeat=repeat, memory=memory)
+            except Exception as e:
+                results[key] = {"error": f"{type(e).__name__}: {e}"}
+                print(f"{key:<40} ERROR {results[key]['error']}")
+                continue
+            rows = getattr(fn, "rows", n_bars)
+            res["n_bars"] = n_bars
+            res["rows"] = rows
+            res["rows_per_s"] = rows / res["seconds"] if res["seconds"] > 0 else float("inf")
+            results[key] = res
+            mem = f"{res['peak_mb']:>9.1f} MB" if "peak_mb" in res else ""
+            print(f"{key:<40}{res['seconds']:>10.3f} s{res['rows_per_s']:>14,.0f} rows/s{mem}")
+
+    return {"meta": environment_info(), "results": results}
+
+
+# ─── Comparison ─────────────────────────────────────────────────────────────────
+def compare_results(baseline: Dict[str, Any], current: Dict[str, Any],
+                    threshold: float = DEFAULT_THRESHOLD) -> List[Dict[str, Any]]:
+    """
+    เทียบผลสองชุด คืนรายการแถว {key, metric, baseline, current, change, regression}
+    change = current/baseline - 1 (seconds และ peak_mb: ยิ่งมากยิ่งแย่)
+    """
+    rows = []
+    base_res, cur_res = baseline.get("results", {}), current.get("results", {})
+    for key in sorted(set(base_res) & set(cur_res)):
+        b, c = base_res[key], cur_res[key]
+        for metric in ("seconds", "peak_mb"):
+            if metric not in b or metric not in c or b[metric] <= 0:
+                continue
+            change = c[metric] / b[metric] - 1.0
+            rows.append({
+                "key": key, "metric": metric,
+                "baseline": b[metric], "current": c[metric],
+                "change": change, "regression": change > threshold,
+            })
+        if "error" in c and "error" not in b:
+            rows.append({"key": key, "metric": "error", "baseline": None, "current": c["error"],
+                         "change": None, "regression": True})
+    return rows
+
+
+def print_comparison(rows: List[Dict[str, Any]], threshold: float):
+    print(f"\n{'benchmark':<40}{'metric':>9}{'baseline':>12}{'current':>12}{'change':>9}")
+    for r in rows:
+        if r["metric"] == "error":
+            print(f"{r['key']:<40}{'error':>9}  {r['current']}  << REGRESSION")
+            continue
+        flag = "  << REGRESSION" if r["regression"] else ""
+        print(f"{r['key']:<40}{r['metric']:>9}{r['baseline']:>12.3f}{r['current']:>12.3f}"
+              f"{r['change']:>+9.1%}{flag}")
+    n_reg = sum(r["regression"] for r in rows)
+    print(f"\n{n_reg} regression(s) above {threshold:.0%}")
+
+
+def load_results(path: str) -> Dict[str, Any]:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_results(results: Dict[str, Any], path: Path) -> Path:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    return path
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark suite for the trading pipeline hot paths")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_run = sub.add_parser("run", help="run benchmarks and write JSON results")
+    p_run.add_argument("--bench", nargs="*", choices=sorted(BENCHMARKS), help="subset of benchmarks")
+    p_run.add_argument("--sizes", nargs="*", default=DEFAULT_SIZES, help="e.g. 10k 100k 1m 5000")
+    p_run.add_argument("--repeat", type=int, default=1)
+    p_run.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    p_run.add_argument("--no-cap", action="store_true", help="ignore per-benchmark max_bars")
+    p_run.add_argument("--seed", type=int, default=42)
+    p_run.add_argument("--output", default=str(RESULTS_DIR / "latest.json"))
+    p_run.add_argument("--save-baseline", metavar="NAME", help="also write benchmarks/baselines/NAME.json")
+    p_run.add_argument("--compare", metavar="BASELINE", help="compare against a baseline after running")
+    p_run.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+
+    p_cmp = sub.add_parser("compare", help="compare two result files")
+    p_cmp.add_argument("baseline")
+    p_cmp.add_argument("current")
+    p_cmp.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        results = run_suite(args.bench, args.sizes, repeat=args.repeat, memory=not args.no_memory,
+                            no_cap=args.no_cap, seed=args.seed)
+        print(f"Results saved to {save_results(results, Path(args.output))}")
+        if args.save_baseline:
+            print(f"Baseline saved to {save_results(results, BASELINE_DIR / f'{args.save_baseline}.json')}")
+        if not args.compare:
+            return 0
+        baseline, current, threshold = load_results(args.compare), results, args.threshold
+    else:
+        baseline, current, threshold = load_results(args.baseline), load_results(args.current), args.threshold
+
+    rows = compare_results(baseline, current, threshold)
+    print_comparison(rows, threshold)
+    return 1 if any(r["regression"] for r in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
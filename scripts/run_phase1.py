@@ -1,53 +1,190 @@
 # ไฟล์: scripts/run_phase1.py
 
+import os
 import sys
+import time
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import product
+from typing import Dict, Any, List, Tuple
 
 # ─── เพิ่ม project root (folder บนสุด) ใน sys.path ───
 project_root = Path(__file__).resolve().parents[1]
 sys.path.append(str(project_root))
 
-from src.fetch_candles import fetch_candles
+import pandas as pd
+import yaml
+
 from src.features import compute_features
 from src.label_ict import label_ict
-import yaml
+from src.stage_cache import stage_cache_from_config, cached_features, cached_labels
+import src.triple_barrier as triple_barrier_mod
+import src.ict_signal as ict_signal_mod
+import src.schema as schema_mod
 
-def main():
-    # โหลด config
+def load_config() -> Dict[str, Any]:
+    """
+    โหลด config จาก config/config.yaml
+    """
     _cfg_path = project_root / "config" / "config.yaml"
     with open(_cfg_path, "r", encoding="utf-8") as f:
-        cfg = yaml.safe_load(f)
+        return yaml.safe_load(f)
+
+def fetch_candles(n: int, symbol: str, timeframe: str) -> pd.DataFrame:
+    """
+    src.fetch_candles.fetch_candles — import ตอนเรียก (MetaTrader5 มีเฉพาะบนเครื่องที่ติดตั้ง terminal)
+    """
+    from src.fetch_candles import fetch_candles as _fetch_candles
+    return _fetch_candles(n, symbol=symbol, timeframe=timeframe)
+
+def instrument_list(cfg: Dict[str, Any]) -> List[Tuple[str, str]]:
+    """
+    คืนรายการ (symbol, timeframe) ทุกคู่จาก config
+    - symbols / timeframes (list) ถ้ามี
+    - ไม่เช่นนั้นใช้ symbol / timeframe เดี่ยวเหมือนเดิม
+    """
+    symbols = cfg.get("symbols") or [cfg["symbol"]]
+    timeframes = cfg.get("timeframes") or [cfg["timeframe"]]
+    return list(product(symbols, timeframes))
+
+def instrument_paths(cfg: Dict[str, Any], symbol: str, timeframe: str, partitioned: bool) -> Dict[str, str]:
+    """
+    คืนพาธ historical / features / labels ของ instrument
+    - instrument เดียว: ใช้พาธเดิมจาก config
+    - หลาย instrument: แยก partition เป็น data/<SYMBOL>_<TF>/...
+    """
+    if not partitioned:
+        return {
+            "historical": cfg["historical_data_path"],
+            "features": cfg["features_data_path"],
+            "labels": str(Path(cfg["features_data_path"]).parent / "with_labels_ict.csv"),
+        }
+    base = Path(cfg["historical_data_path"]).parent / f"{symbol}_{timeframe}"
+    return {
+        "historical": str(base / Path(cfg["historical_data_path"]).name),
+        "features": str(base / Path(cfg["features_data_path"]).name),
+        "labels": str(base / "with_labels_ict.csv"),
+    }
+
+def run_instrument(cfg: Dict[str, Any], symbol: str, timeframe: str, paths: Dict[str, str]) -> Dict[str, Any]:
+    """
+    รัน fetch → features → labels ของ instrument เดียว แล้วคืนเวลาที่ใช้ในแต่ละ stage (วินาที)
+    (ฟังก์ชันระดับ module เพื่อให้ส่งเข้า process pool ได้)
+    """
+    tag = f"[{symbol} {timeframe}]"
+    timings = {"symbol": symbol, "timeframe": timeframe}
+    cache = stage_cache_from_config(cfg)
 
     # Phase 1.1: Fetch candles
-    print(">>> Phase 1.1: Fetching candles")
-    hist_path = cfg["historical_data_path"]
-    df_new = fetch_candles(cfg["fetch_candles_n"])
+    print(f">>> {tag} Phase 1.1: Fetching candles")
+    t0 = time.perf_counter()
+    hist_path = paths["historical"]
+    df_new = fetch_candles(cfg["fetch_candles_n"], symbol=symbol, timeframe=timeframe)
     if df_new is not None and not df_new.empty:
         hist_file = Path(hist_path)
         hist_file.parent.mkdir(parents=True, exist_ok=True)
         if hist_file.exists():
-            import pandas as pd
             df_old = pd.read_csv(hist_path, parse_dates=["time"])
             df_concat = pd.concat([df_old, df_new]).drop_duplicates(subset="time").sort_values("time")
             df_concat.to_csv(hist_path, index=False)
-            print(f"Appended {len(df_new)} rows → {hist_path}")
+            print(f"{tag} Appended {len(df_new)} rows → {hist_path}")
         else:
             df_new.to_csv(hist_path, index=False)
-            print(f"Saved {len(df_new)} rows → {hist_path}")
+            print(f"{tag} Saved {len(df_new)} rows → {hist_path}")
     else:
-        print("No new candles fetched or fetch failed.")
+        print(f"{tag} No new candles fetched or fetch failed.")
+    timings["fetch_s"] = time.perf_counter() - t0
+
+    if not Path(hist_path).exists():
+        print(f"{tag} Historical data not found at {hist_path}; skip features/labels.")
+        timings["features_s"] = timings["labels_s"] = 0.0
+        return timings
 
     # Phase 1.2: Compute features
-    print("\n>>> Phase 1.2: Computing features")
-    features_in  = cfg["historical_data_path"]
-    features_out = cfg["features_data_path"]
-    compute_features(str(features_in), str(features_out))
-
-    # Phase 1.3: Generate ICT-based labels
-    print("\n>>> Phase 1.3: Generating ICT labels")
-    labels_in  = cfg["features_data_path"]
-    labels_out = str(Path(cfg["features_data_path"]).parent / "with_labels_ict.csv")
-    label_ict(str(labels_in), labels_out)
+    print(f"\n>>> {tag} Phase 1.2: Computing features")
+    t0 = time.perf_counter()
+    if cache is not None:
+        cached_features(cache, str(hist_path), str(paths["features"]), base_timeframe=timeframe)
+    else:
+        compute_features(str(hist_path), str(paths["features"]), base_timeframe=timeframe)
+    timings["features_s"] = time.perf_counter() - t0
+
+    # Phase 1.3: Generate labels (ICT setup หรือ triple barrier ตามผลจริงของสัญญาณ)
+    tb_cfg = cfg.get("triple_barrier", {}) or {}
+    t0 = time.perf_counter()
+    if tb_cfg.get("enabled", False):
+        print(f"\n>>> {tag} Phase 1.3: Generating triple-barrier labels")
+        max_bars = int(tb_cfg.get("max_bars", triple_barrier_mod.MAX_BARS))
+        run_tb = lambda: triple_barrier_mod.label_triple_barrier(str(paths["features"]), str(paths["labels"]),
+                                                                 max_bars)
+        if cache is not None:
+            # label ขึ้นกับแท่งข้างหน้าถึง max_bars แท่ง → ต่อท้ายแบบ cached_labels ไม่ได้ ใช้ cache แบบทั้งไฟล์
+            cache.run("labels_tb", [paths["labels"]], [paths["features"]], tb_cfg,
+                      [triple_barrier_mod, ict_signal_mod, schema_mod], run_tb)
+        else:
+            run_tb()
+    else:
+        print(f"\n>>> {tag} Phase 1.3: Generating ICT labels")
+        if cache is not None:
+            cached_labels(cache, str(paths["features"]), str(paths["labels"]))
+        else:
+            label_ict(str(paths["features"]), str(paths["labels"]))
+    timings["labels_s"] = time.perf_counter() - t0
+
+    if cache is not None:
+        print(f"\n{tag}", end="")
+        cache.report()
+        timings["cache"] = cache.summary()
+    return timings
+
+def print_timings(results: List[Dict[str, Any]], wall_s: float):
+    """
+    แสดงเวลาต่อ stage ของแต่ละ instrument + wall clock รวม
+    """
+    print("\n===== Phase 1 Timings (s) =====")
+    print(f"{'instrument':<16}{'fetch':>9}{'features':>10}{'labels':>9}{'total':>9}")
+    for r in results:
+        if "error" in r:
+            print(f"{r['symbol'] + ' ' + r['timeframe']:<16} ERROR: {r['error']}")
+            continue
+        total = r["fetch_s"] + r["features_s"] + r["labels_s"]
+        print(f"{r['symbol'] + ' ' + r['timeframe']:<16}{r['fetch_s']:>9.2f}"
+              f"{r['features_s']:>10.2f}{r['labels_s']:>9.2f}{total:>9.2f}")
+    print(f"Wall clock: {wall_s:.2f}s")
+    print("===============================\n")
+
+def main() -> List[Dict[str, Any]]:
+    cfg = load_config()
+    instruments = instrument_list(cfg)
+    partitioned = len(instruments) > 1
+    workers = cfg.get("phase1_workers") or min(len(instruments), os.cpu_count() or 1)
+
+    t_start = time.perf_counter()
+    results = []
+    if len(instruments) == 1 or workers <= 1:
+        # รันตามลำดับใน process เดียว
+        for symbol, timeframe in instruments:
+            paths = instrument_paths(cfg, symbol, timeframe, partitioned)
+            results.append(run_instrument(cfg, symbol, timeframe, paths))
+    else:
+        # แยกแต่ละ instrument ไปยัง process pool (แต่ละตัวเขียน partition ของตัวเอง)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                pool.submit(run_instrument, cfg, symbol, timeframe,
+                            instrument_paths(cfg, symbol, timeframe, partitioned)): (symbol, timeframe)
+                for symbol, timeframe in instruments
+            }
+            for fut in as_completed(futures):
+                symbol, timeframe = futures[fut]
+                try:
+                    results.append(fut.result())
+                except Exception as e:
+                    print(f"[{symbol} {timeframe}] Phase 1 failed: {e}")
+                    results.append({"symbol": symbol, "timeframe": timeframe, "error": str(e)})
+        results.sort(key=lambda r: instruments.index((r["symbol"], r["timeframe"])))
+
+    print_timings(results, time.perf_counter() - t_start)
+    return results
 
 if __name__ == "__main__":
     main()
@@ -5,9 +5,29 @@ from pathlib import Path
 import sys
 sys.path.append(str(Path(__file__).resolve().parents[1]))
 
-from src.model_trainer import train_walkforward
+import src.model_trainer as model_trainer
+import src.schema as schema
+from src.model_trainer import train_walkforward, FEATURE_COLS
+from src.model_registry import ModelRegistry
+from src.stage_cache import stage_cache_from_config
 # (ถ้าต้องการรัน tune_model ด้วย ก็ import ได้: from src.tune_model import ...)
 
+def register_model(cfg, model_output, summary):
+    """
+    ลงทะเบียนโมเดลที่เทรนแล้วใน model registry (ถ้าเปิดใช้) → run_phase3 ที่ watch อยู่จะสลับมาใช้เอง
+    summary = ผลของ train_walkforward (None เมื่อ cache hit → ลงทะเบียนเฉพาะไฟล์ที่ยังไม่เคยมี)
+    """
+    reg_cfg = cfg.get("model_registry", {}) or {}
+    if not reg_cfg.get("enabled", False):
+        return None
+    summary = summary or {}
+    registry = ModelRegistry(reg_cfg.get("root", "models/registry"))
+    entry = registry.register(model_output, FEATURE_COLS,
+                              train_start=summary.get("train_start"), train_end=summary.get("train_end"),
+                              metrics={k: summary[k] for k in ("rows", "fold_accuracy") if k in summary})
+    print(f"Model registry: version {entry['version']} active ({registry.root})")
+    return entry
+
 def main():
     # โหลด config
     cfg_path = Path(__file__).resolve().parents[1] / "config" / "config.yaml"
@@ -24,7 +44,22 @@ def main():
     # grid()
 
     print(">>> Phase 2: Training XGBoost with Walk‐forward CV")
-    train_walkforward(dataset_path, model_output, report_output)
+    cache = stage_cache_from_config(cfg)
+    if cache is None:
+        summary = train_walkforward(dataset_path, model_output, report_output)
+        register_model(cfg, model_output, summary)
+        return
+
+    # ข้ามการเทรนถ้า dataset / hyperparameters / โค้ดเทรนไม่เปลี่ยนและโมเดลเดิมยังอยู่
+    params = {"xgb": model_trainer.params, "splits": model_trainer.cfg.get("walkforward_splits", 5)}
+    result = {}
+    status = cache.run("model", [model_output, report_output], [dataset_path], params,
+                       [model_trainer, schema],
+                       lambda: result.update(train_walkforward(dataset_path, model_output, report_output)))
+    if status == "hit":
+        print(f"Model unchanged (cache hit) → {model_output}")
+    register_model(cfg, model_output, result)
+    cache.report()
 
 if __name__ == "__main__":
     main()
@@ -1,4 +1,5 @@
 import time
+from collections import Counter
 from datetime import datetime
 import pandas as pd
 import yaml
@@ -12,8 +13,20 @@ sys.path.append(str(project_root))
 from src.fetch_candles import fetch_candles
 from src.features import compute_features
 from src.decision_engine import DecisionEngine
+from src.model_registry import ModelRegistry
+from src.shadow_scoring import ShadowScorer
+from src.shm_ring import ShmRing, default_columns
+from src.journal import Journal, TradeLog
 from src.mt5_api import MT5Wrapper
+from src.position_manager import PositionManager
 from src.health_report import health_check
+from src.schema import read_feature_csv
+from src.instrumentation import REGISTRY, span, start_exporters, stop_exporters
+from src.live_data import write_live_state, positions_snapshot
+from src.tick_stream import TickStream
+from src.position_monitor import PositionMonitor
+from src.candle_index import CandleIndex, resync
+from src.stage_cache import stage_cache_from_config, cached_features
 
 # ─── โหลด config ───────────────────────────────────────────────────────────────────────
 _cfg_path = project_root / "config" / "config.yaml"
@@ -25,156 +38,195 @@ SYMBOL    = cfg["symbol"]
 MT5_CFG   = cfg["mt5"]
 HIST_PATH = Path(cfg["historical_data_path"])
 FEAT_PATH = Path(cfg["features_data_path"])
-
-# ─── เริ่มต้น DecisionEngine และ MT5Wrapper ───────────────────────────────────────────
-engine = DecisionEngine()
+OL_CFG    = cfg.get("online_learning", {}) or {}
+TICK_CFG  = cfg.get("tick_stream", {}) or {}
+MONITOR_CFG = cfg.get("position_monitor", {}) or {}
+INDEX_CFG = cfg.get("candle_index", {}) or {}
+BASE_TF   = cfg.get("timeframe", "M1")
+METRICS_CFG = cfg.get("metrics", {}) or {}
+REGISTRY_CFG = cfg.get("model_registry", {}) or {}
+SHADOW_CFG = cfg.get("shadow_scoring", {}) or {}
+RING_CFG  = cfg.get("shm_ring", {}) or {}
+JOURNAL_CFG = cfg.get("journal", {}) or {}
+TRADE_LOG_PATH = cfg.get("trade_log_path", "data/real_trade_log.csv")
+
+# ─── เริ่มต้น Online learner, DecisionEngine และ MT5Wrapper ─────────────────────────────
+# (import src.online_learning เฉพาะเมื่อเปิดใช้ → river ไม่จำเป็นถ้าปิด online learning;
+#  model_path / checkpoint_every อ่านจาก config ใน src/online_learning.py)
+learner = None
+if OL_CFG.get("enabled", False):
+    from src.online_learning import OnlineLearner
+    learner = OnlineLearner()
+
+# model registry: เริ่มจากเวอร์ชัน active แล้วสลับเวอร์ชันใหม่ระหว่างแท่งโดยไม่ต้อง restart
+model_registry = None
+if REGISTRY_CFG.get("enabled", False):
+    model_registry = ModelRegistry(REGISTRY_CFG.get("root", "models/registry"))
+engine = DecisionEngine(online_learner=learner, registry=model_registry)
 mt5    = MT5Wrapper(MT5_CFG)
 
-# ─── เก็บตำแหน่งที่เปิดค้างไว้ ────────────────────────────────────────────────────────
-# แต่ละตำแหน่งเก็บข้อมูลดังนี้:
-# {
-#   "side": "Buy"/"Sell",
-#   "entry_price": float,
-#   "sl": float,
-#   "tp1": float,
-#   "tp2": float,
-#   "tp3": float,
-#   "atr": float,
-#   "vwap": float,
-#   "breakeven": bool,
-#   "tp1_hit": bool,
-#   "tp2_hit": bool,
-#   "tp3_hit": bool
-# }
-open_positions = []
+# ─── Counters ของ live loop ──────────────────────────────────────────────────────────
+bars_counter    = REGISTRY.counter("bars", "bars processed by the live loop")
+signals_counter = REGISTRY.counter("signals", "ICT entry signals")
+orders_counter  = REGISTRY.counter("orders_opened", "orders opened successfully")
+errors_counter  = REGISTRY.counter("loop_errors", "stage errors in the live loop")
+open_gauge      = REGISTRY.gauge("open_positions", "positions currently tracked")
+signal_sources  = Counter()  # จำนวนสัญญาณแยกตาม source (ICT / XGB) สำหรับ dashboard
+
+# ─── Journal (decision/order/transition แบบ binary) + trade log ของเทรดที่ปิดแล้ว ────────────
+journal = None
+if JOURNAL_CFG.get("enabled", False):
+    journal = Journal(JOURNAL_CFG.get("path", "logs/journal.bin"),
+                      int(JOURNAL_CFG.get("batch_records", 256)),
+                      float(JOURNAL_CFG.get("flush_interval_s", 1.0)),
+                      JOURNAL_CFG.get("fsync", "batch"),
+                      float(JOURNAL_CFG.get("rotate_mb", 64)))
+trade_log = TradeLog(TRADE_LOG_PATH)
+
+def record_closed_trade(pos: dict, exit_price: float):
+    """
+    บันทึกเทรดที่ปิดแล้วลง trade_log_path แล้วส่งผลลัพธ์ (ฟีเจอร์ ณ entry + pnl) ให้ online learner
+    """
+    if pos["side"] == "Buy":
+        pnl = exit_price - pos["entry_price"]
+    else:
+        pnl = pos["entry_price"] - exit_price
+    try:
+        trade_log.append(pos.get("entry_time"), datetime.now(), pos["side"], pos["entry_price"],
+                         exit_price, pnl, pos.get("exit_reason", ""))
+    except OSError as e:
+        print(f"[{datetime.now()}] Trade log write failed: {e}")
+    if learner is None or not OL_CFG.get("update_on_trade", True):
+        return
+    try:
+        learner.learn_trade(pos.get("features"), pnl)
+    except Exception as e:
+        print(f"[{datetime.now()}] Online learner update failed: {e}")
+
+# ─── ตำแหน่งที่เปิดค้างไว้ (logic เดียวกับ replay harness ใน src/replay.py) ─────────────
+positions = PositionManager(mt5, SYMBOL, lot=0.01, on_close=record_closed_trade, journal=journal)
+open_positions = positions.positions
+
+# ─── Tick stream: สร้างแท่งจาก tick แทนการ fetch_candles ทุกรอบ (ดู src/tick_stream.py) ───────
+stream = None
+LOOP_SLEEP = COOLDOWN
+if TICK_CFG.get("enabled", False):
+    stream = TickStream(SYMBOL, timeframes=TICK_CFG.get("timeframes", [BASE_TF]))
+    LOOP_SLEEP = float(TICK_CFG.get("poll_interval_s", 0.5))
+
+# ─── Stage cache + candle index: แทรกแท่งที่หายไปแล้วคำนวณ features ใหม่เฉพาะช่วงท้าย ─────────────
+stage_cache = stage_cache_from_config(cfg)
+candle_index = None
+resync_since = None  # แท่งล่าสุดที่ตรวจช่องว่างแล้ว (เลื่อนเมื่อ resync สำเร็จเท่านั้น)
+
+def check_gaps():
+    """
+    หาแท่งที่หายไปหลัง resync_since (เช่นช่วงที่หลุดการเชื่อมต่อ) แล้วดึงเฉพาะช่วงนั้นจาก MT5 มาแทรก
+    คืนจำนวนแท่งที่แทรก
+    """
+    global candle_index, resync_since
+    if candle_index is None:
+        candle_index = CandleIndex.from_csv(HIST_PATH, BASE_TF)
+    else:
+        candle_index.refresh()
+    if not len(candle_index):
+        return 0
+    try:
+        report = resync(candle_index, since=resync_since, cache=stage_cache, features_path=str(FEAT_PATH))
+    except Exception as e:
+        errors_counter.inc()
+        print(f"[{datetime.now()}] Gap re-sync failed: {e}")
+        return 0
+    if report["bars"]:
+        print(f"[{datetime.now()}] Re-synced {report['bars']} missing bars in {report['gaps']} gaps")
+    resync_since = pd.Timestamp(int(candle_index.times[-1]), unit="s")
+    return report["bars"]
+
+def create_ring() -> ShmRing:
+    """
+    shared-memory ring ของแท่งล่าสุด + features (live loop เป็นผู้เขียนคนเดียว)
+    segment ชื่อเดิมที่ค้างจากรอบก่อน (process ล้ม) ถูก unlink ก่อนสร้างใหม่
+    """
+    name = RING_CFG.get("name", "xauusd_live_ring")
+    try:
+        return ShmRing.create(default_columns(), int(RING_CFG.get("capacity", 4096)), name)
+    except FileExistsError:
+        stale = ShmRing.attach(name)
+        stale.owner = True
+        stale.close()
+        return ShmRing.create(default_columns(), int(RING_CFG.get("capacity", 4096)), name)
+
+def start_tick_stream():
+    """
+    warm up แท่งปัจจุบันและย้อนหลัง warmup_minutes นาทีจาก tick (เริ่มที่ขอบนาที → แท่งแรกครบ)
+    """
+    now_s = int(time.time())
+    start_s = now_s - now_s % 60 - 60 * int(TICK_CFG.get("warmup_minutes", 5))
+    stream.warmup(start_s, now_s)
+    stream.drain_closed(BASE_TF)  # แท่งย้อนหลังมีใน historical.csv อยู่แล้ว
 
-def manage_positions(df_feat: pd.DataFrame):
+def fetch_new_bars() -> pd.DataFrame:
     """
-    ตรวจสถานะตำแหน่งที่เปิดค้างไว้:
-    - Breakeven ถ้า price crossing VWAP
-    - ปิดตาม TP1, TP2, TP3
-    - SL (Market order) ทันทีถ้าทะลุ
-    - Reverse MSS: ปิดทันทีถ้ามีสัญญาณกลับตัว
+    แท่งใหม่ของ BASE_TF: จาก tick stream (เฉพาะแท่งที่ปิดตั้งแต่รอบก่อน) หรือ fetch_candles(1)
+    ดึงไม่สำเร็จ (เช่น MT5 หลุด) → คืน None ให้ loop พักแล้วลองใหม่รอบหน้า
     """
-    global open_positions
-    if not open_positions:
+    try:
+        if stream is None:
+            return fetch_candles(1)
+        stream.poll()
+        return stream.drain_closed(BASE_TF)
+    except Exception as e:
+        errors_counter.inc()
+        print(f"[{datetime.now()}] Error fetching new bars: {e}")
+        return None
+
+last_health_check = None
+
+def periodic_health_check():
+    """
+    health_check ไม่เกิน 1 ครั้งต่อ COOLDOWN วินาที (tick stream วน loop ทุก poll_interval_s)
+    """
+    global last_health_check
+    now = time.monotonic()
+    if last_health_check is not None and now - last_health_check < COOLDOWN:
         return
+    last_health_check = now
+    health_check()
 
-    last = df_feat.iloc[-1]
-    price_bid = last["close"]
-    vwap       = last["vwap"]
-    atr        = last["atr"]
-
-    updated = []
-    for pos in open_positions:
-        side        = pos["side"]
-        entry_price = pos["entry_price"]
-        sl          = pos["sl"]
-        tp1         = pos["tp1"]
-        tp2         = pos["tp2"]
-        tp3         = pos["tp3"]
-        breakeven   = pos["breakeven"]
-        tp1_hit     = pos["tp1_hit"]
-        tp2_hit     = pos["tp2_hit"]
-        tp3_hit     = pos["tp3_hit"]
-
-        # 1) SL
-        if side == "Buy" and price_bid <= sl:
-            mt5.close_all(SYMBOL)
-            print(f"[{datetime.now()}] SL hit for Buy at {price_bid}. Closed position.")
-            continue
-        if side == "Sell" and price_bid >= sl:
-            mt5.close_all(SYMBOL)
-            print(f"[{datetime.now()}] SL hit for Sell at {price_bid}. Closed position.")
-            continue
-
-        # 2) Breakeven (VWAP cross)
-        if not breakeven:
-            if side == "Buy" and price_bid > vwap:
-                sl        = entry_price
-                breakeven = True
-                mt5.close_all(SYMBOL)
-                print(f"[{datetime.now()}] VWAP crossed for Buy; SL set to breakeven. Closed 50% (simulated).")
-            if side == "Sell" and price_bid < vwap:
-                sl        = entry_price
-                breakeven = True
-                mt5.close_all(SYMBOL)
-                print(f"[{datetime.now()}] VWAP crossed for Sell; SL set to breakeven. Closed 50% (simulated).")
-
-        # 3) TP1
-        if not tp1_hit:
-            if side == "Buy" and price_bid >= tp1:
-                mt5.close_all(SYMBOL)
-                tp1_hit = True
-                sl      = entry_price + 0.5 * atr
-                print(f"[{datetime.now()}] TP1 hit for Buy at {price_bid}. Closed 1/3. New SL={sl}.")
-            if side == "Sell" and price_bid <= tp1:
-                mt5.close_all(SYMBOL)
-                tp1_hit = True
-                sl      = entry_price - 0.5 * atr
-                print(f"[{datetime.now()}] TP1 hit for Sell at {price_bid}. Closed 1/3. New SL={sl}.")
-
-        # 4) TP2
-        if not tp2_hit:
-            if side == "Buy" and price_bid >= tp2:
-                mt5.close_all(SYMBOL)
-                tp2_hit = True
-                print(f"[{datetime.now()}] TP2 hit for Buy at {price_bid}. Closed/all or moved SL to breakeven.")
-            if side == "Sell" and price_bid <= tp2:
-                mt5.close_all(SYMBOL)
-                tp2_hit = True
-                print(f"[{datetime.now()}] TP2 hit for Sell at {price_bid}. Closed/all or moved SL to breakeven.")
-
-        # 5) TP3
-        if not tp3_hit:
-            tp3_level = vwap + 0.5 * atr if side == "Buy" else vwap - 0.5 * atr
-            if side == "Buy" and price_bid >= tp3_level:
-                mt5.close_all(SYMBOL)
-                tp3_hit = True
-                print(f"[{datetime.now()}] TP3 hit for Buy at {price_bid}. Closed 1/3 position.")
-            if side == "Sell" and price_bid <= tp3_level:
-                mt5.close_all(SYMBOL)
-                tp3_hit = True
-                print(f"[{datetime.now()}] TP3 hit for Sell at {price_bid}. Closed 1/3 position.")
-
-        # 6) Reverse MSS (อ่านจาก df_feat ถ้ามีคอลัมน์ bullish_mss/bearish_mss)
-        bullish_mss = last.get("bullish_mss", False)
-        bearish_mss = last.get("bearish_mss", False)
-        if side == "Buy" and bearish_mss:
-            mt5.close_all(SYMBOL)
-            print(f"[{datetime.now()}] Reverse MSS (Bearish) for Buy. Closed position.")
-            continue
-        if side == "Sell" and bullish_mss:
-            mt5.close_all(SYMBOL)
-            print(f"[{datetime.now()}] Reverse MSS (Bullish) for Sell. Closed position.")
-            continue
-
-        updated.append({
-            "side": side,
-            "entry_price": entry_price,
-            "sl": sl,
-            "tp1": tp1,
-            "tp2": tp2,
-            "tp3": tp3,
-            "atr": atr,
-            "vwap": vwap,
-            "breakeven": breakeven,
-            "tp1_hit": tp1_hit,
-            "tp2_hit": tp2_hit,
-            "tp3_hit": tp3_hit
-        })
-
-    open_positions[:] = updated
+def manage_positions(df_feat: pd.DataFrame):
+    """
+    ตรวจสถานะตำแหน่งที่เปิดค้างไว้จากแท่งล่าสุด (ดู PositionManager.manage)
+    """
+    positions.manage(df_feat.iloc[-1])
 
 if __name__ == "__main__":
+    exporters = start_exporters(METRICS_CFG)
+    if stream is not None:
+        start_tick_stream()
+    # ตรวจ SL/TP ระหว่างแท่งทุก interval_ms (ล็อกเดียวกับ manage_positions ใน PositionManager)
+    monitor = None
+    if MONITOR_CFG.get("enabled", False):
+        monitor = PositionMonitor(positions, interval_ms=float(MONITOR_CFG.get("interval_ms", 200)))
+        monitor.start()
+    if model_registry is not None:
+        engine.watch(float(REGISTRY_CFG.get("poll_interval_s", 5)))
+    # shadow scoring: candidate models ทำนายแท่งเดียวกันใน process แยก (publish ไม่รอ)
+    shadow = None
+    if SHADOW_CFG.get("enabled", False):
+        shadow = ShadowScorer(SHADOW_CFG.get("models", []), int(SHADOW_CFG.get("capacity", 4096)),
+                              SHADOW_CFG.get("log_path", "logs/shadow_scores.csv"),
+                              float(SHADOW_CFG.get("poll_interval_ms", 50)),
+                              REGISTRY_CFG.get("root", "models/registry")).start()
+    ring = create_ring() if RING_CFG.get("enabled", False) else None
     try:
         # ─── Loop หลัก ─────────────────────────────────────────────────────────────────────────
         while True:
-            # 1) Fetch แท่งใหม่ 1 แท่ง
-            df_new = fetch_candles(1)
+            # 1) Fetch แท่งใหม่ (tick stream: แท่งที่ปิดแล้วเท่านั้น)
+            with span("fetch"):
+                df_new = fetch_new_bars()
             if df_new is None or df_new.empty:
-                time.sleep(COOLDOWN)
-                health_check()
+                time.sleep(LOOP_SLEEP)
+                periodic_health_check()
                 continue
 
             # 2) Append ลง historical.csv
@@ -183,103 +235,123 @@ if __name__ == "__main__":
             except Exception as e:
                 print(f"[{datetime.now()}] Error reading historical data: {e}")
                 time.sleep(COOLDOWN)
-                health_check()
+                periodic_health_check()
                 continue
 
             hist = pd.concat([hist, df_new]).drop_duplicates(subset="time") \
                        .sort_values("time").reset_index(drop=True)
             hist.to_csv(HIST_PATH, index=False)
 
-            # 3) Recompute features → data_with_features.csv
+            # 2b) แทรกแท่งที่หายไประหว่างรอบ (เฉพาะช่วงที่หาย ไม่ดึง/เขียนใหม่ทั้งไฟล์)
+            resynced = 0
+            if INDEX_CFG.get("enabled", False):
+                with span("resync"):
+                    resynced = check_gaps()
+
+            # 3) Recompute features → data_with_features.csv (stage cache: เฉพาะแถวใหม่/หลังจุดแทรก)
             try:
-                compute_features(HIST_PATH, FEAT_PATH)
+                if stage_cache is not None:
+                    cached_features(stage_cache, str(HIST_PATH), str(FEAT_PATH), base_timeframe=BASE_TF)
+                else:
+                    compute_features(HIST_PATH, FEAT_PATH)
             except Exception as e:
+                errors_counter.inc()
                 print(f"[{datetime.now()}] Error computing features: {e}")
                 time.sleep(COOLDOWN)
-                health_check()
+                periodic_health_check()
                 continue
 
             # 4) โหลด dataframe ฟีเจอร์ล่าสุด
             if not FEAT_PATH.exists():
                 print(f"[{datetime.now()}] Features file not found at {FEAT_PATH}")
                 time.sleep(COOLDOWN)
-                health_check()
+                periodic_health_check()
                 continue
 
             try:
-                df_feat = pd.read_csv(FEAT_PATH, parse_dates=["time"])
+                df_feat = read_feature_csv(FEAT_PATH)
             except Exception as e:
                 print(f"[{datetime.now()}] Error reading features: {e}")
                 time.sleep(COOLDOWN)
-                health_check()
+                periodic_health_check()
                 continue
 
             if df_feat.empty:
                 print(f"[{datetime.now()}] Features DataFrame is empty")
                 time.sleep(COOLDOWN)
-                health_check()
+                periodic_health_check()
                 continue
 
             last_idx = len(df_feat) - 1
             last_row = df_feat.iloc[last_idx]
 
+            # 4b) เผยแพร่แท่งใหม่ + features ลง shared-memory ring (แทรกแท่งย้อนหลัง → เขียนทั้งหน้าต่างใหม่)
+            if ring is not None:
+                ring.append_frame(df_feat, reset=resynced > 0)
+
             # 5) สร้างสัญญาณ (ICT หรือ XGB)
+            bars_counter.inc()
             try:
-                sig = engine.predict(df_feat, last_idx)
+                with span("predict"):
+                    sig = engine.predict(df_feat, last_idx)
             except Exception as e:
+                errors_counter.inc()
                 print(f"[{datetime.now()}] Error in DecisionEngine.predict: {e}")
                 time.sleep(COOLDOWN)
-                health_check()
+                periodic_health_check()
                 continue
 
+            if journal is not None:
+                journal.decision(last_row["time"], sig)
+            if shadow is not None:
+                shadow.publish(last_row, sig)
+
             source = sig.get("source")
             side   = sig.get("side")
-            print(f"[{datetime.now()}] Signal from {source}: {side}")
+            online_proba = sig.get("online_proba")
+            signal_sources[str(source)] += 1
+            if online_proba is not None:
+                print(f"[{datetime.now()}] Signal from {source}: {side} (online p_win={online_proba:.3f})")
+            else:
+                print(f"[{datetime.now()}] Signal from {source}: {side}")
 
             # 6) ถ้า ICT entry เกิด → เปิดออร์เดอร์ + บันทึกตำแหน่ง
             if source == "ICT" and side in ("Buy", "Sell"):
-                entry_price = sig["entry_price"]
-                sl          = sig["sl"]
-                tp1         = sig["tp1"]
-                tp2         = sig["tp2"]
-                tp3         = sig["tp3"]
-                atr         = sig["atr"]
-                vwap        = last_row["vwap"]
-
-                lot = 0.01  # เบื้องต้น 1% equity (ปรับตามต้องการ)
-
-                try:
-                    success = mt5.open_order(SYMBOL, side.upper(), lot=lot, sl=sl, tp=tp1)
-                except Exception as e:
-                    print(f"[{datetime.now()}] MT5 open_order exception: {e}")
-                    success = False
-
-                if success:
-                    open_positions.append({
-                        "side": side,
-                        "entry_price": entry_price,
-                        "sl": sl,
-                        "tp1": tp1,
-                        "tp2": tp2,
-                        "tp3": tp3,
-                        "atr": atr,
-                        "vwap": vwap,
-                        "breakeven": False,
-                        "tp1_hit": False,
-                        "tp2_hit": False,
-                        "tp3_hit": False
-                    })
-                    print(f"[{datetime.now()}] Opened {side} @ {entry_price}, SL={sl}, TP1={tp1}, TP2={tp2}, TP3={tp3}")
+                signals_counter.inc()
+                with span("open_order"):
+                    if positions.on_signal(sig, last_row):
+                        orders_counter.inc()
 
             # 7) จัดการตำแหน่งที่เปิดค้างไว้
-            manage_positions(df_feat)
+            with span("manage_positions"):
+                manage_positions(df_feat)
+            open_gauge.set(len(open_positions))
 
-            # 8) ตรวจสุขภาพระบบ
-            health_check()
+            # 8) บันทึก live state ให้ dashboard (src/dashboard.py)
+            try:
+                snapshot = REGISTRY.snapshot()
+                write_live_state({
+                    "updated_at": datetime.now().isoformat(),
+                    "symbol": SYMBOL,
+                    "cooldown_s": COOLDOWN,
+                    "last_bar_time": last_row["time"],
+                    "last_close": float(last_row["close"]),
+                    "last_signal": {"source": source, "side": side, "online_proba": online_proba},
+                    "model_version": engine.model.version,
+                    "signal_sources": dict(signal_sources),
+                    "positions": positions_snapshot(open_positions),
+                    "counters": snapshot["counters"],
+                    "latency": snapshot["latency"],
+                })
+            except Exception as e:
+                print(f"[{datetime.now()}] Failed to write live state: {e}")
+
+            # 9) ตรวจสุขภาพระบบ
+            periodic_health_check()
 
-            # 9) พัก COOLDOWN วินาที
+            # 10) พัก COOLDOWN วินาที (tick stream: poll_interval_s)
             try:
-                time.sleep(COOLDOWN)
+                time.sleep(LOOP_SLEEP)
             except KeyboardInterrupt:
                 print(f"[{datetime.now()}] KeyboardInterrupt caught during sleep. Exiting loop.")
                 break
@@ -287,6 +359,22 @@ if __name__ == "__main__":
     except KeyboardInterrupt:
         print(f"[{datetime.now()}] KeyboardInterrupt caught. Exiting run_phase3.py cleanly.")
     finally:
-        # ปิด MT5 ก่อนออก
+        # หยุด monitor, บันทึก online model ครั้งสุดท้าย แล้วปิด MT5 ก่อนออก
+        if monitor is not None:
+            monitor.stop(timeout=2)
+        if model_registry is not None:
+            engine.stop_watch(timeout=2)
+        if shadow is not None:
+            shadow.stop(timeout=5)
+        if ring is not None:
+            ring.close()
+        if journal is not None:
+            journal.close()
+        if learner is not None:
+            learner.close()
+            print(f"[{datetime.now()}] Online learner metrics: {learner.metrics()}")
+        stop_exporters(exporters)
+        for name, summary in REGISTRY.snapshot()["latency"].items():
+            print(f"[{datetime.now()}] latency {name}: {summary}")
         mt5.shutdown()
         print(f"[{datetime.now()}] MT5 connection closed. Goodbye.")
@@ -0,0 +1,217 @@
+"""
+Historical backfill: ดึงแท่งย้อนหลังช่วงวันที่ยาว ๆ (เช่น 6–12 เดือน M1 สำหรับ backtest_hybrid)
+
+รัน:  python -m src.backfill --start 2024-01-01 --end 2025-01-01
+  - แบ่งช่วงเป็น chunk ละ chunk_days วัน → copy_rates_range ขนานกันไม่เกิน workers งาน
+    ผ่าน MT5 session เดียว (initialize ครั้งเดียวใน process)
+  - เขียนผลตามลำดับเวลาลง historical.csv โดยตรง (append) ถ้าช่วงที่ดึงอยู่หลังแท่งสุดท้ายของไฟล์
+    ไม่เช่นนั้นเขียนลงไฟล์พัก <historical>.backfill.csv แล้ว merge ครั้งเดียวตอนจบ
+  - checkpoint (chunk ถัดไป + ขนาดไฟล์ที่เขียนครบแล้ว) บันทึกหลังทุก chunk → รันซ้ำคำสั่งเดิมเพื่อ resume
+"""
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import yaml
+
+from src.instrumentation import REGISTRY
+
+# โหลด config
+_cfg_path = Path(__file__).resolve().parents[1] / "config" / "config.yaml"
+with open(_cfg_path, "r", encoding="utf-8") as f:
+    cfg = yaml.safe_load(f)
+
+_backfill_cfg = cfg.get("backfill", {}) or {}
+SYMBOL = cfg["symbol"]
+TIMEFRAME = cfg.get("timeframe", "M1")
+HIST_PATH = cfg["historical_data_path"]
+CHUNK_DAYS = float(_backfill_cfg.get("chunk_days", 7))
+WORKERS = int(_backfill_cfg.get("workers", 4))
+RETRIES = int(_backfill_cfg.get("retries", 3))
+MONTHS = int(_backfill_cfg.get("months", 12))
+
+CANDLE_COLUMNS = ["time", "open", "high", "low", "close", "tick_volume"]
+
+bars_counter = REGISTRY.counter("backfill_bars", "bars written by the historical backfill")
+chunk_hist = REGISTRY.histogram("backfill_chunk", "copy_rates_range latency per backfill chunk")
+
+
+def mt5_rates_range(symbol: str, timeframe: str, start: pd.Timestamp, end: pd.Timestamp) -> Optional[np.ndarray]:
+    """
+    copy_rates_range ของช่วง [start, end] (เวลา UTC) — MT5 ต้อง initialize แล้ว
+    """
+    import MetaTrader5 as mt5
+    tf = getattr(mt5, f"TIMEFRAME_{timeframe}")
+    return mt5.copy_rates_range(symbol, tf, start.tz_localize("UTC").to_pydatetime(),
+                                end.tz_localize("UTC").to_pydatetime())
+
+
+def split_ranges(start, end, chunk_days: float = CHUNK_DAYS) -> List[Tuple[pd.Timestamp, pd.Timestamp]]:
+    """
+    แบ่ง [start, end) เป็นช่วงติดกันยาวไม่เกิน chunk_days วัน
+    """
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    edges = list(pd.date_range(start, end, freq=pd.Timedelta(days=chunk_days)))
+    if edges[-1] != end:
+        edges.append(end)
+    return list(zip(edges[:-1], edges[1:]))
+
+
+def rates_frame(rates: np.ndarray, start: pd.Timestamp, end: pd.Timestamp) -> pd.DataFrame:
+    """
+    rates ของ MT5 → DataFrame รูปแบบ historical.csv เฉพาะแท่งที่เปิดใน [start, end)
+    (copy_rates_range รวมขอบขวา จึงตัดออกเพื่อไม่ให้แท่งซ้ำระหว่าง chunk)
+    """
+    df = pd.DataFrame(rates)
+    if df.empty:
+        return pd.DataFrame(columns=CANDLE_COLUMNS)
+    df["time"] = pd.to_datetime(df["time"], unit="s")
+    df = df[(df["time"] >= start) & (df["time"] < end)]
+    return df[CANDLE_COLUMNS].reset_index(drop=True)
+
+
+def _download(fetch: Callable, symbol: str, timeframe: str, start: pd.Timestamp, end: pd.Timestamp,
+              retries: int) -> pd.DataFrame:
+    for attempt in range(retries + 1):
+        t0 = time.perf_counter_ns()
+        rates = fetch(symbol, timeframe, start, end)
+        chunk_hist.record(time.perf_counter_ns() - t0)
+        if rates is not None:
+            return rates_frame(rates, start, end)
+        if attempt < retries:
+            time.sleep(0.5 * 2 ** attempt)
+    raise RuntimeError(f"copy_rates_range failed for {symbol} {timeframe} {start} – {end}")
+
+
+def _last_time(path: Path) -> Optional[pd.Timestamp]:
+    """
+    เวลาของแถวสุดท้ายใน CSV (อ่านแค่ท้ายไฟล์)
+    """
+    if not path.exists() or path.stat().st_size == 0:
+        return None
+    with open(path, "rb") as f:
+        f.seek(max(0, path.stat().st_size - 4096))
+        lines = f.read().decode("utf-8").strip().splitlines()
+    last = lines[-1].split(",")[0] if lines else ""
+    try:
+        return pd.Timestamp(last)
+    except ValueError:
+        return None  # มีแต่ header
+
+
+def _save_checkpoint(path: Path, state: Dict):
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(state, indent=2), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def backfill(start, end, symbol: str = SYMBOL, timeframe: str = TIMEFRAME, hist_path=HIST_PATH,
+             chunk_days: float = CHUNK_DAYS, workers: int = WORKERS, retries: int = RETRIES,
+             fetch: Optional[Callable] = None, checkpoint_path=None) -> Dict:
+    """
+    ดึงแท่ง [start, end) ลง hist_path แบบแบ่ง chunk + ขนาน + resume ได้
+    fetch(symbol, timeframe, start, end) ค่าเริ่มต้นคือ mt5_rates_range
+    คืนสรุป {bars, chunks, seconds, bars_per_s, target}
+    """
+    fetch = fetch or mt5_rates_range
+    hist_path = Path(hist_path)
+    checkpoint_path = Path(checkpoint_path or f"{hist_path}.backfill.json")
+    ranges = split_ranges(start, end, chunk_days)
+    job = {"symbol": symbol, "timeframe": timeframe, "start": str(pd.Timestamp(start)),
+           "end": str(pd.Timestamp(end)), "chunk_days": chunk_days}
+
+    state = None
+    if checkpoint_path.exists():
+        state = json.loads(checkpoint_path.read_text(encoding="utf-8"))
+        if state.get("job") != job:
+            state = None  # checkpoint ของงานอื่น → เริ่มใหม่
+    if state is None:
+        last = _last_time(hist_path)
+        direct = last is None or last < pd.Timestamp(start)
+        target = hist_path if direct else Path(f"{hist_path}.backfill.csv")
+        if not direct and target.exists():
+            target.unlink()
+        state = {"job": job, "target": str(target), "next_chunk": 0, "bars": 0,
+                 "committed_bytes": target.stat().st_size if target.exists() else 0}
+    target = Path(state["target"])
+    target.parent.mkdir(parents=True, exist_ok=True)
+    # ตัดส่วนที่เขียนไม่ครบจากรอบที่ล้มเหลว
+    if target.exists() and target.stat().st_size > state["committed_bytes"]:
+        with open(target, "r+b") as f:
+            f.truncate(state["committed_bytes"])
+
+    t0 = time.perf_counter()
+    bars_before = state["bars"]
+    first = state["next_chunk"]
+    window = max(1, 2 * workers)  # จำนวน chunk ที่ดึงล่วงหน้าได้สูงสุด (จำกัดหน่วยความจำ)
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        pending = {}
+        submitted = first
+        try:
+            for i in range(first, len(ranges)):
+                while submitted < len(ranges) and submitted - i < window:
+                    pending[submitted] = pool.submit(_download, fetch, symbol, timeframe,
+                                                     *ranges[submitted], retries)
+                    submitted += 1
+                df = pending.pop(i).result()
+                if len(df):
+                    header = not target.exists() or target.stat().st_size == 0
+                    df.to_csv(target, mode="a", header=header, index=False)
+                    bars_counter.inc(len(df))
+                state.update(next_chunk=i + 1, bars=state["bars"] + len(df),
+                             committed_bytes=target.stat().st_size if target.exists() else 0)
+                _save_checkpoint(checkpoint_path, state)
+        except BaseException:
+            for fut in pending.values():
+                fut.cancel()
+            raise
+
+    if target != hist_path:
+        # ช่วงที่ดึงซ้อน/อยู่ก่อนข้อมูลเดิม → merge ครั้งเดียว (แท่งเดิมใน historical.csv มาก่อน)
+        parts = [pd.read_csv(hist_path, parse_dates=["time"])]
+        if target.exists():
+            parts.append(pd.read_csv(target, parse_dates=["time"]))
+        merged = pd.concat(parts).drop_duplicates(subset="time").sort_values("time")
+        merged.to_csv(hist_path, index=False)
+        target.unlink(missing_ok=True)
+    checkpoint_path.unlink(missing_ok=True)
+
+    seconds = time.perf_counter() - t0
+    bars = state["bars"] - bars_before
+    summary = {"bars": state["bars"], "chunks": len(ranges), "seconds": seconds,
+               "bars_per_s": bars / seconds if seconds > 0 else 0.0, "target": str(hist_path)}
+    print(f"Backfilled {bars} bars ({len(ranges) - first} chunks) in {seconds:.1f}s "
+          f"→ {summary['bars_per_s']:.0f} bars/s → {hist_path}")
+    return summary
+
+
+if __name__ == "__main__":
+    from src.mt5_api import MT5Wrapper
+
+    parser = argparse.ArgumentParser(description="Backfill historical candles with copy_rates_range")
+    parser.add_argument("--start", default=None, help=f"ค่าเริ่มต้น: {MONTHS} เดือนก่อน --end")
+    parser.add_argument("--end", default=None, help="ค่าเริ่มต้น: ต้นนาทีปัจจุบัน (UTC)")
+    parser.add_argument("--symbol", default=SYMBOL)
+    parser.add_argument("--timeframe", default=TIMEFRAME)
+    parser.add_argument("--output", default=HIST_PATH)
+    parser.add_argument("--chunk-days", type=float, default=CHUNK_DAYS)
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    args = parser.parse_args()
+
+    end = pd.Timestamp(args.end) if args.end else pd.Timestamp.utcnow().tz_localize(None).floor("min")
+    start = pd.Timestamp(args.start) if args.start else end - pd.DateOffset(months=MONTHS)
+
+    session = MT5Wrapper(cfg["mt5"])
+    if not session.initialized:
+        raise SystemExit(1)
+    try:
+        backfill(start, end, args.symbol, args.timeframe, args.output, args.chunk_days, args.workers)
+    finally:
+        session.shutdown()
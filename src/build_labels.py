@@ -1,6 +1,12 @@
+import argparse
+import time
+import numpy as np
 import pandas as pd
 import yaml
 from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+
+from src.schema import LABELS, read_feature_csv, to_labels
 
 # โหลด config จาก config/config.yaml
 _cfg_path = Path(__file__).resolve().parents[1] / "config" / "config.yaml"
@@ -11,6 +17,90 @@ with open(_cfg_path, "r", encoding="utf-8") as f:
 H = _cfg.get("label_horizon", 5)
 k_atr = _cfg.get("label_atr_multiplier", 0.5)
 
+# Label matrix: ทุกคู่ horizon × ATR multiplier ในรอบเดียว (สำหรับศึกษาค่าพารามิเตอร์ของ label)
+_matrix_cfg = _cfg.get("label_matrix", {}) or {}
+MATRIX_HORIZONS = list(_matrix_cfg.get("horizons", [H]))
+MATRIX_MULTIPLIERS = list(_matrix_cfg.get("atr_multipliers", [k_atr]))
+MATRIX_PATH = _matrix_cfg.get("output_path", "data/label_matrix.csv")
+
+# รหัส int8 ตรงกับ schema.label_codes: NoTrade→0, Buy→1, Sell→2
+NO_TRADE, BUY, SELL = (np.int8(LABELS.index(x)) for x in ("NoTrade", "Buy", "Sell"))
+
+
+def matrix_column(horizon: int, multiplier: float) -> str:
+    """
+    ชื่อคอลัมน์ของ label matrix เช่น label_h5_k0.5
+    """
+    return f"label_h{int(horizon)}_k{multiplier:g}"
+
+
+def _col(df: pd.DataFrame, name: str) -> np.ndarray:
+    return df[name].to_numpy()
+
+
+def entry_filters(df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    ตัวกรองขั้น 2–4 ของ build_labels (ไม่ขึ้นกับ horizon/threshold) → (buy_ok, sell_ok) ต่อแถว
+    2) HTF + VWAP bias  3) Bollinger Bands + ATR_MA  4) MSS/FVG + Fibonacci + RSI/ADX + Volume Imbalance
+    NaN ทำให้เงื่อนไขเป็นเท็จเหมือนการเทียบทีละแถว
+    """
+    price_open = _col(df, "open").astype(np.float64)
+    atr = _col(df, "atr").astype(np.float64)
+    ema50_h4, ema200_h4, rsi_h4 = _col(df, "ema50_h4"), _col(df, "ema200_h4"), _col(df, "rsi_h4")
+    vwap = _col(df, "vwap").astype(np.float64)
+    tol = 0.1 * atr
+    bb_upper, bb_lower, atr_ma = _col(df, "bb_upper"), _col(df, "bb_lower"), _col(df, "atr_ma")
+    fvg_fib_b = _col(df, "fvg_bullish").astype(bool) & _col(df, "fib_in_zone").astype(bool)
+    fvg_fib_br = _col(df, "fvg_bearish").astype(bool) & _col(df, "fib_in_zone").astype(bool)
+    rsi, adx, vol_imb = _col(df, "rsi"), _col(df, "adx"), _col(df, "vol_imbalance")
+
+    buy_ok = ((ema50_h4 > ema200_h4) & (rsi_h4 > 50) & (price_open > vwap + tol)
+              & (((price_open <= bb_lower) & (atr < atr_ma)) | ((price_open >= bb_upper) & (atr > atr_ma)))
+              & (_col(df, "mss_bullish").astype(bool) | fvg_fib_b)
+              & (((rsi < 30) & (adx > 25)) | (vol_imb > 0.2)))
+    sell_ok = ((ema50_h4 < ema200_h4) & (rsi_h4 < 50) & (price_open < vwap - tol)
+               & (((price_open >= bb_upper) & (atr < atr_ma)) | ((price_open <= bb_lower) & (atr > atr_ma)))
+               & (_col(df, "mss_bearish").astype(bool) | fvg_fib_br)
+               & (((rsi > 70) & (adx > 25)) | (vol_imb < -0.2)))
+    return buy_ok, sell_ok
+
+
+def label_matrix(df: pd.DataFrame, horizons: Sequence[int] = MATRIX_HORIZONS,
+                 multipliers: Sequence[float] = MATRIX_MULTIPLIERS) -> Dict[Tuple[int, float], np.ndarray]:
+    """
+    label int8 ของทุกคู่ (horizon, multiplier) ในรอบเดียว:
+      - ตัวกรอง entry คำนวณครั้งเดียว
+      - forward max(high)/min(low) ของแท่ง t+1..t+h สะสมทีละ h จาก h−1 (ใช้ array เดิมต่อทุก horizon)
+      - แถวที่มีแท่งถัดไปไม่ครบ h แท่ง (t + h >= n) เป็น NoTrade
+    """
+    n = len(df)
+    high, low = _col(df, "high"), _col(df, "low")
+    price_open = _col(df, "open")
+    atr = _col(df, "atr").astype(np.float64)
+    buy_ok, sell_ok = entry_filters(df)
+
+    horizons = sorted(set(int(h) for h in horizons))
+    out: Dict[Tuple[int, float], np.ndarray] = {}
+    fmax = np.full(n, -np.inf, dtype=high.dtype)
+    fmin = np.full(n, np.inf, dtype=low.dtype)
+    for h in range(1, horizons[-1] + 1 if horizons else 1):
+        np.maximum(fmax[:n - h], high[h:], out=fmax[:n - h])
+        np.minimum(fmin[:n - h], low[h:], out=fmin[:n - h])
+        if h not in horizons:
+            continue
+        valid = np.arange(n) < n - h
+        up, down = fmax - price_open, price_open - fmin
+        for k in multipliers:
+            threshold = k * atr
+            base_buy = valid & (up >= threshold)
+            base_sell = valid & ~base_buy & (down >= threshold)
+            codes = np.full(n, NO_TRADE, dtype=np.int8)
+            codes[base_buy & buy_ok] = BUY
+            codes[base_sell & sell_ok] = SELL
+            out[(h, k)] = codes
+    return out
+
+
 def build_labels(input_path: str, output_path: str = "data/with_labels.csv"):
     """
     อ่านไฟล์ features (data_with_features.csv) → สร้าง label “Buy”/“Sell”/“NoTrade”
@@ -19,110 +109,48 @@ def build_labels(input_path: str, output_path: str = "data/with_labels.csv"):
     2) กรองด้วย Higher-Timeframe & VWAP bias
     3) กรองด้วย Bollinger Bands + ATR_MA
     4) กรองด้วย MSS/FVG + Fibonacci + RSI/ADX + Volume Imbalance
-    จากนั้นบันทึกลง output_path
+    จากนั้นบันทึกลง output_path (คำนวณแบบ vectorized ผ่าน label_matrix ที่ H, k_atr เดียว)
     """
     # 1. โหลด DataFrame ฟีเจอร์
-    df = pd.read_csv(input_path, parse_dates=["time"])
-    n = len(df)
-    labels = ["NoTrade"] * n
-
-    for t in range(n):
-        # ถ้าไม่พอช่วงถัดไป ให้เป็น NoTrade
-        if t + H >= n:
-            labels[t] = "NoTrade"
-            continue
-
-        # 1) Base label จาก ATR-break
-        price_open = df.at[t, "open"]
-        atr_t = df.at[t, "atr"]
-        threshold = k_atr * atr_t
-
-        future_high = df["high"].iloc[t + 1 : t + 1 + H].max()
-        future_low  = df["low"].iloc[t + 1 : t + 1 + H].min()
-
-        if (future_high - price_open) >= threshold:
-            base_label = "Buy"
-        elif (price_open - future_low) >= threshold:
-            base_label = "Sell"
-        else:
-            labels[t] = "NoTrade"
-            continue
-
-        # 2) HTF + VWAP bias
-        ema50_h4 = df.at[t, "ema50_h4"]
-        ema200_h4 = df.at[t, "ema200_h4"]
-        rsi_h4 = df.at[t, "rsi_h4"]
-        vwap = df.at[t, "vwap"]
-        tol = 0.1 * atr_t
-
-        if base_label == "Buy":
-            cond_htf = (ema50_h4 > ema200_h4) and (rsi_h4 > 50)
-            cond_vwap = (price_open > vwap + tol)
-            if not (cond_htf and cond_vwap):
-                labels[t] = "NoTrade"
-                continue
-        else:  # Sell
-            cond_htf = (ema50_h4 < ema200_h4) and (rsi_h4 < 50)
-            cond_vwap = (price_open < vwap - tol)
-            if not (cond_htf and cond_vwap):
-                labels[t] = "NoTrade"
-                continue
-
-        # 3) Bollinger Bands + ATR_MA filter
-        bb_upper = df.at[t, "bb_upper"]
-        bb_lower = df.at[t, "bb_lower"]
-        atr_ma = df.at[t, "atr_ma"]
-
-        if base_label == "Buy":
-            # ถ้า price_open <= bb_lower และ ATR < ATR_MA หรือ price_open >= bb_upper และ ATR > ATR_MA → ผ่าน
-            if price_open <= bb_lower and atr_t < atr_ma:
-                pass
-            elif price_open >= bb_upper and atr_t > atr_ma:
-                pass
-            else:
-                labels[t] = "NoTrade"
-                continue
-        else:  # Sell
-            if price_open >= bb_upper and atr_t < atr_ma:
-                pass
-            elif price_open <= bb_lower and atr_t > atr_ma:
-                pass
-            else:
-                labels[t] = "NoTrade"
-                continue
-
-        # 4) MSS/FVG + Fibonacci + RSI/ADX + Volume Imbalance
-        mss_b = df.at[t, "mss_bullish"]
-        mss_br = df.at[t, "mss_bearish"]
-        fvg_b = df.at[t, "fvg_bullish"]
-        fvg_br = df.at[t, "fvg_bearish"]
-        fib_in_zone = df.at[t, "fib_in_zone"]
-        rsi_t = df.at[t, "rsi"]
-        adx_t = df.at[t, "adx"]
-        vol_imb = df.at[t, "vol_imbalance"]
-
-        if base_label == "Buy":
-            cond1 = mss_b or (fvg_b and fib_in_zone)
-            cond2 = (rsi_t < 30 and adx_t > 25) or (vol_imb > 0.2)
-            if cond1 and cond2:
-                labels[t] = "Buy"
-            else:
-                labels[t] = "NoTrade"
-        else:  # Sell
-            cond1 = mss_br or (fvg_br and fib_in_zone)
-            cond2 = (rsi_t > 70 and adx_t > 25) or (vol_imb < -0.2)
-            if cond1 and cond2:
-                labels[t] = "Sell"
-            else:
-                labels[t] = "NoTrade"
+    df = read_feature_csv(input_path)
+    codes = label_matrix(df, [H], [k_atr])[(H, k_atr)]
 
     # แปลง labels เป็นคอลัมน์ใหม่ใน DataFrame
-    df["label"] = labels
+    df["label"] = pd.Categorical.from_codes(codes, dtype=to_labels([]).dtype)
 
     # สร้างโฟลเดอร์ปลายทาง (ถ้ายังไม่มี) แล้วบันทึก CSV
     Path(output_path).parent.mkdir(parents=True, exist_ok=True)
     df.to_csv(output_path, index=False)
     print(f"Labels saved to {output_path}")
 
+
+def build_label_matrix(input_path: str, output_path: str = MATRIX_PATH,
+                       horizons: Sequence[int] = MATRIX_HORIZONS,
+                       multipliers: Sequence[float] = MATRIX_MULTIPLIERS) -> List[str]:
+    """
+    เขียน label matrix: time + คอลัมน์ int8 (0/1/2 = NoTrade/Buy/Sell) หนึ่งคอลัมน์ต่อคู่ horizon × multiplier
+    คืนชื่อคอลัมน์ label ที่เขียน
+    """
+    df = read_feature_csv(input_path)
+    matrix = label_matrix(df, horizons, multipliers)
+    out = pd.DataFrame({"time": df["time"]})
+    for (h, k), codes in sorted(matrix.items()):
+        out[matrix_column(h, k)] = codes
+    Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+    out.to_csv(output_path, index=False)
+    print(f"Label matrix ({len(matrix)} settings) saved to {output_path}")
+    return list(out.columns[1:])
+
+
 if __name__ == "__main__":
-    build_labels("data/data_with_features.csv", "data/with_labels.csv")
+    parser = argparse.ArgumentParser(description="Build ATR-break labels")
+    parser.add_argument("--matrix", action="store_true",
+                        help="เขียน label matrix ของ label_matrix.horizons × atr_multipliers แทน label เดียว")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    if args.matrix:
+        build_label_matrix("data/data_with_features.csv", MATRIX_PATH)
+    else:
+        build_labels("data/data_with_features.csv", "data/with_labels.csv")
+    print(f"Done in {time.perf_counter() - t0:.2f}s")
@@ -0,0 +1,238 @@
+"""
+Time index ของ historical.csv: หาแท่งที่หายไป (นอกช่วงตลาดปิด) แล้วดึงเฉพาะช่วงนั้นจาก MT5 มาแทรก
+
+  index = CandleIndex.from_csv("data/historical.csv")
+  resync(index, since=last_time, cache=cache, features_path=..., labels_path=...)
+
+  - times (วินาที) และ byte offset ของทุกแถวเป็น numpy array เรียงตามเวลา → หาแถว/ช่องว่างรอบเวลาใด ๆ
+    ด้วย searchsorted (O(log n)) แล้วสแกนเฉพาะช่วงหลัง since
+  - แทรกแท่งโดยเขียนใหม่เฉพาะส่วนของไฟล์หลังช่องว่าง และย้อน stage cache ของ features/labels
+    ไปที่แถวก่อนช่องว่าง (stage_cache.rewind_stages) → ต้นทุนขึ้นกับระยะเวลาที่หลุด ไม่ใช่ขนาดประวัติทั้งหมด
+"""
+
+import os
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import yaml
+
+from src.backfill import RETRIES, _download, mt5_rates_range
+from src.features import TF_SECONDS
+from src.instrumentation import REGISTRY
+
+# โหลด config
+_cfg_path = Path(__file__).resolve().parents[1] / "config" / "config.yaml"
+with open(_cfg_path, "r", encoding="utf-8") as f:
+    cfg = yaml.safe_load(f)
+
+_index_cfg = cfg.get("candle_index", {}) or {}
+SYMBOL = cfg["symbol"]
+TIMEFRAME = cfg.get("timeframe", "M1")
+# ตลาดปิด (เวลา broker): วันในสัปดาห์ (0=จันทร์), ช่วงพักรายวัน ["HH:MM", "HH:MM"] และวันหยุด
+CLOSED_WEEKDAYS = list(_index_cfg.get("closed_weekdays", [5, 6]))
+DAILY_BREAK = _index_cfg.get("daily_break") or None
+HOLIDAYS = list(_index_cfg.get("holidays", []) or [])
+
+missing_counter = REGISTRY.counter("missing_bars", "bars found missing in historical.csv")
+resync_counter = REGISTRY.counter("resync_bars", "missing bars re-fetched and spliced into historical.csv")
+
+
+def _minute_of_day(hhmm: str) -> int:
+    h, m = hhmm.split(":")
+    return int(h) * 60 + int(m)
+
+
+class MarketHours:
+    """
+    ปฏิทินตลาด: แท่งที่เปิดในวันปิด / ช่วงพักรายวัน / วันหยุด ไม่นับว่าหาย
+    """
+
+    def __init__(self, closed_weekdays=CLOSED_WEEKDAYS, daily_break=DAILY_BREAK, holidays=HOLIDAYS):
+        self.closed_weekdays = np.asarray(closed_weekdays, dtype=np.int64)
+        self.daily_break = None if not daily_break else tuple(_minute_of_day(x) for x in daily_break)
+        self.holidays = np.asarray([pd.Timestamp(d).value // 10**9 // 86400 for d in holidays], dtype=np.int64)
+
+    def is_open(self, times_s: np.ndarray) -> np.ndarray:
+        days = times_s // 86400
+        is_open = ~np.isin((days + 3) % 7, self.closed_weekdays)  # 1970-01-01 เป็นวันพฤหัส (3)
+        if len(self.holidays):
+            is_open &= ~np.isin(days, self.holidays)
+        if self.daily_break is not None:
+            minute = (times_s % 86400) // 60
+            start, end = self.daily_break
+            brk = (minute >= start) & (minute < end) if start < end else (minute >= start) | (minute < end)
+            is_open &= ~brk
+        return is_open
+
+
+class CandleIndex:
+    """
+    Index ของไฟล์แท่งเทียน (CSV เรียงตาม time): times[i] = เวลาเปิดแท่ง (วินาที), offsets[i] = ไบต์เริ่มของแถว i
+    offsets มีสมาชิกเกิน 1 ตัว (ขนาดไฟล์) เพื่อให้ offsets[i + 1] ใช้ได้ทุกแถว
+    """
+
+    def __init__(self, path, times: np.ndarray, offsets: np.ndarray, timeframe: str = TIMEFRAME,
+                 hours: Optional[MarketHours] = None):
+        self.path = Path(path)
+        self.times = times
+        self.offsets = offsets
+        self.step = TF_SECONDS[timeframe]
+        self.timeframe = timeframe
+        self.hours = hours or MarketHours()
+        self.checked_empty: List[Tuple[int, int]] = []  # ช่วงที่ MT5 ยืนยันว่าไม่มีแท่ง (เช่นวันหยุดที่ไม่อยู่ใน config)
+
+    @staticmethod
+    def _scan(data: bytes, base: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        แถวข้อมูลทั้งหมดใน data (ไม่มี header) → (times, offsets ของต้นแถว)
+        """
+        buf = np.frombuffer(data, dtype=np.uint8)
+        ends = np.flatnonzero(buf == 0x0A)
+        starts = np.concatenate([[0], ends[:-1] + 1]).astype(np.int64)
+        stamps = [data[s:data.index(b",", s)].decode() for s in starts]
+        times = pd.to_datetime(stamps, format="ISO8601").values.astype("datetime64[s]").astype(np.int64)
+        return times, starts + base
+
+    @classmethod
+    def from_csv(cls, path, timeframe: str = TIMEFRAME, hours: Optional[MarketHours] = None) -> "CandleIndex":
+        data = Path(path).read_bytes()
+        header_end = data.index(b"\n") + 1
+        if len(data) > header_end:
+            times, offsets = cls._scan(data[header_end:], header_end)
+        else:
+            times, offsets = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        return cls(path, times, np.append(offsets, len(data)), timeframe, hours)
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def refresh(self) -> int:
+        """
+        อ่านเฉพาะแถวที่ต่อท้ายไฟล์ตั้งแต่ index ครั้งก่อน (ถ้าไฟล์ถูกเขียนใหม่จน prefix เปลี่ยน → สร้างใหม่)
+        คืนจำนวนแถวใหม่
+        """
+        size = os.path.getsize(self.path)
+        end = int(self.offsets[-1])
+        with open(self.path, "rb") as f:
+            if len(self.times):
+                f.seek(int(self.offsets[-2]))
+                last = f.read(end - int(self.offsets[-2]))
+                stamp = last[:last.index(b",")].decode() if b"," in last else ""
+                same = (size >= end and last.endswith(b"\n") and stamp
+                        and pd.Timestamp(stamp).value // 10**9 == self.times[-1])
+            else:
+                same = size >= end
+            if not same:
+                fresh = CandleIndex.from_csv(self.path, self.timeframe, self.hours)
+                added = len(fresh) - len(self)
+                self.times, self.offsets = fresh.times, fresh.offsets
+                return max(added, 0)
+            data = f.read(size - end)
+        if not data:
+            return 0
+        times, offsets = self._scan(data, end)
+        self.times = np.concatenate([self.times, times])
+        self.offsets = np.concatenate([self.offsets[:-1], offsets, [size]])
+        return len(times)
+
+    def row_of(self, t) -> int:
+        """
+        ตำแหน่งแถวแรกที่เวลา >= t (O(log n))
+        """
+        return int(np.searchsorted(self.times, pd.Timestamp(t).value // 10**9))
+
+    def _missing_slots(self, t0: int, t1: int) -> np.ndarray:
+        """
+        เวลาเปิดแท่งที่ตลาดเปิดอยู่ในช่วง (t0, t1) เปิดทั้งสองข้าง
+        """
+        slots = np.arange(t0 + self.step, t1, self.step, dtype=np.int64)
+        slots = slots[self.hours.is_open(slots)]
+        for a, b in self.checked_empty:
+            slots = slots[(slots < a) | (slots >= b)]
+        return slots
+
+    def gaps(self, since=None, until=None) -> List[Tuple[pd.Timestamp, pd.Timestamp]]:
+        """
+        ช่วงแท่งที่หายไป [start, end) ระหว่าง since..until (ค่าเริ่มต้น: ทั้งไฟล์ / ถึงแท่งสุดท้าย)
+        หาแถวเริ่มด้วย searchsorted แล้วตรวจเฉพาะแถวหลังจากนั้น; ตัดแท่งในช่วงตลาดปิดออก
+        until หลังแท่งสุดท้าย → นับแท่งที่ขาดช่วงท้ายไฟล์ด้วย (เช่นหลุดการเชื่อมต่อจนถึงตอนนี้)
+        """
+        if not len(self.times):
+            return []
+        lo = 0 if since is None else max(self.row_of(since) - 1, 0)
+        times = self.times[lo:]
+        if until is not None:
+            end_s = pd.Timestamp(until).value // 10**9
+            times = np.append(times[times < end_s], end_s)
+        holes = np.flatnonzero(np.diff(times) > self.step)
+
+        out = []
+        for i in holes:
+            slots = self._missing_slots(int(times[i]), int(times[i + 1]))
+            if not len(slots):
+                continue
+            # แท่งที่หายอาจแยกเป็นหลายช่วงถ้าคร่อมช่วงตลาดปิด
+            breaks = np.flatnonzero(np.diff(slots) > self.step) + 1
+            for run in np.split(slots, breaks):
+                out.append((pd.Timestamp(int(run[0]), unit="s"),
+                            pd.Timestamp(int(run[-1]) + self.step, unit="s")))
+        return out
+
+    def splice(self, df: pd.DataFrame) -> int:
+        """
+        แทรกแท่ง df (อยู่ในช่องว่างเดียวกัน ไม่ซ้ำกับแถวเดิม) ลงไฟล์: เขียนใหม่เฉพาะไบต์หลังจุดแทรก
+        คืนแถวที่แทรก (ตำแหน่งของแท่งแรกใน df)
+        """
+        new_times = df["time"].to_numpy().astype("datetime64[s]").astype(np.int64)
+        row = int(np.searchsorted(self.times, new_times[0]))
+        if row < len(self.times) and self.times[row] <= new_times[-1]:
+            raise ValueError("splice ต้องการแท่งที่อยู่ในช่องว่างเดียวกันและไม่ซ้ำกับแถวเดิม")
+        offset = int(self.offsets[row])
+        block = df.to_csv(header=False, index=False).encode()
+        with open(self.path, "r+b") as f:
+            f.seek(offset)
+            tail = f.read()
+            f.seek(offset)
+            f.write(block)
+            f.write(tail)
+
+        _, rel = self._scan(block, offset)
+        self.times = np.concatenate([self.times[:row], new_times, self.times[row:]])
+        self.offsets = np.concatenate([self.offsets[:row], rel, self.offsets[row:] + len(block)])
+        return row
+
+
+def resync(index: CandleIndex, since=None, until=None, symbol: str = SYMBOL,
+           fetch: Optional[Callable] = None, retries: int = RETRIES,
+           cache=None, features_path: Optional[str] = None,
+           labels_path: Optional[str] = None) -> Dict:
+    """
+    ดึงเฉพาะช่วงที่หายไปหลัง since จาก MT5 (copy_rates_range) แทรกลงไฟล์ แล้วย้อน stage cache
+    ของ features/labels ไปที่แถวก่อนจุดแทรกแรก (ถ้าส่ง cache มา)
+    ช่วงท้ายไฟล์ (หลังแท่งสุดท้าย) ไม่แทรกตรงนี้ — live loop ต่อท้ายตามปกติ
+    คืน {gaps, missing, bars, first_row}
+    """
+    fetch = fetch or mt5_rates_range
+    gaps = index.gaps(since, until)
+    last = index.times[-1] if len(index) else None
+    gaps = [(s, e) for s, e in gaps if last is None or s.value // 10**9 < last]
+    missing = sum(len(index._missing_slots(s.value // 10**9 - index.step, e.value // 10**9)) for s, e in gaps)
+    missing_counter.inc(missing)
+
+    first_row, bars = None, 0
+    # แทรกจากช่วงหลังสุดก่อน: offset ของแถวก่อนหน้ายังถูกต้อง และไฟล์ถูกเขียนใหม่แค่ส่วนท้ายครั้งเดียวต่อช่วง
+    for start, end in reversed(gaps):
+        df = _download(fetch, symbol, index.timeframe, start, end, retries)
+        if df.empty:
+            index.checked_empty.append((start.value // 10**9, end.value // 10**9))
+            continue
+        first_row = index.splice(df)
+        bars += len(df)
+    resync_counter.inc(bars)
+
+    if first_row is not None and cache is not None and features_path is not None:
+        from src.stage_cache import rewind_stages
+        rewind_stages(cache, str(index.path), features_path, labels_path, first_row)
+    return {"gaps": len(gaps), "missing": missing, "bars": bars, "first_row": first_row}
@@ -0,0 +1,116 @@
+"""
+Live monitoring dashboard
+
+รัน:  streamlit run src/dashboard.py
+ทุก REFRESH_S วินาทีอ่านเฉพาะข้อมูลที่เพิ่มขึ้น (ดู src/live_data.LiveFeed) แล้ววาดกราฟจากจุดที่ downsample แล้ว
+"""
+
+import sys
+import pandas as pd
+import streamlit as st
+import yaml
+from pathlib import Path
+
+# ─── ปรับ PYTHONPATH ให้รวม project root (streamlit รันไฟล์นี้เป็นสคริปต์) ─────────────────
+project_root = Path(__file__).resolve().parents[1]
+sys.path.append(str(project_root))
+
+from src.live_data import LiveFeed, STATE_PATH, WINDOW_ROWS, CHART_POINTS
+
+# ─── โหลด config ─────────────────────────────────────────────────────────────────────
+_cfg_path = project_root / "config" / "config.yaml"
+with open(_cfg_path, "r", encoding="utf-8") as f:
+    cfg = yaml.safe_load(f)
+
+_dash_cfg = cfg.get("dashboard", {}) or {}
+REFRESH_S = float(_dash_cfg.get("refresh_s", 1))
+HEALTH_ICON = {"ok": "🟢", "degraded": "🟠", "stale": "🟡", "down": "🔴"}
+
+
+@st.cache_resource
+def get_feed() -> LiveFeed:
+    """
+    LiveFeed ตัวเดียวต่อ server process (offset ของ tail และ buffer อยู่ข้าม rerun/session)
+    """
+    metrics_cfg = cfg.get("metrics", {}) or {}
+    ring_cfg = cfg.get("shm_ring", {}) or {}
+    use_ring = ring_cfg.get("enabled", False) and _dash_cfg.get("use_shm_ring", True)
+    return LiveFeed(
+        candles_path=cfg["historical_data_path"],
+        trade_log_path=cfg.get("trade_log_path", "data/real_trade_log.csv"),
+        metrics_path=metrics_cfg.get("file_path") if metrics_cfg.get("enabled") else None,
+        state_path=STATE_PATH,
+        window_rows=WINDOW_ROWS,
+        ring_name=ring_cfg.get("name", "xauusd_live_ring") if use_ring else None,
+    )
+
+
+def _render_status(snapshot):
+    state = snapshot["state"] or {}
+    health = snapshot["health"]
+    cols = st.columns(5)
+    cols[0].metric("Health", f"{HEALTH_ICON.get(health['status'], '')} {health['status']}", health["detail"])
+    cols[1].metric("Last close", f"{state.get('last_close', float('nan')):.2f}", state.get("last_bar_time", ""))
+    sig = state.get("last_signal") or {}
+    cols[2].metric("Last signal", f"{sig.get('source', '-')} {sig.get('side', '')}")
+    counters = state.get("counters", {})
+    cols[3].metric("Orders / Signals", f"{counters.get('orders_opened', 0)} / {counters.get('signals', 0)}")
+    cols[4].metric("Open positions", len(state.get("positions", [])))
+
+
+def _render_body(feed: LiveFeed, snapshot):
+    state = snapshot["state"] or {}
+    left, right = st.columns([2, 1])
+    with left:
+        st.subheader("Price")
+        price = feed.price.downsampled(CHART_POINTS)
+        if len(price):
+            st.line_chart(price, x="time", y="value", height=260)
+        st.subheader("Equity (closed trades)")
+        equity = feed.equity.downsampled(CHART_POINTS)
+        if len(equity):
+            st.line_chart(equity, x="time", y="value", height=200)
+        else:
+            st.caption("no closed trades yet")
+    with right:
+        st.subheader("Signal sources")
+        sources = state.get("signal_sources") or {}
+        if sources:
+            st.bar_chart(pd.Series(sources, name="signals"))
+        st.subheader("Stage latency (µs)")
+        latency = state.get("latency") or {}
+        if latency:
+            st.dataframe(pd.DataFrame(latency).T[["count", "p50_us", "p99_us", "max_us"]])
+
+    st.subheader("Open positions")
+    positions = state.get("positions") or []
+    if positions:
+        st.dataframe(pd.DataFrame(positions), use_container_width=True)
+    else:
+        st.caption("none")
+
+    if feed.latency_history:
+        st.subheader("p99 latency history (µs)")
+        st.line_chart(pd.DataFrame(list(feed.latency_history)).set_index("ts"), height=200)
+
+    if feed.recent_trades:
+        st.subheader("Recent trades")
+        st.dataframe(pd.DataFrame(list(feed.recent_trades)[::-1]), use_container_width=True)
+
+
+@st.fragment(run_every=REFRESH_S)
+def live_panel():
+    feed = get_feed()
+    snapshot = feed.poll()
+    _render_status(snapshot)
+    _render_body(feed, snapshot)
+
+
+def main():
+    st.set_page_config(page_title="HATS live monitor", layout="wide")
+    st.title(f"{cfg['symbol']} live monitor")
+    live_panel()
+
+
+if __name__ == "__main__":
+    main()
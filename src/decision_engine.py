@@ -1,11 +1,14 @@
+import threading
 import xgboost as xgb
 import pandas as pd
 import yaml
 from pathlib import Path
-from typing import Optional, Dict, Any, Tuple
+from typing import Optional, Dict, Any, List, NamedTuple, Tuple
 
 # นำ ICT logic เข้ามาใช้
 from src.ict_signal import generate_ict_signal
+from src.instrumentation import REGISTRY
+from src.model_registry import ModelRegistry, ModelWatcher, POLL_INTERVAL_S
 
 # โหลด config
 _cfg_path = Path(__file__).resolve().parents[1] / "config" / "config.yaml"
@@ -26,21 +29,126 @@ FEATURE_COLS = [
     "fvg_bullish", "fvg_bearish"
 ]
 
+swaps_counter = REGISTRY.counter("model_swaps", "model versions swapped into the live DecisionEngine")
+version_gauge = REGISTRY.gauge("model_version", "registry version of the model used for scoring")
+
+
+class LoadedModel(NamedTuple):
+    clf: xgb.XGBClassifier
+    features: List[str]
+    version: Optional[int]  # None = โหลดจาก MODEL_PATH ตรง ๆ (ไม่ผ่าน registry)
+
+
+def load_model(path, features=None, version=None) -> LoadedModel:
+    clf = xgb.XGBClassifier()
+    clf.load_model(str(path))
+    return LoadedModel(clf, list(features or FEATURE_COLS), version)
+
+
 class DecisionEngine:
-    def __init__(self):
-        # โหลดโมเดล XGBoost
-        self.clf = xgb.XGBClassifier()
-        self.clf.load_model(MODEL_PATH)
+    def __init__(self, online_learner=None, registry: Optional[ModelRegistry] = None):
+        # โหลดโมเดล XGBoost: เวอร์ชัน active ของ registry (ถ้ามี) ไม่เช่นนั้น MODEL_PATH
+        self.registry = registry
+        entry = registry.active() if registry is not None else None
+        if entry is not None:
+            self.model = load_model(registry.model_file(entry), entry["features"], entry["version"])
+        else:
+            self.model = load_model(MODEL_PATH)
+        version_gauge.set(self.model.version or 0)
+        # Hot swap: watcher โหลดโมเดลใหม่ไว้ที่ _pending แล้ว predict สลับเข้า self.model ตอนเริ่มแท่งถัดไป
+        self._previous: Optional[LoadedModel] = None
+        self._pending: Optional[LoadedModel] = None
+        self._swap_lock = threading.Lock()
+        self._watcher: Optional[ModelWatcher] = None
+        # Online learner (River) เป็นแหล่งสัญญาณที่ 3 (optional)
+        self.online_learner = online_learner
+
+    @property
+    def clf(self) -> xgb.XGBClassifier:
+        return self.model.clf
+
+    # ─── Model registry / hot swap ──────────────────────────────────────────────
+    def stage(self, entry: Dict[str, Any]) -> bool:
+        """
+        โหลดเวอร์ชัน entry ของ registry (ตรวจ sha256 ก่อน) แล้วพักไว้ให้ predict ครั้งถัดไปสลับเข้า
+        เรียกจาก watcher thread: การโหลดไม่บล็อกการ score ของ live loop
+        """
+        with self._swap_lock:
+            wanted = self._pending or self.model
+        if entry["version"] == wanted.version:
+            return False
+        if not self.registry.verify(entry):
+            raise ValueError(f"model version {entry['version']} failed sha256 check")
+        model = load_model(self.registry.model_file(entry), entry["features"], entry["version"])
+        with self._swap_lock:
+            self._pending = model
+        return True
+
+    def swap_pending(self) -> Optional[int]:
+        """
+        สลับโมเดลที่พักไว้เข้าใช้งาน (ระหว่างแท่ง) → คืนเวอร์ชันใหม่ หรือ None ถ้าไม่มีอะไรรอ
+        """
+        if self._pending is None:
+            return None
+        with self._swap_lock:
+            model, self._pending = self._pending, None
+        if model is None:
+            return None
+        self._previous, self.model = self.model, model
+        swaps_counter.inc()
+        version_gauge.set(model.version or 0)
+        return model.version
+
+    def rollback(self) -> Optional[int]:
+        """
+        กลับไปเวอร์ชันก่อนหน้าทันที (โมเดลเก่ายังอยู่ในหน่วยความจำ) และย้อน active ใน registry ให้ตรงกัน
+        """
+        with self._swap_lock:
+            self._pending = None
+        entry = self.registry.rollback() if self.registry is not None else None
+        if self._previous is not None and (entry is None or entry["version"] == self._previous.version):
+            self.model, self._previous = self._previous, self.model
+        elif entry is not None:
+            self._previous, self.model = self.model, load_model(
+                self.registry.model_file(entry), entry["features"], entry["version"])
+        else:
+            return None
+        swaps_counter.inc()
+        version_gauge.set(self.model.version or 0)
+        return self.model.version
+
+    def watch(self, interval_s: float = POLL_INTERVAL_S) -> ModelWatcher:
+        """
+        เริ่ม thread ตรวจ registry ทุก interval_s → เวอร์ชัน active ใหม่ถูกโหลดเบื้องหลังแล้วสลับระหว่างแท่ง
+        """
+        if self.registry is None:
+            raise ValueError("DecisionEngine.watch requires a ModelRegistry")
+        self._watcher = ModelWatcher(self.registry, self.stage, interval_s)
+        self._watcher.start()
+        return self._watcher
+
+    def stop_watch(self, timeout: Optional[float] = None):
+        if self._watcher is not None:
+            self._watcher.stop(timeout)
+            self._watcher = None
+
+    def predict_online(self, feature_dict: Dict[str, Any]) -> Optional[float]:
+        """
+        คืนความน่าจะเป็นที่เทรดจะชนะจาก online learner (None ถ้าไม่ได้เปิดใช้)
+        """
+        if self.online_learner is None:
+            return None
+        return self.online_learner.predict_proba(feature_dict)
 
     def predict_xgb(self, feature_dict: Dict[str, Any]) -> tuple[str, float]:
         """
         ใช้โมเดล XGBoost ทำนายบน dictionary ของฟีเจอร์ (feature_dict)
         คืน (label, confidence) โดย label ∈ {"Buy","Sell","NoTrade"}
         """
-        df = pd.DataFrame([feature_dict])
-        X = df[FEATURE_COLS]
-        proba = self.clf.predict_proba(X)[0]
-        pred_code = int(self.clf.predict(X)[0])
+        model = self.model
+        X = pd.DataFrame([feature_dict])[model.features]
+        proba = model.clf.predict_proba(X)[0]
+        pred_code = int(model.clf.predict(X)[0])
         code_to_label = {0: "NoTrade", 1: "Buy", 2: "Sell"}
         label = code_to_label.get(pred_code, "NoTrade")
         confidence = float(max(proba))
@@ -63,28 +171,38 @@ class DecisionEngine:
              'fvg_top': float,
              'fvg_bottom': float,
              'fib_levels': {...},
-             'atr': float
+             'atr': float,
+             'online_proba': float | None
            }
         2) ถ้า ICT คืน None → สร้าง feature_dict จาก df.iloc[idx] แล้วเรียก predict_xgb()
            คืน dict ดังนี้:
            {
              'source': 'XGB',
              'side': 'Buy'/'Sell'/'NoTrade',
-             'confidence': float
+             'confidence': float,
+             'online_proba': float | None
            }
+        3) online_proba คือความน่าจะเป็นที่เทรดจะชนะจาก online learner
+           (None ถ้า DecisionEngine ไม่ได้รับ online_learner)
         """
+        # สลับโมเดลใหม่จาก registry (ถ้ามี) ก่อนเริ่ม score แท่งนี้ → ทั้งแท่งใช้โมเดลเดียวกัน
+        self.swap_pending()
+        row = df.iloc[idx]
+        feature_dict = {col: row[col] for col in FEATURE_COLS}
+
         # 1) ตรวจ ICT entry
         ict_sig = generate_ict_signal(df, idx)
         if ict_sig is not None:
             ict_sig["source"] = "ICT"
+            ict_sig["online_proba"] = self.predict_online(feature_dict)
             return ict_sig
 
-        # 2) ถ้าไม่มี ICT → เตรียม feature_dict แล้วเรียก XGBoost
-        row = df.iloc[idx]
-        feature_dict = {col: row[col] for col in FEATURE_COLS}
-        label, confidence = self.predict_xgb(feature_dict)
+        # 2) ถ้าไม่มี ICT → เรียก XGBoost
+        xgb_features = {col: row[col] for col in self.model.features}
+        label, confidence = self.predict_xgb(xgb_features)
         return {
             "source": "XGB",
             "side": label,
-            "confidence": confidence
+            "confidence": confidence,
+            "online_proba": self.predict_online(feature_dict)
         }
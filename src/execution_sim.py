@@ -0,0 +1,268 @@
+import numpy as np
+import pandas as pd
+import yaml
+from pathlib import Path
+from typing import Dict, Any, Sequence
+
+# โหลด config
+_cfg_path = Path(__file__).resolve().parents[1] / "config" / "config.yaml"
+with open(_cfg_path, "r", encoding="utf-8") as f:
+    cfg = yaml.safe_load(f)
+
+_sim_cfg = cfg.get("execution_sim", {}) or {}
+SPREAD = float(_sim_cfg.get("spread", 0.20))
+SLIPPAGE = float(_sim_cfg.get("slippage", 0.05))
+INTRABAR_RULE = _sim_cfg.get("intrabar_rule", "ohlc_path")
+BREAKEVEN_CLOSE_FRACTION = float(_sim_cfg.get("breakeven_close_fraction", 0.5))
+TP_FRACTIONS = tuple(_sim_cfg.get("tp_fractions", [1 / 3, 1 / 3, 1 / 3]))
+TP1_SL_ATR = float(_sim_cfg.get("tp1_sl_atr", 0.5))
+TP3_VWAP_ATR = float(_sim_cfg.get("tp3_vwap_atr", 0.5))
+MAX_HOLD_BARS = int(_sim_cfg.get("max_hold_bars", 0))
+REVERSE_MSS_EXIT = bool(_sim_cfg.get("reverse_mss_exit", True))
+
+INTRABAR_RULES = ("ohlc_path", "sl_first", "tp_first")
+_INITIAL_WINDOW = 256
+_EPS = 1e-9
+
+
+class MarketArrays:
+    """
+    คอลัมน์ราคา/indicator ที่ simulator ใช้ เก็บเป็น numpy array ต่อเนื่อง (ราคา bid)
+    """
+
+    def __init__(self, df: pd.DataFrame,
+                 bullish_mss_col: str = "mss_bullish",
+                 bearish_mss_col: str = "mss_bearish"):
+        self.time = df["time"].to_numpy()
+        self.open = df["open"].to_numpy(dtype=np.float64)
+        self.high = df["high"].to_numpy(dtype=np.float64)
+        self.low = df["low"].to_numpy(dtype=np.float64)
+        self.close = df["close"].to_numpy(dtype=np.float64)
+        self.vwap = df["vwap"].to_numpy(dtype=np.float64)
+        self.atr = df["atr"].to_numpy(dtype=np.float64)
+        n = len(df)
+        self.bullish_mss = (df[bullish_mss_col].fillna(False).to_numpy(dtype=bool)
+                            if bullish_mss_col in df.columns else np.zeros(n, dtype=bool))
+        self.bearish_mss = (df[bearish_mss_col].fillna(False).to_numpy(dtype=bool)
+                            if bearish_mss_col in df.columns else np.zeros(n, dtype=bool))
+
+    def __len__(self) -> int:
+        return len(self.close)
+
+
+def _first(mask: np.ndarray, start: int = 0) -> int:
+    """
+    index แรก ≥ start ที่ mask เป็น True (ไม่พบ → len(mask))
+    """
+    sub = mask[start:]
+    if sub.size == 0:
+        return len(mask)
+    k = int(sub.argmax())
+    return start + k if sub[k] else len(mask)
+
+
+def simulate_trade(m: MarketArrays, side: str, entry_index: int, entry_price: float,
+                   sl: float, tp1: float, tp2: float,
+                   spread: float = SPREAD,
+                   slippage: float = SLIPPAGE,
+                   intrabar_rule: str = INTRABAR_RULE,
+                   breakeven_close_fraction: float = BREAKEVEN_CLOSE_FRACTION,
+                   tp_fractions: Sequence[float] = TP_FRACTIONS,
+                   max_hold_bars: int = MAX_HOLD_BARS,
+                   reverse_mss_exit: bool = REVERSE_MSS_EXIT) -> Dict[str, Any]:
+    """
+    จำลองการถือ 1 position ตั้งแต่แท่งถัดจาก entry_index ด้วยกติกาเดียวกับ manage_positions:
+      - SL (stop, อ่านจาก high/low ในแท่ง) → ปิดที่เหลือทั้งหมด
+      - Breakeven เมื่อราคาปิดข้าม VWAP → SL = entry และปิด breakeven_close_fraction
+      - TP1 / TP2 (limit คงที่) และ TP3 = VWAP ± 0.5×ATR ของแท่งนั้น → ปิดตาม tp_fractions
+        (สัดส่วนของขนาดเริ่มต้น) และหลัง TP1 เลื่อน SL เป็น entry ± 0.5×ATR
+      - Reverse MSS ตอนปิดแท่ง → ปิดที่เหลือทั้งหมด
+    ราคาใน df เป็น bid: Buy เข้าที่ ask (+spread) ออกที่ bid, Sell กลับกัน
+    stop/market fill โดน slippage; ถ้าแท่งเปิด gap ข้ามระดับ จะ fill ที่ราคาเปิด
+    intrabar_rule เมื่อ SL และ TP อยู่ในแท่งเดียวกัน:
+      - ohlc_path: แท่งเขียว O→L→H→C, แท่งแดง O→H→L→C
+      - sl_first: SL ก่อนเสมอ (pessimistic) / tp_first: TP ก่อนเสมอ
+    การค้นหา event แต่ละครั้งเป็น numpy argmax บนหน้าต่างของแท่งที่ถือ
+    (หน้าต่างขยายทีละ 4 เท่าจนเจอ exit) จึงไม่มี loop Python ต่อแท่ง
+    """
+    if intrabar_rule not in INTRABAR_RULES:
+        raise ValueError(f"intrabar_rule ต้องเป็นหนึ่งใน {INTRABAR_RULES}")
+    n = len(m)
+    start = entry_index + 1
+    end = n if max_hold_bars <= 0 else min(n, start + max_hold_bars)
+    if start >= end:
+        # ไม่มีแท่งถัดไปให้ถือ → exit ณ ราคาปิดของแท่ง entry โดยไม่ตรวจ SL/TP กับ high/low ของแท่งนั้น
+        return _exit_at_entry_close(m, side, entry_index, entry_price, spread, slippage)
+    window = _INITIAL_WINDOW
+    while True:
+        stop = min(end, start + window)
+        res = _simulate_window(m, side, entry_index, entry_price, sl, tp1, tp2, start, stop,
+                               stop >= end, spread, slippage, intrabar_rule,
+                               breakeven_close_fraction, tp_fractions, reverse_mss_exit)
+        if res is not None:
+            if res["exit_reason"] == "end_of_data" and end < n:
+                res["exit_reason"] = "max_hold"
+            return res
+        window *= 4
+
+
+def _exit_at_entry_close(m, side, entry_index, entry_price, spread, slippage) -> Dict[str, Any]:
+    """
+    entry ที่แท่งสุดท้ายของข้อมูล: ปิดทั้งหมดที่ราคาปิดของแท่ง entry (ฝั่ง exit, หัก slippage)
+    """
+    d = 1.0 if side == "Buy" else -1.0
+    entry_fill_x = d * (entry_price + (spread if d > 0 else 0.0)) + slippage
+    exit_x = d * (m.close[entry_index] + (0.0 if d > 0 else spread)) - slippage
+    return {
+        "side": side,
+        "entry_index": entry_index,
+        "exit_index": entry_index,
+        "entry_price": d * entry_fill_x,
+        "exit_price": d * exit_x,
+        "pnl": float(exit_x - entry_fill_x),
+        "mae": 0.0,
+        "mfe": 0.0,
+        "exit_reason": "end_of_data",
+        "breakeven": False,
+        "tp1_hit": False,
+        "tp2_hit": False,
+        "tp3_hit": False,
+        "n_fills": 1,
+        "bars_held": 0,
+    }
+
+
+def _simulate_window(m, side, entry_index, entry_price, sl, tp1, tp2, start, stop, final,
+                     spread, slippage, intrabar_rule, be_frac, tp_fractions, reverse_mss_exit):
+    """
+    จำลองบนแท่ง [start, stop) ในพิกัด x = d × ราคา (d = +1 Buy, −1 Sell) ให้ทุกฝั่งเป็นแบบ Buy:
+    TP hit เมื่อ fav ≥ level, SL hit เมื่อ adv ≤ level
+    คืน None ถ้าไม่มี exit ภายในหน้าต่างและยังไม่ใช่หน้าต่างสุดท้าย
+    """
+    d = 1.0 if side == "Buy" else -1.0
+    # ราคาที่ใช้ปิด position: Buy ปิดที่ bid, Sell ปิดที่ ask = bid + spread
+    exit_adj = 0.0 if d > 0 else spread
+    sl_ = slice(start, stop)
+    if d > 0:
+        fav, adv = m.high[sl_], m.low[sl_]
+    else:
+        fav, adv = -(m.low[sl_] + exit_adj), -(m.high[sl_] + exit_adj)
+    open_x = d * (m.open[sl_] + exit_adj)
+    close_x = d * (m.close[sl_] + exit_adj)
+    atr = m.atr[sl_]
+    vwap_x = d * m.vwap[sl_]
+    W = stop - start
+
+    if intrabar_rule == "sl_first":
+        adverse_first = np.ones(W, dtype=bool)
+    elif intrabar_rule == "tp_first":
+        adverse_first = np.zeros(W, dtype=bool)
+    else:
+        adverse_first = d * (m.close[sl_] - m.open[sl_]) >= 0
+
+    entry_fill_x = d * (entry_price + (spread if d > 0 else 0.0)) + slippage
+    sl_x = d * sl
+    tp_static = [d * tp1, d * tp2]
+    tp3_x = vwap_x + TP3_VWAP_ATR * atr
+
+    t_tp = [_first(fav >= tp_static[0]), _first(fav >= tp_static[1]), _first(fav >= tp3_x)]
+    t_be = _first(d * (m.close[sl_] - m.vwap[sl_]) > 0)
+    rev = (m.bearish_mss if d > 0 else m.bullish_mss)[sl_]
+    t_rev = _first(rev) if reverse_mss_exit else W
+
+    remaining = 1.0
+    fills = []  # (fraction, exit_x)
+    tp_hit = [False, False, False]
+    breakeven = False
+    sl_from = 0
+    reason = None
+    last_j = W - 1
+
+    def close_part(frac, price_x):
+        nonlocal remaining
+        frac = min(frac, remaining)
+        if frac > _EPS:
+            fills.append((frac, price_x))
+            remaining -= frac
+
+    while remaining > _EPS:
+        t_sl = _first(adv <= sl_x, sl_from)
+        pending = [k for k in range(3) if not tp_hit[k]]
+        t_tp_min = min((t_tp[k] for k in pending), default=W)
+        j = min(t_sl, t_tp_min, W if breakeven else t_be, t_rev)
+        if j >= W:
+            if not final:
+                return None
+            last_j = W - 1
+            close_part(remaining, close_x[last_j] - slippage)
+            reason = "end_of_data"
+            break
+
+        sl_now = t_sl == j
+        tps_now = sorted((k for k in pending if t_tp[k] == j),
+                         key=lambda k: tp3_x[j] if k == 2 else tp_static[k])
+
+        # 1) intrabar: SL ก่อน TP ตาม intrabar rule
+        if sl_now and (not tps_now or adverse_first[j]):
+            close_part(remaining, min(sl_x, open_x[j]) - slippage)
+            reason, last_j = "sl", j
+            break
+
+        # 2) intrabar: TP ladder (ระดับใกล้สุดก่อน)
+        for k in tps_now:
+            level = tp3_x[j] if k == 2 else tp_static[k]
+            close_part(tp_fractions[k], max(level, open_x[j]))
+            tp_hit[k] = True
+            if k == 0:
+                sl_x = max(sl_x, d * entry_price + TP1_SL_ATR * atr[j])
+            if remaining <= _EPS:
+                reason, last_j = f"tp{k + 1}", j
+                break
+        if remaining <= _EPS:
+            break
+        if tps_now:
+            # SL (อาจถูกเลื่อนแล้ว) ยังโดนได้ในแท่งเดียวกันถ้าขา adverse มาหลังขา favourable
+            if not adverse_first[j] and adv[j] <= sl_x:
+                close_part(remaining, sl_x - slippage)
+                reason, last_j = "sl", j
+                break
+            sl_from = j + 1
+
+        # 3) ตอนปิดแท่ง: reverse MSS แล้วค่อย breakeven
+        if t_rev == j:
+            close_part(remaining, close_x[j] - slippage)
+            reason, last_j = "reverse_mss", j
+            break
+        if not breakeven and t_be == j:
+            breakeven = True
+            sl_x = max(sl_x, d * entry_price)
+            close_part(be_frac, close_x[j] - slippage)
+            if remaining <= _EPS:
+                reason, last_j = "breakeven", j
+                break
+            sl_from = j + 1
+
+    fracs = np.array([f for f, _ in fills])
+    prices_x = np.array([p for _, p in fills])
+    pnl = float(np.dot(fracs, prices_x - entry_fill_x))
+    held = slice(0, last_j + 1)
+    mfe = max(0.0, float(fav[held].max()) - entry_fill_x)
+    mae = max(0.0, entry_fill_x - float(adv[held].min()))
+    exit_index = start + last_j
+    return {
+        "side": side,
+        "entry_index": entry_index,
+        "exit_index": exit_index,
+        "entry_price": d * entry_fill_x,
+        "exit_price": d * float(np.dot(fracs, prices_x) / fracs.sum()),
+        "pnl": pnl,
+        "mae": mae,
+        "mfe": mfe,
+        "exit_reason": reason,
+        "breakeven": breakeven,
+        "tp1_hit": tp_hit[0],
+        "tp2_hit": tp_hit[1],
+        "tp3_hit": tp_hit[2],
+        "n_fills": len(fills),
+        "bars_held": exit_index - entry_index,
+    }
@@ -0,0 +1,356 @@
+import hashlib
+import json
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+import yaml
+from pathlib import Path
+from typing import Dict, Any, Optional, Tuple, List
+
+from src.decision_engine import FEATURE_COLS
+from src.schema import csv_dtypes
+
+# โหลด config
+_cfg_path = Path(__file__).resolve().parents[1] / "config" / "config.yaml"
+with open(_cfg_path, "r", encoding="utf-8") as f:
+    cfg = yaml.safe_load(f)
+
+_fa_cfg = cfg.get("feature_analysis", {}) or {}
+CACHE_DIR = Path(_fa_cfg.get("cache_dir", "models/feature_analysis_cache"))
+BATCH_SIZE = int(_fa_cfg.get("batch_size", 100_000))
+N_BINS = int(_fa_cfg.get("n_bins", 20))
+SAMPLE_SIZE = int(_fa_cfg.get("sample_size", 50_000))
+RECENT_DAYS = float(_fa_cfg.get("recent_days", 7))
+
+# ขั้นต่ำของสัดส่วนต่อ bin เพื่อไม่ให้ log(0) ใน PSI
+_EPS = 1e-6
+
+TimeRange = Optional[Tuple[Optional[str], Optional[str]]]
+
+
+def file_hash(path: str) -> str:
+    """
+    คืน sha256 ของไฟล์ (อ่านทีละบล็อก ไม่โหลดทั้งไฟล์เข้าหน่วยความจำ)
+    """
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def iter_feature_chunks(data_path: str,
+                        time_range: TimeRange = None,
+                        chunksize: int = BATCH_SIZE,
+                        feature_cols: Optional[List[str]] = None):
+    """
+    อ่าน CSV ทีละ chunk แล้ว yield DataFrame ของ feature_cols (float32 ตาม src/schema.py)
+    กรองเฉพาะแถวที่ time อยู่ใน time_range = (start, end) ถ้ากำหนด
+    """
+    cols = list(feature_cols or FEATURE_COLS)
+    usecols = cols + (["time"] if time_range is not None else [])
+    start, end = time_range if time_range is not None else (None, None)
+    start = pd.Timestamp(start) if start is not None else None
+    end = pd.Timestamp(end) if end is not None else None
+
+    for chunk in pd.read_csv(data_path, usecols=usecols, dtype=csv_dtypes(cols), chunksize=chunksize):
+        if time_range is not None:
+            t = pd.to_datetime(chunk["time"])
+            mask = np.ones(len(chunk), dtype=bool)
+            if start is not None:
+                mask &= (t >= start).to_numpy()
+            if end is not None:
+                mask &= (t <= end).to_numpy()
+            chunk = chunk.loc[mask]
+            if chunk.empty:
+                continue
+        yield chunk[cols].astype(np.float32)
+
+
+def time_bounds(data_path: str, chunksize: int = BATCH_SIZE) -> Tuple[Optional[pd.Timestamp], Optional[pd.Timestamp]]:
+    """
+    คืน (เวลาแรก, เวลาสุดท้าย) ของไฟล์ โดยอ่านเฉพาะคอลัมน์ time ทีละ chunk
+    """
+    t_min, t_max = None, None
+    for chunk in pd.read_csv(data_path, usecols=["time"], chunksize=chunksize):
+        t = pd.to_datetime(chunk["time"])
+        if t.empty:
+            continue
+        lo, hi = t.min(), t.max()
+        t_min = lo if t_min is None or lo < t_min else t_min
+        t_max = hi if t_max is None or hi > t_max else t_max
+    return t_min, t_max
+
+
+# ─── Feature importance (gain + pred_contribs) ──────────────────────────────────
+def compute_contributions(model_path: str,
+                          data_path: str,
+                          time_range: TimeRange = None,
+                          batch_size: int = BATCH_SIZE) -> pd.DataFrame:
+    """
+    คำนวณความสำคัญของฟีเจอร์จากโมเดล XGBoost:
+      - gain / total_gain จาก booster.get_score()
+      - mean_abs_contrib: ค่าเฉลี่ย |SHAP contribution| จาก predict(pred_contribs=True)
+        คำนวณทีละ batch (หน่วยความจำคงที่ตาม batch_size) แล้วเฉลี่ยข้ามทุก class
+    คืน DataFrame เรียงตาม mean_abs_contrib มาก → น้อย
+    """
+    booster = xgb.Booster()
+    booster.load_model(model_path)
+    feature_cols = booster.feature_names or FEATURE_COLS
+
+    n_feat = len(feature_cols)
+    sum_abs = np.zeros(n_feat, dtype=np.float64)
+    n_rows = 0
+
+    for X in iter_feature_chunks(data_path, time_range, batch_size, feature_cols):
+        dm = xgb.DMatrix(X.to_numpy(), feature_names=list(feature_cols))
+        contrib = booster.predict(dm, pred_contribs=True)
+        # multi-class: (n, num_class, n_feat+1), binary/reg: (n, n_feat+1); คอลัมน์สุดท้ายคือ bias
+        if contrib.ndim == 3:
+            sum_abs += np.abs(contrib[:, :, :n_feat]).mean(axis=1).sum(axis=0)
+        else:
+            sum_abs += np.abs(contrib[:, :n_feat]).sum(axis=0)
+        n_rows += len(X)
+
+    gain = booster.get_score(importance_type="gain")
+    total_gain = booster.get_score(importance_type="total_gain")
+
+    result = pd.DataFrame({
+        "feature": list(feature_cols),
+        "gain": [gain.get(c, 0.0) for c in feature_cols],
+        "total_gain": [total_gain.get(c, 0.0) for c in feature_cols],
+        "mean_abs_contrib": sum_abs / max(n_rows, 1),
+    })
+    result.attrs["n_rows"] = n_rows
+    return result.sort_values("mean_abs_contrib", ascending=False).reset_index(drop=True)
+
+
+# ─── Drift (PSI / KS) ด้วย streaming histogram ──────────────────────────────────
+class StreamingHistogram:
+    """
+    Histogram แบบ streaming ที่ใช้ bin edges คงที่
+    - update() นับค่าทีละ chunk (หน่วยความจำ O(n_bins))
+    - bin แรก/สุดท้ายเป็น underflow/overflow, NaN นับแยกใน n_missing
+    """
+
+    def __init__(self, edges: np.ndarray):
+        self.edges = np.asarray(edges, dtype=np.float64)
+        self.counts = np.zeros(len(self.edges) + 1, dtype=np.int64)
+        self.n_missing = 0
+
+    def update(self, values: np.ndarray):
+        values = np.asarray(values, dtype=np.float64)
+        finite = ~np.isnan(values)
+        self.n_missing += int((~finite).sum())
+        idx = np.searchsorted(self.edges, values[finite], side="right")
+        self.counts += np.bincount(idx, minlength=len(self.counts))
+
+    @property
+    def total(self) -> int:
+        return int(self.counts.sum())
+
+    def proportions(self) -> np.ndarray:
+        total = self.total
+        if total == 0:
+            return np.zeros_like(self.counts, dtype=np.float64)
+        return self.counts / total
+
+
+def population_stability_index(ref: StreamingHistogram, cur: StreamingHistogram) -> float:
+    """
+    PSI = Σ (p_cur − p_ref) · ln(p_cur / p_ref)
+    """
+    p_ref = np.clip(ref.proportions(), _EPS, None)
+    p_cur = np.clip(cur.proportions(), _EPS, None)
+    return float(np.sum((p_cur - p_ref) * np.log(p_cur / p_ref)))
+
+
+def ks_statistic(ref: StreamingHistogram, cur: StreamingHistogram) -> float:
+    """
+    KS statistic โดยประมาณจาก CDF ของ histogram (ความละเอียดเท่ากับ bin)
+    """
+    return float(np.max(np.abs(np.cumsum(ref.proportions()) - np.cumsum(cur.proportions()))))
+
+
+def _reservoir_sample(data_path: str,
+                      time_range: TimeRange,
+                      feature_cols: List[str],
+                      sample_size: int,
+                      chunksize: int,
+                      seed: int = 42) -> np.ndarray:
+    """
+    สุ่มตัวอย่างแถวแบบ reservoir (ขนาดคงที่) สำหรับหา quantile bin edges
+    """
+    rng = np.random.default_rng(seed)
+    reservoir = np.empty((sample_size, len(feature_cols)), dtype=np.float64)
+    seen = 0
+    for X in iter_feature_chunks(data_path, time_range, chunksize, feature_cols):
+        arr = X.to_numpy()
+        n = len(arr)
+        # เติม reservoir ให้เต็มก่อน
+        fill = min(max(sample_size - seen, 0), n)
+        if fill > 0:
+            reservoir[seen:seen + fill] = arr[:fill]
+        # แถวที่เหลือ: แทนที่ด้วยความน่าจะเป็น sample_size / (index+1)
+        if fill < n:
+            pos = np.arange(seen + fill, seen + n)
+            j = (rng.random(len(pos)) * (pos + 1)).astype(np.int64)
+            keep = j < sample_size
+            reservoir[j[keep]] = arr[fill:][keep]
+        seen += n
+    return reservoir[:min(seen, sample_size)]
+
+
+def fit_bin_edges(sample: np.ndarray, n_bins: int = N_BINS) -> List[np.ndarray]:
+    """
+    คืน bin edges (quantile) ของแต่ละคอลัมน์ใน sample
+    """
+    qs = np.linspace(0, 1, n_bins + 1)[1:-1]
+    edges = []
+    for j in range(sample.shape[1]):
+        col = sample[:, j]
+        col = col[~np.isnan(col)]
+        if len(col) == 0:
+            edges.append(np.array([0.0]))
+            continue
+        edges.append(np.unique(np.quantile(col, qs)))
+    return edges
+
+
+def build_histograms(data_path: str,
+                     edges: List[np.ndarray],
+                     time_range: TimeRange = None,
+                     chunksize: int = BATCH_SIZE,
+                     feature_cols: Optional[List[str]] = None) -> List[StreamingHistogram]:
+    """
+    สร้าง StreamingHistogram ของทุกฟีเจอร์ด้วยการอ่านไฟล์ 1 รอบ
+    """
+    cols = list(feature_cols or FEATURE_COLS)
+    hists = [StreamingHistogram(e) for e in edges]
+    for X in iter_feature_chunks(data_path, time_range, chunksize, cols):
+        arr = X.to_numpy()
+        for j, h in enumerate(hists):
+            h.update(arr[:, j])
+    return hists
+
+
+def compute_drift(reference_path: str,
+                  current_path: str,
+                  reference_range: TimeRange = None,
+                  current_range: TimeRange = None,
+                  n_bins: int = N_BINS,
+                  sample_size: int = SAMPLE_SIZE,
+                  chunksize: int = BATCH_SIZE,
+                  feature_cols: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    คำนวณ drift ระหว่างช่วงข้อมูล training (reference) กับช่วง live ล่าสุด (current)
+    1) หา quantile bin edges จาก reservoir sample ของ reference
+    2) สร้าง streaming histogram ของ reference และ current (อ่านทีละ chunk)
+    3) คำนวณ PSI และ KS ต่อฟีเจอร์
+    """
+    cols = list(feature_cols or FEATURE_COLS)
+    sample = _reservoir_sample(reference_path, reference_range, cols, sample_size, chunksize)
+    edges = fit_bin_edges(sample, n_bins)
+
+    ref_hists = build_histograms(reference_path, edges, reference_range, chunksize, cols)
+    cur_hists = build_histograms(current_path, edges, current_range, chunksize, cols)
+
+    rows = []
+    for col, ref, cur in zip(cols, ref_hists, cur_hists):
+        rows.append({
+            "feature": col,
+            "psi": population_stability_index(ref, cur),
+            "ks": ks_statistic(ref, cur),
+            "n_reference": ref.total,
+            "n_current": cur.total,
+        })
+    return pd.DataFrame(rows).sort_values("psi", ascending=False).reset_index(drop=True)
+
+
+# ─── Cache ตาม model hash + data range ──────────────────────────────────────────
+def _file_signature(path: str) -> Dict[str, Any]:
+    st = Path(path).stat()
+    return {"path": str(path), "size": st.st_size, "mtime": st.st_mtime}
+
+
+def _normalize_range(time_range: TimeRange):
+    if time_range is None:
+        return None
+    return [str(pd.Timestamp(t)) if t is not None else None for t in time_range]
+
+
+def cache_key(model_path: str,
+              reference_path: str,
+              current_path: str,
+              reference_range: TimeRange,
+              current_range: TimeRange,
+              params: Dict[str, Any]) -> str:
+    """
+    สร้าง cache key จาก hash ของโมเดล + ช่วงข้อมูล + signature ของไฟล์ + พารามิเตอร์
+    """
+    payload = {
+        "model_hash": file_hash(model_path),
+        "reference": _file_signature(reference_path),
+        "current": _file_signature(current_path),
+        "reference_range": _normalize_range(reference_range),
+        "current_range": _normalize_range(current_range),
+        "params": params,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def analyze_features(model_path: str,
+                     reference_path: str,
+                     current_path: str,
+                     reference_range: TimeRange = None,
+                     current_range: TimeRange = None,
+                     cache_dir: str = str(CACHE_DIR),
+                     n_bins: int = N_BINS,
+                     batch_size: int = BATCH_SIZE,
+                     force: bool = False) -> Dict[str, Any]:
+    """
+    รวม importance (จาก reference) + drift (reference vs current) แล้ว cache ผลลัพธ์เป็น JSON
+    ถ้าเคยคำนวณด้วยโมเดลเดียวกันและช่วงข้อมูลเดียวกัน จะคืนค่าจาก cache ทันที
+    คืน dict: {'key','cached','importance': [...], 'drift': [...]}
+    """
+    params = {"n_bins": n_bins, "batch_size": batch_size}
+    key = cache_key(model_path, reference_path, current_path,
+                    reference_range, current_range, params)
+    cache_file = Path(cache_dir) / f"{key}.json"
+
+    if cache_file.exists() and not force:
+        with open(cache_file, "r", encoding="utf-8") as fh:
+            result = json.load(fh)
+        result["cached"] = True
+        return result
+
+    importance = compute_contributions(model_path, reference_path, reference_range, batch_size)
+    drift = compute_drift(reference_path, current_path, reference_range, current_range,
+                          n_bins=n_bins, chunksize=batch_size)
+
+    result = {
+        "key": key,
+        "reference_range": _normalize_range(reference_range),
+        "current_range": _normalize_range(current_range),
+        "importance": importance.to_dict(orient="records"),
+        "drift": drift.to_dict(orient="records"),
+    }
+    cache_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(cache_file, "w", encoding="utf-8") as fh:
+        json.dump(result, fh, indent=2)
+    result["cached"] = False
+    return result
+
+
+if __name__ == "__main__":
+    # reference = dataset ที่ใช้เทรน, current = ฟีเจอร์ live ช่วง RECENT_DAYS วันล่าสุด
+    _, t_max = time_bounds(cfg["features_data_path"])
+    cur_range = (t_max - pd.Timedelta(days=RECENT_DAYS), t_max) if t_max is not None else None
+    res = analyze_features(cfg["model_path"], cfg["dataset_path"],
+                           cfg["features_data_path"], None, cur_range)
+
+    print(f"Feature analysis ({'cached' if res['cached'] else 'computed'}) key={res['key'][:12]}")
+    print("\n===== Feature Importance =====")
+    print(pd.DataFrame(res["importance"]).to_string(index=False))
+    print("\n===== Drift (PSI / KS) =====")
+    print(pd.DataFrame(res["drift"]).to_string(index=False))
@@ -1,8 +1,16 @@
+import os
 import pandas as pd
 import numpy as np
 import talib
 import yaml
 from pathlib import Path
+from typing import Optional, List, Dict
+from scipy.signal import lfilter
+from numpy.lib.stride_tricks import sliding_window_view
+
+from src.instrumentation import timed
+from src.ict_signal import ICT_COLUMNS, SWING_WINDOW, ict_feature_arrays
+from src.schema import apply_schema
 
 # 1) โหลด config จาก config/config.yaml
 _cfg_path = Path(__file__).resolve().parents[1] / "config" / "config.yaml"
@@ -13,90 +21,590 @@ with open(_cfg_path, "r", encoding="utf-8") as f:
 hist_path = Path(_cfg["historical_data_path"])      # data/historical.csv
 feat_path = Path(_cfg["features_data_path"])         # data/data_with_features.csv
 
-def compute_features(input_path: str, output_path: str):
+# 3) จำนวนแถวต่อ chunk (0/None = คำนวณทั้งไฟล์ในหน่วยความจำ)
+FEATURES_CHUNK_SIZE = _cfg.get("features_chunk_size", 0) or None
+
+# 4) Timeframe หลักของข้อมูล และ Higher-Timeframe ที่จะคำนวณ indicator
+TF_SECONDS = {"M1": 60, "M5": 300, "M15": 900, "H1": 3600, "H4": 14400, "D1": 86400}
+BASE_TIMEFRAME = _cfg.get("timeframe", "M1")
+HTF_TIMEFRAMES = list(_cfg.get("htf_timeframes", ["H4"]))
+
+def htf_columns(timeframe: str) -> List[str]:
+    """
+    ชื่อคอลัมน์ HTF ของ timeframe เช่น H4 → ['ema50_h4','ema200_h4','rsi_h4']
+    """
+    suffix = timeframe.lower()
+    return [f"ema50_{suffix}", f"ema200_{suffix}", f"rsi_{suffix}"]
+
+def _htf_bars(times_ns: np.ndarray, close: np.ndarray, freq_ns: int):
+    """
+    รวมแท่ง base (เรียงตามเวลา) เป็นแท่ง HTF: คืน (เวลาเปิดแท่ง, close ของแท่ง)
+    ใช้ตำแหน่งที่ bin เปลี่ยนแทน resample จึงไม่สร้าง DataFrame ใหม่
+    """
+    starts = times_ns - np.mod(times_ns, freq_ns)
+    change = np.flatnonzero(np.diff(starts)) + 1
+    last_idx = np.append(change, len(starts)) - 1
+    return starts[last_idx], close[last_idx]
+
+def _asof_take(avail_ns: np.ndarray, values: np.ndarray, times_ns: np.ndarray) -> np.ndarray:
+    """
+    Sorted as-of join: แต่ละแถวได้ค่าของแท่ง HTF ล่าสุดที่ avail_ns <= time (ไม่มี lookahead)
+    """
+    pos = np.searchsorted(avail_ns, times_ns, side="right") - 1
+    out = np.full(len(times_ns), np.nan)
+    valid = pos >= 0
+    out[valid] = values[pos[valid]]
+    return out
+
+def add_htf_features(df: pd.DataFrame,
+                     timeframes: List[str] = HTF_TIMEFRAMES,
+                     base_timeframe: str = BASE_TIMEFRAME) -> pd.DataFrame:
+    """
+    เพิ่ม EMA50 / EMA200 / RSI14 ของแต่ละ Higher-Timeframe (เช่น H1, H4, D1) ลง df (in-place)
+    - สร้างแท่ง HTF จาก close ของแท่ง base ที่เรียงตามเวลาแล้ว
+    - แท่ง HTF ใช้ได้ตั้งแต่แท่ง base สุดท้ายของช่วงนั้น (ปิดพร้อมแท่ง HTF) เป็นต้นไป
+      → แถวใด ๆ เห็นเฉพาะแท่ง HTF ที่ปิดแล้วเท่านั้น
+    - จับคู่ด้วย searchsorted (as-of join) แล้วเขียนเป็นคอลัมน์ใหม่ ไม่ merge/copy ทั้ง frame
+    """
+    times_ns = df["time"].to_numpy(dtype="datetime64[ns]").view(np.int64)
+    close = df["close"].to_numpy(dtype=np.float64)
+    base_ns = TF_SECONDS[base_timeframe] * 10**9
+
+    for tf in timeframes:
+        freq_ns = TF_SECONDS[tf] * 10**9
+        bar_start, bar_close = _htf_bars(times_ns, close, freq_ns)
+        avail_ns = bar_start + freq_ns - base_ns
+        ema50_col, ema200_col, rsi_col = htf_columns(tf)
+        df[ema50_col] = _asof_take(avail_ns, talib.EMA(bar_close, timeperiod=50), times_ns)
+        df[ema200_col] = _asof_take(avail_ns, talib.EMA(bar_close, timeperiod=200), times_ns)
+        df[rsi_col] = _asof_take(avail_ns, talib.RSI(bar_close, timeperiod=14), times_ns)
+    return df
+
+# ลำดับคอลัมน์ฟีเจอร์ M1 (ก่อน ICT/HTF) และคอลัมน์ท้าย (หลัง HTF) ของไฟล์ features
+M1_COLUMNS = ["atr", "vwap", "ema9", "ema21", "rsi", "adx"]
+TAIL_COLUMNS = ["bb_upper", "bb_lower", "atr_ma", "bb_upper_diff", "bb_lower_diff", "vol_imbalance"]
+
+def indicator_pass(df: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """
+    indicator M1 ทั้งหมดในรอบเดียว: แปลง open/high/low/close/tick_volume เป็น float64 array ต่อเนื่องครั้งเดียว
+    แล้วป้อน array ชุดเดียวกันให้ TA-Lib ทุกตัว (ATR, EMA×2, RSI, ADX, BBANDS) และ ICT pass
+    (ไม่ต้องแปลง pandas Series ใหม่ทุกครั้งที่เรียก TA-Lib)
+    คืน dict ชื่อคอลัมน์ → array (M1_COLUMNS + ICT_COLUMNS + TAIL_COLUMNS)
+    """
+    open_, high, low, close, vol = (np.ascontiguousarray(df[c].to_numpy(dtype=np.float64))
+                                    for c in ("open", "high", "low", "close", "tick_volume"))
+    atr = talib.ATR(high, low, close, timeperiod=14)
+    cum_vol = np.cumsum(vol)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        vwap = np.cumsum(close * vol) / np.where(cum_vol == 0, np.nan, cum_vol)
+        vol_imbalance = (close - open_) / np.where(vol == 0, np.nan, vol)
+    upper, _, lower = talib.BBANDS(close, timeperiod=20, nbdevup=2, nbdevdn=2)
+
+    out = {
+        "atr": atr,
+        "vwap": vwap,
+        "ema9": talib.EMA(close, timeperiod=9),
+        "ema21": talib.EMA(close, timeperiod=21),
+        "rsi": talib.RSI(close, timeperiod=14),
+        "adx": talib.ADX(high, low, close, timeperiod=14),
+    }
+    out.update(ict_feature_arrays(open_, high, low, close, atr))
+    out.update({
+        "bb_upper": upper,
+        "bb_lower": lower,
+        "atr_ma": pd.Series(atr).rolling(window=14, min_periods=1).mean().to_numpy(),
+        "bb_upper_diff": close - upper,
+        "bb_lower_diff": close - lower,
+        "vol_imbalance": vol_imbalance,
+    })
+    return out
+
+@timed("compute_features")
+def compute_features(input_path: str, output_path: str,
+                     chunk_size: Optional[int] = FEATURES_CHUNK_SIZE,
+                     htf_timeframes: Optional[List[str]] = None,
+                     base_timeframe: str = BASE_TIMEFRAME):
     """
     อ่านไฟล์ historical.csv → คำนวณฟีเจอร์ทั้งหมด → บันทึกเป็น data_with_features.csv
+    ถ้ากำหนด chunk_size จะคำนวณแบบ streaming ทีละ chunk (ดู compute_features_chunked)
     ฟีเจอร์:
       - ATR (14)
       - VWAP (สะสม)
       - EMA9, EMA21
-      - RSI (14)
-      - EMA50_H4, EMA200_H4, RSI_H4 (จากการ resample เป็น H4)
+      - RSI (14), ADX (14)
+      - EMA50/EMA200/RSI ของแต่ละ HTF ใน htf_timeframes (ค่าเริ่มต้นจาก config เช่น H4)
+        จากแท่ง HTF ที่ปิดแล้วเท่านั้น
       - Bollinger Bands (period=20, stddev=2) + ผลต่างราคา–BB
-      - MSS placeholder (False)
-      - FVG placeholder (False)
+      - ICT: swing points, MSS, FVG (top/bottom), FVG ในโซน Fibonacci, pullback,
+        fib_in_zone (ราคาปิดในโซน 38.2–61.8% ของ last swing range) — swing นับตั้งแต่แถวที่ยืนยัน (ไม่มี lookahead)
       - ATR_MA (rolling 14)
       - Volume Imbalance = (close − open) / tick_volume
+    คอลัมน์ถูกแปลง dtype ตาม src/schema.py ก่อนเขียน (float32 / bool / int32)
     """
+    htf_timeframes = HTF_TIMEFRAMES if htf_timeframes is None else list(htf_timeframes)
+    if chunk_size:
+        return compute_features_chunked(input_path, output_path, chunk_size,
+                                        htf_timeframes=htf_timeframes,
+                                        base_timeframe=base_timeframe)
+
     # โหลด historical prices
     df = pd.read_csv(input_path, parse_dates=["time"])
     df = df.sort_values("time").reset_index(drop=True)
 
-    # 1) ATR M1 (period=14)
-    df["atr"] = talib.ATR(df["high"], df["low"], df["close"], timeperiod=14)
-
-    # 2) VWAP M1 (สะสม)
-    cum_vp = (df["close"] * df["tick_volume"]).cumsum()
-    cum_vol = df["tick_volume"].cumsum().replace(0, np.nan)
-    df["vwap"] = cum_vp / cum_vol
-
-    # 3) EMA9, EMA21 (บน M1)
-    df["ema9"] = talib.EMA(df["close"], timeperiod=9)
-    df["ema21"] = talib.EMA(df["close"], timeperiod=21)
-
-    # 4) RSI14 (บน M1)
-    df["rsi"] = talib.RSI(df["close"], timeperiod=14)
-
-    # 5) MSS placeholder (ตั้งค่า False ก่อน)
-    df["mss_bullish"] = False
-    df["mss_bearish"] = False
-
-    # 6) FVG placeholder (False)
-    df["fvg_bullish"] = False
-    df["fvg_bearish"] = False
-    df["fvg_top"] = np.nan
-    df["fvg_bottom"] = np.nan
-
-    # 7) Higher-Timeframe H4 → คำนวณ EMA50_H4, EMA200_H4, RSI_H4
-    df_h4 = df.set_index("time").resample("4h").agg({
-        "open": "first",
-        "high": "max",
-        "low": "min",
-        "close": "last",
-        "tick_volume": "sum"
-    }).dropna().reset_index()
-    df_h4["ema50_h4"] = talib.EMA(df_h4["close"], timeperiod=50)
-    df_h4["ema200_h4"] = talib.EMA(df_h4["close"], timeperiod=200)
-    df_h4["rsi_h4"] = talib.RSI(df_h4["close"], timeperiod=14)
-
-    # Merge ค่า H4 ลง df หลัก แล้ว ffill
-    df = df.merge(
-        df_h4[["time", "ema50_h4", "ema200_h4", "rsi_h4"]],
-        on="time",
-        how="left"
-    )
-    df[["ema50_h4", "ema200_h4", "rsi_h4"]] = df[["ema50_h4", "ema200_h4", "rsi_h4"]].ffill()
-
-    # 8) Bollinger Bands (period=20, stddev=2)
-    upper, mid, lower = talib.BBANDS(df["close"], timeperiod=20, nbdevup=2, nbdevdn=2)
-    df["bb_upper"] = upper
-    df["bb_lower"] = lower
-
-    # 9) ATR_MA (rolling 14 ของ ATR)
-    df["atr_ma"] = df["atr"].rolling(window=14, min_periods=1).mean()
-
-    # 10) คอลัมน์ diff กับ Bollinger
-    df["bb_upper_diff"] = df["close"] - df["bb_upper"]
-    df["bb_lower_diff"] = df["close"] - df["bb_lower"]
+    # 1) Indicator M1 + ICT ทั้งหมดจาก array ชุดเดียว (ดู indicator_pass)
+    cols = indicator_pass(df)
 
-    # 11) Volume Imbalance = (close − open) / tick_volume
-    df["vol_imbalance"] = (df["close"] - df["open"]) / df["tick_volume"].replace(0, np.nan)
+    # 2) ATR(14), VWAP สะสม, EMA9/EMA21, RSI(14), ADX(14)
+    for col in M1_COLUMNS:
+        df[col] = cols[col]
+
+    # 3) ICT: swing → MSS → FVG → Fibonacci zone → pullback
+    for col in ICT_COLUMNS:
+        df[col] = cols[col]
 
-    # 12) บันทึกไฟล์ features (สร้างโฟลเดอร์ output ถ้ายังไม่มี)
+    # 4) Higher-Timeframe (H1/H4/D1) → EMA50, EMA200, RSI14 ของแท่ง HTF ที่ปิดแล้ว (as-of join)
+    add_htf_features(df, htf_timeframes, base_timeframe)
+
+    # 5) Bollinger Bands (20, 2), ATR_MA (rolling 14), diff กับ Bollinger, Volume Imbalance
+    for col in TAIL_COLUMNS:
+        df[col] = cols[col]
+
+    # 6) แปลง dtype ตาม schema (float32/bool/int32) แล้วบันทึกไฟล์ features
+    apply_schema(df, inplace=True)
     Path(output_path).parent.mkdir(parents=True, exist_ok=True)
     df.to_csv(output_path, index=False)
     print(f"Features saved to {output_path}")
 
+# ─── Chunked (out-of-core) mode ─────────────────────────────────────────────────
+# indicator แต่ละตัวเก็บ state ข้าม chunk เพื่อให้ผลลัพธ์ตรงกับการคำนวณทั้งไฟล์
+# (สูตรเดียวกับ TA-Lib: seed ด้วย SMA แล้ว smoothing แบบ recursive)
+
+def _smooth(x: np.ndarray, alpha: float, prev: float) -> np.ndarray:
+    """
+    y[i] = alpha * x[i] + (1 − alpha) * y[i−1] โดยเริ่มจาก y[−1] = prev (คำนวณด้วย lfilter)
+    """
+    y, _ = lfilter([alpha], [1.0, -(1.0 - alpha)], x, zi=[(1.0 - alpha) * prev])
+    return y
+
+
+class _StreamingSmoother:
+    """
+    Smoother แบบ EMA/Wilder ที่ seed ด้วยค่าเฉลี่ยของ period ค่าแรก (เหมือน TA-Lib)
+    ผลลัพธ์ค่าแรกออกที่ตัวอย่างลำดับที่ period
+    """
+
+    def __init__(self, period: int, alpha: float):
+        self.period = period
+        self.alpha = alpha
+        self.seed = []
+        self.prev = None
+
+    def update(self, x: np.ndarray) -> np.ndarray:
+        out = np.full(len(x), np.nan)
+        start = 0
+        if self.prev is None:
+            need = self.period - len(self.seed)
+            self.seed.extend(x[:need].tolist())
+            if len(self.seed) < self.period:
+                return out
+            self.prev = float(np.mean(self.seed))
+            out[need - 1] = self.prev
+            start = need
+        if start < len(x):
+            out[start:] = _smooth(x[start:], self.alpha, self.prev)
+            self.prev = float(out[-1])
+        return out
+
+
+class _StreamingEMA(_StreamingSmoother):
+    """EMA (เหมือน talib.EMA)"""
+
+    def __init__(self, period: int):
+        super().__init__(period, 2.0 / (period + 1))
+
+
+class _StreamingRSI:
+    """Wilder RSI (เหมือน talib.RSI) — state: close ก่อนหน้า + ค่าเฉลี่ย gain/loss"""
+
+    def __init__(self, period: int = 14):
+        self.prev_close = None
+        self.avg_gain = _StreamingSmoother(period, 1.0 / period)
+        self.avg_loss = _StreamingSmoother(period, 1.0 / period)
+
+    def update(self, close: np.ndarray) -> np.ndarray:
+        if len(close) == 0:
+            return np.empty(0)
+        prev = np.nan if self.prev_close is None else self.prev_close
+        diff = np.diff(close, prepend=prev)
+        out = np.full(len(close), np.nan)
+        # แถวแรกสุดของข้อมูลไม่มี diff → ข้าม
+        start = 1 if self.prev_close is None else 0
+        d = diff[start:]
+        ag = self.avg_gain.update(np.maximum(d, 0.0))
+        al = self.avg_loss.update(np.maximum(-d, 0.0))
+        total = ag + al
+        with np.errstate(invalid="ignore", divide="ignore"):
+            rsi = np.where(np.abs(total) < 1e-8, 0.0, 100.0 * ag / total)
+        rsi[np.isnan(total)] = np.nan
+        out[start:] = rsi
+        self.prev_close = float(close[-1])
+        return out
+
+
+class _StreamingATR:
+    """Wilder ATR (เหมือน talib.ATR) — state: close ก่อนหน้า + ค่า ATR ล่าสุด"""
+
+    def __init__(self, period: int = 14):
+        self.prev_close = None
+        self.smoother = _StreamingSmoother(period, 1.0 / period)
+
+    def update(self, high: np.ndarray, low: np.ndarray, close: np.ndarray) -> np.ndarray:
+        if len(close) == 0:
+            return np.empty(0)
+        prev = np.nan if self.prev_close is None else self.prev_close
+        prev_close = np.concatenate([[prev], close[:-1]])
+        tr = np.maximum.reduce([high - low, np.abs(high - prev_close), np.abs(low - prev_close)])
+        out = np.full(len(close), np.nan)
+        start = 1 if self.prev_close is None else 0
+        out[start:] = self.smoother.update(tr[start:])
+        self.prev_close = float(close[-1])
+        return out
+
+
+class _StreamingADX:
+    """
+    Wilder ADX (เหมือน talib.ADX) — state: แท่งก่อนหน้า, ผลรวม smoothing ของ +DM/−DM/TR และ ADX ล่าสุด
+    - แท่ง 1 .. period−1: สะสมผลรวมเริ่มต้น
+    - แท่ง period .. 2·period−1: smoothing + สะสม DX → ADX แรก = ค่าเฉลี่ย DX ที่แท่ง 2·period−1
+    - หลังจากนั้น ADX = smoothing ของ DX (แถวที่ TR หรือ +DI + −DI เป็นศูนย์ ADX คงเดิม)
+    """
+
+    def __init__(self, period: int = 14):
+        self.period = period
+        self.prev = None        # (high, low, close) ของแท่งก่อนหน้า
+        self.count = 0          # จำนวนแท่งที่เห็นแล้ว
+        self.sums = np.zeros(3)  # +DM, −DM, TR
+        self.sum_dx = 0.0
+        self.adx = None
+
+    @staticmethod
+    def _dx(plus: np.ndarray, minus: np.ndarray, tr: np.ndarray):
+        """DX และ mask แถวที่คำนวณได้ (TA-Lib ข้ามแถวที่ TR หรือ +DI + −DI ใกล้ศูนย์)"""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            plus_di = 100.0 * (plus / tr)
+            minus_di = 100.0 * (minus / tr)
+            di_sum = plus_di + minus_di
+            dx = 100.0 * (np.abs(minus_di - plus_di) / di_sum)
+        valid = (np.abs(tr) >= 1e-8) & (np.abs(di_sum) >= 1e-8)
+        return dx, valid
+
+    def update(self, high: np.ndarray, low: np.ndarray, close: np.ndarray) -> np.ndarray:
+        n = len(close)
+        out = np.full(n, np.nan)
+        if n == 0:
+            return out
+        prev_h, prev_l, prev_c = self.prev if self.prev is not None else (np.nan, np.nan, np.nan)
+        ph = np.concatenate([[prev_h], high[:-1]])
+        pl = np.concatenate([[prev_l], low[:-1]])
+        pc = np.concatenate([[prev_c], close[:-1]])
+        diff_p, diff_m = high - ph, pl - low
+        minus_dm = np.where((diff_m > 0) & (diff_p < diff_m), diff_m, 0.0)
+        plus_dm = np.where(~((diff_m > 0) & (diff_p < diff_m)) & (diff_p > 0) & (diff_p > diff_m), diff_p, 0.0)
+        tr = np.maximum.reduce([high - low, np.abs(high - pc), np.abs(low - pc)])
+        self.prev = (float(high[-1]), float(low[-1]), float(close[-1]))
+
+        p = self.period
+        j = 1 if self.count == 0 else 0  # แท่งแรกสุดของข้อมูลไม่มี DM/TR
+        self.count += j
+        # ช่วงเริ่มต้น (2·period − 1 แท่งแรก) สั้นมาก → วนทีละแท่งเหมือน TA-Lib
+        while j < n and self.count < 2 * p:
+            x = np.array([plus_dm[j], minus_dm[j], tr[j]])
+            if self.count < p:
+                self.sums += x
+            else:
+                self.sums = self.sums - self.sums / p + x
+                dx, valid = self._dx(*(self.sums[k:k + 1] for k in range(3)))
+                if valid[0]:
+                    self.sum_dx += dx[0]
+                if self.count == 2 * p - 1:
+                    self.adx = self.sum_dx / p
+                    out[j] = self.adx
+            self.count += 1
+            j += 1
+        if j >= n:
+            return out
+
+        # ช่วงปกติ: Wilder sum S[t] = S[t−1]·(1 − 1/p) + x[t] แล้ว ADX = smoothing ของ DX
+        a = 1.0 - 1.0 / p
+        smoothed = [lfilter([1.0], [1.0, -a], x[j:], zi=[a * s])[0]
+                    for x, s in zip((plus_dm, minus_dm, tr), self.sums)]
+        self.sums = np.array([s[-1] for s in smoothed])
+        dx, valid = self._dx(*smoothed)
+        if valid.all():
+            adx = _smooth(dx, 1.0 / p, self.adx)
+        else:
+            adx = np.empty(len(dx))
+            prev = self.adx
+            for i in range(len(dx)):
+                if valid[i]:
+                    prev = (prev * (p - 1) + dx[i]) / p
+                adx[i] = prev
+        out[j:] = adx
+        self.adx = float(adx[-1])
+        self.count += n - j
+        return out
+
+
+class _RollingTail:
+    """
+    เก็บ (window − 1) ค่าสุดท้ายของ chunk ก่อนหน้า เพื่อให้ rolling window ต่อเนื่องข้าม chunk
+    """
+
+    def __init__(self, window: int):
+        self.window = window
+        self.tail = np.empty(0)
+
+    def extend(self, x: np.ndarray) -> np.ndarray:
+        full = np.concatenate([self.tail, x])
+        self.tail = full[-(self.window - 1):] if self.window > 1 else np.empty(0)
+        return full
+
+
+class _StreamingICT:
+    """
+    คอลัมน์ ICT แบบ streaming (ผลเท่ากับ ICT pass ของ indicator_pass ทั้งไฟล์)
+    - ค่า ICT ของแถว i ใช้เฉพาะแท่ง ≤ i (swing ยืนยันหลัง pivot half แท่ง) → ทุกแถวของ chunk เขียนได้ทันที
+    - context: open/high/low/close ของ window − 1 แถวล่าสุด (pivot ที่ยืนยันในแถวแรก ๆ ของ chunk
+      และ 3 แท่งของ FVG)
+    - last_swing_high/low: ค่า last swing ณ แถวล่าสุดที่เขียนไปแล้ว
+    """
+
+    PRICE_COLS = ["open", "high", "low", "close"]
+
+    def __init__(self, window: int = SWING_WINDOW):
+        self.window = window
+        self.context_rows = max(window - 1, 3)
+        self.context = pd.DataFrame(columns=self.PRICE_COLS, dtype=np.float64)
+        self.last_swing_high = np.nan
+        self.last_swing_low = np.nan
+
+    def update(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        รับ chunk (มีฟีเจอร์ M1/HTF แล้ว) → คืน chunk พร้อมคอลัมน์ ICT
+        """
+        ctx = len(self.context)
+        arrays = [np.concatenate([self.context[c].to_numpy(dtype=np.float64), df[c].to_numpy(dtype=np.float64)])
+                  for c in self.PRICE_COLS]
+        atr = np.concatenate([np.full(ctx, np.nan), df["atr"].to_numpy(dtype=np.float64)])
+        swing_ok = np.arange(len(atr)) >= ctx
+        cols = ict_feature_arrays(*arrays, atr, window=self.window, swing_ok=swing_ok,
+                                  last_swing_high=self.last_swing_high,
+                                  last_swing_low=self.last_swing_low)
+        df = df.copy()
+        for col in ICT_COLUMNS:
+            df[col] = cols[col][ctx:]
+        if len(df):
+            self.last_swing_high = float(cols["last_swing_high"][-1])
+            self.last_swing_low = float(cols["last_swing_low"][-1])
+            self.context = pd.concat([self.context, df[self.PRICE_COLS].astype(np.float64)],
+                                     ignore_index=True).iloc[-self.context_rows:].reset_index(drop=True)
+        return df
+
+
+class FeatureStreamState:
+    """
+    State ทั้งหมดที่ต้องส่งต่อระหว่าง chunk:
+      - ATR/EMA/RSI/ADX (Wilder/EMA recursive state)
+      - Bollinger window (19 close ล่าสุด) และ ATR_MA window (13 ATR ล่าสุด)
+      - VWAP accumulators (Σ price·volume, Σ volume)
+      - HTF: indicator state ของแท่งที่ปิดแล้ว + แท่งที่ยังเปิดอยู่ (ต่อ timeframe)
+      - ICT: context ของ swing window และ last swing high/low
+      - output_bytes: ขนาดไฟล์ output เมื่อประมวลผลถึงแถวล่าสุด (ทำต่อจาก checkpoint ตัดไฟล์กลับไปที่จุดนี้)
+    """
+
+    def __init__(self, htf_timeframes: Optional[List[str]] = None,
+                 base_timeframe: str = BASE_TIMEFRAME):
+        self.atr = _StreamingATR(14)
+        self.ema9 = _StreamingEMA(9)
+        self.ema21 = _StreamingEMA(21)
+        self.rsi = _StreamingRSI(14)
+        self.adx = _StreamingADX(14)
+        self.bb_tail = _RollingTail(20)
+        self.atr_ma_tail = _RollingTail(14)
+        self.cum_vp = 0.0
+        self.cum_vol = 0.0
+        self.last_time = None
+
+        timeframes = HTF_TIMEFRAMES if htf_timeframes is None else htf_timeframes
+        self.htf = [_StreamingHTF(tf, base_timeframe) for tf in timeframes]
+        self.ict = _StreamingICT()
+        self.output_bytes = 0
+
+
+class _StreamingHTF:
+    """
+    HTF indicator แบบ streaming ของ timeframe เดียว (ผลเท่ากับ add_htf_features)
+    - แท่งที่ยังเปิดอยู่เก็บแค่ (เวลาเปิด, close ล่าสุด) จนกว่าจะปิด
+    - แท่งที่ปิดแล้วป้อนเข้า EMA50/EMA200/RSI14 แล้ว as-of join กับแถวของ chunk
+    """
+
+    def __init__(self, timeframe: str, base_timeframe: str):
+        self.columns = htf_columns(timeframe)
+        self.freq_ns = TF_SECONDS[timeframe] * 10**9
+        self.base_ns = TF_SECONDS[base_timeframe] * 10**9
+        self.ema50 = _StreamingEMA(50)
+        self.ema200 = _StreamingEMA(200)
+        self.rsi = _StreamingRSI(14)
+        self.open_start = None
+        self.open_close = None
+        self.last_avail = None
+        self.last_vals = [np.nan, np.nan, np.nan]
+
+    def update(self, df: pd.DataFrame):
+        times_ns = df["time"].to_numpy(dtype="datetime64[ns]").view(np.int64)
+        bar_start, bar_close = _htf_bars(times_ns, df["close"].to_numpy(dtype=np.float64), self.freq_ns)
+
+        # แท่งที่เปิดค้างจาก chunk ก่อน: ถ้า chunk นี้เริ่มแท่งใหม่ แปลว่าแท่งนั้นปิดแล้ว
+        if self.open_start is not None and bar_start[0] != self.open_start:
+            bar_start = np.concatenate([[self.open_start], bar_start])
+            bar_close = np.concatenate([[self.open_close], bar_close])
+
+        # แท่งสุดท้ายปิดแล้วก็ต่อเมื่อถึงแท่ง base สุดท้ายของช่วง ไม่เช่นนั้นเก็บไว้รอ chunk ถัดไป
+        if times_ns[-1] >= bar_start[-1] + self.freq_ns - self.base_ns:
+            self.open_start = self.open_close = None
+        else:
+            self.open_start, self.open_close = bar_start[-1], bar_close[-1]
+            bar_start, bar_close = bar_start[:-1], bar_close[:-1]
+
+        vals = [self.ema50.update(bar_close), self.ema200.update(bar_close), self.rsi.update(bar_close)]
+        avail_ns = bar_start + self.freq_ns - self.base_ns
+        if self.last_avail is not None:
+            avail_ns = np.concatenate([[self.last_avail], avail_ns])
+            vals = [np.concatenate([[last], v]) for last, v in zip(self.last_vals, vals)]
+        for col, v in zip(self.columns, vals):
+            df[col] = _asof_take(avail_ns, v, times_ns)
+        if len(avail_ns):
+            self.last_avail = avail_ns[-1]
+            self.last_vals = [v[-1] for v in vals]
+
+
+def _m1_features_chunk(df: pd.DataFrame, state: FeatureStreamState) -> pd.DataFrame:
+    """
+    คำนวณฟีเจอร์ M1 ของ chunk (ทุกตัวเป็น causal) โดยใช้/อัปเดต state
+    คอลัมน์ ICT เติมทีหลังโดย _StreamingICT (ต้องรอแท่งถัดไปยืนยัน swing)
+    """
+    high = df["high"].to_numpy(dtype=np.float64)
+    low = df["low"].to_numpy(dtype=np.float64)
+    close = df["close"].to_numpy(dtype=np.float64)
+    vol = df["tick_volume"].to_numpy(dtype=np.float64)
+
+    df["atr"] = state.atr.update(high, low, close)
+
+    # VWAP: cumsum ต่อจากยอดสะสมของ chunk ก่อนหน้า (บวกเรียงลำดับเดียวกับแบบทั้งไฟล์)
+    cum_vp = np.cumsum(np.concatenate([[state.cum_vp], close * vol]))[1:]
+    cum_vol = np.cumsum(np.concatenate([[state.cum_vol], vol]))[1:]
+    state.cum_vp, state.cum_vol = float(cum_vp[-1]), float(cum_vol[-1])
+    with np.errstate(invalid="ignore", divide="ignore"):
+        df["vwap"] = np.where(cum_vol == 0, np.nan, cum_vp / np.where(cum_vol == 0, 1, cum_vol))
+
+    df["ema9"] = state.ema9.update(close)
+    df["ema21"] = state.ema21.update(close)
+    df["rsi"] = state.rsi.update(close)
+    df["adx"] = state.adx.update(high, low, close)
+
+    for htf in state.htf:
+        htf.update(df)
+
+    # Bollinger Bands (20, 2) ต่อ window ข้าม chunk
+    window = state.bb_tail.extend(close)
+    n_prev = len(window) - len(close)
+    bb_upper = np.full(len(close), np.nan)
+    bb_lower = np.full(len(close), np.nan)
+    if len(window) >= 20:
+        w = sliding_window_view(window, 20)
+        mid, sd = w.mean(axis=1), w.std(axis=1)
+        first = 19 - n_prev  # แถวแรกของ chunk ที่มี window ครบ 20
+        bb_upper[max(first, 0):] = (mid + 2 * sd)[max(-first, 0):]
+        bb_lower[max(first, 0):] = (mid - 2 * sd)[max(-first, 0):]
+    df["bb_upper"] = bb_upper
+    df["bb_lower"] = bb_lower
+
+    # ATR_MA (rolling 14, min_periods=1) ต่อ window ข้าม chunk
+    atr_window = state.atr_ma_tail.extend(df["atr"].to_numpy())
+    atr_ma = pd.Series(atr_window).rolling(window=14, min_periods=1).mean().to_numpy()
+    df["atr_ma"] = atr_ma[len(atr_window) - len(df):]
+
+    df["bb_upper_diff"] = df["close"] - df["bb_upper"]
+    df["bb_lower_diff"] = df["close"] - df["bb_lower"]
+    df["vol_imbalance"] = (df["close"] - df["open"]) / df["tick_volume"].replace(0, np.nan)
+    return df
+
+
+def _output_columns(df: pd.DataFrame, state: FeatureStreamState) -> List[str]:
+    """
+    ลำดับคอลัมน์เหมือน compute_features: คอลัมน์ input → M1 → ICT → HTF → BB/ATR_MA/diff/vol_imbalance
+    """
+    htf_cols = [c for htf in state.htf for c in htf.columns]
+    head = [c for c in df.columns if c not in htf_cols and c not in TAIL_COLUMNS and c not in ICT_COLUMNS]
+    return head + ICT_COLUMNS + htf_cols + TAIL_COLUMNS
+
+
+def compute_features_chunked(input_path: str, output_path: str, chunk_size: int = 500_000,
+                             state: Optional[FeatureStreamState] = None,
+                             htf_timeframes: Optional[List[str]] = None,
+                             base_timeframe: str = BASE_TIMEFRAME,
+                             start_row: int = 0) -> FeatureStreamState:
+    """
+    คำนวณฟีเจอร์แบบ streaming: อ่าน historical.csv ทีละ chunk_size แถว → คำนวณ → เขียนต่อท้าย output
+    - indicator state (EMA, Wilder RSI/ATR, Bollinger window, VWAP, แท่ง HTF ที่ยังไม่ปิด) ถูกส่งต่อข้าม chunk
+      ผลลัพธ์จึงเท่ากับ compute_features แบบทั้งไฟล์ (ต่างกันแค่ระดับ floating-point rounding)
+    - HTF ใช้เฉพาะแท่งที่ปิดแล้ว และ swing ของ ICT นับตั้งแต่แถวที่ยืนยัน → ทุกแถวของ chunk เขียนได้ทันที
+    - หน่วยความจำสูงสุดขึ้นกับ chunk_size ไม่ใช่ขนาดไฟล์
+    ไฟล์ input ต้องเรียงตาม time อยู่แล้ว (เหมือน historical.csv ที่ fetch_candles เขียน)
+    start_row > 0: ทำต่อจาก checkpoint → ข้าม start_row แถวแรกของ input, ตัด output เดิมกลับไปที่
+    state.output_bytes (เช่นหลัง rewind ไป snapshot ก่อนหน้า) แล้วเขียนต่อท้าย
+    (state ต้องเป็น state หลังประมวลผล start_row แถวนั้นแล้ว)
+    คืน state สุดท้าย
+    """
+    if start_row and state is None:
+        raise ValueError("start_row > 0 ต้องส่ง state ของแถวก่อนหน้ามาด้วย")
+    state = state or FeatureStreamState(htf_timeframes, base_timeframe)
+    out_cols = None
+    Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+    header = not (start_row and state.output_bytes)
+    if not header:
+        os.truncate(output_path, state.output_bytes)
+
+    def _write(frame: pd.DataFrame):
+        nonlocal header, out_cols
+        if frame.empty:
+            return
+        if out_cols is None:
+            out_cols = _output_columns(frame, state)
+        apply_schema(frame, inplace=True)
+        frame.to_csv(output_path, index=False, columns=out_cols,
+                     mode="w" if header else "a", header=header)
+        header = False
+
+    skiprows = range(1, start_row + 1) if start_row else None
+    for chunk in pd.read_csv(input_path, chunksize=chunk_size, skiprows=skiprows):
+        if chunk.empty:
+            continue
+        # ระบุ format ตรง ๆ เพื่อไม่ให้ pandas เดา format ใหม่ทุก chunk
+        chunk["time"] = pd.to_datetime(chunk["time"], format="ISO8601")
+        times = chunk["time"]
+        if not times.is_monotonic_increasing or (state.last_time is not None and times.iloc[0] < state.last_time):
+            raise ValueError("compute_features_chunked ต้องการไฟล์ input ที่เรียงตาม time")
+        state.last_time = times.iloc[-1]
+
+        chunk = _m1_features_chunk(chunk.reset_index(drop=True), state)
+        _write(state.ict.update(chunk))
+
+    state.output_bytes = os.path.getsize(output_path) if not header else 0
+
+    print(f"Features saved to {output_path} (chunked, chunk_size={chunk_size})")
+    return state
+
 # เมื่อรันไฟล์นี้เป็นสคริปต์หลัก
 if __name__ == "__main__":
     compute_features(str(hist_path), str(feat_path))
@@ -25,9 +25,10 @@ TF_MAP = {
 }
 TF = TF_MAP.get(timeframe, mt5.TIMEFRAME_M1)
 
-def fetch_candles(n: int = n_bars) -> pd.DataFrame:
+def fetch_candles(n: int = n_bars, symbol: str = symbol, timeframe: str = timeframe) -> pd.DataFrame:
     """
     เชื่อม MT5, ดึง n แท่งเทียนล่าสุดสำหรับ symbol ตาม timeframe
+    (ค่าเริ่มต้นจาก config; ส่ง symbol/timeframe อื่นได้สำหรับหลาย instrument)
     แล้วคืนค่าเป็น DataFrame ที่มีคอลัมน์:
     time, open, high, low, close, tick_volume
     """
@@ -43,7 +44,7 @@ def fetch_candles(n: int = n_bars) -> pd.DataFrame:
         return pd.DataFrame()
 
     # 2. ดึงข้อมูลแท่งเทียนจาก MT5
-    rates = mt5.copy_rates_from_pos(symbol, TF, 0, n)
+    rates = mt5.copy_rates_from_pos(symbol, TF_MAP.get(timeframe, mt5.TIMEFRAME_M1), 0, n)
     # 3. ปิดการเชื่อมต่อ MT5
     mt5.shutdown()
 
@@ -28,9 +28,13 @@ def send_telegram(message: str):
 def check_mt5_connection() -> bool:
     """
     ตรวจสอบว่า MT5 Terminal เชื่อมต่อได้หรือไม่
+    session ของ MT5 ใช้ร่วมกันทั้ง process (order, tick stream, position monitor) จึงไม่ shutdown:
+    เชื่อมต่ออยู่แล้ว → True ทันที, หลุด → initialize ใหม่และเปิด session ค้างไว้
     คืน True หากเชื่อมต่อสำเร็จ, False หากล้มเหลวหรือเกิดข้อผิดพลาด
     """
     try:
+        if mt5.terminal_info() is not None:
+            return True
         if mt5.initialize(
             path=MT5_CFG["terminal_path"],
             login=MT5_CFG["login"],
@@ -38,7 +42,6 @@ def check_mt5_connection() -> bool:
             password=MT5_CFG["password"],
             timeout=MT5_CFG["timeout"],
         ):
-            mt5.shutdown()
             return True
     except Exception as e:
         print(f"[{datetime.now()}] Exception during MT5 initialize: {e}")
@@ -4,13 +4,29 @@ import talib
 from datetime import time
 from typing import Optional, Dict
 
+from src.instrumentation import timed
+
 # ─── พารามิเตอร์หลัก (สามารถปรับได้ใน config ในอนาคต) ─── #
 ALPHA_ATR = 0.5      # α สำหรับ SL offset
 BETA_ATR  = 1.0      # β สำหรับ ATR Trailing factor
 SESSION_START = time(7, 0)   # 07:00 GMT+7
 SESSION_END   = time(15, 0)  # 15:00 GMT+7
+SWING_WINDOW  = 5            # window ของ swing point (ยืนยันได้หลัง pivot SWING_WINDOW // 2 แท่ง)
 # ──────────────────────────────────────────────────────────── #
 
+# คอลัมน์ ICT ที่ feature stage เขียน (ชื่อเดียวกับ FEATURE_COLS ของโมเดล) ตามลำดับใน output
+ICT_COLUMNS = [
+    "mss_bullish", "mss_bearish",
+    "fvg_bullish", "fvg_bearish", "fvg_top", "fvg_bottom",
+    "is_swing_high", "is_swing_low", "last_swing_high", "last_swing_low",
+    "fvg_in_fib_zone", "ict_pullback", "fib_in_zone",
+]
+# ชื่อเดิมที่ detect_mss / compute_fvg ใช้ (generate_ict_signal ยังอ่านได้ถ้าไม่มีชื่อใหม่)
+_LEGACY_NAMES = {
+    "mss_bullish": "bullish_mss", "mss_bearish": "bearish_mss",
+    "fvg_bullish": "bullish_fvg", "fvg_bearish": "bearish_fvg",
+}
+
 def is_in_session(ts: pd.Timestamp) -> bool:
     """
     คืน True ก็ต่อเมื่อ timestamp อยู่ในช่วง SESSION_START–SESSION_END (GMT+7)
@@ -140,6 +156,176 @@ def compute_fibonacci_levels(swing_low: float, swing_high: float) -> Dict[str, f
         "ext_1272": swing_low + 1.272 * diff
     }
 
+def _ffill_at(mask: np.ndarray, values: np.ndarray, seed: float) -> np.ndarray:
+    """
+    ค่าของ values ณ แถวล่าสุดที่ mask เป็น True (ก่อนหน้าแถวแรกใช้ seed)
+    """
+    idx = np.maximum.accumulate(np.where(mask, np.arange(len(mask)), -1))
+    return np.where(idx >= 0, values[np.maximum(idx, 0)], seed)
+
+def _window_extreme(x: np.ndarray, window: int, op) -> np.ndarray:
+    """
+    max/min ของทุก window ยาว window (ผลยาว n − window + 1) ด้วย op = np.maximum / np.minimum
+    ทีละ shift (window เล็ก → เร็วกว่า reduce บน sliding_window_view หลายเท่า)
+    """
+    m = len(x) - window + 1
+    out = x[:m].copy()
+    for k in range(1, window):
+        op(out, x[k:k + m], out=out)
+    return out
+
+def ict_feature_arrays(open_: np.ndarray, high: np.ndarray, low: np.ndarray,
+                       close: np.ndarray, atr: np.ndarray,
+                       window: int = SWING_WINDOW,
+                       swing_ok: Optional[np.ndarray] = None,
+                       last_swing_high: float = np.nan,
+                       last_swing_low: float = np.nan) -> Dict[str, np.ndarray]:
+    """
+    คำนวณ swing → MSS → FVG → Fibonacci zone → pullback ในรอบเดียวแบบ vectorized (+ fib_in_zone ของราคาปิด)
+    ทุกคอลัมน์ของแถว i ใช้เฉพาะแท่ง ≤ i (causal): swing pivot ที่แถว j (detect_swing_points) ต้องเห็นแท่ง
+    j+1 .. j+half จึงถือว่ารู้ผลที่แถว j+half → is_swing_high/low เป็น True ที่แถวยืนยัน (j+half)
+    และ last_swing_high/low ใช้ราคาของ pivot นั้นตั้งแต่แถวยืนยันเป็นต้นไป
+    FVG และเงื่อนไขข้อ 5–6 เท่ากับ compute_fvg และ generate_ict_signal
+      - swing_ok: แถวที่อนุญาตให้ยืนยัน swing (streaming ใช้ตัดแถว context ที่เขียนไปแล้ว)
+      - last_swing_high/low: ค่า last swing ก่อนแถวแรก (state จาก chunk ก่อนหน้า)
+    คืน dict ของ array ตาม ICT_COLUMNS
+    """
+    n = len(close)
+    half = window // 2
+
+    # 1) Swing: pivot j มี high/low เท่ากับ max/min ของ j±half → ยืนยันที่แถว j+half (แถว window−1 .. n−1)
+    is_sh = np.zeros(n, dtype=bool)
+    is_sl = np.zeros(n, dtype=bool)
+    sh_price = np.full(n, np.nan)
+    sl_price = np.full(n, np.nan)
+    if n >= window:
+        pivot, confirm = slice(half, n - half), slice(window - 1, n)
+        is_sh[confirm] = high[pivot] == _window_extreme(high, window, np.maximum)
+        is_sl[confirm] = low[pivot] == _window_extreme(low, window, np.minimum)
+        sh_price[confirm] = high[pivot]
+        sl_price[confirm] = low[pivot]
+    if swing_ok is not None:
+        is_sh &= swing_ok
+        is_sl &= swing_ok
+
+    # 2) MSS: close ทะลุ last swing high/low (swing ล่าสุดที่ยืนยันแล้วถึงแถวนั้น)
+    last_sh = _ffill_at(is_sh, sh_price, last_swing_high)
+    last_sl = _ffill_at(is_sl, sl_price, last_swing_low)
+    with np.errstate(invalid="ignore"):
+        mss_bull = close > last_sh
+        mss_bear = close < last_sl
+
+    # 3) FVG: 3 แท่ง (i−3, i−2, i−1) สีเดียวกันและมี gap ระหว่างแท่ง i−2 กับ i−3
+    fvg_bull = np.zeros(n, dtype=bool)
+    fvg_bear = np.zeros(n, dtype=bool)
+    top = np.full(n, np.nan)
+    bottom = np.full(n, np.nan)
+    if n > 3:
+        green, red = close > open_, close < open_
+        g3 = green[:-3] & green[1:-2] & green[2:-1]
+        r3 = red[:-3] & red[1:-2] & red[2:-1]
+        fvg_bull[3:] = g3 & (low[1:-2] > high[:-3])
+        fvg_bear[3:] = r3 & (high[1:-2] < low[:-3])
+        top[3:] = np.where(fvg_bull[3:], low[1:-2], np.where(fvg_bear[3:], low[:-3], np.nan))
+        bottom[3:] = np.where(fvg_bull[3:], high[:-3], np.where(fvg_bear[3:], high[1:-2], np.nan))
+
+    # 4) FVG อยู่ในโซน Fibonacci ของ last swing low ↔ high (เงื่อนไขข้อ 5)
+    diff = last_sh - last_sl
+    fib_382, fib_50, fib_618 = last_sh - 0.382 * diff, last_sh - 0.5 * diff, last_sh - 0.618 * diff
+    with np.errstate(invalid="ignore"):
+        zone_bull = ((fib_618 >= top) & (top >= fib_50)) | ((fib_50 >= top) & (top >= fib_382))
+        zone_bear = ((fib_618 <= bottom) & (bottom <= fib_50)) | ((fib_50 <= bottom) & (bottom <= fib_382))
+    in_fib = (fvg_bull & zone_bull) | (fvg_bear & zone_bear)
+    # ราคาปิดอยู่ในโซน retracement 38.2–61.8% ของ last swing range ที่ยืนยันแล้ว ณ แถวนั้น (ใช้ใน build_labels)
+    with np.errstate(invalid="ignore"):
+        fib_in_zone = (close >= np.fmin(fib_382, fib_618)) & (close <= np.fmax(fib_382, fib_618))
+
+    # 5) Pullback: open หรือ close อยู่ในโซน FVG ± 0.5×ATR (เงื่อนไขข้อ 6)
+    zone_low = bottom - 0.5 * atr
+    zone_high = top + 0.5 * atr
+    with np.errstate(invalid="ignore"):
+        pullback = (fvg_bull | fvg_bear) & (((zone_low <= open_) & (open_ <= zone_high))
+                                            | ((zone_low <= close) & (close <= zone_high)))
+
+    return {
+        "mss_bullish": mss_bull, "mss_bearish": mss_bear,
+        "fvg_bullish": fvg_bull, "fvg_bearish": fvg_bear, "fvg_top": top, "fvg_bottom": bottom,
+        "is_swing_high": is_sh, "is_swing_low": is_sl,
+        "last_swing_high": last_sh, "last_swing_low": last_sl,
+        "fvg_in_fib_zone": in_fib, "ict_pullback": pullback, "fib_in_zone": fib_in_zone,
+    }
+
+def add_ict_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    เติมคอลัมน์ ICT_COLUMNS ให้ frame ของ compute_features (เรียงตาม time แล้ว)
+    ถ้า feature stage เขียนไว้ครบแล้วคืน df เดิมโดยไม่คำนวณซ้ำ
+    """
+    if all(c in df.columns for c in ICT_COLUMNS):
+        return df
+    df = df.reset_index(drop=True)
+    cols = ict_feature_arrays(*(df[c].to_numpy(dtype=np.float64)
+                                for c in ("open", "high", "low", "close", "atr")))
+    for col in ICT_COLUMNS:
+        df[col] = cols[col]
+    return df
+
+def _flag_array(df: pd.DataFrame, col: str) -> np.ndarray:
+    name = col if col in df.columns else _LEGACY_NAMES.get(col, col)
+    if name not in df.columns:
+        return np.zeros(len(df), dtype=bool)
+    return df[name].fillna(False).to_numpy(dtype=bool)
+
+def _row_flag(row: pd.Series, col: str) -> bool:
+    name = col if col in row.index else _LEGACY_NAMES.get(col, col)
+    return bool(row.get(name, False))
+
+def signal_candidates(df: pd.DataFrame) -> np.ndarray:
+    """
+    index ของแถวที่ผ่านเงื่อนไขจำเป็นของ generate_ict_signal (vectorized):
+    session, HTF filter, มี last swing high/low, มี FVG ณ แถวนั้น
+    และ (ถ้า feature stage เขียนไว้) FVG อยู่ในโซน Fibonacci + pullback
+    แถวอื่นคืน None แน่นอน จึงเรียก generate_ict_signal เฉพาะแถวเหล่านี้ก็พอ
+    """
+    times = pd.DatetimeIndex(df["time"])
+    sec = times.hour * 3600 + times.minute * 60 + times.second + times.microsecond / 1e6
+    start = SESSION_START.hour * 3600 + SESSION_START.minute * 60
+    end = SESSION_END.hour * 3600 + SESSION_END.minute * 60
+    in_session = (np.asarray(sec) >= start) & (np.asarray(sec) <= end)
+
+    ema50, ema200, rsi = (df[c].to_numpy(dtype=np.float64) for c in ("ema50_h4", "ema200_h4", "rsi_h4"))
+    htf = ((ema50 > ema200) & (rsi > 50)) | ((ema50 < ema200) & (rsi < 50))
+    has_swings = df["last_swing_low"].notna().to_numpy() & df["last_swing_high"].notna().to_numpy()
+    mask = in_session & htf & has_swings & (_flag_array(df, "fvg_bullish") | _flag_array(df, "fvg_bearish"))
+    for col in ("fvg_in_fib_zone", "ict_pullback"):
+        if col in df.columns:
+            mask &= _flag_array(df, col)
+    return np.flatnonzero(mask)
+
+def signal_levels(df: pd.DataFrame, idx: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+    """
+    side/entry/SL/TP1–TP3 ของ generate_ict_signal สำหรับหลายแถวพร้อมกัน (vectorized)
+    idx: แถวที่เป็นสัญญาณ (ค่าเริ่มต้น signal_candidates(df) — df ต้องมีคอลัมน์ ICT ครบจาก add_ict_columns
+    จึงจะตรงกับแถวที่ generate_ict_signal คืนสัญญาณ)
+    คืน dict ของ array: index, side (+1 Buy / −1 Sell), entry_price, sl, tp1, tp2, tp3, atr
+    """
+    idx = signal_candidates(df) if idx is None else np.asarray(idx, dtype=np.int64)
+    col = lambda name: df[name].to_numpy(dtype=np.float64)[idx]
+    buy = _flag_array(df, "fvg_bullish")[idx]
+    atr, entry, vwap = col("atr"), col("open"), col("vwap")
+    swing_low, swing_high = col("last_swing_low"), col("last_swing_high")
+    side = np.where(buy, 1, -1).astype(np.int8)
+    return {
+        "index": idx,
+        "side": side,
+        "entry_price": entry,
+        "sl": np.where(buy, col("fvg_bottom") - ALPHA_ATR * atr, col("fvg_top") + ALPHA_ATR * atr),
+        "tp1": swing_low + 1.272 * (swing_high - swing_low),
+        "tp2": entry + side * 2 * atr,
+        "tp3": vwap + side * 0.5 * atr,
+        "atr": atr,
+    }
+
+@timed("generate_ict_signal")
 def generate_ict_signal(df: pd.DataFrame, idx: int) -> Optional[Dict]:
     """
     ตรวจแท่งที่ idx ว่าตรงเงื่อนไข ICT entry หรือไม่
@@ -147,7 +333,7 @@ def generate_ict_signal(df: pd.DataFrame, idx: int) -> Optional[Dict]:
       1) Session filter (07:00–15:00)
       2) HTF filter: EMA50_H4 vs EMA200_H4 และ RSI_H4
       3) เคยเกิด MSS (last_swing_low/high ไม่ใช่ NaN)
-      4) มี FVG ณ idx (bullish_fvg หรือ bearish_fvg)
+      4) มี FVG ณ idx (fvg_bullish หรือ fvg_bearish)
       5) FVG อยู่ในช่วงโซน Fibonacci (61.8–50 หรือ 50–38.2)
       6) Pullback: bar แถว idx (open หรือ close) อยู่ในโซน FVG ± (0.5×ATR)
       7) คืน dict {'side','entry_index','entry_time','entry_price','sl','tp1','tp2','tp3','fvg_top','fvg_bottom','fib_levels','atr'}
@@ -155,9 +341,11 @@ def generate_ict_signal(df: pd.DataFrame, idx: int) -> Optional[Dict]:
 
     df ต้องมีคอลัมน์:
     ['time','open','high','low','close','tick_volume','atr','vwap',
-      'ema50_h4','ema200_h4','rsi_h4','bullish_mss','bearish_mss',
-      'last_swing_low','last_swing_high','bullish_fvg','bearish_fvg',
+      'ema50_h4','ema200_h4','rsi_h4',
+      'last_swing_low','last_swing_high','fvg_bullish','fvg_bearish',
       'fvg_top','fvg_bottom']
+    (ชื่อเดิม bullish_fvg/bearish_fvg ก็ได้) ถ้ามี fvg_in_fib_zone / ict_pullback จาก feature stage
+    จะใช้ flag นั้นแทนการคำนวณข้อ 5–6 ซ้ำ
     """
     row = df.iloc[idx]
     ts   = row["time"]
@@ -182,8 +370,8 @@ def generate_ict_signal(df: pd.DataFrame, idx: int) -> Optional[Dict]:
         return None
 
     # 4) ตรวจ FVG ณ idx
-    bullish_fvg = row["bullish_fvg"]
-    bearish_fvg = row["bearish_fvg"]
+    bullish_fvg = _row_flag(row, "fvg_bullish")
+    bearish_fvg = _row_flag(row, "fvg_bearish")
     fvg_top    = row["fvg_top"]
     fvg_bottom = row["fvg_bottom"]
     if not (bullish_fvg or bearish_fvg):
@@ -193,15 +381,18 @@ def generate_ict_signal(df: pd.DataFrame, idx: int) -> Optional[Dict]:
     fibs = compute_fibonacci_levels(swing_low, swing_high)
 
     # ตรวจว่า FVG top/bottom อยู่ในโซน fib
-    in_fibo_zone = False
-    if bullish_fvg:
-        top = fvg_top
-        if (fibs["fib_618"] >= top >= fibs["fib_50"]) or (fibs["fib_50"] >= top >= fibs["fib_382"]):
-            in_fibo_zone = True
-    if bearish_fvg:
-        bot = fvg_bottom
-        if (fibs["fib_618"] <= bot <= fibs["fib_50"]) or (fibs["fib_50"] <= bot <= fibs["fib_382"]):
-            in_fibo_zone = True
+    if "fvg_in_fib_zone" in row.index:
+        in_fibo_zone = bool(row["fvg_in_fib_zone"])
+    else:
+        in_fibo_zone = False
+        if bullish_fvg:
+            top = fvg_top
+            if (fibs["fib_618"] >= top >= fibs["fib_50"]) or (fibs["fib_50"] >= top >= fibs["fib_382"]):
+                in_fibo_zone = True
+        if bearish_fvg:
+            bot = fvg_bottom
+            if (fibs["fib_618"] <= bot <= fibs["fib_50"]) or (fibs["fib_50"] <= bot <= fibs["fib_382"]):
+                in_fibo_zone = True
     if not in_fibo_zone:
         return None
 
@@ -210,12 +401,16 @@ def generate_ict_signal(df: pd.DataFrame, idx: int) -> Optional[Dict]:
     buffer = 0.5 * atr
     price_open  = row["open"]
     price_close = row["close"]
-
-    if bullish_fvg:
+    if "ict_pullback" in row.index:
+        pullback = bool(row["ict_pullback"])
+    else:
         zone_low  = fvg_bottom - buffer
         zone_high = fvg_top + buffer
-        if not (zone_low <= price_open <= zone_high or zone_low <= price_close <= zone_high):
-            return None
+        pullback = zone_low <= price_open <= zone_high or zone_low <= price_close <= zone_high
+    if not pullback:
+        return None
+
+    if bullish_fvg:
         side = "Buy"
         entry_price = price_open
         sl = fvg_bottom - ALPHA_ATR * atr
@@ -225,10 +420,6 @@ def generate_ict_signal(df: pd.DataFrame, idx: int) -> Optional[Dict]:
         tp3 = vwap + 0.5 * atr
 
     else:  # bearish_fvg
-        zone_low  = fvg_bottom - buffer
-        zone_high = fvg_top + buffer
-        if not (zone_low <= price_open <= zone_high or zone_low <= price_close <= zone_high):
-            return None
         side = "Sell"
         entry_price = price_open
         sl = fvg_top + ALPHA_ATR * atr
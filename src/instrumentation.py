@@ -0,0 +1,341 @@
+import functools
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Any, Optional, Callable
+
+# ─── Latency histogram (HDR-style, log-linear buckets) ──────────────────────────
+# ค่า (ns) ถูกเก็บเป็น bucket ที่มีความละเอียด SUB_BITS บิตต่อช่วงกำลังสอง
+# → ความคลาดเคลื่อนสัมพัทธ์ ≤ 1/2^(SUB_BITS-1) (~6% ที่ SUB_BITS=5) ไม่ว่าค่าจะเล็กหรือใหญ่
+SUB_BITS = 5
+_HALF = 1 << (SUB_BITS - 1)
+MAX_EXPONENT = 40  # ~18 นาที (2^40 ns)
+N_BUCKETS = (MAX_EXPONENT - SUB_BITS + 2) * _HALF + _HALF
+
+
+def _bucket_index(value_ns: int) -> int:
+    """
+    แปลงค่า ns เป็น index ของ bucket (ใช้แค่ bit_length + shift)
+    """
+    if value_ns < (1 << SUB_BITS):
+        return value_ns if value_ns > 0 else 0
+    shift = value_ns.bit_length() - SUB_BITS
+    idx = shift * _HALF + (value_ns >> shift)
+    return idx if idx < N_BUCKETS else N_BUCKETS - 1
+
+
+def _bucket_value(idx: int) -> int:
+    """
+    ค่ากลางโดยประมาณของ bucket (ใช้ตอนคำนวณ percentile)
+    """
+    if idx < (1 << SUB_BITS):
+        return idx
+    shift = (idx - (1 << SUB_BITS)) // _HALF + 1
+    mantissa = idx - shift * _HALF
+    return (mantissa << shift) + (1 << (shift - 1))
+
+
+class LatencyHistogram:
+    """
+    Histogram ของ latency (ns) แบบ fixed-size
+    - record() เป็น O(1) และไม่จองหน่วยความจำเพิ่ม
+    - percentile() เดิน bucket ตอน export เท่านั้น
+    """
+
+    __slots__ = ("name", "help", "counts", "count", "total_ns", "min_ns", "max_ns")
+
+    def __init__(self, name: str, help: str = ""):
+        self.name = name
+        self.help = help
+        self.counts = [0] * N_BUCKETS
+        self.count = 0
+        self.total_ns = 0
+        self.min_ns = None
+        self.max_ns = 0
+
+    def record(self, value_ns: int):
+        self.counts[_bucket_index(value_ns)] += 1
+        self.count += 1
+        self.total_ns += value_ns
+        if self.min_ns is None or value_ns < self.min_ns:
+            self.min_ns = value_ns
+        if value_ns > self.max_ns:
+            self.max_ns = value_ns
+
+    def percentile(self, q: float) -> float:
+        """
+        คืนค่า percentile q (0–100) ในหน่วย ns
+        """
+        if self.count == 0:
+            return 0.0
+        target = max(1, int(round(q / 100.0 * self.count)))
+        seen = 0
+        for idx, c in enumerate(self.counts):
+            seen += c
+            if seen >= target:
+                return float(min(max(_bucket_value(idx), self.min_ns), self.max_ns))
+        return float(self.max_ns)
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        คืนสรุป (หน่วย µs): count, mean, p50, p90, p99, max
+        """
+        mean = self.total_ns / self.count if self.count else 0.0
+        return {
+            "count": self.count,
+            "mean_us": mean / 1e3,
+            "p50_us": self.percentile(50) / 1e3,
+            "p90_us": self.percentile(90) / 1e3,
+            "p99_us": self.percentile(99) / 1e3,
+            "max_us": self.max_ns / 1e3,
+        }
+
+
+class Counter:
+    __slots__ = ("name", "help", "value")
+
+    def __init__(self, name: str, help: str = ""):
+        self.name = name
+        self.help = help
+        self.value = 0
+
+    def inc(self, n: int = 1):
+        self.value += n
+
+
+class Gauge:
+    __slots__ = ("name", "help", "value")
+
+    def __init__(self, name: str, help: str = ""):
+        self.name = name
+        self.help = help
+        self.value = 0.0
+
+    def set(self, value: float):
+        self.value = value
+
+
+class MetricsRegistry:
+    """
+    ที่เก็บ histogram / counter / gauge ทั้งหมดของ process
+    """
+
+    def __init__(self, prefix: str = "hats"):
+        self.prefix = prefix
+        self.histograms: Dict[str, LatencyHistogram] = {}
+        self.counters: Dict[str, Counter] = {}
+        self.gauges: Dict[str, Gauge] = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name: str, help: str = "") -> LatencyHistogram:
+        h = self.histograms.get(name)
+        if h is None:
+            with self._lock:
+                h = self.histograms.setdefault(name, LatencyHistogram(name, help))
+        return h
+
+    def counter(self, name: str, help: str = "") -> Counter:
+        c = self.counters.get(name)
+        if c is None:
+            with self._lock:
+                c = self.counters.setdefault(name, Counter(name, help))
+        return c
+
+    def gauge(self, name: str, help: str = "") -> Gauge:
+        g = self.gauges.get(name)
+        if g is None:
+            with self._lock:
+                g = self.gauges.setdefault(name, Gauge(name, help))
+        return g
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        คืน dict ของ metrics ทั้งหมด (สำหรับเขียนไฟล์ / dashboard)
+        """
+        return {
+            "ts": time.time(),
+            "latency": {name: h.summary() for name, h in list(self.histograms.items())},
+            "counters": {name: c.value for name, c in list(self.counters.items())},
+            "gauges": {name: g.value for name, g in list(self.gauges.items())},
+        }
+
+    def render_prometheus(self) -> str:
+        """
+        Export เป็น Prometheus text format (histogram → summary หน่วยวินาที)
+        """
+        lines = []
+        for name, h in list(self.histograms.items()):
+            metric = f"{self.prefix}_{name}_seconds"
+            lines.append(f"# HELP {metric} {h.help or name + ' latency'}")
+            lines.append(f"# TYPE {metric} summary")
+            for q in (0.5, 0.9, 0.99):
+                lines.append(f'{metric}{{quantile="{q}"}} {h.percentile(q * 100) / 1e9:.9f}')
+            lines.append(f"{metric}_sum {h.total_ns / 1e9:.9f}")
+            lines.append(f"{metric}_count {h.count}")
+        for name, c in list(self.counters.items()):
+            metric = f"{self.prefix}_{name}_total"
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {c.value}")
+        for name, g in list(self.gauges.items()):
+            metric = f"{self.prefix}_{name}"
+            lines.append(f"# TYPE {metric} gauge")
+            lines.append(f"{metric} {g.value}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+
+# ─── Timers: context manager + decorator ────────────────────────────────────────
+class _Span:
+    __slots__ = ("hist", "t0")
+
+    def __init__(self, hist: LatencyHistogram):
+        self.hist = hist
+
+    def __enter__(self):
+        self.t0 = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.hist.record(time.perf_counter_ns() - self.t0)
+        return False
+
+
+def span(name: str, registry: MetricsRegistry = REGISTRY) -> _Span:
+    """
+    จับเวลาช่วงโค้ด:  with span("predict"): ...
+    """
+    return _Span(registry.histogram(name))
+
+
+def timed(name: Optional[str] = None, registry: MetricsRegistry = REGISTRY) -> Callable:
+    """
+    Decorator จับเวลาทุกครั้งที่เรียกฟังก์ชัน (ชื่อ histogram = name หรือชื่อฟังก์ชัน)
+    """
+    def decorator(func):
+        hist = registry.histogram(name or func.__name__)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            t0 = time.perf_counter_ns()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                hist.record(time.perf_counter_ns() - t0)
+        return wrapper
+    return decorator
+
+
+# ─── Exporters ──────────────────────────────────────────────────────────────────
+def start_http_server(port: int, host: str = "127.0.0.1",
+                      registry: MetricsRegistry = REGISTRY) -> ThreadingHTTPServer:
+    """
+    เปิด endpoint /metrics (Prometheus text) ใน daemon thread
+    """
+    class _Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/", "/metrics"):
+                self.send_response(404)
+                self.end_headers()
+                return
+            body = registry.render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), _Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+class MetricsFileWriter:
+    """
+    เขียน snapshot ของ metrics เป็น JSON lines ทุก interval_s วินาที (daemon thread)
+    หมุนไฟล์เมื่อเกิน max_bytes: metrics.jsonl → metrics.jsonl.1 → ... (เก็บ backup_count ไฟล์)
+    """
+
+    def __init__(self, path: str, interval_s: float = 5.0, max_bytes: int = 5_000_000,
+                 backup_count: int = 3, registry: MetricsRegistry = REGISTRY):
+        self.path = Path(path)
+        self.interval_s = interval_s
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.registry = registry
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="metrics-file", daemon=True)
+
+    def start(self) -> "MetricsFileWriter":
+        self._thread.start()
+        return self
+
+    def _rotate(self):
+        for i in range(self.backup_count - 1, 0, -1):
+            src = self.path.with_name(f"{self.path.name}.{i}")
+            if src.exists():
+                os.replace(src, self.path.with_name(f"{self.path.name}.{i + 1}"))
+        if self.backup_count > 0:
+            os.replace(self.path, self.path.with_name(f"{self.path.name}.1"))
+        else:
+            self.path.unlink()
+
+    def write_once(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self.path.exists() and self.path.stat().st_size >= self.max_bytes:
+            self._rotate()
+        with open(self.path, "a", encoding="utf-8") as fh:
+            fh.write(json.dumps(self.registry.snapshot()) + "\n")
+
+    def _run(self):
+        while not self._stop.wait(self.interval_s):
+            try:
+                self.write_once()
+            except Exception as e:
+                print(f"Warning: metrics file write failed: {e}")
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join(timeout=self.interval_s + 1)
+        self.write_once()
+
+
+def start_exporters(metrics_cfg: Dict[str, Any], registry: MetricsRegistry = REGISTRY) -> Dict[str, Any]:
+    """
+    เปิด exporter ตาม config:
+      metrics: {enabled, http_port, file_path, file_interval_s, max_bytes, backup_count}
+    """
+    exporters = {}
+    if not metrics_cfg or not metrics_cfg.get("enabled", False):
+        return exporters
+    if metrics_cfg.get("http_port"):
+        try:
+            exporters["http"] = start_http_server(int(metrics_cfg["http_port"]), registry=registry)
+        except OSError as e:
+            print(f"Warning: cannot start metrics endpoint on port {metrics_cfg['http_port']}: {e}")
+    if metrics_cfg.get("file_path"):
+        exporters["file"] = MetricsFileWriter(
+            metrics_cfg["file_path"],
+            interval_s=float(metrics_cfg.get("file_interval_s", 5)),
+            max_bytes=int(metrics_cfg.get("max_bytes", 5_000_000)),
+            backup_count=int(metrics_cfg.get("backup_count", 3)),
+            registry=registry,
+        ).start()
+    return exporters
+
+
+def stop_exporters(exporters: Dict[str, Any]):
+    """
+    ปิด exporter ที่เปิดจาก start_exporters()
+    """
+    if "http" in exporters:
+        exporters["http"].shutdown()
+    if "file" in exporters:
+        exporters["file"].stop()
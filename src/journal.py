@@ -0,0 +1,270 @@
+"""
+Trade / decision journal: บันทึกการตัดสินใจ ออร์เดอร์ fill และการเปลี่ยนสถานะของตำแหน่งแบบ append-only
+
+- record ขนาดคงที่ (RECORD_DTYPE, numpy structured) → log() แค่ใส่ tuple ลง buffer ที่จองไว้ (ไม่กี่ µs)
+- เขียนลงไฟล์เป็น batch (ครบ batch_records หรือเกิน flush_interval_s) พร้อม fsync ตาม policy:
+    none   → ปล่อยให้ OS flush เอง (เร็วสุด, อาจเสีย record ล่าสุดถ้าเครื่องดับ)
+    batch  → fsync หลังทุก batch
+    always → เขียน + fsync ทุก record (ช้า ใช้เมื่อต้องการความทนทานสูงสุด)
+- ไฟล์ยาวเกิน rotate_mb → เริ่มไฟล์ใหม่ <stem>.00001.bin, .00002.bin ... (ไฟล์แรกคือ path เอง)
+- read_journal / export_journal แปลงเป็น DataFrame / CSV / Parquet เมื่อต้องการ
+
+รัน:  python -m src.journal --output logs/journal.parquet
+"""
+
+import argparse
+import csv
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import yaml
+
+# โหลด config
+_cfg_path = Path(__file__).resolve().parents[1] / "config" / "config.yaml"
+with open(_cfg_path, "r", encoding="utf-8") as f:
+    cfg = yaml.safe_load(f)
+
+_journal_cfg = cfg.get("journal", {}) or {}
+JOURNAL_PATH = _journal_cfg.get("path", "logs/journal.bin")
+BACKTEST_JOURNAL_PATH = _journal_cfg.get("backtest_path", "logs/backtest_journal.bin")
+BATCH_RECORDS = int(_journal_cfg.get("batch_records", 256))
+FLUSH_INTERVAL_S = float(_journal_cfg.get("flush_interval_s", 1.0))
+FSYNC = _journal_cfg.get("fsync", "batch")
+ROTATE_MB = float(_journal_cfg.get("rotate_mb", 64))
+TRADE_LOG_PATH = cfg.get("trade_log_path", "data/real_trade_log.csv")
+
+FSYNC_POLICIES = ("none", "batch", "always")
+MAGIC = b"TJRNL001"
+
+RECORD_DTYPE = np.dtype([
+    ("ts", "<i8"),           # เวลาที่บันทึก (ns epoch)
+    ("bar_time", "<i8"),     # เวลาของแท่งที่เกี่ยวข้อง (ns epoch, 0 = ไม่มี)
+    ("kind", "u1"),          # KINDS
+    ("event", "u1"),         # EVENTS
+    ("source", "u1"),        # SOURCES
+    ("side", "u1"),          # SIDES
+    ("position", "<i4"),     # id ของตำแหน่ง (−1 = ไม่เกี่ยวกับตำแหน่ง)
+    ("price", "<f8"),
+    ("sl", "<f8"),
+    ("tp1", "<f8"),
+    ("tp2", "<f8"),
+    ("tp3", "<f8"),
+    ("confidence", "<f8"),
+    ("online_proba", "<f8"),
+    ("pnl", "<f8"),
+])
+HEADER_BYTES = len(MAGIC) + 8  # magic + itemsize (ตรวจ schema ตอนอ่าน)
+
+KINDS = ["decision", "order", "fill", "transition"]
+EVENTS = ["", "signal", "no_signal", "open", "rejected", "entry", "exit", "sl", "breakeven",
+          "tp1", "tp2", "tp3", "reverse_mss", "close"]
+SOURCES = ["", "ICT", "XGB"]
+SIDES = ["", "Buy", "Sell", "NoTrade"]
+_CODES = {name: {v: i for i, v in enumerate(values)}
+          for name, values in (("kind", KINDS), ("event", EVENTS), ("source", SOURCES), ("side", SIDES))}
+NAN = float("nan")
+
+
+def _ns(t) -> int:
+    """
+    เวลา (Timestamp / datetime / str) → ns epoch; None/NaT → 0
+    """
+    if t is None:
+        return 0
+    t = pd.Timestamp(t)
+    return 0 if t is pd.NaT else int(t.value)
+
+
+def _part_path(path: Path, index: int) -> Path:
+    return path if index == 0 else path.with_name(f"{path.stem}.{index:05d}{path.suffix}")
+
+
+def journal_parts(path) -> List[Path]:
+    """
+    ไฟล์ทั้งหมดของ journal ตามลำดับเวลา (path, <stem>.00001<suffix>, ...)
+    """
+    path = Path(path)
+    parts, i = [], 0
+    while _part_path(path, i).exists():
+        parts.append(_part_path(path, i))
+        i += 1
+    return parts
+
+
+class Journal:
+    """
+    ใช้ร่วมกันได้หลาย thread (live loop + PositionMonitor) — ล็อกเฉพาะช่วงใส่ record ลง buffer
+    fresh=True → ลบไฟล์ journal เดิมทั้งหมดก่อน (เช่น backtest ที่เขียนใหม่ทุกรอบ) ไม่เช่นนั้นต่อท้าย
+    """
+
+    def __init__(self, path=JOURNAL_PATH, batch_records: int = BATCH_RECORDS,
+                 flush_interval_s: float = FLUSH_INTERVAL_S, fsync: str = FSYNC, rotate_mb: float = ROTATE_MB,
+                 fresh: bool = False):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync ต้องเป็นหนึ่งใน {FSYNC_POLICIES}")
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if fresh:
+            for part in journal_parts(self.path):
+                part.unlink()
+        self.batch_records = 1 if fsync == "always" else max(1, batch_records)
+        self.flush_interval_ns = int(flush_interval_s * 1e9)
+        self.fsync = fsync
+        self.rotate_bytes = int(rotate_mb * (1 << 20))
+        self._buf = np.zeros(self.batch_records, dtype=RECORD_DTYPE)
+        self._n = 0
+        self._last_flush = time.time_ns()
+        self._lock = threading.Lock()
+        self._part = max(len(journal_parts(self.path)) - 1, 0)  # ต่อท้ายไฟล์ล่าสุดของรอบก่อน
+        self._file = None
+        self._open_part()
+
+    def _open_part(self):
+        path = _part_path(self.path, self._part)
+        self._file = open(path, "ab")
+        if self._file.tell() == 0:
+            self._file.write(MAGIC + np.int64(RECORD_DTYPE.itemsize).tobytes())
+            self._file.flush()
+
+    # ─── hot path ─────────────────────────────────────────────────────────────
+    def log(self, kind: str, event: str = "", bar_time=None, source: str = "", side: str = "",
+            position: int = -1, price: float = NAN, sl: float = NAN, tp1: float = NAN, tp2: float = NAN,
+            tp3: float = NAN, confidence: float = NAN, online_proba: float = NAN, pnl: float = NAN):
+        now = time.time_ns()
+        record = (now, _ns(bar_time), _CODES["kind"][kind], _CODES["event"][event],
+                  _CODES["source"].get(source or "", 0), _CODES["side"].get(side or "", 0), position,
+                  price, sl, tp1, tp2, tp3, confidence, online_proba, pnl)
+        with self._lock:
+            self._buf[self._n] = record
+            self._n += 1
+            if self._n >= self.batch_records or now - self._last_flush >= self.flush_interval_ns:
+                self._flush_locked(now)
+
+    def decision(self, bar_time, sig: Dict[str, Any]):
+        """
+        ผลของ DecisionEngine.predict ต่อแท่ง
+        """
+        side = sig.get("side")
+        online = sig.get("online_proba")
+        conf = sig.get("confidence")
+        self.log("decision", "signal" if side in ("Buy", "Sell") else "no_signal", bar_time,
+                 sig.get("source") or "", side or "", price=sig.get("entry_price", NAN),
+                 sl=sig.get("sl", NAN), tp1=sig.get("tp1", NAN), tp2=sig.get("tp2", NAN), tp3=sig.get("tp3", NAN),
+                 confidence=NAN if conf is None else conf, online_proba=NAN if online is None else online)
+
+    # ─── I/O ──────────────────────────────────────────────────────────────────
+    def _flush_locked(self, now: Optional[int] = None):
+        self._last_flush = now or time.time_ns()
+        if not self._n:
+            return
+        self._file.write(self._buf[:self._n].tobytes())
+        self._n = 0
+        self._file.flush()
+        if self.fsync != "none":
+            os.fsync(self._file.fileno())
+        if self._file.tell() >= self.rotate_bytes:
+            self._file.close()
+            self._part += 1
+            self._open_part()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def close(self):
+        with self._lock:
+            if self._file is None:
+                return
+            self._flush_locked()
+            if self.fsync == "none":
+                os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_records(path) -> np.ndarray:
+    """
+    record ทั้งหมดของ journal (ทุกไฟล์ที่ rotate แล้ว) เป็น structured array
+    ตัด record สุดท้ายที่เขียนไม่ครบ (process ล้มกลางการเขียน) ทิ้ง
+    """
+    chunks = []
+    for part in journal_parts(path):
+        raw = part.read_bytes()
+        if len(raw) < HEADER_BYTES:
+            continue  # ไฟล์ที่เพิ่งเปิด ยังเขียน header ไม่ครบ
+        if raw[:len(MAGIC)] != MAGIC or np.frombuffer(raw, "<i8", 1, len(MAGIC))[0] != RECORD_DTYPE.itemsize:
+            raise ValueError(f"{part} is not a journal with the current record schema")
+        body = raw[HEADER_BYTES:]
+        usable = len(body) - len(body) % RECORD_DTYPE.itemsize
+        chunks.append(np.frombuffer(body[:usable], dtype=RECORD_DTYPE))
+    return np.concatenate(chunks) if chunks else np.zeros(0, dtype=RECORD_DTYPE)
+
+
+def read_journal(path=JOURNAL_PATH) -> pd.DataFrame:
+    """
+    journal → DataFrame (เวลาเป็น datetime, รหัสเป็น categorical, position −1 → <NA>)
+    """
+    rec = read_records(path)
+    df = pd.DataFrame({name: rec[name] for name in RECORD_DTYPE.names})
+    df["ts"] = pd.to_datetime(df["ts"], unit="ns")
+    df["bar_time"] = pd.to_datetime(df["bar_time"].where(df["bar_time"] != 0), unit="ns")
+    for name, values in (("kind", KINDS), ("event", EVENTS), ("source", SOURCES), ("side", SIDES)):
+        df[name] = pd.Categorical.from_codes(df[name].astype(np.int8), categories=values)
+    df["position"] = df["position"].astype("Int32").where(df["position"] >= 0)
+    return df
+
+
+def export_journal(path=JOURNAL_PATH, output: str = "logs/journal.parquet") -> pd.DataFrame:
+    """
+    export เป็น Parquet (.parquet) หรือ CSV (นามสกุลอื่น)
+    """
+    df = read_journal(path)
+    Path(output).parent.mkdir(parents=True, exist_ok=True)
+    if str(output).endswith(".parquet"):
+        df.to_parquet(output, index=False)
+    else:
+        df.to_csv(output, index=False)
+    print(f"Journal ({len(df)} records) exported to {output}")
+    return df
+
+
+TRADE_LOG_COLUMNS = ["entry_time", "exit_time", "side", "entry_price", "exit_price", "pnl", "exit_reason"]
+
+
+class TradeLog:
+    """
+    เขียนเทรดที่ปิดแล้วต่อท้าย trade_log_path ทีละแถว (รูปแบบเดียวกับ backtest_trade_log.csv
+    ที่ report_generator.load_trade_log และ dashboard อ่าน)
+    """
+
+    def __init__(self, path=TRADE_LOG_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if not self.path.exists() or self.path.stat().st_size == 0:
+            with open(self.path, "w", newline="", encoding="utf-8") as f:
+                csv.writer(f).writerow(TRADE_LOG_COLUMNS)
+
+    def append(self, entry_time, exit_time, side: str, entry_price: float, exit_price: float,
+               pnl: float, exit_reason: str = ""):
+        with open(self.path, "a", newline="", encoding="utf-8") as f:
+            csv.writer(f).writerow([entry_time, exit_time, side, round(float(entry_price), 5),
+                                    round(float(exit_price), 5), round(float(pnl), 5), exit_reason])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the binary trade/decision journal")
+    parser.add_argument("--journal", default=JOURNAL_PATH, help=f"journal ของ backtest: {BACKTEST_JOURNAL_PATH}")
+    parser.add_argument("--output", default="logs/journal.parquet", help=".parquet หรือ .csv")
+    args = parser.parse_args()
+    export_journal(args.journal, args.output)
@@ -3,7 +3,8 @@ import yaml
 from pathlib import Path
 
 # โหลด ICT logic (ต้องมีไฟล์ src/ict_signal.py พร้อมใช้งาน)
-from src.ict_signal import detect_swing_points, detect_mss, compute_fvg, generate_ict_signal
+from src.ict_signal import add_ict_columns, signal_candidates, generate_ict_signal
+from src.schema import read_feature_csv, to_labels
 
 # โหลด config
 _cfg_path = Path(__file__).resolve().parents[1] / "config" / "config.yaml"
@@ -14,35 +15,42 @@ with open(_cfg_path, "r", encoding="utf-8") as f:
 features_path = Path(cfg["features_data_path"])      # data/data_with_features.csv
 output_path   = Path(cfg["historical_data_path"]).parent / "with_labels_ict.csv"  # data/with_labels_ict.csv
 
-def label_ict(input_path: str, output_path: str):
+def ict_labels(df: pd.DataFrame) -> pd.DataFrame:
     """
-    อ่านไฟล์ features (data_with_features.csv) → ใช้ ICT Logic สร้าง label “Buy”/“Sell”/“NoTrade”
-    แล้วบันทึกเป็น data/with_labels_ict.csv
+    เติมคอลัมน์ label “Buy”/“Sell”/“NoTrade” ให้ frame ฟีเจอร์ (df ต้องเรียงตาม time แล้ว)
+    คอลัมน์ ICT (swing, MSS, FVG, fib zone, pullback) มาจาก feature stage อยู่แล้ว
+    คำนวณเองเฉพาะเมื่อไฟล์ features ยังไม่มี (add_ict_columns)
     """
-    # 1) โหลด DataFrame ฟีเจอร์ (M1) ทั้งหมด
-    df = pd.read_csv(input_path, parse_dates=["time"])
-    df = df.sort_values("time").reset_index(drop=True)
-
-    # 2) เตรียม DataFrame: คำนวณ swing points, MSS, FVGล่วงหน้า
-    #    (ฟังก์ชันเหล่านี้ return df ที่มีคอลัมน์เสริมสำหรับ ICT)
-    df = detect_swing_points(df, window=5)
-    df = detect_mss(df)
-    df = compute_fvg(df)
+    # 1) คอลัมน์ ICT จาก compute_features (ไม่คำนวณซ้ำถ้ามีครบ)
+    df = add_ict_columns(df)
 
-    # 3) สร้างลิสต์เก็บ label เริ่มต้นทุกแถวเป็น "NoTrade"
+    # 2) สร้างลิสต์เก็บ label เริ่มต้นทุกแถวเป็น "NoTrade"
     labels = ["NoTrade"] * len(df)
 
-    # 4) วนลูปทุก index → เรียก generate_ict_signal
-    for i in range(len(df)):
-        sig = generate_ict_signal(df, idx=i)
+    # 3) เรียก generate_ict_signal เฉพาะแถวที่ผ่านเงื่อนไขจำเป็น (แถวอื่นคืน None แน่นอน)
+    for i in signal_candidates(df):
+        sig = generate_ict_signal(df, idx=int(i))
         if sig is not None:
             # กำหนด label ตาม 'side' (Buy/Sell)
             labels[i] = sig["side"]
 
-    # 5) แปะคอลัมน์ label ลงใน df
-    df["label"] = labels
+    # 4) แปะคอลัมน์ label ลงใน df
+    df["label"] = to_labels(labels)
+    return df
+
+def label_ict(input_path: str, output_path: str):
+    """
+    อ่านไฟล์ features (data_with_features.csv) → ใช้ ICT Logic สร้าง label “Buy”/“Sell”/“NoTrade”
+    แล้วบันทึกเป็น data/with_labels_ict.csv
+    """
+    # 1) โหลด DataFrame ฟีเจอร์ (M1) ทั้งหมด
+    df = read_feature_csv(input_path)
+    df = df.sort_values("time").reset_index(drop=True)
+
+    # 2) ICT columns + label
+    df = ict_labels(df)
 
-    # 6) บันทึกเป็น CSV ใหม่ (รวมทั้งคอลัมน์ features เดิม + label)
+    # 3) บันทึกเป็น CSV ใหม่ (รวมทั้งคอลัมน์ features เดิม + label)
     Path(output_path).parent.mkdir(parents=True, exist_ok=True)
     df.to_csv(output_path, index=False)
     print(f"Labels (ICT) saved to {output_path}")
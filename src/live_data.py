@@ -0,0 +1,315 @@
+import io
+import json
+import os
+import threading
+import numpy as np
+import pandas as pd
+import yaml
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, Optional, List, Sequence
+
+from src.shm_ring import ShmRing, RingTail
+
+# โหลด config
+_cfg_path = Path(__file__).resolve().parents[1] / "config" / "config.yaml"
+with open(_cfg_path, "r", encoding="utf-8") as f:
+    cfg = yaml.safe_load(f)
+
+_dash_cfg = cfg.get("dashboard", {}) or {}
+STATE_PATH = _dash_cfg.get("state_path", "logs/live_state.json")
+WINDOW_ROWS = int(_dash_cfg.get("window_rows", 20_000))
+CHART_POINTS = int(_dash_cfg.get("chart_points", 1000))
+
+_BLOCK = 1 << 16
+
+
+# ─── Live state (run_phase3 เขียน, dashboard อ่าน) ────────────────────────────────────
+def write_live_state(state: Dict[str, Any], path: str = STATE_PATH):
+    """
+    เขียน snapshot ของ live loop เป็น JSON แบบ atomic (เขียนไฟล์ชั่วคราวแล้ว rename)
+    ผู้อ่านจึงไม่เห็นไฟล์ที่เขียนไม่ครบ
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(state, default=str), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def read_live_state(path: str = STATE_PATH) -> Optional[Dict[str, Any]]:
+    try:
+        return json.loads(Path(path).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def positions_snapshot(positions: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    ตำแหน่งที่เปิดอยู่ (ไม่รวม features ณ entry ซึ่งใหญ่และไม่ต้องแสดง)
+    """
+    return [{k: (v.item() if isinstance(v, np.generic) else v) for k, v in pos.items() if k != "features"}
+            for pos in positions]
+
+
+def health_status(state: Optional[Dict[str, Any]], now: Optional[datetime] = None) -> Dict[str, Any]:
+    """
+    สถานะของ live loop จาก live_state:
+      - down: ไม่มีไฟล์ state
+      - stale: ไม่ได้อัปเดตเกิน 3 × cooldown (loop ค้างหรือหยุด)
+      - degraded: มี error ใน loop
+      - ok
+    """
+    if not state:
+        return {"status": "down", "detail": "no live state"}
+    now = now or datetime.now()
+    age = (now - datetime.fromisoformat(state["updated_at"])).total_seconds()
+    limit = 3 * float(state.get("cooldown_s", 60))
+    if age > limit:
+        return {"status": "stale", "detail": f"last update {age:.0f}s ago", "age_s": age}
+    errors = state.get("counters", {}).get("loop_errors", 0)
+    if errors:
+        return {"status": "degraded", "detail": f"{errors} loop errors", "age_s": age}
+    return {"status": "ok", "detail": f"updated {age:.0f}s ago", "age_s": age}
+
+
+# ─── Incremental readers ─────────────────────────────────────────────────────────────
+class _FileTail:
+    """
+    อ่านเฉพาะไบต์ที่ต่อท้ายไฟล์ตั้งแต่ครั้งก่อน (เก็บ offset ของบรรทัดสมบูรณ์ล่าสุด)
+    - ครั้งแรกเริ่มที่ initial_rows บรรทัดสุดท้าย (ไม่อ่านประวัติทั้งไฟล์)
+    - ถ้าไฟล์หดหรือบรรทัดก่อน offset เปลี่ยน (rotate / เขียนใหม่) → เริ่มอ่านใหม่จากท้ายไฟล์
+    """
+
+    def __init__(self, path: str, has_header: bool, initial_rows: int = WINDOW_ROWS):
+        self.path = Path(path)
+        self.has_header = has_header
+        self.initial_rows = initial_rows
+        self.header = b""
+        self.offset = None
+        self.last_line = b""
+        self.resets = 0
+
+    def _start_offset(self, f, size: int, body_start: int) -> int:
+        # ย้อนจากท้ายไฟล์ทีละบล็อกจนนับได้ initial_rows บรรทัด
+        pos, newlines = size, 0
+        while pos > body_start:
+            step = min(_BLOCK, pos - body_start)
+            pos -= step
+            f.seek(pos)
+            block = f.read(step)
+            count = block.count(b"\n")
+            if newlines + count > self.initial_rows:
+                # ตำแหน่งหลัง newline ตัวที่ (initial_rows + 1) นับจากท้าย
+                cut = len(block)
+                for _ in range(self.initial_rows + 1 - newlines):
+                    cut = block.rindex(b"\n", 0, cut)
+                return pos + cut + 1
+            newlines += count
+        return body_start
+
+    def _valid(self, f) -> bool:
+        if self.offset is None:
+            return False
+        if not self.last_line:
+            return True
+        f.seek(self.offset - len(self.last_line))
+        return f.read(len(self.last_line)) == self.last_line
+
+    def read_new(self) -> bytes:
+        """
+        คืนไบต์ของบรรทัดสมบูรณ์ใหม่ (ไม่รวม header) ตั้งแต่ครั้งก่อน
+        """
+        if not self.path.exists():
+            return b""
+        with open(self.path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if self.offset is None or size < self.offset or not self._valid(f):
+                if self.offset is not None:
+                    self.resets += 1
+                f.seek(0)
+                self.header = f.readline() if self.has_header else b""
+                if self.has_header and not self.header.endswith(b"\n"):
+                    return b""
+                self.offset = self._start_offset(f, size, len(self.header))
+                self.last_line = b""
+            f.seek(self.offset)
+            data = f.read(size - self.offset)
+        end = data.rfind(b"\n") + 1
+        if end == 0:
+            return b""
+        data = data[:end]
+        self.offset += end
+        self.last_line = data[data.rfind(b"\n", 0, end - 1) + 1:]
+        return data
+
+
+class CsvTail(_FileTail):
+    """
+    tail ของ CSV (historical.csv / trade log): poll() คืน DataFrame ของแถวใหม่เท่านั้น
+    """
+
+    def __init__(self, path: str, parse_dates: Sequence[str] = (), initial_rows: int = WINDOW_ROWS):
+        super().__init__(path, has_header=True, initial_rows=initial_rows)
+        self.parse_dates = list(parse_dates)
+
+    def poll(self) -> pd.DataFrame:
+        data = self.read_new()
+        if not data:
+            return pd.DataFrame()
+        df = pd.read_csv(io.BytesIO(self.header + data))
+        for col in self.parse_dates:
+            if col in df.columns:
+                df[col] = pd.to_datetime(df[col], format="ISO8601")
+        return df
+
+
+class JsonlTail(_FileTail):
+    """
+    tail ของ JSON lines (logs/metrics.jsonl): poll() คืน list ของ record ใหม่
+    """
+
+    def __init__(self, path: str, initial_rows: int = 3600):
+        super().__init__(path, has_header=False, initial_rows=initial_rows)
+
+    def poll(self) -> List[Dict[str, Any]]:
+        out = []
+        for line in self.read_new().splitlines():
+            try:
+                out.append(json.loads(line))
+            except ValueError:
+                continue
+        return out
+
+
+# ─── Downsampling ────────────────────────────────────────────────────────────────────
+def lttb(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: เลือก n_out จุดที่รักษารูปทรงของกราฟ (spike/จุดกลับตัว)
+    คืน index ของจุดที่เลือก (จุดแรกและจุดสุดท้ายอยู่เสมอ)
+    """
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)  # bucket ของจุดกลาง n_out − 2 ช่วง
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # จุดเฉลี่ยของ bucket ถัดไป (bucket สุดท้ายใช้จุดปลาย)
+        nlo, nhi = hi, (edges[i + 2] if i + 2 < len(edges) else n)
+        cx, cy = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(area.argmax())
+        out[i + 1] = a
+    return out
+
+
+class SeriesBuffer:
+    """
+    อนุกรมเวลา (x เป็น ns, y) ที่ต่อท้ายได้ เก็บไม่เกิน max_len จุดล่าสุด
+    ผล downsample ถูก cache ไว้จนกว่าจะมีข้อมูลใหม่
+    """
+
+    def __init__(self, max_len: int = WINDOW_ROWS):
+        self.max_len = max_len
+        self.x = np.empty(0, dtype=np.int64)
+        self.y = np.empty(0, dtype=np.float64)
+        self._cache = None
+
+    def __len__(self) -> int:
+        return len(self.y)
+
+    def extend(self, x: np.ndarray, y: np.ndarray):
+        if len(y) == 0:
+            return
+        self.x = np.concatenate([self.x, np.asarray(x, dtype="datetime64[ns]").view(np.int64)])[-self.max_len:]
+        self.y = np.concatenate([self.y, np.asarray(y, dtype=np.float64)])[-self.max_len:]
+        self._cache = None
+
+    def last(self) -> float:
+        return float(self.y[-1]) if len(self.y) else 0.0
+
+    def downsampled(self, n_points: int = CHART_POINTS) -> pd.DataFrame:
+        if self._cache is None or self._cache[0] != n_points:
+            idx = lttb(self.x, self.y, n_points)
+            frame = pd.DataFrame({"time": self.x[idx].view("datetime64[ns]"), "value": self.y[idx]})
+            self._cache = (n_points, frame)
+        return self._cache[1]
+
+
+# ─── Feed รวมสำหรับ dashboard ─────────────────────────────────────────────────────────
+class LiveFeed:
+    """
+    แหล่งข้อมูลของ dashboard: แต่ละ poll() อ่านเฉพาะส่วนที่เพิ่มขึ้นของ
+    historical.csv (ราคา), trade log (equity / เทรดล่าสุด), metrics.jsonl (latency) และ live_state.json
+    ใช้ร่วมกันได้หลาย session (มี lock)
+    """
+
+    def __init__(self, candles_path: str, trade_log_path: str, metrics_path: Optional[str],
+                 state_path: str = STATE_PATH, window_rows: int = WINDOW_ROWS, ring_name: Optional[str] = None):
+        self.candles = CsvTail(candles_path, parse_dates=["time"], initial_rows=window_rows)
+        self.ring_name = ring_name  # ชื่อ ShmRing ของ live loop: ถ้ามีจะอ่านราคาจาก shared memory แทน CSV
+        self.trade_log = CsvTail(trade_log_path, parse_dates=["entry_time", "exit_time", "time"],
+                                 initial_rows=window_rows)
+        self.metrics = JsonlTail(metrics_path) if metrics_path else None
+        self.state_path = state_path
+        self.price = SeriesBuffer(window_rows)
+        self.equity = SeriesBuffer(window_rows)
+        self.recent_trades = deque(maxlen=50)
+        self.latency_history = deque(maxlen=3600)
+        self._lock = threading.Lock()
+
+    def _attach_ring(self):
+        """
+        เปลี่ยนแหล่งราคาเป็น ShmRing เมื่อ live loop สร้าง ring แล้ว (ยังไม่มี → ใช้ historical.csv ต่อ)
+        """
+        if self.ring_name is None or isinstance(self.candles, RingTail):
+            return
+        try:
+            ring = ShmRing.attach(self.ring_name)
+        except (FileNotFoundError, ValueError):
+            return
+        self.candles = RingTail(ring, initial_rows=self.price.max_len)
+        self.price = SeriesBuffer(self.price.max_len)
+
+    def poll(self) -> Dict[str, Any]:
+        with self._lock:
+            self._attach_ring()
+            resets = (self.candles.resets, self.trade_log.resets)
+            bars = self.candles.poll()
+            trades = self.trade_log.poll()
+            # ไฟล์ถูกเขียนใหม่/rotate → tail อ่านช่วงท้ายใหม่ จึงต้องล้าง buffer เดิมก่อน
+            if self.candles.resets != resets[0]:
+                self.price = SeriesBuffer(self.price.max_len)
+            if self.trade_log.resets != resets[1]:
+                self.equity = SeriesBuffer(self.equity.max_len)
+                self.recent_trades.clear()
+
+            if len(bars):
+                # live loop เขียน historical.csv ใหม่ทั้งไฟล์แต่ prefix เดิม → ได้เฉพาะแท่งใหม่
+                self.price.extend(bars["time"].to_numpy(), bars["close"].to_numpy())
+
+            if len(trades) and "pnl" in trades.columns:
+                t = trades["exit_time"] if "exit_time" in trades.columns else trades.get("time")
+                self.equity.extend(t.to_numpy(), self.equity.last() + trades["pnl"].cumsum().to_numpy())
+                self.recent_trades.extend(trades.to_dict("records"))
+
+            if self.metrics is not None:
+                for snap in self.metrics.poll():
+                    row = {"ts": pd.Timestamp(snap["ts"], unit="s")}
+                    for name, s in snap.get("latency", {}).items():
+                        row[name] = s.get("p99_us")
+                    self.latency_history.append(row)
+
+            state = read_live_state(self.state_path)
+            return {
+                "state": state,
+                "health": health_status(state),
+                "n_bars": len(self.price),
+                "n_trades": len(self.equity),
+            }
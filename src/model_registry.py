@@ -0,0 +1,202 @@
+"""
+Model registry: เก็บโมเดลที่เทรนแล้วเป็นเวอร์ชัน ให้ live loop สลับโมเดลได้โดยไม่ต้อง restart
+
+โครงสร้างใต้ root (ค่าเริ่มต้น models/registry):
+  registry.json          manifest: versions (ข้อมูลทุกเวอร์ชัน), active, history (ลำดับการ activate)
+  v0001/model.json       สำเนาไฟล์โมเดลของแต่ละเวอร์ชัน (ไม่ถูกเขียนทับ)
+แต่ละเวอร์ชันเก็บ: model_file, features, train_start/train_end, metrics, sha256, created_at
+manifest เขียนแบบ tmp + os.replace → process อื่น (เช่น run_phase3) อ่านได้เสมอโดยไม่เห็นไฟล์ครึ่ง ๆ
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import yaml
+
+# โหลด config
+_cfg_path = Path(__file__).resolve().parents[1] / "config" / "config.yaml"
+with open(_cfg_path, "r", encoding="utf-8") as f:
+    cfg = yaml.safe_load(f)
+
+_registry_cfg = cfg.get("model_registry", {}) or {}
+REGISTRY_ROOT = _registry_cfg.get("root", "models/registry")
+POLL_INTERVAL_S = float(_registry_cfg.get("poll_interval_s", 5))
+MANIFEST_NAME = "registry.json"
+
+
+def file_sha256(path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class ModelRegistry:
+    """
+    registry แบบไฟล์ของโมเดล XGBoost (ไม่โหลดโมเดลเอง — DecisionEngine เป็นผู้โหลด)
+    """
+
+    def __init__(self, root=REGISTRY_ROOT):
+        self.root = Path(root)
+        self.manifest_path = self.root / MANIFEST_NAME
+        self._lock = threading.Lock()  # กัน register/activate ซ้อนกันภายใน process เดียว
+
+    # ─── manifest ─────────────────────────────────────────────────────────────
+    def _load(self) -> Dict[str, Any]:
+        if not self.manifest_path.exists():
+            return {"active": None, "history": [], "versions": []}
+        return json.loads(self.manifest_path.read_text(encoding="utf-8"))
+
+    def _save(self, state: Dict[str, Any]):
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self.manifest_path.with_name(MANIFEST_NAME + ".tmp")
+        tmp.write_text(json.dumps(state, indent=2, default=str), encoding="utf-8")
+        os.replace(tmp, self.manifest_path)
+
+    def stamp(self):
+        """
+        (mtime_ns, size) ของ manifest — ใช้ตรวจการเปลี่ยนแปลงแบบถูก ๆ โดยไม่ต้อง parse JSON
+        """
+        try:
+            st = os.stat(self.manifest_path)
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    # ─── อ่าน ─────────────────────────────────────────────────────────────────
+    def versions(self) -> List[Dict[str, Any]]:
+        return self._load()["versions"]
+
+    def get(self, version: int) -> Dict[str, Any]:
+        for entry in self.versions():
+            if entry["version"] == version:
+                return entry
+        raise KeyError(f"model version {version} not in registry {self.root}")
+
+    def active(self) -> Optional[Dict[str, Any]]:
+        state = self._load()
+        if state["active"] is None:
+            return None
+        return next(e for e in state["versions"] if e["version"] == state["active"])
+
+    def model_file(self, entry: Dict[str, Any]) -> Path:
+        return self.root / entry["model_file"]
+
+    def verify(self, entry: Dict[str, Any]) -> bool:
+        """
+        ไฟล์โมเดลของเวอร์ชันยังอยู่และ sha256 ตรงกับที่ลงทะเบียนไว้
+        """
+        path = self.model_file(entry)
+        return path.exists() and file_sha256(path) == entry["sha256"]
+
+    # ─── เขียน ────────────────────────────────────────────────────────────────
+    def register(self, model_path, features: Sequence[str], train_start=None, train_end=None,
+                 metrics: Optional[Dict[str, Any]] = None, activate: bool = True) -> Dict[str, Any]:
+        """
+        คัดลอกไฟล์โมเดลเข้า registry เป็นเวอร์ชันใหม่ (ไฟล์เดิมซ้ำ sha256 → คืนเวอร์ชันเดิม ไม่สร้างใหม่)
+        activate=True → เป็นเวอร์ชัน active ทันที (live engine ที่ watch อยู่จะโหลดเอง)
+        """
+        sha = file_sha256(model_path)
+        with self._lock:
+            state = self._load()
+            entry = next((e for e in state["versions"] if e["sha256"] == sha), None)
+            if entry is None:
+                version = max((e["version"] for e in state["versions"]), default=0) + 1
+                rel = Path(f"v{version:04d}") / Path(model_path).name
+                (self.root / rel).parent.mkdir(parents=True, exist_ok=True)
+                shutil.copyfile(model_path, self.root / rel)
+                entry = {
+                    "version": version,
+                    "model_file": rel.as_posix(),
+                    "features": list(features),
+                    "train_start": None if train_start is None else str(train_start),
+                    "train_end": None if train_end is None else str(train_end),
+                    "metrics": metrics or {},
+                    "sha256": sha,
+                    "created_at": datetime.now().isoformat(timespec="seconds"),
+                }
+                state["versions"].append(entry)
+            if activate and state["active"] != entry["version"]:
+                state["active"] = entry["version"]
+                state["history"].append(entry["version"])
+            self._save(state)
+        return entry
+
+    def activate(self, version: int) -> Dict[str, Any]:
+        with self._lock:
+            state = self._load()
+            entry = next((e for e in state["versions"] if e["version"] == version), None)
+            if entry is None:
+                raise KeyError(f"model version {version} not in registry {self.root}")
+            if state["active"] != version:
+                state["active"] = version
+                state["history"].append(version)
+                self._save(state)
+        return entry
+
+    def rollback(self) -> Dict[str, Any]:
+        """
+        กลับไปเวอร์ชันที่ active ก่อนหน้า (ตาม history) — เรียกซ้ำเพื่อย้อนต่อได้
+        """
+        with self._lock:
+            state = self._load()
+            if len(state["history"]) < 2:
+                raise ValueError("no previous model version to roll back to")
+            state["history"].pop()
+            state["active"] = state["history"][-1]
+            self._save(state)
+            return next(e for e in state["versions"] if e["version"] == state["active"])
+
+
+class ModelWatcher(threading.Thread):
+    """
+    Thread ที่ตรวจ manifest ทุก interval_s แล้วเรียก on_change(entry) เมื่อเวอร์ชัน active เปลี่ยน
+    on_change ทำงานใน thread นี้ (เช่นโหลดโมเดลใหม่) → live loop ไม่ต้องรอ
+    """
+
+    def __init__(self, registry: ModelRegistry, on_change: Callable[[Dict[str, Any]], None],
+                 interval_s: float = POLL_INTERVAL_S, log: Optional[Callable[[str], None]] = print):
+        super().__init__(name="model-watcher", daemon=True)
+        self.registry = registry
+        self.on_change = on_change
+        self.interval_s = interval_s
+        self.log = log or (lambda msg: None)
+        self._stop_event = threading.Event()
+        self._stamp = registry.stamp()
+        self._version = (registry.active() or {}).get("version")
+
+    def check_once(self) -> bool:
+        """
+        คืน True ถ้าพบเวอร์ชัน active ใหม่และเรียก on_change แล้ว
+        """
+        stamp = self.registry.stamp()
+        if stamp is None or stamp == self._stamp:
+            return False
+        entry = self.registry.active()
+        if entry is None or entry["version"] == self._version:
+            self._stamp = stamp
+            return False
+        self.on_change(entry)
+        # บันทึกหลัง on_change สำเร็จเท่านั้น → ถ้าโหลดล้มเหลวจะลองใหม่รอบถัดไป
+        self._stamp, self._version = stamp, entry["version"]
+        return True
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.check_once()
+            except Exception as e:
+                self.log(f"Model watcher error: {e}")
+            self._stop_event.wait(self.interval_s)
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stop_event.set()
+        if self.is_alive():
+            self.join(timeout)
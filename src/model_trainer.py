@@ -1,11 +1,12 @@
-import pandas as pd
 import numpy as np
 import xgboost as xgb
 import yaml
 from pathlib import Path
-from sklearn.metrics import classification_report
+from sklearn.metrics import accuracy_score, classification_report
 from sklearn.model_selection import TimeSeriesSplit
 
+from src.schema import read_feature_csv, label_codes
+
 # โหลด config
 _cfg_path = Path(__file__).resolve().parents[1] / "config" / "config.yaml"
 with open(_cfg_path, "r", encoding="utf-8") as f:
@@ -44,25 +45,26 @@ def train_walkforward(dataset_path: str,
       dataset_path: พาธไปยัง data/with_labels_ict.csv
       model_output:  พาธที่จะบันทึกไฟล์โมเดล XGBoost (.json)
       report_output: พาธที่จะบันทึกรายงาน walk-forward (.txt)
+    คืน dict สรุปสำหรับ model registry: train_start, train_end, rows, fold_accuracy
     """
-    df = pd.read_csv(dataset_path)
+    df = read_feature_csv(dataset_path)
 
-    # แปลง boolean เป็น int (0/1)
+    # แปลง boolean เป็น uint8 (0/1)
     for col in ["mss_bullish", "mss_bearish", "fvg_bullish", "fvg_bearish"]:
         if col in df.columns:
-            df[col] = df[col].astype(int)
+            df[col] = df[col].astype(np.uint8)
 
     # เตรียมคุณลักษณะ X
     X = df[FEATURE_COLS]
 
-    # แปลง label เป็นตัวเลข: Buy→1, Sell→2, NoTrade→0
-    df["label_num"] = df["label"].map({"Buy": 1, "Sell": 2, "NoTrade": 0})
-    y = df["label_num"]
+    # label (categorical) → รหัส int8: NoTrade→0, Buy→1, Sell→2
+    y = label_codes(df["label"])
 
     # Walk-forward CV
     tscv = TimeSeriesSplit(n_splits=cfg.get("walkforward_splits", 5))
     fold = 0
     reports = []
+    fold_accuracy = []
 
     for train_idx, test_idx in tscv.split(X):
         X_train, X_test = X.iloc[train_idx], X.iloc[test_idx]
@@ -78,6 +80,7 @@ def train_walkforward(dataset_path: str,
         else:
             y_pred = y_pred_raw
 
+        fold_accuracy.append(round(float(accuracy_score(y_test, y_pred)), 4))
         report = classification_report(
             y_test, y_pred, labels=[1, 2, 0],
             target_names=["Buy", "Sell", "NoTrade"]
@@ -97,6 +100,12 @@ def train_walkforward(dataset_path: str,
     Path(model_output).parent.mkdir(parents=True, exist_ok=True)
     clf_final.save_model(model_output)
     print(f"Model saved to {model_output}")
+    return {
+        "train_start": str(df["time"].iloc[0]) if "time" in df.columns and len(df) else None,
+        "train_end": str(df["time"].iloc[-1]) if "time" in df.columns and len(df) else None,
+        "rows": int(len(df)),
+        "fold_accuracy": fold_accuracy,
+    }
 
 
 if __name__ == "__main__":
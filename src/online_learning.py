@@ -0,0 +1,202 @@
+import os
+import math
+import pickle
+import threading
+import time
+import yaml
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+from river import compose, linear_model, preprocessing
+
+from src.decision_engine import FEATURE_COLS
+
+# โหลด config
+_cfg_path = Path(__file__).resolve().parents[1] / "config" / "config.yaml"
+with open(_cfg_path, "r", encoding="utf-8") as f:
+    cfg = yaml.safe_load(f)
+
+_ol_cfg = cfg.get("online_learning", {}) or {}
+ONLINE_MODEL_PATH = _ol_cfg.get("model_path", "models/river_model.bin")
+CHECKPOINT_EVERY = int(_ol_cfg.get("checkpoint_every", 1))
+
+
+def build_online_model():
+    """
+    สร้างโมเดล River เริ่มต้น: StandardScaler → LogisticRegression
+    ทั้งสองตัวเก็บสถานะขนาดคงที่ต่อฟีเจอร์ (mean/var และน้ำหนัก)
+    จึงอัปเดตได้ O(1) ต่อเทรด และหน่วยความจำไม่โตตามจำนวนเทรด
+    """
+    return compose.Pipeline(
+        preprocessing.StandardScaler(),
+        linear_model.LogisticRegression()
+    )
+
+
+class OnlineLearner:
+    """
+    Online learner ที่เรียนจากเทรดที่ปิดแล้วใน live loop
+    - learn_trade(features, pnl): อัปเดตโมเดลด้วยฟีเจอร์ ณ entry + ผลลัพธ์จริง (pnl > 0 → ชนะ)
+    - predict_proba(features): คืนความน่าจะเป็นที่เทรดจะชนะ
+    - บันทึก checkpoint ลง model_path ใน background thread (ไม่บล็อก trading loop)
+    """
+
+    def __init__(self,
+                 model_path: str = ONLINE_MODEL_PATH,
+                 feature_cols: Optional[list] = None,
+                 checkpoint_every: int = CHECKPOINT_EVERY):
+        self.model_path = Path(model_path)
+        self.feature_cols = list(feature_cols or FEATURE_COLS)
+        self.checkpoint_every = max(1, int(checkpoint_every))
+
+        self.model = self._load_or_create()
+        self._lock = threading.Lock()
+
+        # metrics
+        self.n_updates = 0
+        self.n_predictions = 0
+        self.last_update_us = 0.0
+        self.avg_update_us = 0.0
+        self.last_predict_us = 0.0
+        self.avg_predict_us = 0.0
+        self.model_bytes = 0
+        self.checkpoint_bytes = 0
+        self.n_checkpoints = 0
+        self.last_checkpoint_time = None
+        self.last_checkpoint_error = None
+
+        # background checkpoint thread
+        self._ckpt_event = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._checkpoint_loop,
+                                        name="online-learner-checkpoint",
+                                        daemon=True)
+        self._thread.start()
+
+    def _load_or_create(self):
+        """
+        โหลดโมเดลจาก model_path ถ้ามี ไม่เช่นนั้นสร้างใหม่
+        """
+        if self.model_path.exists():
+            try:
+                with open(self.model_path, "rb") as fh:
+                    return pickle.load(fh)
+            except Exception as e:
+                print(f"Warning: ไม่สามารถโหลด online model ({self.model_path}): {e}")
+        return build_online_model()
+
+    def _to_x(self, features: Dict[str, Any]) -> Dict[str, float]:
+        """
+        แปลง dict ฟีเจอร์เป็น dict ของ float (ข้ามค่า None/NaN)
+        """
+        x = {}
+        for col in self.feature_cols:
+            v = features.get(col)
+            if v is None:
+                continue
+            v = float(v)
+            if math.isnan(v):
+                continue
+            x[col] = v
+        return x
+
+    def predict_proba(self, features: Dict[str, Any]) -> float:
+        """
+        คืนความน่าจะเป็นที่เทรดจาก features นี้จะปิดแบบกำไร (0.0–1.0)
+        """
+        t0 = time.perf_counter_ns()
+        x = self._to_x(features)
+        with self._lock:
+            proba = self.model.predict_proba_one(x)
+        p_win = float(proba.get(True, 0.0))
+
+        dt_us = (time.perf_counter_ns() - t0) / 1000.0
+        self.n_predictions += 1
+        self.last_predict_us = dt_us
+        self.avg_predict_us += (dt_us - self.avg_predict_us) / self.n_predictions
+        return p_win
+
+    def learn_trade(self, features: Dict[str, Any], pnl: float):
+        """
+        อัปเดตโมเดลด้วยเทรดที่ปิดแล้ว 1 เทรด (O(1))
+        แล้วส่งสัญญาณให้ background thread บันทึก checkpoint
+        """
+        if features is None:
+            return
+        t0 = time.perf_counter_ns()
+        x = self._to_x(features)
+        y = bool(pnl > 0)
+        with self._lock:
+            self.model.learn_one(x, y)
+            self.n_updates += 1
+            n_updates = self.n_updates
+
+        dt_us = (time.perf_counter_ns() - t0) / 1000.0
+        self.last_update_us = dt_us
+        self.avg_update_us += (dt_us - self.avg_update_us) / n_updates
+
+        if n_updates % self.checkpoint_every == 0:
+            self._ckpt_event.set()
+
+    def _checkpoint_loop(self):
+        """
+        Background thread: รอสัญญาณแล้วเขียน checkpoint
+        (serialize ภายใต้ lock สั้น ๆ แล้วเขียนไฟล์นอก lock)
+        """
+        while not self._stop.is_set():
+            self._ckpt_event.wait()
+            self._ckpt_event.clear()
+            if self._stop.is_set():
+                break
+            self._write_checkpoint()
+
+    def _write_checkpoint(self):
+        """
+        เขียน model ลงไฟล์ชั่วคราวแล้ว os.replace เพื่อไม่ให้ได้ไฟล์ครึ่ง ๆ กลาง ๆ
+        """
+        try:
+            with self._lock:
+                blob = pickle.dumps(self.model, protocol=pickle.HIGHEST_PROTOCOL)
+                self.model_bytes = int(self.model._raw_memory_usage)
+
+            self.model_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.model_path.with_suffix(self.model_path.suffix + ".tmp")
+            with open(tmp_path, "wb") as fh:
+                fh.write(blob)
+            os.replace(tmp_path, self.model_path)
+
+            self.checkpoint_bytes = len(blob)
+            self.n_checkpoints += 1
+            self.last_checkpoint_time = time.time()
+            self.last_checkpoint_error = None
+        except Exception as e:
+            self.last_checkpoint_error = str(e)
+            print(f"Warning: online model checkpoint failed: {e}")
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        คืน metrics ด้าน latency และหน่วยความจำของ online learner
+        """
+        return {
+            "n_updates": self.n_updates,
+            "n_predictions": self.n_predictions,
+            "last_update_us": self.last_update_us,
+            "avg_update_us": self.avg_update_us,
+            "last_predict_us": self.last_predict_us,
+            "avg_predict_us": self.avg_predict_us,
+            "model_bytes": self.model_bytes,
+            "checkpoint_bytes": self.checkpoint_bytes,
+            "n_checkpoints": self.n_checkpoints,
+            "last_checkpoint_time": self.last_checkpoint_time,
+            "last_checkpoint_error": self.last_checkpoint_error,
+        }
+
+    def close(self):
+        """
+        หยุด background thread แล้วบันทึก checkpoint สุดท้ายแบบ synchronous
+        """
+        self._stop.set()
+        self._ckpt_event.set()
+        self._thread.join(timeout=5)
+        if self.n_updates > 0:
+            self._write_checkpoint()
@@ -0,0 +1,318 @@
+import threading
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Callable
+
+from src.decision_engine import FEATURE_COLS
+from src.execution_sim import SPREAD, SLIPPAGE
+
+
+def _print_log(msg: str):
+    print(f"[{datetime.now()}] {msg}")
+
+
+class PositionManager:
+    """
+    Logic การเปิด/ดูแลตำแหน่งที่ live loop (run_phase3) และ replay harness ใช้ร่วมกัน
+    broker ต้องมี open_order(symbol, side, lot=, sl=, tp=) และ close_all(symbol)
+    (MT5Wrapper สำหรับ live, SimBroker สำหรับ replay)
+
+    แต่ละตำแหน่งเก็บ:
+      side, entry_price, sl, tp1, tp2, tp3, atr, vwap,
+      breakeven, tp1_hit, tp2_hit, tp3_hit, features (ฟีเจอร์ ณ entry สำหรับ online learning),
+      id, entry_time
+    journal (src.journal.Journal, optional): บันทึกออร์เดอร์และทุกการเปลี่ยนสถานะของตำแหน่ง
+    """
+
+    def __init__(self, broker, symbol: str, lot: float = 0.01,
+                 on_close: Optional[Callable[[dict, float], None]] = None,
+                 log: Optional[Callable[[str], None]] = _print_log, journal=None):
+        self.broker = broker
+        self.symbol = symbol
+        self.lot = lot
+        self.on_close = on_close
+        self.log = log or (lambda msg: None)
+        self.journal = journal
+        self._next_id = 0
+        self.positions: List[Dict[str, Any]] = []
+        # manage() (ทุกแท่ง) และ check_tick() (PositionMonitor thread) แก้ positions ร่วมกัน
+        self.lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def _record(self, event: str, pos: dict, price: float, **fields):
+        if self.journal is not None:
+            self.journal.log("transition", event, side=pos["side"], position=pos.get("id", -1), price=price,
+                             sl=pos["sl"], **fields)
+
+    def _closed(self, pos: dict, exit_price: float, reason: str):
+        pos["exit_reason"] = reason
+        sign = 1 if pos["side"] == "Buy" else -1
+        self._record("close", pos, exit_price, pnl=sign * (exit_price - pos["entry_price"]))
+        if self.on_close is not None:
+            self.on_close(pos, exit_price)
+
+    def on_signal(self, sig: Dict[str, Any], last_row) -> bool:
+        """
+        ถ้าเป็น ICT entry (Buy/Sell) → เปิดออร์เดอร์ผ่าน broker แล้วบันทึกตำแหน่ง
+        คืน True ถ้าเปิดสำเร็จ
+        """
+        side = sig.get("side")
+        if sig.get("source") != "ICT" or side not in ("Buy", "Sell"):
+            return False
+
+        entry_price = sig["entry_price"]
+        sl = sig["sl"]
+        tp1 = sig["tp1"]
+        tp2 = sig["tp2"]
+        tp3 = sig["tp3"]
+        atr = sig["atr"]
+        vwap = last_row["vwap"]
+
+        try:
+            success = self.broker.open_order(self.symbol, side.upper(), lot=self.lot, sl=sl, tp=tp1)
+        except Exception as e:
+            self.log(f"MT5 open_order exception: {e}")
+            success = False
+
+        if self.journal is not None:
+            self.journal.log("order", "open" if success else "rejected", sig.get("entry_time"), "ICT", side,
+                             price=entry_price, sl=sl, tp1=tp1, tp2=tp2, tp3=tp3)
+        if success:
+            with self.lock:
+                self._next_id += 1
+                self.positions.append({
+                    "side": side,
+                    "entry_price": entry_price,
+                    "sl": sl,
+                    "tp1": tp1,
+                    "tp2": tp2,
+                    "tp3": tp3,
+                    "atr": atr,
+                    "vwap": vwap,
+                    "breakeven": False,
+                    "tp1_hit": False,
+                    "tp2_hit": False,
+                    "tp3_hit": False,
+                    "features": {col: last_row.get(col) for col in FEATURE_COLS},
+                    "id": self._next_id,
+                    "entry_time": sig.get("entry_time"),
+                })
+                self._record("open", self.positions[-1], entry_price, tp1=tp1, tp2=tp2, tp3=tp3)
+            self.log(f"Opened {side} @ {entry_price}, SL={sl}, TP1={tp1}, TP2={tp2}, TP3={tp3}")
+        return bool(success)
+
+    def _apply_levels(self, pos: dict, price: float, vwap: float, atr: float) -> Optional[dict]:
+        """
+        ตรวจระดับราคาของตำแหน่งเดียว (SL, breakeven ที่ VWAP, TP1–TP3) → คืนตำแหน่งที่อัปเดตแล้ว
+        หรือ None ถ้าโดน SL และปิดไปแล้ว
+        """
+        broker, symbol, log = self.broker, self.symbol, self.log
+        side        = pos["side"]
+        entry_price = pos["entry_price"]
+        sl          = pos["sl"]
+        tp1         = pos["tp1"]
+        tp2         = pos["tp2"]
+        breakeven   = pos["breakeven"]
+        tp1_hit     = pos["tp1_hit"]
+        tp2_hit     = pos["tp2_hit"]
+        tp3_hit     = pos["tp3_hit"]
+
+        # 1) SL
+        if side == "Buy" and price <= sl:
+            broker.close_all(symbol)
+            self._record("sl", pos, price)
+            self._closed(pos, price, "sl")
+            log(f"SL hit for Buy at {price}. Closed position.")
+            return None
+        if side == "Sell" and price >= sl:
+            broker.close_all(symbol)
+            self._record("sl", pos, price)
+            self._closed(pos, price, "sl")
+            log(f"SL hit for Sell at {price}. Closed position.")
+            return None
+
+        # 2) Breakeven (VWAP cross)
+        if not breakeven:
+            if side == "Buy" and price > vwap:
+                sl        = entry_price
+                breakeven = True
+                broker.close_all(symbol)
+                log("VWAP crossed for Buy; SL set to breakeven. Closed 50% (simulated).")
+            if side == "Sell" and price < vwap:
+                sl        = entry_price
+                breakeven = True
+                broker.close_all(symbol)
+                log("VWAP crossed for Sell; SL set to breakeven. Closed 50% (simulated).")
+
+        # 3) TP1
+        if not tp1_hit:
+            if side == "Buy" and price >= tp1:
+                broker.close_all(symbol)
+                tp1_hit = True
+                sl      = entry_price + 0.5 * atr
+                log(f"TP1 hit for Buy at {price}. Closed 1/3. New SL={sl}.")
+            if side == "Sell" and price <= tp1:
+                broker.close_all(symbol)
+                tp1_hit = True
+                sl      = entry_price - 0.5 * atr
+                log(f"TP1 hit for Sell at {price}. Closed 1/3. New SL={sl}.")
+
+        # 4) TP2
+        if not tp2_hit:
+            if side == "Buy" and price >= tp2:
+                broker.close_all(symbol)
+                tp2_hit = True
+                log(f"TP2 hit for Buy at {price}. Closed/all or moved SL to breakeven.")
+            if side == "Sell" and price <= tp2:
+                broker.close_all(symbol)
+                tp2_hit = True
+                log(f"TP2 hit for Sell at {price}. Closed/all or moved SL to breakeven.")
+
+        # 5) TP3
+        if not tp3_hit:
+            tp3_level = vwap + 0.5 * atr if side == "Buy" else vwap - 0.5 * atr
+            if side == "Buy" and price >= tp3_level:
+                broker.close_all(symbol)
+                tp3_hit = True
+                log(f"TP3 hit for Buy at {price}. Closed 1/3 position.")
+            if side == "Sell" and price <= tp3_level:
+                broker.close_all(symbol)
+                tp3_hit = True
+                log(f"TP3 hit for Sell at {price}. Closed 1/3 position.")
+
+        updated = {
+            "side": side,
+            "entry_price": entry_price,
+            "sl": sl,
+            "tp1": tp1,
+            "tp2": tp2,
+            "tp3": pos["tp3"],
+            "atr": atr,
+            "vwap": vwap,
+            "breakeven": breakeven,
+            "tp1_hit": tp1_hit,
+            "tp2_hit": tp2_hit,
+            "tp3_hit": tp3_hit,
+            "features": pos.get("features"),
+            "id": pos.get("id", -1),
+            "entry_time": pos.get("entry_time"),
+        }
+        if self.journal is not None:
+            for flag, event in (("breakeven", "breakeven"), ("tp1_hit", "tp1"), ("tp2_hit", "tp2"),
+                                ("tp3_hit", "tp3")):
+                if updated[flag] and not pos[flag]:
+                    self._record(event, updated, price)
+        return updated
+
+    def manage(self, last):
+        """
+        ตรวจสถานะตำแหน่งที่เปิดค้างไว้จากแท่งล่าสุด (row/dict ที่มี close, vwap, atr):
+        - Breakeven ถ้า price crossing VWAP
+        - ปิดตาม TP1, TP2, TP3
+        - SL (Market order) ทันทีถ้าทะลุ
+        - Reverse MSS: ปิดทันทีถ้ามีสัญญาณกลับตัว
+        """
+        with self.lock:
+            if not self.positions:
+                return
+
+            price_bid = last["close"]
+            vwap = last["vwap"]
+            atr = last["atr"]
+            # Reverse MSS (อ่านจากแท่งล่าสุดถ้ามีคอลัมน์ mss_bullish/mss_bearish ของ feature stage)
+            bullish_mss = last.get("mss_bullish", last.get("bullish_mss", False))
+            bearish_mss = last.get("mss_bearish", last.get("bearish_mss", False))
+
+            updated = []
+            for pos in self.positions:
+                pos = self._apply_levels(pos, price_bid, vwap, atr)
+                if pos is None:
+                    continue
+
+                # 6) Reverse MSS
+                if pos["side"] == "Buy" and bearish_mss:
+                    self.broker.close_all(self.symbol)
+                    self._record("reverse_mss", pos, price_bid)
+                    self._closed(pos, price_bid, "reverse_mss")
+                    self.log("Reverse MSS (Bearish) for Buy. Closed position.")
+                    continue
+                if pos["side"] == "Sell" and bullish_mss:
+                    self.broker.close_all(self.symbol)
+                    self._record("reverse_mss", pos, price_bid)
+                    self._closed(pos, price_bid, "reverse_mss")
+                    self.log("Reverse MSS (Bullish) for Sell. Closed position.")
+                    continue
+
+                updated.append(pos)
+
+            self.positions[:] = updated
+
+    def check_tick(self, bid: float, ask: float) -> int:
+        """
+        ตรวจ SL / breakeven / TP1–TP3 ระหว่างแท่งจากราคา tick (ใช้โดย PositionMonitor)
+        Buy ออกที่ bid, Sell ออกที่ ask; VWAP/ATR ใช้ค่าจากแท่งล่าสุดที่ manage() เก็บไว้
+        คืนจำนวนตำแหน่งที่สถานะเปลี่ยน (ปิดหรือโดน level)
+        """
+        with self.lock:
+            if not self.positions:
+                return 0
+            fired = 0
+            updated = []
+            for pos in self.positions:
+                price = bid if pos["side"] == "Buy" else ask
+                new = self._apply_levels(pos, price, pos["vwap"], pos["atr"])
+                if new is None or any(new[k] != pos[k] for k in ("sl", "breakeven", "tp1_hit", "tp2_hit", "tp3_hit")):
+                    fired += 1
+                if new is not None:
+                    updated.append(new)
+            self.positions[:] = updated
+            return fired
+
+
+class SimBroker:
+    """
+    Broker จำลองสำหรับ replay: fill ที่ราคาปิดของแท่งปัจจุบัน (bid) + spread/slippage
+    - open_order: Buy ที่ ask + slippage, Sell ที่ bid − slippage
+    - close_all: ปิดทุก order ที่เปิดอยู่ (Buy ที่ bid, Sell ที่ ask) และบันทึกลง trades
+    """
+
+    def __init__(self, spread: float = SPREAD, slippage: float = SLIPPAGE):
+        self.spread = spread
+        self.slippage = slippage
+        self.time = None
+        self.bid = None
+        self.open_orders: List[Dict[str, Any]] = []
+        self.trades: List[Dict[str, Any]] = []
+
+    def set_bar(self, time, bid: float):
+        self.time = time
+        self.bid = float(bid)
+
+    def open_order(self, symbol: str, side: str, lot: float = 0.01, sl: float = None, tp: float = None) -> bool:
+        buy = side.upper() == "BUY"
+        price = self.bid + self.spread + self.slippage if buy else self.bid - self.slippage
+        self.open_orders.append({
+            "symbol": symbol, "side": "Buy" if buy else "Sell", "lot": lot,
+            "entry_time": self.time, "entry_price": price, "sl": sl, "tp": tp,
+        })
+        return True
+
+    def close_all(self, symbol: str) -> bool:
+        closing = [o for o in self.open_orders if o["symbol"] == symbol]
+        if not closing:
+            return False
+        for o in closing:
+            if o["side"] == "Buy":
+                exit_price = self.bid - self.slippage
+                pnl = exit_price - o["entry_price"]
+            else:
+                exit_price = self.bid + self.spread + self.slippage
+                pnl = o["entry_price"] - exit_price
+            self.trades.append({
+                "entry_time": o["entry_time"], "exit_time": self.time, "side": o["side"],
+                "entry_price": o["entry_price"], "exit_price": exit_price,
+                "lot": o["lot"], "pnl": pnl,
+            })
+        self.open_orders = [o for o in self.open_orders if o["symbol"] != symbol]
+        return True
@@ -0,0 +1,89 @@
+import threading
+import time
+import yaml
+from pathlib import Path
+from typing import Callable, Optional
+
+from src.instrumentation import REGISTRY
+from src.position_manager import PositionManager
+
+# โหลด config
+_cfg_path = Path(__file__).resolve().parents[1] / "config" / "config.yaml"
+with open(_cfg_path, "r", encoding="utf-8") as f:
+    cfg = yaml.safe_load(f)
+
+_monitor_cfg = cfg.get("position_monitor", {}) or {}
+INTERVAL_MS = float(_monitor_cfg.get("interval_ms", 200))
+
+poll_hist     = REGISTRY.histogram("monitor_poll", "symbol_info_tick latency of the position monitor")
+decision_hist = REGISTRY.histogram("monitor_decision", "intrabar level check latency")
+ticks_counter = REGISTRY.counter("monitor_ticks", "new ticks evaluated by the position monitor")
+exits_counter = REGISTRY.counter("monitor_exits", "intrabar SL/breakeven/TP events fired by the monitor")
+
+
+def mt5_tick(symbol: str):
+    """
+    tick ล่าสุดของ symbol (มี bid, ask, time_msc) — import MetaTrader5 ตอนเรียกเท่านั้น
+    ได้ None (เช่น session หลุด) → ตรวจ/initialize session แล้วลองอีกครั้ง (เชื่อมต่อไม่ได้ → RuntimeError)
+    """
+    import MetaTrader5 as mt5
+    tick = mt5.symbol_info_tick(symbol)
+    if tick is None:
+        from src.tick_stream import mt5_session
+        tick = mt5_session().symbol_info_tick(symbol)
+    return tick
+
+
+class PositionMonitor(threading.Thread):
+    """
+    Thread ที่ poll tick ทุก interval_ms แล้วตรวจ SL / breakeven / TP1–TP3 ของตำแหน่งที่เปิดอยู่ทันที
+    (PositionManager.check_tick) แยกจากรอบตัดสินใจรายแท่งของ live loop
+      - ไม่มีตำแหน่ง → ไม่เรียก symbol_info_tick (แค่รอรอบถัดไป)
+      - tick เดิม (time_msc/bid/ask ไม่เปลี่ยน) → ไม่ตรวจซ้ำ
+      - latency ของการ poll และการตรวจ level บันทึกใน histogram monitor_poll / monitor_decision
+    """
+
+    def __init__(self, positions: PositionManager, interval_ms: float = INTERVAL_MS,
+                 tick_fn: Optional[Callable[[str], object]] = None):
+        super().__init__(name="position-monitor", daemon=True)
+        self.positions = positions
+        self.interval_s = interval_ms / 1000.0
+        self.tick_fn = tick_fn or mt5_tick
+        self._stop_event = threading.Event()
+        self._last_key = None
+
+    def check_once(self) -> int:
+        """
+        poll 1 ครั้ง → คืนจำนวน event ที่ยิง (0 ถ้าไม่มีตำแหน่ง/ไม่มี tick ใหม่)
+        """
+        if not self.positions.positions:
+            return 0
+        t0 = time.perf_counter_ns()
+        tick = self.tick_fn(self.positions.symbol)
+        t1 = time.perf_counter_ns()
+        poll_hist.record(t1 - t0)
+        if tick is None:
+            return 0
+        key = (tick.time_msc, tick.bid, tick.ask)
+        if key == self._last_key:
+            return 0
+        self._last_key = key
+        ticks_counter.inc()
+        fired = self.positions.check_tick(tick.bid, tick.ask)
+        decision_hist.record(time.perf_counter_ns() - t1)
+        if fired:
+            exits_counter.inc(fired)
+        return fired
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.check_once()
+            except Exception as e:
+                self.positions.log(f"Position monitor error: {e}")
+            self._stop_event.wait(self.interval_s)
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stop_event.set()
+        if self.is_alive():
+            self.join(timeout)
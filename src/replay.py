@@ -0,0 +1,133 @@
+import argparse
+import time
+import pandas as pd
+import yaml
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+from src.decision_engine import DecisionEngine
+from src.ict_signal import add_ict_columns
+from src.instrumentation import MetricsRegistry, span
+from src.position_manager import PositionManager, SimBroker
+from src.schema import read_feature_csv
+
+# โหลด config
+_cfg_path = Path(__file__).resolve().parents[1] / "config" / "config.yaml"
+with open(_cfg_path, "r", encoding="utf-8") as f:
+    cfg = yaml.safe_load(f)
+
+SYMBOL = cfg["symbol"]
+
+
+def prepare_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    เรียงตามเวลา และเติมคอลัมน์ ICT (last_swing_*, fvg_*, mss_*, ...) ถ้า features ยังไม่มี
+    """
+    df = df.sort_values("time").reset_index(drop=True)
+    return add_ict_columns(df)
+
+
+class ReplayHarness:
+    """
+    ป้อนแท่งย้อนหลังทีละแท่งเข้า DecisionEngine + PositionManager ตัวเดียวกับ live loop (run_phase3)
+    โดยใช้ SimBroker แทน MT5 และไม่มี cooldown → วัด throughput (bars/s) และ latency ต่อ stage ได้
+
+    ฟีเจอร์ทุกคอลัมน์ของแถว i ขึ้นกับแถว ≤ i เท่านั้น: indicator เป็น recursive/rolling, HTF ใช้แท่งที่ปิดแล้ว
+    และคอลัมน์ ICT นับ swing ตั้งแต่แถวที่ยืนยัน (ict_feature_arrays) จึงคำนวณล่วงหน้าครั้งเดียว
+    แล้วเรียก engine.predict(df, i) ได้ผลเท่ากับ live ที่คำนวณจากแท่งถึง i แล้วอ่านแถวสุดท้าย
+    (ไฟล์ features ที่สร้างด้วยโค้ดก่อนแก้ swing ต้องคำนวณใหม่ — stage cache ทำให้เองเพราะ code version เปลี่ยน)
+    """
+
+    def __init__(self, df_feat: pd.DataFrame, engine, broker: Optional[SimBroker] = None,
+                 symbol: str = SYMBOL, lot: float = 0.01, on_close=None, verbose: bool = False):
+        self.df = prepare_frame(df_feat)
+        self.engine = engine
+        self.broker = broker or SimBroker()
+        self.registry = MetricsRegistry(prefix="replay")
+        self.positions = PositionManager(self.broker, symbol, lot=lot, on_close=on_close,
+                                         log=None if not verbose else print)
+        self.n_signals = 0
+        self.n_orders = 0
+        self.n_errors = 0
+
+    def run(self, start: int = 0, end: Optional[int] = None) -> Dict[str, Any]:
+        """
+        replay แท่ง [start, end) แล้วคืนรายงาน: bars, seconds, bars_per_s, latency ต่อ stage,
+        จำนวน signal/order และ trade log จาก SimBroker
+        """
+        df = self.df
+        end = len(df) if end is None else min(end, len(df))
+        times = df["time"].to_numpy()
+        closes = df["close"].to_numpy()
+        reg, broker, positions, engine = self.registry, self.broker, self.positions, self.engine
+
+        t0 = time.perf_counter()
+        for i in range(start, end):
+            with span("bar", reg):
+                broker.set_bar(times[i], closes[i])
+                try:
+                    with span("predict", reg):
+                        sig = engine.predict(df, i)
+                except Exception:
+                    self.n_errors += 1
+                    continue
+
+                last_row = None
+                if sig.get("source") == "ICT" and sig.get("side") in ("Buy", "Sell"):
+                    self.n_signals += 1
+                    last_row = df.iloc[i]
+                    with span("open_order", reg):
+                        if positions.on_signal(sig, last_row):
+                            self.n_orders += 1
+
+                if len(positions):
+                    with span("manage_positions", reg):
+                        positions.manage(last_row if last_row is not None else df.iloc[i])
+        seconds = time.perf_counter() - t0
+
+        bars = max(0, end - start)
+        trades = pd.DataFrame(broker.trades,
+                              columns=["entry_time", "exit_time", "side", "entry_price",
+                                       "exit_price", "lot", "pnl"])
+        return {
+            "bars": bars,
+            "seconds": seconds,
+            "bars_per_s": bars / seconds if seconds > 0 else float("inf"),
+            "latency": {name: h.summary() for name, h in reg.histograms.items()},
+            "n_signals": self.n_signals,
+            "n_orders": self.n_orders,
+            "n_errors": self.n_errors,
+            "n_trades": len(trades),
+            "total_pnl": float(trades["pnl"].sum()) if len(trades) else 0.0,
+            "trades": trades,
+        }
+
+
+def print_report(report: Dict[str, Any]):
+    print("\n===== Replay =====")
+    print(f"Bars           : {report['bars']:,}")
+    print(f"Elapsed        : {report['seconds']:.2f} s ({report['bars_per_s']:,.0f} bars/s)")
+    print(f"Signals/Orders : {report['n_signals']} / {report['n_orders']} (errors {report['n_errors']})")
+    print(f"Trades / PnL   : {report['n_trades']} / {report['total_pnl']:.5f}")
+    print(f"{'stage':<18}{'count':>9}{'mean_us':>10}{'p50_us':>10}{'p99_us':>10}{'max_us':>10}")
+    for name, s in report["latency"].items():
+        print(f"{name:<18}{s['count']:>9}{s['mean_us']:>10.1f}{s['p50_us']:>10.1f}"
+              f"{s['p99_us']:>10.1f}{s['max_us']:>10.1f}")
+    print("==================\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay historical bars through the live-loop components")
+    parser.add_argument("--features", default=cfg["features_data_path"])
+    parser.add_argument("--start", type=int, default=0)
+    parser.add_argument("--end", type=int, default=None)
+    parser.add_argument("--trade-log", default=None, help="write the SimBroker trade log to this CSV")
+    args = parser.parse_args()
+
+    harness = ReplayHarness(read_feature_csv(args.features), DecisionEngine())
+    report = harness.run(args.start, args.end)
+    print_report(report)
+    if args.trade_log:
+        Path(args.trade_log).parent.mkdir(parents=True, exist_ok=True)
+        report["trades"].to_csv(args.trade_log, index=False)
+        print(f"Trade log saved to {args.trade_log}")
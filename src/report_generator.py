@@ -0,0 +1,357 @@
+import argparse
+import html
+import time
+import numpy as np
+import pandas as pd
+import yaml
+from pathlib import Path
+from typing import Dict, Any, Optional, List
+
+# โหลด config
+_cfg_path = Path(__file__).resolve().parents[1] / "config" / "config.yaml"
+with open(_cfg_path, "r", encoding="utf-8") as f:
+    cfg = yaml.safe_load(f)
+
+_rep_cfg = cfg.get("report", {}) or {}
+BUCKET = _rep_cfg.get("bucket", "1D")
+ROLLING_WINDOW = int(_rep_cfg.get("rolling_window", 100))
+OUTPUT_PATH = _rep_cfg.get("output_path", "reports/performance_report.html")
+CHART_POINTS = int(_rep_cfg.get("chart_points", 2000))
+# ช่วงชั่วโมง [start, end) ของแต่ละ session ตามเวลาใน trade log (เวลา broker)
+SESSIONS = _rep_cfg.get("sessions") or {
+    "asia": [0, 7], "london": [7, 13], "new_york": [13, 22], "off_hours": [22, 24],
+}
+
+# ชื่อคอลัมน์อื่นที่ trade log อาจใช้ → ชื่อมาตรฐาน
+_ALIASES = {
+    "profit": "pnl", "pl": "pnl",
+    "time": "exit_time", "close_time": "exit_time",
+    "open_time": "entry_time",
+    "type": "side", "direction": "side",
+}
+_TIME_COLS = ("entry_time", "exit_time")
+
+
+def load_trade_log(path: str) -> pd.DataFrame:
+    """
+    อ่าน trade log (backtest_trade_log.csv หรือ real_trade_log.csv) ให้อยู่ในรูปเดียวกัน:
+      exit_time (datetime), entry_time, side (categorical), pnl (float64), mae/mfe/bars_held ถ้ามี
+    เรียงตาม exit_time (เวลาที่กำไร/ขาดทุนเกิดขึ้นจริงใน equity)
+    """
+    df = pd.read_csv(path)
+    df = df.rename(columns={c: _ALIASES[c.lower()] for c in df.columns
+                            if c.lower() in _ALIASES and _ALIASES[c.lower()] not in df.columns})
+    if "pnl" not in df.columns:
+        raise ValueError(f"trade log {path} ไม่มีคอลัมน์ pnl")
+    for col in _TIME_COLS:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], format="ISO8601")
+    if "exit_time" not in df.columns:
+        if "entry_time" not in df.columns:
+            raise ValueError(f"trade log {path} ไม่มีคอลัมน์เวลา (exit_time/entry_time)")
+        df["exit_time"] = df["entry_time"]
+    if "entry_time" not in df.columns:
+        df["entry_time"] = df["exit_time"]
+    side = df["side"].astype(str).str.capitalize() if "side" in df.columns else "Unknown"
+    df["side"] = pd.Categorical(side)
+    df["pnl"] = df["pnl"].astype(np.float64)
+    return df.sort_values("exit_time", kind="stable").reset_index(drop=True)
+
+
+def _longest_run(mask: np.ndarray) -> int:
+    """
+    ความยาวของช่วง True ต่อเนื่องที่ยาวที่สุด (vectorized)
+    """
+    if not mask.any():
+        return 0
+    padded = np.concatenate([[False], mask, [False]]).astype(np.int8)
+    edges = np.flatnonzero(np.diff(padded))
+    return int((edges[1::2] - edges[::2]).max())
+
+
+def _periods_per_year(bucket: str) -> float:
+    # ตลาดเปิด ~252 วันต่อปี
+    return 252.0 * (pd.Timedelta("1D") / pd.Timedelta(bucket))
+
+
+def bucket_pnl(trades: pd.DataFrame, bucket: str = BUCKET) -> pd.Series:
+    """
+    กำไร/ขาดทุนรวมต่อช่วงเวลา (equity curve แบบ time-bucketed) ช่วงที่ไม่มีเทรดเป็น 0
+    ถ้า bucket ≥ 1 วัน ตัดเสาร์–อาทิตย์ (ตลาดปิด) ออก
+    """
+    if trades.empty:
+        return pd.Series(dtype=np.float64)
+    pnl = pd.Series(trades["pnl"].to_numpy(), index=pd.DatetimeIndex(trades["exit_time"]))
+    per_bucket = pnl.resample(bucket).sum()
+    if pd.Timedelta(bucket) >= pd.Timedelta("1D"):
+        per_bucket = per_bucket[per_bucket.index.dayofweek < 5]
+    return per_bucket
+
+
+def compute_metrics(trades: pd.DataFrame, bucket: str = BUCKET,
+                    periods_per_year: Optional[float] = None) -> Dict[str, Any]:
+    """
+    metrics ทั้งหมดของ trade log (vectorized ทั้งหมด ไม่มี loop ต่อเทรด):
+      - win rate, profit factor, expectancy, avg win/loss, payoff ratio, max consecutive wins/losses
+      - max drawdown (ราคา) และระยะเวลา drawdown สูงสุด (เวลาและจำนวนเทรดจาก peak ถึงกลับมาทำ high ใหม่)
+      - Sharpe / Sortino จาก pnl ต่อ bucket (annualized ด้วย periods_per_year)
+      - MAE / MFE เฉลี่ย และ edge ratio (MFE/MAE) ถ้ามีคอลัมน์
+    """
+    n = len(trades)
+    if n == 0:
+        return {"n_trades": 0}
+    pnl = trades["pnl"].to_numpy(dtype=np.float64)
+    times = trades["exit_time"].to_numpy(dtype="datetime64[ns]")
+    wins, losses = pnl > 0, pnl < 0
+    gross_win, gross_loss = pnl[wins].sum(), -pnl[losses].sum()
+
+    # equity / drawdown (เริ่มจาก 0 ก่อนเทรดแรก)
+    equity = np.cumsum(pnl)
+    peak = np.maximum.accumulate(np.maximum(equity, 0.0))
+    drawdown = equity - peak
+    # index ของ peak ล่าสุด ณ แต่ละเทรด (−1 = จุดเริ่มต้นก่อนเทรดแรก)
+    at_peak = equity >= peak
+    last_peak = np.maximum.accumulate(np.where(at_peak, np.arange(n), -1))
+    peak_time = np.where(last_peak >= 0, times[np.maximum(last_peak, 0)], times[0])
+    dd_duration = (times - peak_time).max()
+    dd_trades = int((np.arange(n) - last_peak).max())
+
+    per_bucket = bucket_pnl(trades, bucket).to_numpy()
+    ppy = periods_per_year or _periods_per_year(bucket)
+    mean, std = per_bucket.mean(), per_bucket.std(ddof=1) if len(per_bucket) > 1 else np.nan
+    downside = np.sqrt(np.mean(np.minimum(per_bucket, 0.0) ** 2))
+    max_dd = float(drawdown.min())
+
+    metrics = {
+        "n_trades": n,
+        "total_pnl": float(equity[-1]),
+        "win_rate": float(wins.mean()),
+        "profit_factor": float(gross_win / gross_loss) if gross_loss > 0 else np.inf,
+        "expectancy": float(pnl.mean()),
+        "avg_win": float(pnl[wins].mean()) if wins.any() else 0.0,
+        "avg_loss": float(pnl[losses].mean()) if losses.any() else 0.0,
+        "payoff_ratio": float(pnl[wins].mean() / -pnl[losses].mean()) if wins.any() and losses.any() else np.nan,
+        "max_consecutive_wins": _longest_run(wins),
+        "max_consecutive_losses": _longest_run(losses),
+        "max_drawdown": max_dd,
+        "max_drawdown_duration": pd.Timedelta(dd_duration),
+        "max_drawdown_trades": dd_trades,
+        "sharpe": float(mean / std * np.sqrt(ppy)) if std and std > 0 else np.nan,
+        "sortino": float(mean / downside * np.sqrt(ppy)) if downside > 0 else np.nan,
+        "recovery_factor": float(equity[-1] / -max_dd) if max_dd < 0 else np.inf,
+        "bucket": bucket,
+        "start": pd.Timestamp(times[0]),
+        "end": pd.Timestamp(times[-1]),
+    }
+    if "mae" in trades.columns and "mfe" in trades.columns:
+        mae = trades["mae"].to_numpy(dtype=np.float64)
+        mfe = trades["mfe"].to_numpy(dtype=np.float64)
+        metrics["avg_mae"] = float(np.nanmean(mae))
+        metrics["avg_mfe"] = float(np.nanmean(mfe))
+        metrics["edge_ratio"] = float(np.nanmean(mfe) / np.nanmean(mae)) if np.nanmean(mae) > 0 else np.nan
+    if "bars_held" in trades.columns:
+        metrics["avg_bars_held"] = float(trades["bars_held"].mean())
+    return metrics
+
+
+def session_of(times: pd.Series, sessions: Dict[str, List[int]] = SESSIONS) -> pd.Categorical:
+    """
+    ชื่อ session ของแต่ละเวลา จากชั่วโมง (vectorized ด้วย lookup table 24 ช่อง)
+    """
+    names = list(sessions)
+    lookup = np.full(24, len(names), dtype=np.int8)
+    for code, (start, end) in enumerate(sessions.values()):
+        lookup[start:end] = code
+    codes = lookup[pd.DatetimeIndex(times).hour]
+    categories = names + (["other"] if (codes == len(names)).any() else [])
+    return pd.Categorical.from_codes(codes, categories=categories)
+
+
+def breakdown(trades: pd.DataFrame, by) -> pd.DataFrame:
+    """
+    สรุปต่อกลุ่ม (groupby เดียว): จำนวนเทรด, win rate, pnl รวม, expectancy, profit factor, MAE/MFE เฉลี่ย
+    by: ชื่อคอลัมน์ หรือ array ที่ยาวเท่า trades
+    """
+    pnl = trades["pnl"]
+    frame = pd.DataFrame({
+        "pnl": pnl,
+        "win": (pnl > 0).astype(np.float64),
+        "gross_win": pnl.clip(lower=0),
+        "gross_loss": (-pnl).clip(lower=0),
+    })
+    for col in ("mae", "mfe"):
+        if col in trades.columns:
+            frame[col] = trades[col]
+    key = trades[by] if isinstance(by, str) else pd.Series(by, index=trades.index)
+    g = frame.groupby(key, observed=True)
+    out = pd.DataFrame({
+        "trades": g["pnl"].size(),
+        "win_rate": g["win"].mean(),
+        "total_pnl": g["pnl"].sum(),
+        "expectancy": g["pnl"].mean(),
+    })
+    gl = g["gross_loss"].sum()
+    out["profit_factor"] = (g["gross_win"].sum() / gl.where(gl > 0)).fillna(np.inf)
+    for col in ("mae", "mfe"):
+        if col in frame.columns:
+            out[f"avg_{col}"] = g[col].mean()
+    return out
+
+
+def rolling_metrics(trades: pd.DataFrame, window: int = ROLLING_WINDOW) -> pd.DataFrame:
+    """
+    win rate / expectancy / profit factor ของ window เทรดล่าสุด ณ แต่ละเทรด
+    คำนวณจากผลต่าง cumulative sum → O(n) ไม่ขึ้นกับขนาด window
+    """
+    pnl = trades["pnl"].to_numpy(dtype=np.float64)
+    n = len(pnl)
+
+    def _rolling_sum(x):
+        c = np.concatenate([[0.0], np.cumsum(x)])
+        lo = np.maximum(np.arange(1, n + 1) - window, 0)
+        return c[1:] - c[lo]
+
+    count = np.minimum(np.arange(1, n + 1), window).astype(np.float64)
+    gross_win = _rolling_sum(np.maximum(pnl, 0.0))
+    gross_loss = _rolling_sum(np.maximum(-pnl, 0.0))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pf = np.where(gross_loss > 0, gross_win / gross_loss, np.inf)
+    out = pd.DataFrame({
+        "exit_time": trades["exit_time"].to_numpy(),
+        "win_rate": _rolling_sum((pnl > 0).astype(np.float64)) / count,
+        "expectancy": _rolling_sum(pnl) / count,
+        "profit_factor": pf,
+    })
+    # ช่วงแรกที่ยังไม่ครบ window ไม่นับ
+    return out.iloc[window - 1:].reset_index(drop=True) if n >= window else out.iloc[0:0]
+
+
+# ─── HTML ────────────────────────────────────────────────────────────────────────
+def _decimate(y: np.ndarray, max_points: int) -> np.ndarray:
+    """
+    ลดจำนวนจุดของกราฟ: แบ่งเป็นช่วงแล้วเก็บจุด min/max ของแต่ละช่วง (รักษา spike/drawdown)
+    คืน index ของจุดที่เก็บ
+    """
+    n = len(y)
+    if n <= max_points:
+        return np.arange(n)
+    n_bins = max(max_points // 2, 1)
+    edges = np.linspace(0, n, n_bins + 1).astype(np.int64)
+    starts = edges[:-1]
+    imin = np.minimum.reduceat(y, starts)
+    imax = np.maximum.reduceat(y, starts)
+    # หา index ของ min/max ในแต่ละช่วงด้วย mask (vectorized)
+    bin_of = np.repeat(np.arange(n_bins), np.diff(edges))
+    is_min = y == imin[bin_of]
+    is_max = y == imax[bin_of]
+    first_min = np.unique(bin_of[is_min], return_index=True)[1]
+    first_max = np.unique(bin_of[is_max], return_index=True)[1]
+    idx = np.concatenate([np.flatnonzero(is_min)[first_min], np.flatnonzero(is_max)[first_max], [0, n - 1]])
+    return np.unique(idx)
+
+
+def _svg_line(y: np.ndarray, width: int = 900, height: int = 220, color: str = "#1f77b4",
+              fill: bool = False) -> str:
+    if len(y) == 0:
+        return "<p>ไม่มีข้อมูล</p>"
+    idx = _decimate(y, CHART_POINTS)
+    ys = y[idx]
+    lo, hi = float(np.min(ys)), float(np.max(ys))
+    span = hi - lo or 1.0
+    px = idx / max(len(y) - 1, 1) * width
+    py = height - (ys - lo) / span * height
+    pts = " ".join(f"{a:.1f},{b:.1f}" for a, b in zip(px, py))
+    zero = height - (0 - lo) / span * height
+    area = (f'<polygon points="0,{zero:.1f} {pts} {width},{zero:.1f}" fill="{color}" opacity="0.3"/>'
+            if fill else "")
+    return (f'<svg viewBox="0 0 {width} {height}" width="100%" height="{height}" '
+            f'preserveAspectRatio="none">{area}'
+            f'<polyline points="{pts}" fill="none" stroke="{color}" stroke-width="1"/></svg>'
+            f'<div class="axis">min {lo:.2f} · max {hi:.2f}</div>')
+
+
+def _fmt(v) -> str:
+    if isinstance(v, (float, np.floating)):
+        return f"{v:.4f}" if np.isfinite(v) else str(v)
+    return html.escape(str(v))
+
+
+def _table(df: pd.DataFrame) -> str:
+    head = "".join(f"<th>{html.escape(str(c))}</th>" for c in [df.index.name or ""] + list(df.columns))
+    rows = "".join(
+        "<tr>" + f"<td>{html.escape(str(i))}</td>" + "".join(f"<td>{_fmt(v)}</td>" for v in r) + "</tr>"
+        for i, r in zip(df.index, df.itertuples(index=False))
+    )
+    return f"<table><tr>{head}</tr>{rows}</table>"
+
+
+def render_html(title: str, metrics: Dict[str, Any], equity: np.ndarray, drawdown: np.ndarray,
+                by_session: pd.DataFrame, by_side: pd.DataFrame, rolling: pd.DataFrame,
+                by_month: pd.DataFrame) -> str:
+    """
+    สร้างหน้า HTML เดี่ยว (ไม่มีไฟล์/JS ภายนอก): ตาราง metrics + กราฟ SVG ของ equity/drawdown/rolling
+    """
+    summary = pd.DataFrame({"value": [_fmt(v) for v in metrics.values()]},
+                           index=pd.Index(list(metrics.keys()), name="metric"))
+    roll_expectancy = rolling["expectancy"].to_numpy() if len(rolling) else np.array([])
+    roll_win = rolling["win_rate"].to_numpy() if len(rolling) else np.array([])
+    return f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{html.escape(title)}</title>
+<style>
+body {{ font-family: sans-serif; margin: 24px; color: #222; }}
+table {{ border-collapse: collapse; margin-bottom: 16px; }}
+td, th {{ border: 1px solid #ccc; padding: 3px 8px; text-align: right; }}
+th {{ background: #f0f0f0; }}
+.axis {{ font-size: 11px; color: #666; }}
+</style></head><body>
+<h1>{html.escape(title)}</h1>
+<h2>Summary</h2>{_table(summary)}
+<h2>Equity curve</h2>{_svg_line(equity)}
+<h2>Drawdown</h2>{_svg_line(drawdown, color="#d62728", fill=True)}
+<h2>Rolling expectancy ({ROLLING_WINDOW} trades)</h2>{_svg_line(roll_expectancy, color="#2ca02c")}
+<h2>Rolling win rate ({ROLLING_WINDOW} trades)</h2>{_svg_line(roll_win, color="#9467bd")}
+<h2>By session</h2>{_table(by_session)}
+<h2>By side</h2>{_table(by_side)}
+<h2>By month</h2>{_table(by_month)}
+</body></html>
+"""
+
+
+def generate_report(trade_log_path: str, output_path: str = OUTPUT_PATH,
+                    bucket: str = BUCKET, window: int = ROLLING_WINDOW,
+                    title: Optional[str] = None) -> Dict[str, Any]:
+    """
+    trade log (backtest หรือ live) → metrics + breakdown ต่อ session/side/เดือน + rolling → HTML
+    คืน dict ของ metrics
+    """
+    trades = load_trade_log(trade_log_path)
+    metrics = compute_metrics(trades, bucket=bucket)
+    equity = trades["pnl"].cumsum().to_numpy()
+    drawdown = equity - np.maximum.accumulate(np.maximum(equity, 0.0)) if len(equity) else equity
+    sessions = session_of(trades["entry_time"])
+    by_session = breakdown(trades, sessions).rename_axis("session")
+    by_side = breakdown(trades, "side").rename_axis("side")
+    by_month = breakdown(trades, trades["exit_time"].to_numpy().astype("datetime64[M]"))
+    by_month.index = pd.Index(by_month.index.strftime("%Y-%m"), name="month")
+    rolling = rolling_metrics(trades, window)
+
+    page = render_html(title or f"Performance report – {Path(trade_log_path).name}", metrics,
+                       equity, drawdown, by_session, by_side, rolling, by_month)
+    Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+    Path(output_path).write_text(page, encoding="utf-8")
+    print(f"Report saved to {output_path}")
+    return metrics
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate an HTML performance report from a trade log")
+    parser.add_argument("--trade-log", default=cfg.get("trade_log_path", "data/real_trade_log.csv"),
+                        help="backtest_trade_log.csv or real_trade_log.csv")
+    parser.add_argument("--output", default=OUTPUT_PATH)
+    parser.add_argument("--bucket", default=BUCKET, help="equity bucket for Sharpe/Sortino, e.g. 1D, 1h")
+    parser.add_argument("--window", type=int, default=ROLLING_WINDOW)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    generate_report(args.trade_log, args.output, args.bucket, args.window)
+    print(f"Done in {time.perf_counter() - t0:.2f}s")
@@ -0,0 +1,124 @@
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from typing import Dict, Any, Optional, List, Union
+
+# ─── Dtype policy ของ feature frame ─────────────────────────────────────────────
+# - time: datetime64[ns] (เก็บเป็น int64 epoch-ns อยู่แล้ว)
+# - ราคา/indicator ทั้งหมด: float32 (XAUUSD ละเอียดถึง 0.01 → float32 แม่นยำ ~1e-4 ที่ราคา 2000)
+# - flag (MSS/FVG/swing/fib zone/pullback): bool (1 byte)
+# - tick_volume: int32 / ผล triple barrier: tb_outcome int8, tb_bars int32
+# - label: categorical ["NoTrade","Buy","Sell"] → code 0/1/2 ตรงกับ class ของ XGBoost
+# - label matrix (label_h<H>_k<k> จาก build_label_matrix): รหัส 0/1/2 เดียวกันเป็น int8
+TIME_COL = "time"
+LABEL_COL = "label"
+LABEL_MATRIX_PREFIX = "label_h"
+LABELS = ["NoTrade", "Buy", "Sell"]
+LABEL_DTYPE = pd.CategoricalDtype(LABELS)
+FLOAT_DTYPE = np.float32
+INT_COLS = {"tick_volume": np.int32, "tb_outcome": np.int8, "tb_bars": np.int32}
+FLAG_COLS = (
+    "mss_bullish", "mss_bearish", "fvg_bullish", "fvg_bearish",
+    "bullish_mss", "bearish_mss", "bullish_fvg", "bearish_fvg",
+    "is_swing_high", "is_swing_low", "fvg_in_fib_zone", "ict_pullback", "fib_in_zone",
+)
+
+
+def is_flag(col: str) -> bool:
+    return col in FLAG_COLS
+
+
+def is_label_code(col: str) -> bool:
+    return col.startswith(LABEL_MATRIX_PREFIX)
+
+
+def label_codes(labels: pd.Series) -> pd.Series:
+    """
+    แปลงคอลัมน์ label (string หรือ categorical) เป็นรหัส int8: NoTrade→0, Buy→1, Sell→2
+    (ค่าที่ไม่รู้จักได้ −1)
+    """
+    if not isinstance(labels.dtype, pd.CategoricalDtype) or list(labels.cat.categories) != LABELS:
+        labels = labels.astype(LABEL_DTYPE)
+    return labels.cat.codes.astype(np.int8)
+
+
+def to_labels(values: Union[List[str], np.ndarray, pd.Series]) -> pd.Categorical:
+    """
+    สร้างคอลัมน์ label แบบ categorical จาก list ของ "Buy"/"Sell"/"NoTrade"
+    """
+    return pd.Categorical(values, categories=LABELS)
+
+
+def apply_schema(df: pd.DataFrame, inplace: bool = False) -> pd.DataFrame:
+    """
+    แปลง dtype ของ feature frame ตาม policy ข้างบน
+    คอลัมน์อื่นที่ไม่ใช่ตัวเลข (เช่น side ใน trade log) คงไว้ตามเดิม
+    """
+    if not inplace:
+        df = df.copy()
+    for col in df.columns:
+        s = df[col]
+        if col == TIME_COL:
+            if not pd.api.types.is_datetime64_any_dtype(s):
+                df[col] = pd.to_datetime(s, format="ISO8601")
+        elif col == LABEL_COL:
+            if not isinstance(s.dtype, pd.CategoricalDtype) or list(s.cat.categories) != LABELS:
+                df[col] = s.astype(LABEL_DTYPE)
+        elif is_flag(col):
+            if s.dtype != bool:
+                df[col] = s.fillna(False).astype(bool)
+        elif is_label_code(col):
+            df[col] = s.astype(np.int8)
+        elif col in INT_COLS:
+            if s.notna().all():
+                df[col] = s.astype(INT_COLS[col])
+        elif pd.api.types.is_float_dtype(s) or pd.api.types.is_integer_dtype(s):
+            df[col] = s.astype(FLOAT_DTYPE)
+    return df
+
+
+def csv_dtypes(columns: List[str]) -> Dict[str, Any]:
+    """
+    dtype map สำหรับ pd.read_csv ตาม policy (ไม่รวม time ซึ่ง parse แยก)
+    """
+    dtypes: Dict[str, Any] = {}
+    for col in columns:
+        if col == TIME_COL:
+            continue
+        if col == LABEL_COL:
+            dtypes[col] = LABEL_DTYPE
+        elif is_flag(col):
+            dtypes[col] = bool
+        elif is_label_code(col):
+            dtypes[col] = np.int8
+        elif col in INT_COLS:
+            dtypes[col] = INT_COLS[col]
+        else:
+            dtypes[col] = FLOAT_DTYPE
+    return dtypes
+
+
+def read_feature_csv(path: Union[str, Path], usecols: Optional[List[str]] = None,
+                     **kwargs) -> pd.DataFrame:
+    """
+    อ่าน CSV ของ features/labels โดย parse ตรงเป็น dtype ที่กระชับ
+    (ไม่ต้องสร้าง float64/object ชั่วคราวทั้งก้อนก่อนแปลง)
+    ถ้าไฟล์มีคอลัมน์ที่ไม่ตรง policy (เช่น flag ว่าง) จะอ่านแบบปกติแล้ว apply_schema แทน
+    """
+    columns = list(pd.read_csv(path, nrows=0).columns)
+    if usecols is not None:
+        columns = [c for c in columns if c in set(usecols)]
+    parse_dates = [TIME_COL] if TIME_COL in columns else False
+    try:
+        return pd.read_csv(path, usecols=usecols, dtype=csv_dtypes(columns),
+                           parse_dates=parse_dates, **kwargs)
+    except (ValueError, TypeError):
+        df = pd.read_csv(path, usecols=usecols, parse_dates=parse_dates, **kwargs)
+        return apply_schema(df, inplace=True)
+
+
+def frame_memory_mb(df: pd.DataFrame) -> float:
+    """
+    หน่วยความจำของ DataFrame (รวม object/string จริง) หน่วย MB
+    """
+    return df.memory_usage(deep=True).sum() / 1e6
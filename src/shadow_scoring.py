@@ -0,0 +1,208 @@
+"""
+Shadow scoring: ให้โมเดลที่เทรนใหม่ (candidate) ทำนายบนแท่ง live คู่กับโมเดล production โดยไม่ส่งออร์เดอร์
+
+  live loop ──ShadowScorer.publish(แถว features + การตัดสินใจของ production)──▶ ShmQueue (shared memory)
+                                                                                    │
+  side process (python -m src.shadow_scoring) ◀───────────── อ่านเป็น batch ─────────┘
+      → score ทุก candidate → ต่อท้าย log CSV: production กับ candidate แต่ละตัวในแถวเดียวกัน
+
+- publish ไม่รอ side process เลย: queue เต็ม → ทิ้งแถวนั้นและนับ shadow_dropped
+- shadow_queue_lag = แถวที่ publish แล้วแต่ยังไม่ถูก score (ดูว่า scorer ตามไม่ทันหรือไม่)
+- candidate ระบุเป็นพาธไฟล์โมเดล (ใช้ FEATURE_COLS) หรือเลขเวอร์ชันใน model registry (ใช้ features ของเวอร์ชัน)
+"""
+
+import argparse
+import csv
+import json
+import math
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+import yaml
+
+from src.instrumentation import REGISTRY
+from src.shm_queue import ShmQueue
+
+# โหลด config
+_cfg_path = Path(__file__).resolve().parents[1] / "config" / "config.yaml"
+with open(_cfg_path, "r", encoding="utf-8") as f:
+    cfg = yaml.safe_load(f)
+
+_shadow_cfg = cfg.get("shadow_scoring", {}) or {}
+CANDIDATES = list(_shadow_cfg.get("models", []) or [])
+CAPACITY = int(_shadow_cfg.get("capacity", 4096))
+LOG_PATH = _shadow_cfg.get("log_path", "logs/shadow_scores.csv")
+POLL_MS = float(_shadow_cfg.get("poll_interval_ms", 50))
+BATCH_ROWS = 256
+
+# คอลัมน์นำหน้าของทุกแถวใน queue (ตามด้วย features ที่ candidate ใช้)
+META_COLS = ["time", "published", "production_code", "production_conf"]
+SIDE_CODES = {"NoTrade": 0, "Buy": 1, "Sell": 2}
+CODE_TO_LABEL = {v: k for k, v in SIDE_CODES.items()}
+LOG_COLUMNS = ["time", "scored_at", "lag_rows", "lag_ms", "production", "production_conf",
+               "model", "side", "confidence"]
+
+publish_hist = REGISTRY.histogram("shadow_publish", "time to publish one feature row to the shadow queue")
+lag_gauge = REGISTRY.gauge("shadow_queue_lag", "feature rows published but not yet scored by shadow models")
+dropped_counter = REGISTRY.counter("shadow_dropped", "feature rows dropped because the shadow queue was full")
+
+
+def resolve_candidates(specs: Sequence, registry_root: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    spec → {"name", "path", "features"}: int = เวอร์ชันใน model registry, str = พาธไฟล์โมเดล XGBoost
+    """
+    from src.decision_engine import FEATURE_COLS
+    out = []
+    for spec in specs:
+        if isinstance(spec, int):
+            from src.model_registry import ModelRegistry, REGISTRY_ROOT
+            registry = ModelRegistry(registry_root or REGISTRY_ROOT)
+            entry = registry.get(spec)
+            out.append({"name": f"v{spec}", "path": str(registry.model_file(entry)),
+                        "features": list(entry["features"])})
+        else:
+            out.append({"name": Path(spec).stem, "path": str(spec), "features": list(FEATURE_COLS)})
+    return out
+
+
+def queue_columns(candidates: Sequence[Dict[str, Any]]) -> List[str]:
+    columns = list(META_COLS)
+    for c in candidates:
+        columns += [f for f in c["features"] if f not in columns]
+    return columns
+
+
+class ShadowScorer:
+    """
+    ฝั่ง live loop: สร้าง queue, เปิด side process และ publish แถวละแท่ง
+    """
+
+    def __init__(self, candidates: Optional[Sequence] = None, capacity: int = CAPACITY,
+                 log_path: str = LOG_PATH, poll_ms: float = POLL_MS, registry_root: Optional[str] = None):
+        self.candidates = resolve_candidates(CANDIDATES if candidates is None else candidates, registry_root)
+        if not self.candidates:
+            raise ValueError("shadow scoring needs at least one candidate model")
+        self.columns = queue_columns(self.candidates)
+        self._features = self.columns[len(META_COLS):]
+        self.log_path = str(log_path)
+        self.poll_ms = poll_ms
+        self.queue = ShmQueue.create(capacity, len(self.columns))
+        self._row = np.empty(len(self.columns), dtype=np.float64)  # ใช้ buffer เดิมทุกแถว
+        self.process: Optional[subprocess.Popen] = None
+
+    def start(self):
+        """
+        เปิด side process แยก (python -m src.shadow_scoring) — ไม่ re-import สคริปต์ live ใน process ลูก
+        """
+        spec = json.dumps({"queue": self.queue.name, "columns": self.columns,
+                           "candidates": self.candidates, "log_path": self.log_path, "poll_ms": self.poll_ms})
+        self.process = subprocess.Popen([sys.executable, "-m", "src.shadow_scoring", "--spec", spec],
+                                        cwd=str(Path(__file__).resolve().parents[1]))
+        return self
+
+    def publish(self, row: pd.Series, decision: Dict[str, Any]) -> bool:
+        """
+        ส่งแถว features ของแท่งล่าสุด + การตัดสินใจของ production → False ถ้า queue เต็ม (แถวถูกทิ้ง)
+        """
+        t0 = time.perf_counter_ns()
+        buf = self._row
+        buf[0] = pd.Timestamp(row["time"]).timestamp()
+        buf[1] = time.time()
+        buf[2] = SIDE_CODES.get(decision.get("side"), 0)
+        conf = decision.get("confidence")
+        buf[3] = math.nan if conf is None else conf
+        buf[len(META_COLS):] = [row[f] for f in self._features]
+        ok = self.queue.put(buf)
+        publish_hist.record(time.perf_counter_ns() - t0)
+        if not ok:
+            dropped_counter.inc()
+        lag_gauge.set(self.queue.lag())
+        return ok
+
+    def stop(self, timeout: float = 5.0):
+        """
+        ปิด queue (side process score แถวที่ค้างให้หมดแล้วจบ) → รอไม่เกิน timeout วินาที → unlink
+        """
+        self.queue.close_writer()
+        if self.process is not None:
+            try:
+                self.process.wait(timeout)
+            except subprocess.TimeoutExpired:
+                self.process.terminate()
+                self.process.wait()
+        self.queue.close()
+
+
+def score_batch(models, rows: np.ndarray) -> List[tuple]:
+    """
+    [(name, codes, confidence)] ของทุก candidate บน batch เดียว
+    """
+    out = []
+    for name, clf, idx, features in models:
+        X = pd.DataFrame(rows[:, idx], columns=features)
+        proba = clf.predict_proba(X)
+        out.append((name, proba.argmax(axis=1), proba.max(axis=1)))
+    return out
+
+
+def shadow_worker(queue_name: str, columns: Sequence[str], candidates: Sequence[Dict[str, Any]],
+                  log_path: str = LOG_PATH, poll_ms: float = POLL_MS):
+    """
+    side process: อ่าน queue เป็น batch → score ทุก candidate → ต่อท้าย log → จบเมื่อ queue ปิดและอ่านหมด
+    """
+    from src.decision_engine import load_model
+
+    queue = ShmQueue.attach(queue_name)
+    models = []
+    for c in candidates:
+        idx = [list(columns).index(f) for f in c["features"]]
+        models.append((c["name"], load_model(c["path"], c["features"]).clf, idx, c["features"]))
+
+    path = Path(log_path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    new_file = not path.exists() or path.stat().st_size == 0
+    with open(path, "a", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        if new_file:
+            writer.writerow(LOG_COLUMNS)
+        while True:
+            closed = queue.closed  # อ่านก่อน peek → แถวที่ publish ก่อนปิดถูก score ครบ
+            _, rows = queue.peek(BATCH_ROWS)
+            if not len(rows):
+                if closed:
+                    break
+                time.sleep(poll_ms / 1000.0)
+                continue
+            lag_rows = queue.lag()
+            scores = score_batch(models, rows)
+            meta = rows[:, :len(META_COLS)].copy()
+            n = len(rows)
+            del rows  # ปล่อย view ก่อนคืนช่องให้ producer
+            queue.advance(n)
+
+            now = time.time()
+            scored_at = datetime.fromtimestamp(now).isoformat(timespec="milliseconds")
+            for i, (bar_time, published, prod_code, prod_conf) in enumerate(meta):
+                bar_time = pd.Timestamp(bar_time, unit="s").isoformat(sep=" ")
+                prod = CODE_TO_LABEL.get(int(prod_code), "NoTrade")
+                prod_conf = "" if math.isnan(prod_conf) else round(float(prod_conf), 6)
+                lag_ms = round((now - published) * 1000.0, 3)
+                for name, codes, conf in scores:
+                    writer.writerow([bar_time, scored_at, lag_rows, lag_ms, prod, prod_conf,
+                                     name, CODE_TO_LABEL[int(codes[i])], round(float(conf[i]), 6)])
+            f.flush()
+    queue.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Shadow-score candidate models from the live feature queue")
+    parser.add_argument("--spec", required=True, help="JSON จาก ShadowScorer.start")
+    args = parser.parse_args()
+    spec = json.loads(args.spec)
+    shadow_worker(spec["queue"], spec["columns"], spec["candidates"], spec["log_path"], spec["poll_ms"])
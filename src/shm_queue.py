@@ -0,0 +1,123 @@
+"""
+Shared-memory queue: single producer / single consumer ของแถว float64 ความกว้างคงที่ ข้าม process
+
+layout ของ segment (multiprocessing.shared_memory):
+  header int64[8]: write_seq, read_seq, dropped, capacity, width, closed, magic, (สำรอง)
+  data   float64[capacity, width]
+- producer เขียนแถวลงช่อง write_seq % capacity แล้วจึงเลื่อน write_seq (publish)
+- consumer อ่านเป็น view ของ data โดยตรง (ไม่ copy) แล้วเลื่อน read_seq เมื่อใช้เสร็จ
+- queue เต็ม → put คืน False และนับ dropped ทันที (producer ไม่รอ consumer)
+"""
+
+from multiprocessing import resource_tracker, shared_memory
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+HEADER_SLOTS = 8
+_WRITE, _READ, _DROPPED, _CAPACITY, _WIDTH, _CLOSED, _MAGIC = range(7)
+MAGIC = 0x5348_4D51  # "SHMQ"
+
+
+def attach_shared_memory(name: str) -> shared_memory.SharedMemory:
+    """
+    attach segment ที่ process อื่นสร้างไว้ โดยไม่ลงทะเบียนกับ resource_tracker ของ process นี้
+    (ไม่เช่นนั้น tracker จะ unlink segment ตอน process ผู้อ่านจบ — เจ้าของเป็นผู้ unlink เท่านั้น)
+    """
+    register = resource_tracker.register
+    resource_tracker.register = lambda *args, **kwargs: None
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+
+class ShmQueue:
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool):
+        self.shm = shm
+        self.owner = owner
+        self._header = np.ndarray((HEADER_SLOTS,), dtype=np.int64, buffer=shm.buf)
+        if self._header[_MAGIC] != MAGIC:
+            raise ValueError(f"shared memory {shm.name!r} is not a ShmQueue")
+        self.capacity = int(self._header[_CAPACITY])
+        self.width = int(self._header[_WIDTH])
+        self._data = np.ndarray((self.capacity, self.width), dtype=np.float64, buffer=shm.buf,
+                                offset=HEADER_SLOTS * 8)
+
+    @classmethod
+    def create(cls, capacity: int, width: int, name: Optional[str] = None) -> "ShmQueue":
+        size = HEADER_SLOTS * 8 + capacity * width * 8
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        header = np.ndarray((HEADER_SLOTS,), dtype=np.int64, buffer=shm.buf)
+        header[:] = 0
+        header[_CAPACITY], header[_WIDTH], header[_MAGIC] = capacity, width, MAGIC
+        del header
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name: str) -> "ShmQueue":
+        return cls(attach_shared_memory(name), owner=False)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    # ─── producer ─────────────────────────────────────────────────────────────
+    def put(self, row: Sequence[float]) -> bool:
+        """
+        เพิ่มแถว 1 แถว (ยาว width) → False ถ้า queue เต็ม (แถวถูกทิ้ง ไม่รอ)
+        """
+        header = self._header
+        w = int(header[_WRITE])
+        if w - int(header[_READ]) >= self.capacity:
+            header[_DROPPED] += 1
+            return False
+        self._data[w % self.capacity] = row
+        header[_WRITE] = w + 1  # publish หลังเขียนข้อมูลครบ
+        return True
+
+    def close_writer(self):
+        """
+        แจ้ง consumer ว่าจะไม่มีแถวใหม่ (consumer อ่านที่ค้างให้หมดแล้วจบ)
+        """
+        self._header[_CLOSED] = 1
+
+    # ─── consumer ─────────────────────────────────────────────────────────────
+    def peek(self, max_rows: Optional[int] = None) -> Tuple[int, np.ndarray]:
+        """
+        (seq ของแถวแรก, view ของแถวที่ยังไม่ได้อ่าน) — ติดกันในหน่วยความจำ จึงหยุดที่ปลาย buffer
+        view ใช้ได้จนกว่าจะเรียก advance
+        """
+        r = int(self._header[_READ])
+        n = int(self._header[_WRITE]) - r
+        start = r % self.capacity
+        n = min(n, self.capacity - start)
+        if max_rows is not None:
+            n = min(n, max_rows)
+        return r, self._data[start:start + n]
+
+    def advance(self, n: int):
+        self._header[_READ] += n
+
+    @property
+    def closed(self) -> bool:
+        return bool(self._header[_CLOSED])
+
+    # ─── สถานะ ────────────────────────────────────────────────────────────────
+    def lag(self) -> int:
+        """
+        จำนวนแถวที่ publish แล้วแต่ consumer ยังไม่ได้อ่าน
+        """
+        return int(self._header[_WRITE] - self._header[_READ])
+
+    def stats(self) -> Dict[str, int]:
+        h = self._header
+        return {"written": int(h[_WRITE]), "read": int(h[_READ]), "lag": int(h[_WRITE] - h[_READ]),
+                "dropped": int(h[_DROPPED]), "capacity": self.capacity}
+
+    def close(self):
+        # ปล่อย view ก่อน ไม่เช่นนั้น SharedMemory.close จะ error (exported pointers)
+        self._header = self._data = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
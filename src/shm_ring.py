@@ -0,0 +1,226 @@
+"""
+Shared-memory ring ของแท่งล่าสุด + features: live loop เขียน (ผู้เขียนคนเดียว) process อื่นอ่านแบบไม่ล็อก
+
+layout ของ segment (multiprocessing.shared_memory):
+  header int64[8]: seq, count, pending, capacity, width, magic, schema_len, (สำรอง)
+  schema          JSON รายชื่อคอลัมน์ (SCHEMA_BYTES ไบต์) → ผู้อ่าน attach ด้วยชื่อ segment อย่างเดียว
+  data            float64[2 × capacity, width] — แถว r อยู่ทั้งช่อง r % capacity และ r % capacity + capacity
+                  (mirror) → n แถวล่าสุดติดกันในหน่วยความจำเสมอ อ่านเป็น view ได้โดยไม่ copy
+- seqlock: seq เป็นเลขคี่ระหว่างเขียน, count = จำนวนแถวที่เขียนครบแล้วทั้งหมด
+- pending = count หลังการเขียนที่กำลังทำ (ตั้งก่อนแตะข้อมูล) → intact() บอกว่า view ที่ถืออยู่ถูกเขียนทับหรือยัง
+- คอลัมน์ time เก็บเป็นวินาที epoch (float64), คอลัมน์ bool เป็น 0/1
+"""
+
+import json
+import time
+from multiprocessing import shared_memory
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import yaml
+from pathlib import Path
+
+from src.instrumentation import REGISTRY
+from src.shm_queue import attach_shared_memory
+
+# โหลด config
+_cfg_path = Path(__file__).resolve().parents[1] / "config" / "config.yaml"
+with open(_cfg_path, "r", encoding="utf-8") as f:
+    cfg = yaml.safe_load(f)
+
+_ring_cfg = cfg.get("shm_ring", {}) or {}
+RING_NAME = _ring_cfg.get("name", "xauusd_live_ring")
+CAPACITY = int(_ring_cfg.get("capacity", 4096))
+
+HEADER_SLOTS = 8
+SCHEMA_BYTES = 8192
+_SEQ, _COUNT, _PENDING, _CAPACITY, _WIDTH, _MAGIC, _SCHEMA_LEN = range(7)
+MAGIC = 0x5348_4D52  # "SHMR"
+CANDLE_COLUMNS = ["time", "open", "high", "low", "close", "tick_volume"]
+
+write_hist = REGISTRY.histogram("shm_ring_write", "time to publish new bars to the shared-memory ring")
+
+
+def default_columns() -> List[str]:
+    """
+    แท่ง OHLCV + ฟีเจอร์ของ DecisionEngine
+    """
+    from src.decision_engine import FEATURE_COLS
+    return CANDLE_COLUMNS + [c for c in FEATURE_COLS if c not in CANDLE_COLUMNS]
+
+
+class ShmRing:
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool):
+        self.shm = shm
+        self.owner = owner
+        self._header = np.ndarray((HEADER_SLOTS,), dtype=np.int64, buffer=shm.buf)
+        if self._header[_MAGIC] != MAGIC:
+            raise ValueError(f"shared memory {shm.name!r} is not a ShmRing")
+        self.capacity = int(self._header[_CAPACITY])
+        self.width = int(self._header[_WIDTH])
+        start = HEADER_SLOTS * 8
+        self.columns = json.loads(bytes(shm.buf[start:start + int(self._header[_SCHEMA_LEN])]))
+        self._data = np.ndarray((2 * self.capacity, self.width), dtype=np.float64, buffer=shm.buf,
+                                offset=start + SCHEMA_BYTES)
+        self._last_time = -np.inf  # เวลาของแถวล่าสุดที่ append_frame เขียน (ฝั่งผู้เขียน)
+
+    @classmethod
+    def create(cls, columns: Sequence[str], capacity: int = CAPACITY, name: Optional[str] = None) -> "ShmRing":
+        schema = json.dumps(list(columns)).encode("utf-8")
+        if len(schema) > SCHEMA_BYTES:
+            raise ValueError(f"ring schema exceeds {SCHEMA_BYTES} bytes")
+        size = HEADER_SLOTS * 8 + SCHEMA_BYTES + 2 * capacity * len(columns) * 8
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        header = np.ndarray((HEADER_SLOTS,), dtype=np.int64, buffer=shm.buf)
+        header[:] = 0
+        header[_CAPACITY], header[_WIDTH], header[_SCHEMA_LEN] = capacity, len(columns), len(schema)
+        shm.buf[HEADER_SLOTS * 8:HEADER_SLOTS * 8 + len(schema)] = schema
+        header[_MAGIC] = MAGIC  # ตั้งท้ายสุด → ผู้อ่านไม่เห็น segment ที่ยังตั้งค่าไม่ครบ
+        del header
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name: str = RING_NAME) -> "ShmRing":
+        return cls(attach_shared_memory(name), owner=False)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    @property
+    def seq(self) -> int:
+        return int(self._header[_SEQ])
+
+    @property
+    def count(self) -> int:
+        return int(self._header[_COUNT])
+
+    # ─── ผู้เขียน ─────────────────────────────────────────────────────────────
+    def write(self, rows: np.ndarray):
+        """
+        ต่อท้าย rows (float64[k, width]) — ถ้า k > capacity เก็บเฉพาะ capacity แถวสุดท้าย
+        """
+        rows = np.asarray(rows, dtype=np.float64)[-self.capacity:]
+        k = len(rows)
+        if not k:
+            return
+        header = self._header
+        c = int(header[_COUNT])
+        header[_PENDING] = c + k
+        header[_SEQ] += 1  # คี่: กำลังเขียน
+        slots = (c + np.arange(k)) % self.capacity
+        self._data[slots] = rows
+        self._data[slots + self.capacity] = rows
+        header[_COUNT] = c + k
+        header[_SEQ] += 1  # คู่: เขียนครบ
+
+    def frame_rows(self, df: pd.DataFrame) -> np.ndarray:
+        """
+        DataFrame → float64[len(df), width] ตาม schema ของ ring (คอลัมน์ที่ไม่มีเป็น NaN)
+        """
+        out = np.full((len(df), self.width), np.nan)
+        for j, col in enumerate(self.columns):
+            if col not in df.columns:
+                continue
+            values = df[col]
+            if col == "time":
+                out[:, j] = pd.to_datetime(values, cache=False).to_numpy(dtype="datetime64[ns]").view(np.int64) / 1e9
+            else:
+                out[:, j] = values.to_numpy(dtype=np.float64, na_value=np.nan)
+        return out
+
+    def append_frame(self, df: pd.DataFrame, reset: bool = False) -> int:
+        """
+        เขียนเฉพาะแถวที่ time ใหม่กว่าแถวล่าสุดที่เคยเขียน (reset=True → เขียน capacity แถวท้ายของ df ใหม่ทั้งหมด
+        เช่นหลังแทรกแท่งที่หายไปย้อนหลัง) → คืนจำนวนแถวที่เขียน
+        """
+        t0 = time.perf_counter_ns()
+        times = pd.to_datetime(df["time"].iloc[-self.capacity:], cache=False).to_numpy(dtype="datetime64[ns]")
+        times = times.view(np.int64) / 1e9
+        # df เรียงตามเวลา → แถวใหม่คือช่วงท้ายหลัง _last_time (แปลงเฉพาะแถวเหล่านั้น)
+        k = len(times) if reset else len(times) - int(np.searchsorted(times, self._last_time, side="right"))
+        rows = self.frame_rows(df.iloc[len(df) - k:]) if k else np.empty((0, self.width))
+        self.write(rows)
+        if k:
+            self._last_time = float(times[-1])
+        write_hist.record(time.perf_counter_ns() - t0)
+        return len(rows)
+
+    # ─── ผู้อ่าน ─────────────────────────────────────────────────────────────
+    def latest(self, n: int) -> Tuple[int, np.ndarray]:
+        """
+        (count, view ของ n แถวล่าสุด) แบบ zero-copy — view ใช้ได้ตราบที่ intact(count, n) เป็นจริง
+        """
+        n = min(n, self.capacity)
+        while True:
+            s = int(self._header[_SEQ])
+            if s & 1:
+                continue  # ผู้เขียนกำลังเขียน (ใช้เวลาไม่กี่ µs)
+            c = int(self._header[_COUNT])
+            m = min(n, c)
+            start = (c - m) % self.capacity
+            view = self._data[start:start + m]
+            if int(self._header[_SEQ]) == s:
+                return c, view
+
+    def intact(self, count: int, n: int) -> bool:
+        """
+        view จาก latest() ที่ได้ count นี้ยังไม่ถูกเขียนทับ (ตรวจหลังใช้ข้อมูลเสร็จ)
+        """
+        return int(self._header[_PENDING]) - count <= self.capacity - min(n, self.capacity, count)
+
+    def read(self, n: int) -> Tuple[int, np.ndarray]:
+        """
+        สำเนาของ n แถวล่าสุดที่สอดคล้องกัน (seqlock: copy แล้วตรวจซ้ำ ถ้าถูกเขียนทับระหว่าง copy ก็อ่านใหม่)
+        """
+        while True:
+            c, view = self.latest(n)
+            rows = view.copy()
+            if self.intact(c, len(rows)):
+                return c, rows
+
+    def since(self, count: int) -> Tuple[int, np.ndarray]:
+        """
+        สำเนาของแถวที่เขียนหลัง count (สูงสุด capacity แถว) → (count ปัจจุบัน, rows)
+        """
+        while True:
+            c, view = self.latest(self.capacity)
+            m = min(max(c - count, 0), len(view))
+            rows = view[len(view) - m:].copy()
+            if self.intact(c, m):
+                return c, rows
+
+    def to_frame(self, rows: np.ndarray) -> pd.DataFrame:
+        df = pd.DataFrame(rows, columns=self.columns)
+        if "time" in df.columns:
+            df["time"] = pd.to_datetime(np.round(df["time"].to_numpy() * 1e9).astype(np.int64))
+        return df
+
+    def close(self):
+        self._header = self._data = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+class RingTail:
+    """
+    ตัวอ่านแบบ tail ของ ShmRing ให้หน้าตาเหมือน live_data.CsvTail: poll() คืน DataFrame ของแถวใหม่
+    (resets เพิ่มเมื่อผู้เขียนเขียนช่วงเวลาซ้ำ เช่น append_frame(reset=True) → ผู้ใช้ควรล้าง buffer)
+    """
+
+    def __init__(self, ring: ShmRing, initial_rows: int = CAPACITY):
+        self.ring = ring
+        self.count = max(0, ring.count - initial_rows)
+        self.last_time = -np.inf
+        self.resets = 0
+
+    def poll(self) -> pd.DataFrame:
+        self.count, rows = self.ring.since(self.count)
+        if not len(rows):
+            return pd.DataFrame()
+        if rows[0, self.ring.columns.index("time")] <= self.last_time:
+            self.resets += 1
+        self.last_time = rows[-1, self.ring.columns.index("time")]
+        return self.ring.to_frame(rows)
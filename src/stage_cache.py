@@ -0,0 +1,463 @@
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import time
+import numpy as np
+import pandas as pd
+import yaml
+from pathlib import Path
+from typing import Dict, Any, Optional, List, Callable, Sequence
+
+import src.features as features_mod
+import src.ict_signal as ict_signal_mod
+import src.label_ict as label_ict_mod
+import src.schema as schema_mod
+from src.features import compute_features_chunked, HTF_TIMEFRAMES, BASE_TIMEFRAME
+from src.label_ict import ict_labels
+from src.schema import read_feature_csv
+
+# โหลด config
+_cfg_path = Path(__file__).resolve().parents[1] / "config" / "config.yaml"
+with open(_cfg_path, "r", encoding="utf-8") as f:
+    cfg = yaml.safe_load(f)
+
+_cache_cfg = cfg.get("stage_cache", {}) or {}
+CACHE_DIR = _cache_cfg.get("dir", "data/.stage_cache")
+LABEL_OVERLAP = int(_cache_cfg.get("label_overlap", 500))
+STATE_SNAPSHOTS = int(_cache_cfg.get("state_snapshots", 4))
+FEATURES_CHUNK = int(cfg.get("features_chunk_size", 0) or 500_000)
+
+_BLOCK = 1 << 20
+
+
+def _digest(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def params_digest(params: Any) -> str:
+    return _digest(json.dumps(params, sort_keys=True, default=str).encode())
+
+
+def code_version(*modules) -> str:
+    """
+    hash ของ source code ของ module ที่ stage ใช้ (แก้โค้ด → key เปลี่ยน → คำนวณใหม่)
+    """
+    h = hashlib.blake2b(digest_size=16)
+    for mod in modules:
+        h.update(Path(inspect.getsourcefile(mod)).read_bytes())
+    return h.hexdigest()
+
+
+def file_fingerprint(path, known: Optional[Dict[str, Any]] = None,
+                     prefix_size: Optional[int] = None) -> Dict[str, Any]:
+    """
+    fingerprint ของไฟล์แบบ content-addressed: {size, mtime_ns, sha, rows}
+    - known: fingerprint เดิม → ถ้า size/mtime ไม่เปลี่ยนถือว่าเนื้อหาเดิม (ไม่ต้อง hash ใหม่)
+    - prefix_size: hash ของ prefix_size ไบต์แรกด้วย (prefix_sha) เพื่อตรวจว่าไฟล์แค่ถูกต่อท้าย
+    rows = จำนวนบรรทัดข้อมูล (ไม่รวม header)
+    """
+    st = os.stat(path)
+    if known and known.get("size") == st.st_size and known.get("mtime_ns") == st.st_mtime_ns:
+        fp = dict(known)
+        fp["prefix_sha"] = known["sha"] if prefix_size == st.st_size else None
+        return fp
+
+    h = hashlib.blake2b(digest_size=16)
+    prefix_sha = None
+    newlines = 0
+    pos = 0
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(_BLOCK)
+            if not block:
+                break
+            if prefix_size and pos < prefix_size <= pos + len(block):
+                cut = prefix_size - pos
+                h.update(block[:cut])
+                prefix_sha = h.hexdigest()
+                h.update(block[cut:])
+            else:
+                h.update(block)
+            newlines += block.count(b"\n")
+            pos += len(block)
+    return {
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+        "sha": h.hexdigest(),
+        "rows": max(newlines - 1, 0),
+        "prefix_sha": prefix_sha,
+    }
+
+
+def _tail_offset(path, n_lines: int) -> int:
+    """
+    ตำแหน่งไบต์ที่ n_lines บรรทัดสุดท้ายของไฟล์เริ่มต้น (ไฟล์ที่ลงท้ายด้วย newline)
+    """
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        pos, found = size - 1, 0  # ข้าม newline ตัวสุดท้ายของไฟล์
+        while pos > 0:
+            start = max(pos - _BLOCK, 0)
+            f.seek(start)
+            block = f.read(pos - start)
+            for i in range(len(block) - 1, -1, -1):
+                if block[i] == 0x0A:
+                    found += 1
+                    if found == n_lines:
+                        return start + i + 1
+            pos = start
+    return 0
+
+
+def _stored(fp: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: v for k, v in fp.items() if k != "prefix_sha"}
+
+
+class StageCache:
+    """
+    Cache ของ pipeline stage (fetch → features → labels → model → backtest) แบบ content-addressed
+    แต่ละ stage เก็บ manifest (JSON) ต่อ output: key = hash(input + config + code) และ fingerprint ของ output
+      - hit: key เดิมและ output ยังเป็นไฟล์เดิม → ข้าม
+      - partial: input แค่ถูกต่อท้าย → คำนวณเฉพาะแถวใหม่ (features/labels)
+      - miss: คำนวณใหม่ทั้งหมด
+    """
+
+    def __init__(self, root: str = CACHE_DIR):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.events: List[Dict[str, Any]] = []
+
+    def _manifest(self, stage: str, output_path) -> Path:
+        tag = _digest(str(Path(output_path).resolve()).encode())[:12]
+        return self.root / f"{stage}-{tag}.json"
+
+    def state_path(self, stage: str, output_path) -> Path:
+        return self._manifest(stage, output_path).with_suffix(".state.pkl")
+
+    def snapshot_path(self, stage: str, output_path, rows: int) -> Path:
+        return self._manifest(stage, output_path).with_suffix(f".state-{rows}.pkl")
+
+    def load(self, stage: str, output_path) -> Optional[Dict[str, Any]]:
+        path = self._manifest(stage, output_path)
+        if not path.exists():
+            return None
+        try:
+            return json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+
+    def save(self, stage: str, output_path, record: Dict[str, Any]):
+        path = self._manifest(stage, output_path)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(record, indent=2, default=str), encoding="utf-8")
+        os.replace(tmp, path)
+
+    def outputs_intact(self, record: Optional[Dict[str, Any]]) -> bool:
+        """
+        True ถ้า output ทุกไฟล์ใน record ยังมีอยู่และเนื้อหาตรงกับตอนที่บันทึก
+        """
+        if not record or not record.get("outputs"):
+            return False
+        for path, fp in record["outputs"].items():
+            if not Path(path).exists() or file_fingerprint(path, known=fp)["sha"] != fp["sha"]:
+                return False
+        return True
+
+    def log(self, stage: str, status: str, seconds: float, detail: str = ""):
+        self.events.append({"stage": stage, "status": status, "seconds": seconds, "detail": detail})
+
+    def run(self, stage: str, outputs: Sequence, inputs: Sequence, params: Any,
+            code: Sequence, fn: Callable[[], Any]) -> str:
+        """
+        stage ทั่วไปแบบ all-or-nothing (model, backtest): ข้าม fn ถ้า key เดิมและ output ยังอยู่
+        คืน "hit" หรือ "miss"
+        """
+        t0 = time.perf_counter()
+        key = params_digest({
+            "inputs": [file_fingerprint(p)["sha"] for p in inputs],
+            "params": params,
+            "code": code_version(*code),
+        })
+        record = self.load(stage, outputs[0])
+        if record and record.get("key") == key and self.outputs_intact(record):
+            self.log(stage, "hit", time.perf_counter() - t0)
+            return "hit"
+        fn()
+        self.save(stage, outputs[0], {
+            "key": key,
+            "outputs": {str(p): _stored(file_fingerprint(p)) for p in outputs},
+        })
+        self.log(stage, "miss", time.perf_counter() - t0)
+        return "miss"
+
+    def summary(self) -> Dict[str, int]:
+        counts = {"hit": 0, "partial": 0, "miss": 0}
+        for e in self.events:
+            counts[e["status"]] = counts.get(e["status"], 0) + 1
+        return counts
+
+    def report(self):
+        print("\n===== Stage Cache =====")
+        print(f"{'stage':<12}{'status':<9}{'seconds':>9}  detail")
+        for e in self.events:
+            print(f"{e['stage']:<12}{e['status']:<9}{e['seconds']:>9.2f}  {e['detail']}")
+        s = self.summary()
+        print(f"hits={s['hit']} partial={s['partial']} misses={s['miss']}")
+        print("=======================\n")
+
+
+def stage_cache_from_config(config: Dict[str, Any]) -> Optional[StageCache]:
+    """
+    คืน StageCache ถ้า config มี stage_cache.enabled = true (ไม่เช่นนั้น None → รันทุก stage ตามเดิม)
+    """
+    section = config.get("stage_cache") or {}
+    if not section.get("enabled"):
+        return None
+    return StageCache(section.get("dir", CACHE_DIR))
+
+
+def cached_features(cache: StageCache, input_path: str, output_path: str,
+                    htf_timeframes: Optional[List[str]] = None,
+                    base_timeframe: str = BASE_TIMEFRAME,
+                    chunk_size: int = FEATURES_CHUNK) -> str:
+    """
+    compute_features ผ่าน cache:
+      - historical เดิม → hit
+      - historical แค่มีแถวต่อท้าย → โหลด FeatureStreamState จาก checkpoint แล้วคำนวณเฉพาะแถวใหม่
+        ได้ผลเท่ากับคำนวณใหม่ทั้งไฟล์ (ฟีเจอร์ของแถวเดิมไม่ขึ้นกับแท่งที่มาทีหลัง)
+      - อย่างอื่น → คำนวณใหม่ทั้งไฟล์ด้วย compute_features_chunked (เพื่อให้ได้ state ไว้ต่อครั้งหน้า)
+    คืน "hit" / "partial" / "miss"
+    """
+    t0 = time.perf_counter()
+    htf_timeframes = HTF_TIMEFRAMES if htf_timeframes is None else list(htf_timeframes)
+    key = params_digest({
+        "htf_timeframes": htf_timeframes,
+        "base_timeframe": base_timeframe,
+        "code": code_version(features_mod, schema_mod),
+    })
+    record = cache.load("features", output_path)
+    state_file = cache.state_path("features", output_path)
+    usable = (record is not None and record.get("key") == key
+              and cache.outputs_intact(record) and state_file.exists())
+    fp_in = file_fingerprint(input_path, known=record["input"] if usable else None,
+                             prefix_size=record["input"]["size"] if usable else None)
+
+    status, detail = "miss", f"{fp_in['rows']} rows"
+    if usable and fp_in["sha"] == record["input"]["sha"]:
+        cache.log("features", "hit", time.perf_counter() - t0, f"{fp_in['rows']} rows")
+        return "hit"
+
+    state = None
+    if usable and fp_in["prefix_sha"] == record["input"]["sha"]:
+        done = record["input"]["rows"]
+        try:
+            with open(state_file, "rb") as f:
+                state = pickle.load(f)
+            state = compute_features_chunked(input_path, output_path, chunk_size, state=state,
+                                             start_row=done)
+            status, detail = "partial", f"+{fp_in['rows'] - done} rows"
+        except (ValueError, OSError, pickle.UnpicklingError, EOFError):
+            # แถวใหม่ไม่ได้ต่อท้ายตามเวลา หรือ checkpoint เสีย → คำนวณใหม่ทั้งไฟล์
+            state = None
+    if state is None:
+        state = compute_features_chunked(input_path, output_path, chunk_size,
+                                         htf_timeframes=htf_timeframes, base_timeframe=base_timeframe)
+
+    snapshots = _rotate_snapshots(cache, output_path, record if usable else None, status == "partial")
+    with open(state_file, "wb") as f:
+        pickle.dump(state, f)
+    cache.save("features", output_path, {
+        "key": key,
+        "input": _stored(fp_in),
+        "outputs": {str(output_path): _stored(file_fingerprint(output_path))},
+        "snapshots": snapshots,
+    })
+    cache.log("features", status, time.perf_counter() - t0, detail)
+    return status
+
+
+def _rotate_snapshots(cache: StageCache, output_path: str, record: Optional[Dict[str, Any]],
+                      keep_previous: bool) -> List[Dict[str, Any]]:
+    """
+    เก็บ state ของรอบก่อนไว้เป็น snapshot (สูงสุด STATE_SNAPSHOTS อัน) ก่อนเขียน state ใหม่
+    → rewind_features ย้อนกลับไปคำนวณต่อจากแถวก่อนช่วงที่ historical ถูกแทรกแท่งได้
+    keep_previous=False (คำนวณใหม่ทั้งไฟล์) → snapshot เดิมใช้ไม่ได้แล้ว ลบทิ้ง
+    """
+    snapshots = list(record.get("snapshots", [])) if record else []
+    state_file = cache.state_path("features", output_path)
+    if keep_previous and record is not None and state_file.exists():
+        rows = record["input"]["rows"]
+        snap = cache.snapshot_path("features", output_path, rows)
+        os.replace(state_file, snap)
+        snapshots = [s for s in snapshots if s["rows"] != rows]
+        snapshots.append({"rows": rows, "size": record["input"]["size"], "sha": record["input"]["sha"],
+                          "file": snap.name})
+    else:
+        snapshots, dropped = [], snapshots
+        for snap in dropped:
+            (cache.root / snap["file"]).unlink(missing_ok=True)
+    while len(snapshots) > STATE_SNAPSHOTS:
+        (cache.root / snapshots.pop(0)["file"]).unlink(missing_ok=True)
+    return snapshots
+
+
+def rewind_features(cache: StageCache, input_path: str, output_path: str, row: int) -> Optional[Dict[str, int]]:
+    """
+    historical ถูกแก้ตั้งแต่แถว row (เช่นแทรกแท่งที่หายไป) → ย้อน cache ของ features ไปที่ snapshot ล่าสุด
+    ที่ประมวลผลไม่เกิน row แถวและ prefix ของ input ยังตรงกัน ครั้งหน้า cached_features จะคำนวณต่อจากจุดนั้น
+    (partial) แทนการคำนวณใหม่ทั้งไฟล์
+    คืน {rows, stable_rows, stable_size} ของจุดที่ย้อนไป (stable = แถว/ไบต์ของ output ที่ไม่เปลี่ยน)
+    หรือ None ถ้าไม่มี snapshot ที่ใช้ได้ (ครั้งหน้าเป็น miss ตามเดิม)
+    """
+    record = cache.load("features", output_path)
+    state_file = cache.state_path("features", output_path)
+    if record is None or not state_file.exists():
+        return None
+
+    def _stable(path: Path, rows: int) -> Dict[str, int]:
+        with open(path, "rb") as f:
+            st = pickle.load(f)
+        return {"rows": rows, "stable_rows": rows, "stable_size": st.output_bytes}
+
+    if record["input"]["rows"] <= row:
+        return _stable(state_file, record["input"]["rows"])  # แถวที่แก้อยู่หลังทุกแถวที่ประมวลผลแล้ว
+
+    snapshots = record.get("snapshots", [])
+    for i in range(len(snapshots) - 1, -1, -1):
+        snap = snapshots[i]
+        path = cache.root / snap["file"]
+        if snap["rows"] > row or not path.exists():
+            continue
+        if file_fingerprint(input_path, prefix_size=snap["size"])["prefix_sha"] != snap["sha"]:
+            continue
+        for newer in snapshots[i + 1:]:
+            (cache.root / newer["file"]).unlink(missing_ok=True)
+        os.replace(path, state_file)
+        record["input"] = {"size": snap["size"], "mtime_ns": None, "sha": snap["sha"], "rows": snap["rows"]}
+        record["snapshots"] = snapshots[:i]
+        cache.save("features", output_path, record)
+        return _stable(state_file, snap["rows"])
+    return None
+
+
+def rewind_labels(cache: StageCache, features_path: str, output_path: str,
+                  stable_rows: int, stable_size: int) -> bool:
+    """
+    features เปลี่ยนตั้งแต่ไบต์ stable_size (แถว stable_rows) → ตัด label ที่ได้จากแถวที่เปลี่ยนทิ้ง
+    แล้วตั้ง record ให้ cached_labels ครั้งหน้าต่อท้ายจาก stable_rows (label ขึ้นกับแถวของตัวเองเท่านั้น)
+    คืน False ถ้าไม่มี record ที่ใช้ได้
+    """
+    record = cache.load("labels", output_path)
+    if record is None or "stable_size" not in record["input"] or not cache.outputs_intact(record):
+        return False
+    if record["input"]["stable_size"] <= stable_size:
+        return True  # label ทุกแถวที่ถือว่านิ่งอยู่ก่อนจุดที่เปลี่ยน → record เดิมใช้ต่อได้
+    drop = record["input"]["rows"] - stable_rows
+    if drop < 0:
+        return False
+    if drop:
+        os.truncate(output_path, _tail_offset(output_path, drop))
+    fp = file_fingerprint(features_path, prefix_size=stable_size)
+    record["input"] = {"size": stable_size, "mtime_ns": None, "sha": None, "rows": stable_rows,
+                       "stable_size": stable_size, "stable_sha": fp["prefix_sha"]}
+    record["outputs"] = {str(output_path): _stored(file_fingerprint(output_path))}
+    cache.save("labels", output_path, record)
+    return True
+
+
+def rewind_stages(cache: StageCache, input_path: str, features_path: str,
+                  labels_path: Optional[str], row: int) -> Optional[Dict[str, int]]:
+    """
+    ย้อน features (และ labels ถ้ามี) ให้คำนวณใหม่เฉพาะตั้งแต่แถว row ของ historical
+    """
+    point = rewind_features(cache, input_path, features_path, row)
+    if point is not None and labels_path is not None:
+        rewind_labels(cache, features_path, labels_path, point["stable_rows"], point["stable_size"])
+    return point
+
+
+_LABEL_CHECK_COLS = ["label", "is_swing_high", "is_swing_low", "mss_bullish", "mss_bearish",
+                     "last_swing_high", "last_swing_low"]
+
+
+def _same_rows(a: pd.DataFrame, b: pd.DataFrame) -> bool:
+    for col in _LABEL_CHECK_COLS:
+        x, y = a[col], b[col]
+        if col == "label":
+            if not np.array_equal(x.astype(str).to_numpy(), y.astype(str).to_numpy()):
+                return False
+        elif not np.array_equal(x.to_numpy(dtype=np.float32), y.to_numpy(dtype=np.float32), equal_nan=True):
+            return False
+    return True
+
+
+def _extend_labels(features_path: str, output_path: str, done: int, overlap: int) -> bool:
+    """
+    คำนวณ ICT label เฉพาะช่วงท้าย: เริ่มที่ done − overlap แล้วตรวจว่าแถวครึ่งหลังของช่วง overlap
+    ได้ผลตรงกับไฟล์เดิม (overlap check)
+    features ที่มีคอลัมน์ ICT แล้ว label ขึ้นกับแถวนั้นแถวเดียวจึงผ่านเสมอ; ไฟล์ features เก่าที่ต้องคำนวณ
+    swing/MSS เองอาจไม่ผ่าน (last swing เก่ากว่าช่วง overlap) → คืน False ให้คำนวณใหม่ทั้งไฟล์
+    """
+    start = done - overlap
+    if start <= 0:
+        return False
+    tail = read_feature_csv(features_path, skiprows=range(1, start + 1))
+    tail = ict_labels(tail)
+    old = read_feature_csv(output_path)
+    if len(old) != done:
+        return False
+
+    check_from = start + overlap // 2
+    if not _same_rows(old.iloc[check_from:].reset_index(drop=True),
+                      tail.iloc[check_from - start:done - start].reset_index(drop=True)):
+        return False
+
+    new_rows = tail.iloc[done - start:][old.columns].astype(old.dtypes.to_dict())
+    df = pd.concat([old, new_rows], ignore_index=True)
+    df.to_csv(output_path, index=False)
+    print(f"Labels (ICT) extended in {output_path} (+{len(df) - done} rows)")
+    return True
+
+
+def cached_labels(cache: StageCache, features_path: str, output_path: str,
+                  overlap: int = LABEL_OVERLAP) -> str:
+    """
+    label_ict ผ่าน cache:
+      - features เดิม → hit
+      - features แค่มีแถวต่อท้าย → คำนวณ label เฉพาะช่วงท้าย (+ overlap check)
+      - อย่างอื่น → label_ict ทั้งไฟล์
+    คืน "hit" / "partial" / "miss"
+    """
+    t0 = time.perf_counter()
+    key = params_digest({"code": code_version(label_ict_mod, ict_signal_mod, schema_mod)})
+    record = cache.load("labels", output_path)
+    usable = (record is not None and record.get("key") == key and cache.outputs_intact(record)
+              and "stable_size" in record["input"])
+    fp_in = file_fingerprint(features_path, known=record["input"] if usable else None,
+                             prefix_size=record["input"]["stable_size"] if usable else None)
+
+    if usable and fp_in["sha"] == record["input"]["sha"]:
+        cache.log("labels", "hit", time.perf_counter() - t0, f"{fp_in['rows']} rows")
+        return "hit"
+
+    status, detail = "miss", f"{fp_in['rows']} rows"
+    if usable and fp_in["prefix_sha"] is not None and fp_in["prefix_sha"] == record["input"]["stable_sha"]:
+        done = record["input"]["rows"]
+        if _extend_labels(features_path, output_path, done, overlap):
+            status, detail = "partial", f"+{fp_in['rows'] - done} rows"
+        else:
+            detail = f"{fp_in['rows']} rows (overlap check failed)"
+    if status == "miss":
+        label_ict_mod.label_ict(features_path, output_path)
+
+    stable_size = os.path.getsize(features_path)
+    fp_in = file_fingerprint(features_path, prefix_size=stable_size)
+    cache.save("labels", output_path, {
+        "key": key,
+        "input": {**_stored(fp_in), "stable_size": stable_size, "stable_sha": fp_in["prefix_sha"]},
+        "outputs": {str(output_path): _stored(file_fingerprint(output_path))},
+    })
+    cache.log("labels", status, time.perf_counter() - t0, detail)
+    return status
@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from scipy.signal import lfilter
+from typing import Union
+
+# ขนาดมาตรฐานของชุดข้อมูลสำหรับ benchmark
+BAR_SIZES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+
+# ความผันผวนต่อแท่ง (สัดส่วนของราคา) และรูปแบบ intraday ตามชั่วโมง (เวลา broker)
+# XAUUSD M1: ATR(14) ราว 0.8–1.5 ที่ราคา ~2000 → σ ต่อแท่ง ~0.025%
+BASE_SIGMA = 0.00025
+HOURLY_VOL = np.array([
+    0.6, 0.5, 0.5, 0.5, 0.6, 0.7, 0.8, 0.9,   # 00–07 (เอเชีย)
+    1.0, 1.0, 1.1, 1.2, 1.2, 1.1, 1.2, 1.4,   # 08–15 (ยุโรปเปิด)
+    1.6, 1.8, 1.7, 1.5, 1.3, 1.1, 0.9, 0.7,   # 16–23 (นิวยอร์ก)
+])
+
+
+def parse_size(size: Union[str, int]) -> int:
+    """
+    แปลงขนาดเช่น "10k", "100k", "1m" หรือ 5000 เป็นจำนวนแท่ง
+    """
+    if isinstance(size, int):
+        return size
+    key = str(size).lower()
+    if key in BAR_SIZES:
+        return BAR_SIZES[key]
+    if key.endswith("k"):
+        return int(float(key[:-1]) * 1_000)
+    if key.endswith("m"):
+        return int(float(key[:-1]) * 1_000_000)
+    return int(key)
+
+
+def trading_minutes(n_bars: int, start: str = "2023-01-02") -> pd.DatetimeIndex:
+    """
+    สร้าง timestamp ของแท่ง M1 จำนวน n_bars โดยข้ามวันเสาร์–อาทิตย์ (ตลาดปิด)
+    """
+    start_ts = pd.Timestamp(start)
+    # เผื่อช่วงเวลาให้พอสำหรับวันหยุด (7/5 ของนาทีที่ต้องการ + 1 สัปดาห์)
+    n_calendar = int(n_bars * 7 / 5) + 7 * 1440
+    times = pd.date_range(start_ts, periods=n_calendar, freq="min")
+    times = times[times.dayofweek < 5]
+    return times[:n_bars]
+
+
+def generate_xauusd_m1(n_bars: int, seed: int = 42, start: str = "2023-01-02",
+                       start_price: float = 2000.0) -> pd.DataFrame:
+    """
+    สร้างแท่งเทียน XAUUSD M1 สังเคราะห์ (vectorized) คอลัมน์เดียวกับ fetch_candles():
+    time, open, high, low, close, tick_volume
+    - ผลตอบแทนแบบ fat-tail (Student-t df=4) และ volatility clustering (GARCH-like)
+    - ความผันผวน/volume ขึ้นกับชั่วโมงของวัน
+    - มี gap ตอนเปิดตลาดวันจันทร์
+    """
+    rng = np.random.default_rng(seed)
+    times = trading_minutes(n_bars, start)
+    hours = times.hour.to_numpy()
+
+    # volatility clustering: log-vol เป็น AR(1) ช้า ๆ (กรองด้วย lfilter แทน loop)
+    shocks = rng.standard_normal(n_bars) * 0.05
+    log_vol = lfilter([1.0], [1.0, -0.995], shocks)
+    sigma = BASE_SIGMA * HOURLY_VOL[hours] * np.exp(np.clip(log_vol, -1.5, 1.5))
+
+    t_noise = rng.standard_t(df=4, size=n_bars) / np.sqrt(2.0)
+    returns = sigma * t_noise
+
+    # gap เปิดสัปดาห์ (แท่งแรกหลังวันหยุด)
+    gaps = np.zeros(n_bars)
+    if n_bars > 1:
+        delta = np.diff(times.asi8) // 60_000_000_000
+        weekend_open = np.flatnonzero(delta > 1) + 1
+        gaps[weekend_open] = rng.normal(0.0, 0.002, size=len(weekend_open))
+
+    close = start_price * np.exp(np.cumsum(returns + gaps))
+    open_ = np.empty(n_bars)
+    open_[0] = start_price
+    open_[1:] = close[:-1] * np.exp(gaps[1:])
+
+    body_hi = np.maximum(open_, close)
+    body_lo = np.minimum(open_, close)
+    wick = sigma * close
+    high = body_hi + np.abs(rng.standard_normal(n_bars)) * 0.6 * wick
+    low = body_lo - np.abs(rng.standard_normal(n_bars)) * 0.6 * wick
+
+    lam = 60.0 * HOURLY_VOL[hours] * (sigma / BASE_SIGMA / HOURLY_VOL[hours]) ** 0.5
+    tick_volume = rng.poisson(lam).astype(np.int64) + 1
+
+    return pd.DataFrame({
+        "time": times,
+        "open": np.round(open_, 2),
+        "high": np.round(high, 2),
+        "low": np.round(low, 2),
+        "close": np.round(close, 2),
+        "tick_volume": tick_volume,
+    })
+
+
+def write_synthetic_csv(path: Union[str, Path], n_bars: int, seed: int = 42) -> Path:
+    """
+    เขียนข้อมูลสังเคราะห์ลง CSV (ข้ามถ้ามีไฟล์อยู่แล้ว) แล้วคืนพาธ
+    """
+    path = Path(path)
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        generate_xauusd_m1(n_bars, seed=seed).to_csv(path, index=False)
+    return path
@@ -0,0 +1,289 @@
+import time
+import numpy as np
+import pandas as pd
+import yaml
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+
+from src.features import TF_SECONDS
+from src.instrumentation import REGISTRY
+
+# โหลด config
+_cfg_path = Path(__file__).resolve().parents[1] / "config" / "config.yaml"
+with open(_cfg_path, "r", encoding="utf-8") as f:
+    cfg = yaml.safe_load(f)
+
+_tick_cfg = cfg.get("tick_stream", {}) or {}
+SYMBOL = cfg["symbol"]
+TIMEFRAMES = list(_tick_cfg.get("timeframes", [cfg.get("timeframe", "M1")]))
+PRICE_FIELD = _tick_cfg.get("price", "bid")          # แท่งของ MT5 สร้างจาก bid
+CAPACITY = int(_tick_cfg.get("capacity", 10_000))    # จำนวนแท่งที่ปิดแล้วที่เก็บต่อ timeframe
+MAX_TICKS = int(_tick_cfg.get("max_ticks", 100_000))  # จำนวน tick สูงสุดต่อการเรียก copy_ticks_from
+
+# แท่งเก็บเป็น structured array ขนาดคงที่ (time = วินาที epoch ของเวลาเปิดแท่ง, tick_volume = จำนวน tick)
+BAR_DTYPE = np.dtype([
+    ("time", np.int64), ("open", np.float64), ("high", np.float64),
+    ("low", np.float64), ("close", np.float64), ("tick_volume", np.int32),
+])
+BAR_COLUMNS = list(BAR_DTYPE.names)
+
+ticks_counter = REGISTRY.counter("ticks", "ticks ingested by the tick stream")
+
+
+# ─── MT5 tick source ───────────────────────────────────────────────────────────────
+# import MetaTrader5 ตอนเรียกเท่านั้น: BarBuilder / TickStream ใช้กับ tick จากแหล่งอื่น (replay, test) ได้
+
+def mt5_session():
+    """
+    module MetaTrader5 ที่ terminal เชื่อมต่ออยู่ — session ถูกปิด (terminal_info เป็น None) → initialize ใหม่
+    ด้วย cfg["mt5"] (session ของ MT5 ใช้ร่วมกันทั้ง process) เชื่อมต่อไม่ได้ → RuntimeError
+    """
+    import MetaTrader5 as mt5
+    if mt5.terminal_info() is None:
+        mt5_cfg = cfg["mt5"]
+        if not mt5.initialize(path=mt5_cfg["terminal_path"], login=mt5_cfg["login"],
+                              server=mt5_cfg["server"], password=mt5_cfg["password"],
+                              timeout=mt5_cfg["timeout"]):
+            raise RuntimeError(f"MT5 initialize failed: {mt5.last_error()}")
+    return mt5
+
+
+def mt5_ticks_from(symbol: str, from_s: int, count: int) -> Optional[np.ndarray]:
+    """
+    tick ตั้งแต่วินาที from_s (รวม) สูงสุด count tick (bid/ask เปลี่ยน)
+    ได้ None (เช่น session หลุด) → ตรวจ/initialize session แล้วลองอีกครั้ง
+    """
+    import MetaTrader5 as mt5
+    ticks = mt5.copy_ticks_from(symbol, int(from_s), count, mt5.COPY_TICKS_INFO)
+    if ticks is None:
+        ticks = mt5_session().copy_ticks_from(symbol, int(from_s), count, mt5.COPY_TICKS_INFO)
+    return ticks
+
+
+def mt5_ticks_range(symbol: str, start_s: int, end_s: int) -> Optional[np.ndarray]:
+    """
+    tick ทั้งหมดในช่วง [start_s, end_s] (ใช้ warm up แท่งก่อนเริ่ม stream)
+    """
+    mt5 = mt5_session()
+    return mt5.copy_ticks_range(symbol, int(start_s), int(end_s), mt5.COPY_TICKS_INFO)
+
+
+# ─── Bar building ─────────────────────────────────────────────────────────────────
+class BarRing:
+    """
+    Ring buffer ของแท่งที่ปิดแล้ว (preallocate capacity แถวของ BAR_DTYPE ไม่ขยายตัว)
+    """
+
+    def __init__(self, capacity: int = CAPACITY):
+        self.capacity = capacity
+        self.data = np.zeros(capacity, dtype=BAR_DTYPE)
+        self.total = 0  # จำนวนแท่งที่เคยเพิ่มทั้งหมด (ตำแหน่งเขียนถัดไป = total % capacity)
+
+    def __len__(self) -> int:
+        return min(self.total, self.capacity)
+
+    def extend(self, bars: np.ndarray):
+        if len(bars) > self.capacity:
+            self.total += len(bars) - self.capacity
+            bars = bars[-self.capacity:]
+        pos = self.total % self.capacity
+        first = min(len(bars), self.capacity - pos)
+        self.data[pos:pos + first] = bars[:first]
+        self.data[:len(bars) - first] = bars[first:]
+        self.total += len(bars)
+
+    def last(self, n: Optional[int] = None) -> np.ndarray:
+        """
+        n แท่งล่าสุด (ค่าเริ่มต้น: ทั้งหมดที่เก็บอยู่) เรียงจากเก่าไปใหม่ (สำเนา)
+        """
+        n = len(self) if n is None else min(n, len(self))
+        end = self.total % self.capacity
+        idx = (np.arange(end - n, end)) % self.capacity
+        return self.data[idx]
+
+
+class BarBuilder:
+    """
+    รวม tick เป็นแท่งของ timeframe เดียวแบบ incremental
+    - แท่งปัจจุบัน (partial) อัปเดตทุก tick; แท่งปิดเมื่อมี tick ของแท่งถัดไปเข้ามา
+    - tick ของแต่ละ batch ถูกจัดกลุ่มตามเวลาเปิดแท่งด้วย reduceat (ไม่วนทีละ tick)
+    """
+
+    def __init__(self, timeframe: str = "M1", capacity: int = CAPACITY):
+        self.timeframe = timeframe
+        self.seconds = TF_SECONDS[timeframe]
+        self.ring = BarRing(capacity)
+        self.partial: Optional[np.ndarray] = None  # BAR_DTYPE shape (1,)
+        self.late_ticks = 0
+
+    def update(self, times_ms: np.ndarray, prices: np.ndarray) -> np.ndarray:
+        """
+        ป้อน tick (เรียงตามเวลา) → คืนแท่งที่ปิดในรอบนี้ (BAR_DTYPE, อาจว่าง)
+        tick ที่เก่ากว่าแท่งปัจจุบันถูกนับใน late_ticks แล้วทิ้ง
+        """
+        sec = times_ms // 1000
+        starts = sec - sec % self.seconds
+        if self.partial is not None:
+            late = starts < self.partial["time"][0]
+            if late.any():
+                self.late_ticks += int(late.sum())
+                starts, prices = starts[~late], prices[~late]
+        if len(starts) == 0:
+            return np.empty(0, dtype=BAR_DTYPE)
+
+        first = np.concatenate([[0], np.flatnonzero(np.diff(starts)) + 1])
+        groups = np.empty(len(first), dtype=BAR_DTYPE)
+        groups["time"] = starts[first]
+        groups["open"] = prices[first]
+        groups["high"] = np.maximum.reduceat(prices, first)
+        groups["low"] = np.minimum.reduceat(prices, first)
+        groups["close"] = prices[np.append(first[1:], len(prices)) - 1]
+        groups["tick_volume"] = np.diff(np.append(first, len(prices)))
+
+        if self.partial is not None:
+            p = self.partial[0]
+            if groups["time"][0] == p["time"]:
+                groups["open"][0] = p["open"]
+                groups["high"][0] = max(groups["high"][0], p["high"])
+                groups["low"][0] = min(groups["low"][0], p["low"])
+                groups["tick_volume"][0] += p["tick_volume"]
+            else:
+                groups = np.concatenate([self.partial, groups])
+
+        closed = groups[:-1]
+        self.partial = groups[-1:].copy()
+        if len(closed):
+            self.ring.extend(closed)
+        return closed
+
+
+def bars_frame(bars: np.ndarray) -> pd.DataFrame:
+    """
+    แท่ง BAR_DTYPE → DataFrame คอลัมน์เดียวกับ fetch_candles (time, open, high, low, close, tick_volume)
+    """
+    df = pd.DataFrame({col: bars[col] for col in BAR_COLUMNS})
+    df["time"] = pd.to_datetime(df["time"], unit="s")
+    return df
+
+
+# ─── Tick stream ──────────────────────────────────────────────────────────────────
+class TickStream:
+    """
+    ดึง tick ใหม่ตั้งแต่ cursor (เวลา tick ล่าสุด) แล้วสร้างแท่งทุก timeframe แบบ incremental
+      - cursor = (time_msc ล่าสุด, จำนวน tick ที่ ms นั้นที่ประมวลผลแล้ว) → copy_ticks_from รวมวินาทีเริ่ม
+        จึงตัด tick ที่เคยเห็นทิ้งได้ถูกต้องแม้หลาย tick มีเวลาเดียวกัน
+      - แท่งที่ปิดแล้วส่งให้ on_bar(timeframe, bar) และเก็บใน ring; แท่งปัจจุบันส่งให้ on_partial ทุก poll
+      - drain_closed(timeframe) คืนเฉพาะแท่งที่ปิดแล้วและยังไม่ได้อ่าน (แทน fetch_candles ซ้ำทุกรอบ)
+    fetch(symbol, from_s, count) ต้องคืน structured array ที่มี time_msc และคอลัมน์ราคา (bid/ask/last)
+    """
+
+    def __init__(self, symbol: str = SYMBOL, timeframes: Sequence[str] = TIMEFRAMES,
+                 capacity: int = CAPACITY, price_field: str = PRICE_FIELD, max_ticks: int = MAX_TICKS,
+                 fetch: Optional[Callable[[str, int, int], Optional[np.ndarray]]] = None,
+                 fetch_range: Optional[Callable[[str, int, int], Optional[np.ndarray]]] = None):
+        self.symbol = symbol
+        self.price_field = price_field
+        self.max_ticks = max_ticks
+        self.fetch = fetch or mt5_ticks_from
+        self.fetch_range = fetch_range or mt5_ticks_range
+        self.builders: Dict[str, BarBuilder] = {tf: BarBuilder(tf, capacity) for tf in timeframes}
+        self.cursor_msc: Optional[int] = None
+        self.start_s: Optional[int] = None  # จุดเริ่มของ poll ก่อนมี tick แรก (ยังไม่มี cursor)
+        self._seen_at_cursor = 0
+        self._unread = {tf: 0 for tf in timeframes}
+        self._bar_subs: List[Callable] = []
+        self._partial_subs: List[Callable] = []
+
+    def subscribe(self, on_bar: Optional[Callable[[str, np.void], None]] = None,
+                  on_partial: Optional[Callable[[str, np.void], None]] = None):
+        if on_bar is not None:
+            self._bar_subs.append(on_bar)
+        if on_partial is not None:
+            self._partial_subs.append(on_partial)
+
+    def _new_ticks(self, ticks: Optional[np.ndarray]):
+        """
+        ตัด tick ที่ประมวลผลแล้ว (ก่อน cursor และที่ ms เดียวกับ cursor) และเลื่อน cursor
+        คืน (time_msc, price) ของ tick ใหม่ที่มีราคา และจำนวน tick ใหม่ทั้งหมด
+        """
+        if ticks is None or len(ticks) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0), 0
+        t = np.asarray(ticks["time_msc"], dtype=np.int64)
+        price = np.asarray(ticks[self.price_field], dtype=np.float64)
+        if self.cursor_msc is not None:
+            start = np.searchsorted(t, self.cursor_msc, side="left")
+            at_cursor = np.searchsorted(t, self.cursor_msc, side="right") - start
+            start += min(at_cursor, self._seen_at_cursor)
+            t, price = t[start:], price[start:]
+        valid = price > 0  # tick ที่ไม่มีราคาฝั่งนี้ (เช่น ask เปลี่ยนอย่างเดียวใน feed บางแบบ)
+        if len(t):
+            last = t[-1]
+            same = int(np.count_nonzero(t == last))
+            self._seen_at_cursor = same + (self._seen_at_cursor if last == self.cursor_msc else 0)
+            self.cursor_msc = int(last)
+        return t[valid], price[valid], len(t)
+
+    def _ingest(self, t: np.ndarray, price: np.ndarray):
+        if len(t) == 0:
+            return
+        ticks_counter.inc(len(t))
+        for tf, builder in self.builders.items():
+            closed = builder.update(t, price)
+            self._unread[tf] += len(closed)
+            for sub in self._bar_subs:
+                for bar in closed:
+                    sub(tf, bar)
+            if builder.partial is not None:
+                for sub in self._partial_subs:
+                    sub(tf, builder.partial[0])
+
+    def warmup(self, start_s: int, end_s: int):
+        """
+        สร้างแท่งจาก tick ช่วง [start_s, end_s] ด้วย copy_ticks_range แล้วตั้ง cursor ต่อจากนั้น
+        (ไม่มี tick เลย เช่นตลาดปิด → poll เริ่มที่ end_s)
+        """
+        t, price, _ = self._new_ticks(self.fetch_range(self.symbol, start_s, end_s))
+        self._ingest(t, price)
+        if self.cursor_msc is None:
+            self.start_s = int(end_s)
+
+    def poll(self, now_s: Optional[int] = None) -> int:
+        """
+        ดึง tick ใหม่ทั้งหมดตั้งแต่ cursor (วนจนได้น้อยกว่า max_ticks) → คืนจำนวน tick ใหม่
+        ยังไม่มี cursor (ยังไม่เคยได้ tick) → เริ่มที่ start_s จาก warmup หรือ poll ครั้งก่อน
+        ถ้าไม่มีก็ now_s (ค่าเริ่มต้น: เวลาปัจจุบัน) แล้วใช้จุดเดิมจนกว่าจะได้ tick แรก
+        """
+        if self.cursor_msc is None and self.start_s is None:
+            self.start_s = int(time.time()) if now_s is None else int(now_s)
+        total = 0
+        while True:
+            from_s = self.cursor_msc // 1000 if self.cursor_msc is not None else self.start_s
+            ticks = self.fetch(self.symbol, from_s, self.max_ticks)
+            t, price, n_new = self._new_ticks(ticks)
+            self._ingest(t, price)
+            total += n_new
+            if ticks is None or len(ticks) < self.max_ticks or n_new == 0:
+                return total
+
+    def partial(self, timeframe: str) -> Optional[Dict[str, float]]:
+        """
+        แท่งปัจจุบัน (ยังไม่ปิด) ของ timeframe เป็น dict หรือ None ถ้ายังไม่มี tick
+        """
+        p = self.builders[timeframe].partial
+        if p is None:
+            return None
+        row = bars_frame(p).iloc[0]
+        return row.to_dict()
+
+    def bars(self, timeframe: str, n: Optional[int] = None) -> pd.DataFrame:
+        """
+        n แท่งที่ปิดแล้วล่าสุดใน ring (รูปแบบเดียวกับ fetch_candles)
+        """
+        return bars_frame(self.builders[timeframe].ring.last(n))
+
+    def drain_closed(self, timeframe: str) -> pd.DataFrame:
+        """
+        แท่งที่ปิดแล้วตั้งแต่ drain ครั้งก่อน (ถ้าค้างเกิน capacity จะได้แค่ capacity แท่งล่าสุด)
+        """
+        n, self._unread[timeframe] = self._unread[timeframe], 0
+        return self.bars(timeframe, n) if n else bars_frame(np.empty(0, dtype=BAR_DTYPE))
@@ -0,0 +1,137 @@
+import numpy as np
+import pandas as pd
+import yaml
+from pathlib import Path
+from typing import Dict
+
+from src.execution_sim import SPREAD, INTRABAR_RULE, INTRABAR_RULES
+from src.ict_signal import add_ict_columns, signal_levels
+from src.schema import read_feature_csv, to_labels
+
+# โหลด config
+_cfg_path = Path(__file__).resolve().parents[1] / "config" / "config.yaml"
+with open(_cfg_path, "r", encoding="utf-8") as f:
+    cfg = yaml.safe_load(f)
+
+_tb_cfg = cfg.get("triple_barrier", {}) or {}
+MAX_BARS = int(_tb_cfg.get("max_bars", 120))          # time barrier (จำนวนแท่งหลัง entry)
+TB_INTRABAR_RULE = _tb_cfg.get("intrabar_rule", INTRABAR_RULE)
+BLOCK_CELLS = 1 << 22  # จำนวนช่อง (สัญญาณ × แท่ง) ต่อ block ของการค้นหา first touch
+
+# ผลของแต่ละสัญญาณ (คอลัมน์ tb_outcome)
+TP_HIT, TIME_OUT, SL_HIT = 1, 0, -1
+
+
+def profit_barrier(levels: Dict[str, np.ndarray]) -> np.ndarray:
+    """
+    ระดับทำกำไรแรกของ ladder ที่อยู่ฝั่งกำไรของ entry: TP1 ถ้าอยู่ถูกฝั่ง ไม่เช่นนั้น TP2 (entry ± 2×ATR)
+    (TP1 = fib extension 127.2% ซึ่งสำหรับ Sell อยู่เหนือ swing high → ใน live ปิดบางส่วนทันทีไม่ใช่กำไร)
+    """
+    side, entry = levels["side"], levels["entry_price"]
+    ok = (levels["tp1"] - entry) * side > 0
+    return np.where(ok, levels["tp1"], levels["tp2"])
+
+
+def first_touch(high: np.ndarray, low: np.ndarray, open_: np.ndarray, close: np.ndarray,
+                start: np.ndarray, side: np.ndarray, sl: np.ndarray, tp: np.ndarray,
+                max_bars: int = MAX_BARS, spread: float = SPREAD,
+                intrabar_rule: str = TB_INTRABAR_RULE):
+    """
+    หาแท่งแรกที่ราคาแตะ SL หรือ TP ของทุกสัญญาณพร้อมกัน ในแท่ง start .. start + max_bars − 1
+    - ราคาเป็น bid: Buy ออกที่ bid (SL: low ≤ sl, TP: high ≥ tp), Sell ออกที่ ask = bid + spread
+    - ค้นหาเป็นเมทริกซ์ (สัญญาณ × แท่ง) ทีละ block แล้ว argmax ของแต่ละแถว ไม่มี loop ต่อแท่ง
+    - SL และ TP ในแท่งเดียวกัน: ราคาเปิดที่ gap ข้ามระดับชนะก่อน จากนั้นตาม intrabar_rule เดียวกับ
+      execution_sim (ohlc_path: แท่งเขียว O→L→H→C, แท่งแดง O→H→L→C)
+    คืน (outcome int8: 1 TP / −1 SL / 0 หมดเวลา, bars int32: จำนวนแท่งถึง exit หรือถึง time barrier)
+    """
+    if intrabar_rule not in INTRABAR_RULES:
+        raise ValueError(f"intrabar_rule ต้องเป็นหนึ่งใน {INTRABAR_RULES}")
+    n, m = len(high), len(start)
+    outcome = np.zeros(m, dtype=np.int8)
+    bars = np.zeros(m, dtype=np.int32)
+    if m == 0 or max_bars <= 0:
+        return outcome, bars
+
+    steps = np.arange(max_bars)
+    block = max(1, BLOCK_CELLS // max_bars)
+    for b in range(0, m, block):
+        s = slice(b, b + block)
+        offs = start[s, None] + steps
+        valid = offs < n
+        offs = np.minimum(offs, n - 1)
+        buy = side[s, None] > 0
+        lo_, sl_, tp_ = low[offs], sl[s, None], tp[s, None]
+        hi_ = high[offs]
+        sl_hit = valid & np.where(buy, lo_ <= sl_, hi_ + spread >= sl_)
+        tp_hit = valid & np.where(buy, hi_ >= tp_, lo_ + spread <= tp_)
+        first_sl = np.where(sl_hit.any(axis=1), sl_hit.argmax(axis=1), max_bars)
+        first_tp = np.where(tp_hit.any(axis=1), tp_hit.argmax(axis=1), max_bars)
+
+        tp_wins = first_tp < first_sl
+        tie = (first_tp == first_sl) & (first_tp < max_bars)
+        if tie.any():
+            rows = np.flatnonzero(tie)
+            j = offs[rows, first_tp[rows]]
+            is_buy = side[s][rows] > 0
+            o = open_[j]
+            gap_sl = np.where(is_buy, o <= sl[s][rows], o + spread >= sl[s][rows])
+            gap_tp = np.where(is_buy, o >= tp[s][rows], o + spread <= tp[s][rows])
+            if intrabar_rule == "sl_first":
+                path_tp = np.zeros(len(rows), dtype=bool)
+            elif intrabar_rule == "tp_first":
+                path_tp = np.ones(len(rows), dtype=bool)
+            else:
+                green = close[j] >= o
+                path_tp = np.where(is_buy, ~green, green)  # Buy: แท่งแดงไป high ก่อน; Sell: แท่งเขียวไป low ก่อน
+            tp_wins[rows] = ~gap_sl & (gap_tp | path_tp)
+
+        hit = np.minimum(first_sl, first_tp)
+        outcome[s] = np.where(hit >= max_bars, TIME_OUT, np.where(tp_wins, TP_HIT, SL_HIT))
+        available = np.clip(n - start[s], 0, max_bars)
+        bars[s] = np.where(hit < max_bars, hit + 1, available)
+    return outcome, bars
+
+
+def triple_barrier_labels(df: pd.DataFrame, max_bars: int = MAX_BARS, spread: float = SPREAD,
+                          intrabar_rule: str = TB_INTRABAR_RULE) -> pd.DataFrame:
+    """
+    เติม label ตามผลจริงของสัญญาณ ICT (triple barrier):
+      - สัญญาณ = แถวที่ generate_ict_signal คืนค่า (SL/TP จาก signal_levels ชุดเดียวกัน)
+      - เข้า ณ แท่งสัญญาณ ถือตั้งแต่แท่งถัดไป: แตะ TP ก่อน → label = side, แตะ SL ก่อนหรือครบ max_bars → NoTrade
+    คอลัมน์เพิ่ม: tb_outcome (1 TP / −1 SL / 0 หมดเวลาหรือไม่มีสัญญาณ), tb_bars (แท่งถึง exit)
+    """
+    df = add_ict_columns(df)
+    levels = signal_levels(df)
+    idx = levels["index"]
+    arr = lambda name: df[name].to_numpy(dtype=np.float64)
+    outcome, bars = first_touch(arr("high"), arr("low"), arr("open"), arr("close"), idx + 1,
+                                levels["side"], levels["sl"], profit_barrier(levels),
+                                max_bars, spread, intrabar_rule)
+
+    codes = np.zeros(len(df), dtype=np.int8)  # 0 = NoTrade, 1 = Buy, 2 = Sell (ลำดับ schema.LABELS)
+    won = outcome == TP_HIT
+    codes[idx[won]] = np.where(levels["side"][won] > 0, 1, 2)
+    df["label"] = pd.Categorical.from_codes(codes, dtype=to_labels([]).dtype)
+    df["tb_outcome"] = np.zeros(len(df), dtype=np.int8)
+    df["tb_bars"] = np.zeros(len(df), dtype=np.int32)
+    df.loc[idx, "tb_outcome"] = outcome
+    df.loc[idx, "tb_bars"] = bars
+    return df
+
+
+def label_triple_barrier(input_path: str, output_path: str, max_bars: int = MAX_BARS):
+    """
+    อ่านไฟล์ features → triple-barrier label → บันทึก CSV (คอลัมน์ features เดิม + label, tb_outcome, tb_bars)
+    """
+    df = read_feature_csv(input_path)
+    df = df.sort_values("time").reset_index(drop=True)
+    df = triple_barrier_labels(df, max_bars)
+    Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+    df.to_csv(output_path, index=False)
+    counts = df["tb_outcome"][df["tb_bars"] > 0].value_counts().to_dict()
+    print(f"Labels (triple barrier) saved to {output_path} "
+          f"(TP={counts.get(TP_HIT, 0)}, SL={counts.get(SL_HIT, 0)}, timeout={counts.get(TIME_OUT, 0)})")
+
+
+if __name__ == "__main__":
+    label_triple_barrier(cfg["features_data_path"], cfg.get("dataset_path", "data/with_labels.csv"))
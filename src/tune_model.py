@@ -4,13 +4,15 @@ from pathlib import Path
 from xgboost import XGBClassifier
 from sklearn.model_selection import train_test_split, GridSearchCV
 
+from src.schema import read_feature_csv, label_codes
+
 # โหลด config
 _cfg_path = Path(__file__).resolve().parents[1] / "config" / "config.yaml"
 with open(_cfg_path, "r", encoding="utf-8") as f:
     cfg = yaml.safe_load(f)
 
 # โหลด dataset จากไฟล์ ICT‐based labels
-df = pd.read_csv(cfg["dataset_path"])  # data/with_labels_ict.csv
+df = read_feature_csv(cfg["dataset_path"])  # data/with_labels_ict.csv
 
 # ฟีเจอร์เดียวกันกับ model_trainer.py
 FEATURE_COLS = [
@@ -24,13 +26,13 @@ FEATURE_COLS = [
     "fvg_bullish", "fvg_bearish"
 ]
 
-# แปลง boolean เป็น int
+# แปลง boolean เป็น uint8
 for col in ["mss_bullish", "mss_bearish", "fvg_bullish", "fvg_bearish"]:
     if col in df.columns:
-        df[col] = df[col].astype(int)
+        df[col] = df[col].astype("uint8")
 
 X = df[FEATURE_COLS]
-y = df["label"].map({"Buy": 1, "Sell": 2, "NoTrade": 0})
+y = label_codes(df["label"])
 
 # แบ่งข้อมูล train/test 80/20 (stratify ถ้าเป็นไปได้)
 try:
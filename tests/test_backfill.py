@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.backfill import backfill, split_ranges
+
+RATES_DTYPE = np.dtype([("time", np.int64), ("open", np.float64), ("high", np.float64),
+                        ("low", np.float64), ("close", np.float64), ("tick_volume", np.int64),
+                        ("spread", np.int32), ("real_volume", np.int64)])
+
+
+def all_bars(start="2025-01-03", end="2025-01-09"):
+    """
+    แท่ง M1 จำลอง (ไม่มีแท่งวันเสาร์–อาทิตย์)
+    """
+    times = pd.date_range(start, end, freq="1min", inclusive="left")
+    times = times[times.dayofweek < 5]
+    close = 2000 + np.arange(len(times)) * 0.01
+    return pd.DataFrame({"time": times, "open": close, "high": close + 0.5, "low": close - 0.5,
+                         "close": close, "tick_volume": np.arange(len(times)) % 50 + 1})
+
+
+class FakeRates:
+    """
+    จำลอง copy_rates_range: คืนแท่งใน [start, end] (รวมขอบขวาเหมือน MT5), fail ตามที่ตั้งไว้
+    """
+
+    def __init__(self, bars, fail_starts=()):
+        self.bars = bars
+        self.fail_starts = set(pd.Timestamp(s) for s in fail_starts)
+        self.calls = []
+
+    def __call__(self, symbol, timeframe, start, end):
+        self.calls.append(start)
+        if start in self.fail_starts:
+            return None
+        sel = self.bars[(self.bars["time"] >= start) & (self.bars["time"] <= end)]
+        rates = np.zeros(len(sel), dtype=RATES_DTYPE)
+        rates["time"] = sel["time"].astype("int64") // 10**9
+        for col in ["open", "high", "low", "close", "tick_volume"]:
+            rates[col] = sel[col]
+        return rates
+
+
+def test_backfill_resumes_after_failed_chunk(tmp_path):
+    bars = all_bars()
+    hist = tmp_path / "historical.csv"
+    assert len(split_ranges("2025-01-03", "2025-01-09", 1)) == 6
+
+    flaky = FakeRates(bars, fail_starts=["2025-01-07"])
+    with pytest.raises(RuntimeError):
+        backfill("2025-01-03", "2025-01-09", "XAUUSD", "M1", hist, chunk_days=1, workers=3,
+                 retries=0, fetch=flaky)
+    checkpoint = tmp_path / "historical.csv.backfill.json"
+    assert checkpoint.exists()
+    # แถวครึ่ง ๆ จากรอบที่ล้มเหลวต้องถูกตัดทิ้งตอน resume
+    with open(hist, "a") as f:
+        f.write("2025-01-07 00:00:00,1,1")
+
+    fetch = FakeRates(bars)
+    summary = backfill("2025-01-03", "2025-01-09", "XAUUSD", "M1", hist, chunk_days=1, workers=3,
+                       retries=0, fetch=fetch)
+    # resume เริ่มที่ chunk ที่ล้มเหลว ไม่ดึง chunk ที่เขียนแล้วซ้ำ
+    assert min(fetch.calls) == pd.Timestamp("2025-01-07")
+    assert not checkpoint.exists()
+    assert summary["bars"] == len(bars) and summary["bars_per_s"] > 0
+    out = pd.read_csv(hist, parse_dates=["time"])
+    pd.testing.assert_frame_equal(out, bars, check_dtype=False)
+
+
+def test_backfill_before_existing_history_merges(tmp_path):
+    bars = all_bars()
+    hist = tmp_path / "historical.csv"
+    recent = bars[bars["time"] >= "2025-01-08"]
+    recent.to_csv(hist, index=False)
+
+    backfill("2025-01-03", "2025-01-08 12:00", "XAUUSD", "M1", hist, chunk_days=2, workers=2,
+             fetch=FakeRates(bars))
+    out = pd.read_csv(hist, parse_dates=["time"])
+    pd.testing.assert_frame_equal(out, bars, check_dtype=False)
+    assert not (tmp_path / "historical.csv.backfill.csv").exists()
@@ -40,3 +40,65 @@ def test_build_labels(tmp_path):
     assert "label" in df_out.columns
     # ค่า label ควรเป็น str ทั้งหมด
     assert all(isinstance(x, str) for x in df_out["label"])
+
+def test_build_labels_on_compute_features_output(tmp_path):
+    """
+    ไฟล์จาก compute_features ต้องมี adx / fib_in_zone ครบสำหรับ build_labels
+    """
+    from src.features import compute_features
+    from src.synthetic_data import generate_xauusd_m1
+
+    hist = tmp_path / "hist.csv"
+    generate_xauusd_m1(300, seed=5).to_csv(hist, index=False)
+    feat = tmp_path / "features.csv"
+    compute_features(str(hist), str(feat), chunk_size=None)
+    df_feat = pd.read_csv(feat)
+    assert df_feat["adx"].notna().sum() == 300 - 27  # ADX(14) lookback = 27 แท่ง
+    assert df_feat["fib_in_zone"].any()
+
+    output_file = tmp_path / "labels.csv"
+    build_labels(str(feat), str(output_file))
+    assert len(pd.read_csv(output_file)) == 300
+
+def test_label_matrix_matches_single_label_runs(tmp_path, monkeypatch):
+    """
+    label matrix ทุกคู่ horizon × multiplier ต้องเท่ากับ build_labels ที่ตั้ง H / k_atr ทีละค่า
+    """
+    import numpy as np
+    import src.build_labels as bl
+    from src.schema import label_codes, read_feature_csv
+
+    rng = np.random.default_rng(0)
+    n = 2000
+    close = 2000 + np.cumsum(rng.normal(0, 1, n))
+    # ค่าตัวกรองสุ่มให้ผ่านได้บ่อย (ข้อมูลจริงแทบไม่มีแถวที่ผ่านครบทุกขั้น)
+    df = pd.DataFrame({
+        "time": pd.date_range("2025-01-01", periods=n, freq="min"),
+        "open": close + rng.normal(0, 0.3, n), "high": close + 1, "low": close - 1, "close": close,
+        "tick_volume": 10, "ema50_h4": rng.choice([1.0, 2.0], n), "ema200_h4": 1.5,
+        "rsi_h4": rng.choice([40.0, 60.0], n), "vwap": close + rng.normal(0, 2, n),
+        "atr": rng.uniform(0.5, 3, n), "bb_lower": close + rng.normal(0, 1, n),
+        "bb_upper": close + rng.normal(0, 1, n), "atr_ma": rng.uniform(0.5, 3, n),
+        "rsi": rng.uniform(0, 100, n), "adx": rng.uniform(0, 50, n),
+        "mss_bullish": rng.random(n) < 0.5, "mss_bearish": rng.random(n) < 0.5,
+        "fvg_bullish": rng.random(n) < 0.5, "fvg_bearish": rng.random(n) < 0.5,
+        "fib_in_zone": rng.random(n) < 0.5, "vol_imbalance": rng.uniform(-0.5, 0.5, n),
+    })
+    df.loc[rng.random(n) < 0.05, "atr"] = np.nan
+    feat = tmp_path / "features.csv"
+    df.to_csv(feat, index=False)
+
+    matrix_path = tmp_path / "label_matrix.csv"
+    cols = bl.build_label_matrix(str(feat), str(matrix_path), horizons=[1, 5, 10], multipliers=[0.25, 1.0])
+    matrix = read_feature_csv(matrix_path)
+    assert cols == [bl.matrix_column(h, k) for h in (1, 5, 10) for k in (0.25, 1.0)]
+    assert all(matrix[c].dtype == np.int8 for c in cols)
+
+    for h in (1, 5, 10):
+        for k in (0.25, 1.0):
+            monkeypatch.setattr(bl, "H", h)
+            monkeypatch.setattr(bl, "k_atr", k)
+            bl.build_labels(str(feat), str(tmp_path / "labels.csv"))
+            expected = label_codes(read_feature_csv(tmp_path / "labels.csv")["label"])
+            np.testing.assert_array_equal(matrix[bl.matrix_column(h, k)].to_numpy(), expected.to_numpy())
+            assert (expected[n - h:] == 0).all() and (expected > 0).sum() > 10
@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+
+from src.candle_index import CandleIndex, MarketHours, resync
+from src.features import compute_features_chunked
+from src.label_ict import label_ict
+from src.stage_cache import StageCache, cached_features, cached_labels
+from src.synthetic_data import generate_xauusd_m1
+
+RATES_DTYPE = np.dtype([("time", np.int64), ("open", np.float64), ("high", np.float64),
+                        ("low", np.float64), ("close", np.float64), ("tick_volume", np.int64)])
+
+
+def fake_rates(df):
+    """
+    จำลอง copy_rates_range จากแท่งใน df (รวมขอบขวาเหมือน MT5)
+    """
+    calls = []
+
+    def fetch(symbol, timeframe, start, end):
+        calls.append((start, end))
+        sel = df[(df["time"] >= start) & (df["time"] <= end)]
+        rates = np.zeros(len(sel), dtype=RATES_DTYPE)
+        rates["time"] = sel["time"].astype("int64") // 10**9
+        for col in ["open", "high", "low", "close", "tick_volume"]:
+            rates[col] = sel[col]
+        return rates
+    fetch.calls = calls
+    return fetch
+
+
+def test_gaps_skip_market_closures_and_refresh_appends(tmp_path):
+    # ศุกร์ 20:00 → จันทร์ 03:00 (ข้ามเสาร์–อาทิตย์) พักทุกวัน 23:58–01:00
+    times = pd.date_range("2025-01-03 20:00", "2025-01-06 03:00", freq="min", inclusive="left")
+    hours = MarketHours(closed_weekdays=[5, 6], daily_break=["23:58", "01:00"])
+    times = times[hours.is_open(times.values.astype("datetime64[s]").astype(np.int64))]
+    df = pd.DataFrame({"time": times, "open": 1.0, "high": 2.0, "low": 0.5, "close": 1.5, "tick_volume": 10})
+    hist = tmp_path / "historical.csv"
+    drop = (df["time"] >= "2025-01-03 21:10") & (df["time"] < "2025-01-03 21:25")
+    df[~drop].iloc[:-30].to_csv(hist, index=False)
+
+    index = CandleIndex.from_csv(hist, hours=hours)
+    assert index.gaps() == [(pd.Timestamp("2025-01-03 21:10"), pd.Timestamp("2025-01-03 21:25"))]
+    assert index.gaps(since="2025-01-03 22:00") == []
+
+    df[~drop].iloc[-30:].to_csv(hist, mode="a", header=False, index=False)
+    assert index.refresh() == 30 and len(index) == (~drop).sum()
+    assert index.row_of("2025-01-06 01:00") == (df[~drop]["time"] < "2025-01-06 01:00").sum()
+    # หลุดการเชื่อมต่อช่วงท้าย (ก่อนเวลา until) ก็นับเป็นช่องว่าง
+    assert index.gaps(since="2025-01-06 02:00", until="2025-01-06 03:05") == [
+        (pd.Timestamp("2025-01-06 03:00"), pd.Timestamp("2025-01-06 03:05"))]
+
+
+def test_resync_splices_gap_and_recomputes_only_tail(tmp_path):
+    df = generate_xauusd_m1(2700, seed=5)
+    hist, feat, lab = tmp_path / "historical.csv", tmp_path / "features.csv", tmp_path / "labels.csv"
+    cache = StageCache(tmp_path / "cache")
+
+    df.iloc[:2490].to_csv(hist, index=False)
+    assert cached_features(cache, hist, feat) == "miss"
+    assert cached_labels(cache, feat, lab, overlap=300) == "miss"
+    # หลุดการเชื่อมต่อ 40 แท่ง: live loop ต่อท้ายด้วยแท่งหลังกลับมาเชื่อมต่อ
+    df.iloc[2530:].to_csv(hist, mode="a", header=False, index=False)
+    assert cached_features(cache, hist, feat) == "partial"
+    assert cached_labels(cache, feat, lab, overlap=300) == "partial"
+
+    index = CandleIndex.from_csv(hist)
+    fetch = fake_rates(df)
+    report = resync(index, since=df["time"].iloc[2400], fetch=fetch, cache=cache,
+                    features_path=str(feat), labels_path=str(lab))
+    assert report == {"gaps": 1, "missing": 40, "bars": 40, "first_row": 2490}
+    assert fetch.calls == [(df["time"].iloc[2490], df["time"].iloc[2530])]
+    assert hist.read_bytes() == df.to_csv(index=False).encode()
+    assert index.gaps() == [] and index.offsets[-1] == hist.stat().st_size
+
+    # stage cache ย้อนไปที่ state ของ 2490 แถวแรก → คำนวณต่อเฉพาะช่วงท้าย
+    assert cached_features(cache, hist, feat) == "partial"
+    assert cached_labels(cache, feat, lab, overlap=300) == "partial"
+    compute_features_chunked(str(hist), str(tmp_path / "full_features.csv"))
+    assert feat.read_bytes() == (tmp_path / "full_features.csv").read_bytes()
+    label_ict(str(tmp_path / "full_features.csv"), str(tmp_path / "full_labels.csv"))
+    pd.testing.assert_frame_equal(pd.read_csv(lab), pd.read_csv(tmp_path / "full_labels.csv"),
+                                  check_dtype=False, rtol=1e-6)
@@ -137,3 +137,25 @@ def test_decision_engine_xgb_fallback(monkeypatch):
     assert result["source"] == "XGB"
     assert result["side"] == "Sell"
     assert abs(result["confidence"] - 0.7) < 1e-6
+
+def test_decision_engine_online_proba(monkeypatch):
+    """
+    เมื่อส่ง online_learner ให้ DecisionEngine → ผลลัพธ์ต้องมี online_proba จาก learner
+    และเมื่อไม่ส่ง → online_proba เป็น None
+    """
+    df = build_dummy_df_for_decision()
+
+    import src.decision_engine as de_mod
+    monkeypatch.setattr(de_mod, "generate_ict_signal", lambda df_local, idx: None)
+
+    class FakeLearner:
+        def predict_proba(self, features):
+            assert set(features) == set(FEATURE_COLS)
+            return 0.8
+
+    result = DecisionEngine(online_learner=FakeLearner()).predict(df, idx=30)
+    assert result["source"] == "XGB"
+    assert abs(result["online_proba"] - 0.8) < 1e-9
+
+    result = DecisionEngine().predict(df, idx=30)
+    assert result["online_proba"] is None
@@ -0,0 +1,106 @@
+import pandas as pd
+import pytest
+
+from src.execution_sim import MarketArrays, simulate_trade
+
+
+def make_market(bars, vwap=200.0, atr=1.0, bearish_mss_at=None):
+    """
+    สร้าง MarketArrays จาก list ของ (open, high, low, close)
+    ค่าเริ่มต้น vwap อยู่เหนือราคามาก → Buy ไม่เกิด breakeven/TP3 (Sell ให้ส่ง vwap ต่ำ ๆ แทน)
+    """
+    n = len(bars)
+    df = pd.DataFrame(bars, columns=["open", "high", "low", "close"])
+    df["time"] = pd.date_range("2025-01-06 08:00", periods=n, freq="min")
+    df["vwap"] = vwap
+    df["atr"] = atr
+    df["mss_bullish"] = False
+    df["mss_bearish"] = False
+    if bearish_mss_at is not None:
+        df.loc[bearish_mss_at, "mss_bearish"] = True
+    return MarketArrays(df)
+
+
+NO_COSTS = dict(spread=0.0, slippage=0.0, breakeven_close_fraction=0.0)
+
+
+def test_same_bar_sl_and_tp_follows_intrabar_rule():
+    """
+    แท่งเดียวแตะทั้ง TP1 และ SL: sl_first ขาดทุนเต็ม, tp_first ได้ TP1 ก่อนแล้วโดน SL ใหม่,
+    ohlc_path ของแท่งเขียวเดิน O→L→H→C จึงโดน SL ก่อน
+    """
+    # entry ที่ 100, SL 99, TP1 101, TP2 105; แท่งถัดไป (เขียว) แตะทั้ง 98.5 และ 101.5
+    m = make_market([(100, 100, 100, 100), (100, 101.5, 98.5, 100.5), (100.5, 100.6, 100.4, 100.5)])
+    args = (m, "Buy", 0, 100.0, 99.0, 101.0, 105.0)
+
+    sl_first = simulate_trade(*args, intrabar_rule="sl_first", **NO_COSTS)
+    assert sl_first["exit_reason"] == "sl"
+    assert sl_first["pnl"] == pytest.approx(-1.0)
+
+    tp_first = simulate_trade(*args, intrabar_rule="tp_first", **NO_COSTS)
+    # 1/3 ที่ TP1 (+1) แล้ว SL ถูกเลื่อนเป็น 100.5 และโดนในแท่งเดียวกัน → 2/3 ที่ +0.5
+    assert tp_first["tp1_hit"] and tp_first["exit_reason"] == "sl"
+    assert tp_first["pnl"] == pytest.approx(1 / 3 * 1.0 + 2 / 3 * 0.5, abs=1e-3)
+
+    ohlc = simulate_trade(*args, intrabar_rule="ohlc_path", **NO_COSTS)
+    assert ohlc["pnl"] == pytest.approx(sl_first["pnl"])
+    assert ohlc["mae"] == pytest.approx(1.5) and ohlc["mfe"] == pytest.approx(1.5)
+
+
+def test_partial_tp_ladder_and_reverse_mss():
+    """
+    ราคาไต่ขึ้นผ่าน TP1 → TP2 แล้วเกิด reverse MSS → ปิดส่วนที่เหลือที่ราคาปิด
+    """
+    bars = [(100, 100, 100, 100), (100, 101.2, 99.8, 101.1), (101.1, 102.2, 101.0, 102.0),
+            (102.0, 102.1, 101.5, 101.8), (101.8, 101.9, 101.6, 101.7)]
+    m = make_market(bars, bearish_mss_at=3)
+    res = simulate_trade(m, "Buy", 0, 100.0, 99.0, 101.0, 102.0, intrabar_rule="sl_first", **NO_COSTS)
+    assert res["tp1_hit"] and res["tp2_hit"] and not res["tp3_hit"]
+    assert res["exit_reason"] == "reverse_mss"
+    assert res["exit_index"] == 3
+    assert res["n_fills"] == 3
+    expected = 0.3333 * 1.0 + 0.3333 * 2.0 + (1 - 0.6666) * 1.8
+    assert res["pnl"] == pytest.approx(expected, abs=1e-3)
+
+
+def test_spread_and_slippage_make_fills_worse():
+    """
+    Sell เข้าที่ bid − slippage และออกที่ ask (+spread) → pnl ต่ำกว่ากรณีไม่มีต้นทุน
+    """
+    bars = [(100, 100, 100, 100)] + [(100 - 0.1 * i, 100 - 0.1 * i + 0.05, 100 - 0.1 * i - 0.05, 100 - 0.1 * i)
+                                     for i in range(1, 40)]
+    m = make_market(bars, vwap=0.0)
+    free = simulate_trade(m, "Sell", 0, 100.0, 101.0, 98.0, 97.0, **NO_COSTS)
+    costly = simulate_trade(m, "Sell", 0, 100.0, 101.0, 98.0, 97.0, spread=0.2, slippage=0.05,
+                            breakeven_close_fraction=0.0)
+    assert free["entry_price"] == pytest.approx(100.0)
+    assert costly["entry_price"] == pytest.approx(99.95)
+    assert costly["pnl"] < free["pnl"]
+    # TP ของ Sell ต้องรอ ask (low + spread) แตะระดับ → ออกช้ากว่า
+    assert costly["exit_index"] >= free["exit_index"]
+
+
+def test_max_hold_and_invalid_rule():
+    bars = [(100, 100.2, 99.8, 100)] * 10
+    m = make_market(bars)
+    res = simulate_trade(m, "Buy", 0, 100.0, 95.0, 110.0, 120.0, max_hold_bars=3, **NO_COSTS)
+    assert res["exit_reason"] == "max_hold" and res["exit_index"] == 3
+    with pytest.raises(ValueError):
+        simulate_trade(m, "Buy", 0, 100.0, 95.0, 110.0, 120.0, intrabar_rule="random")
+
+
+def test_signal_on_last_bar_exits_at_its_close_without_intrabar_checks():
+    """
+    entry ที่แท่งสุดท้าย: high/low ของแท่งนั้นแตะทั้ง SL และ TP แต่ต้องไม่ถูกใช้ → ปิดที่ราคาปิด
+    """
+    m = make_market([(100, 101, 99, 100), (100, 110, 90, 102)])
+    res = simulate_trade(m, "Buy", 1, 100.0, 95.0, 105.0, 108.0, **NO_COSTS)
+    assert res["exit_reason"] == "end_of_data" and res["bars_held"] == 0 and res["n_fills"] == 1
+    assert res["exit_price"] == pytest.approx(102.0) and res["pnl"] == pytest.approx(2.0)
+    assert not res["tp1_hit"] and res["mae"] == 0.0
+
+    # Sell: เข้าที่ bid ออกที่ ask (+spread) หัก slippage
+    res = simulate_trade(m, "Sell", 1, 100.0, 105.0, 95.0, 92.0, spread=0.2, slippage=0.05)
+    assert res["exit_reason"] == "end_of_data"
+    assert res["entry_price"] == pytest.approx(99.95) and res["exit_price"] == pytest.approx(102.25)
+    assert res["pnl"] == pytest.approx(99.95 - 102.25)
@@ -0,0 +1,110 @@
+import numpy as np
+import pandas as pd
+import pytest
+import xgboost as xgb
+
+import src.feature_analysis as fa
+from src.feature_analysis import (
+    StreamingHistogram,
+    population_stability_index,
+    ks_statistic,
+    compute_contributions,
+    compute_drift,
+    analyze_features,
+)
+from src.decision_engine import FEATURE_COLS
+
+
+def build_feature_csv(path, n=500, shift=0.0, seed=0):
+    """
+    สร้างไฟล์ฟีเจอร์สุ่มตาม FEATURE_COLS (ค่า atr เลื่อนได้ด้วย shift เพื่อจำลอง drift)
+    """
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame(rng.normal(size=(n, len(FEATURE_COLS))), columns=FEATURE_COLS)
+    df["atr"] += shift
+    for col in ["mss_bullish", "mss_bearish", "fvg_bullish", "fvg_bearish"]:
+        df[col] = df[col] > 0
+    df.insert(0, "time", pd.date_range("2025-01-01", periods=n, freq="min"))
+    df["label"] = np.where(df["atr"] > shift + 0.5, "Buy", np.where(df["atr"] < shift - 0.5, "Sell", "NoTrade"))
+    df.to_csv(path, index=False)
+    return df
+
+
+def train_dummy_model(df, path):
+    """
+    เทรน XGBClassifier เล็ก ๆ บนฟีเจอร์ที่สร้างขึ้น แล้วบันทึกเป็น .json
+    """
+    X = df[FEATURE_COLS].astype(float)
+    y = df["label"].map({"NoTrade": 0, "Buy": 1, "Sell": 2})
+    clf = xgb.XGBClassifier(objective="multi:softprob", n_estimators=10, max_depth=2)
+    clf.fit(X, y)
+    clf.save_model(str(path))
+
+
+def test_psi_and_ks_from_streaming_histograms():
+    """
+    ข้อมูลชุดเดียวกัน → PSI/KS ≈ 0, ข้อมูลที่เลื่อนค่า → PSI/KS สูง
+    """
+    rng = np.random.default_rng(1)
+    ref_vals = rng.normal(size=20000)
+    edges = np.quantile(ref_vals, np.linspace(0, 1, 11)[1:-1])
+
+    ref = StreamingHistogram(edges)
+    same = StreamingHistogram(edges)
+    shifted = StreamingHistogram(edges)
+    # อัปเดตทีละ chunk เพื่อทดสอบ streaming
+    for part in np.array_split(ref_vals, 7):
+        ref.update(part)
+    same.update(rng.normal(size=20000))
+    shifted.update(rng.normal(loc=1.0, size=20000))
+
+    assert population_stability_index(ref, same) < 0.01
+    assert ks_statistic(ref, same) < 0.03
+    assert population_stability_index(ref, shifted) > 0.25
+    assert ks_statistic(ref, shifted) > 0.3
+
+
+def test_contributions_and_drift(tmp_path):
+    ref_df = build_feature_csv(tmp_path / "ref.csv", seed=0)
+    build_feature_csv(tmp_path / "cur.csv", shift=2.0, seed=1)
+    model_path = tmp_path / "model.json"
+    train_dummy_model(ref_df, model_path)
+
+    imp = compute_contributions(str(model_path), str(tmp_path / "ref.csv"), batch_size=128)
+    assert list(imp.columns) == ["feature", "gain", "total_gain", "mean_abs_contrib"]
+    assert imp.attrs["n_rows"] == len(ref_df)
+    # label ถูกสร้างจาก atr → atr ต้องสำคัญที่สุด
+    assert imp.iloc[0]["feature"] == "atr"
+
+    drift = compute_drift(str(tmp_path / "ref.csv"), str(tmp_path / "cur.csv"), chunksize=128)
+    assert drift.iloc[0]["feature"] == "atr"
+    assert drift.iloc[0]["psi"] > 1.0
+    assert (drift.set_index("feature").drop("atr")["psi"] < 0.5).all()
+
+
+def test_analyze_features_uses_cache(tmp_path, monkeypatch):
+    ref_df = build_feature_csv(tmp_path / "ref.csv")
+    model_path = tmp_path / "model.json"
+    train_dummy_model(ref_df, model_path)
+    cur_range = ("2025-01-01 04:00", None)
+
+    first = analyze_features(str(model_path), str(tmp_path / "ref.csv"), str(tmp_path / "ref.csv"),
+                             current_range=cur_range, cache_dir=str(tmp_path / "cache"))
+    assert first["cached"] is False
+
+    # ครั้งที่สองต้องไม่คำนวณใหม่
+    def fail(*args, **kwargs):
+        raise AssertionError("should be served from cache")
+    monkeypatch.setattr(fa, "compute_contributions", fail)
+    monkeypatch.setattr(fa, "compute_drift", fail)
+
+    second = analyze_features(str(model_path), str(tmp_path / "ref.csv"), str(tmp_path / "ref.csv"),
+                              current_range=cur_range, cache_dir=str(tmp_path / "cache"))
+    assert second["cached"] is True
+    assert second["key"] == first["key"]
+    assert second["drift"] == first["drift"]
+
+    # เปลี่ยนช่วงข้อมูล → key ใหม่ → ต้องคำนวณใหม่
+    with pytest.raises(AssertionError):
+        analyze_features(str(model_path), str(tmp_path / "ref.csv"), str(tmp_path / "ref.csv"),
+                         current_range=("2025-01-01 05:00", None), cache_dir=str(tmp_path / "cache"))
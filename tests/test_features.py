@@ -43,3 +43,97 @@ def test_compute_features(tmp_path):
     ]
     for col in expected_cols:
         assert col in df_out.columns
+
+def test_compute_features_chunked_matches_in_memory(tmp_path):
+    """
+    คำนวณแบบ chunked (chunk เล็กกว่าแท่ง H4 และไม่ตรงขอบ H4) ต้องได้ผลเท่ากับแบบทั้งไฟล์
+    ทั้งลำดับคอลัมน์ จำนวนแถว และค่า (ภายใน floating-point tolerance)
+    """
+    import numpy as np
+
+    rng = np.random.default_rng(0)
+    times = pd.date_range("2025-01-01 00:03", periods=6000, freq="T")
+    times = times[rng.random(len(times)) > 0.05]  # จำลองแท่งที่หายไป
+    n = len(times)
+    close = 2000 + np.cumsum(rng.normal(0, 0.5, n))
+    open_ = close + rng.normal(0, 0.2, n)
+    df = pd.DataFrame({
+        "time": times,
+        "open": open_,
+        "high": np.maximum(open_, close) + rng.random(n),
+        "low": np.minimum(open_, close) - rng.random(n),
+        "close": close,
+        "tick_volume": rng.integers(0, 50, n),
+    })
+    input_file = tmp_path / "hist.csv"
+    df.to_csv(input_file, index=False)
+
+    compute_features(str(input_file), str(tmp_path / "full.csv"), chunk_size=None)
+    compute_features(str(input_file), str(tmp_path / "chunked.csv"), chunk_size=173)
+
+    full = pd.read_csv(tmp_path / "full.csv")
+    chunked = pd.read_csv(tmp_path / "chunked.csv")
+    assert list(full.columns) == list(chunked.columns)
+    assert len(full) == len(chunked)
+    for col in full.columns:
+        if full[col].dtype.kind == "f":
+            # ไฟล์ output เป็น float32 → ต่างกันได้ไม่เกิน ~1 ulp จากการปัดเศษ
+            assert np.allclose(full[col], chunked[col], rtol=1e-6, atol=1e-6, equal_nan=True), col
+        else:
+            assert (full[col] == chunked[col]).all(), col
+
+def test_ict_columns_streamed_across_tiny_chunks(tmp_path):
+    """
+    คอลัมน์ ICT ที่โมเดลใช้ต้องไม่ใช่ค่าคงที่ และ chunk ที่เล็กกว่า swing window
+    (swing ยืนยันใน chunk ถัดจาก pivot) ต้องได้ผลเท่ากับแบบทั้งไฟล์
+    """
+    import numpy as np
+    from src.ict_signal import ICT_COLUMNS
+
+    rng = np.random.default_rng(1)
+    n = 300
+    steps = np.repeat(rng.choice([-1.0, 1.0], n // 20), 20) * 0.6 + rng.normal(0, 0.4, n)
+    close = 2000 + np.cumsum(steps)
+    open_ = close - steps * rng.uniform(0.5, 1.0, n)
+    df = pd.DataFrame({
+        "time": pd.date_range("2025-01-01 00:01", periods=n, freq="T"),
+        "open": open_,
+        "high": np.maximum(open_, close) + rng.uniform(0, 0.2, n),
+        "low": np.minimum(open_, close) - rng.uniform(0, 0.2, n),
+        "close": close,
+        "tick_volume": rng.integers(50, 200, n),
+    })
+    input_file = tmp_path / "hist.csv"
+    df.to_csv(input_file, index=False)
+
+    compute_features(str(input_file), str(tmp_path / "full.csv"), chunk_size=None)
+    full = pd.read_csv(tmp_path / "full.csv")
+    for col in ("mss_bullish", "mss_bearish", "fvg_bullish", "fvg_bearish"):
+        assert full[col].nunique() == 2, col
+
+    for chunk_size in (2, 7):
+        out = tmp_path / f"chunked_{chunk_size}.csv"
+        compute_features(str(input_file), str(out), chunk_size=chunk_size)
+        chunked = pd.read_csv(out)
+        assert list(chunked.columns) == list(full.columns)
+        pd.testing.assert_frame_equal(chunked[ICT_COLUMNS], full[ICT_COLUMNS], rtol=1e-6)
+
+def test_add_htf_features_uses_completed_bars_only():
+    """
+    ค่า HTF ต้องมาจากแท่งที่ปิดแล้วเท่านั้น:
+    แถว 07:58 ยังเห็นแท่ง H1 06:00, แถว 07:59 (แท่ง M1 สุดท้ายของ 07:00) เห็นแท่ง 07:00
+    """
+    import numpy as np
+    from src.features import add_htf_features
+
+    times = pd.date_range("2025-01-01 00:00", periods=60 * 24, freq="T")
+    df = pd.DataFrame({"time": times, "close": np.arange(len(times), dtype=float)})
+    add_htf_features(df, timeframes=["H1", "D1"], base_timeframe="M1")
+
+    assert {"ema50_h1", "ema200_h1", "rsi_h1", "ema50_d1"}.issubset(df.columns)
+    # close ขึ้นตลอด → RSI ของแท่งที่ปิดแล้วเป็น 100 ตั้งแต่แท่ง H1 ที่ 15 (index 14)
+    rsi = df.set_index("time")["rsi_h1"]
+    assert np.isnan(rsi[pd.Timestamp("2025-01-01 14:58")])
+    assert rsi[pd.Timestamp("2025-01-01 14:59")] == 100
+    # แท่ง D1 แรกยังไม่ปิดจนแถวสุดท้ายของวัน
+    assert df["ema50_d1"].isna().all()
@@ -78,3 +78,87 @@ def test_generate_ict_signal():
     assert sig is not None
     assert sig["side"] == "Buy"
     assert "entry_price" in sig and "sl" in sig and "tp1" in sig
+
+def build_trending_df(n=3000, seed=1):
+    """
+    ราคาเป็นช่วงขึ้น/ลงต่อเนื่อง 20 แท่ง → มี swing, MSS และ FVG ทั้งสองฝั่งจำนวนมาก
+    """
+    rng = np.random.default_rng(seed)
+    steps = np.repeat(rng.choice([-1.0, 1.0], n // 20), 20) * 0.6 + rng.normal(0, 0.4, n)
+    close = 2000 + np.cumsum(steps)
+    open_ = close - steps * rng.uniform(0.5, 1.0, n)
+    times = pd.date_range("2025-01-06 07:00", periods=n, freq="8s")  # อยู่ใน session ทั้งหมด
+    return pd.DataFrame({
+        "time": times,
+        "open": open_,
+        "high": np.maximum(open_, close) + rng.uniform(0, 0.2, n),
+        "low": np.minimum(open_, close) - rng.uniform(0, 0.2, n),
+        "close": close,
+        "tick_volume": rng.integers(50, 200, n),
+        "atr": rng.uniform(2.0, 4.0, n),
+        "vwap": close,
+        "ema50_h4": 105.0, "ema200_h4": 100.0, "rsi_h4": 55.0,
+    })
+
+def test_add_ict_columns_matches_loop_implementation():
+    """
+    pass แบบ vectorized (swing → MSS → FVG → fib zone → pullback) ต้องเท่ากับฟังก์ชันแบบลูปเดิม
+    เมื่อเลื่อน swing pivot ไปที่แถวยืนยัน (pivot + 2 แท่ง) และ generate_ict_signal ที่อ่าน flag
+    สำเร็จรูปต้องให้สัญญาณเดียวกับแบบคำนวณข้อ 5–6 เอง
+    """
+    from src.ict_signal import add_ict_columns, signal_candidates
+
+    df = build_trending_df()
+    pivots = detect_swing_points(df, window=5)
+    confirmed = pivots.copy()
+    for col in ("is_swing_high", "is_swing_low"):
+        confirmed[col] = pivots[col].shift(2, fill_value=False)
+    confirmed[["high", "low"]] = pivots[["high", "low"]].shift(2)
+    legacy = detect_mss(confirmed)
+    legacy[["high", "low"]] = df[["high", "low"]]
+    legacy = compute_fvg(legacy)
+    fused = add_ict_columns(df)
+    pairs = {
+        "is_swing_high": "is_swing_high", "is_swing_low": "is_swing_low",
+        "mss_bullish": "bullish_mss", "mss_bearish": "bearish_mss",
+        "last_swing_high": "last_swing_high", "last_swing_low": "last_swing_low",
+        "fvg_bullish": "bullish_fvg", "fvg_bearish": "bearish_fvg",
+        "fvg_top": "fvg_top", "fvg_bottom": "fvg_bottom",
+    }
+    for new, old in pairs.items():
+        np.testing.assert_array_equal(fused[new].to_numpy(float), legacy[old].to_numpy(float), err_msg=new)
+    assert fused["fvg_bullish"].sum() > 0 and fused["fvg_bearish"].sum() > 0
+
+    sides_legacy = [generate_ict_signal(legacy, i) for i in range(len(legacy))]
+    sides_legacy = {i: s["side"] for i, s in enumerate(sides_legacy) if s is not None}
+    sides_fused = {int(i): generate_ict_signal(fused, int(i)) for i in signal_candidates(fused)}
+    sides_fused = {i: s["side"] for i, s in sides_fused.items() if s is not None}
+    assert sides_fused and sides_fused == sides_legacy
+
+def test_ict_columns_are_causal():
+    """
+    คอลัมน์ ICT ของแถว i ต้องเท่าเดิมไม่ว่าจะมีแท่งหลัง i หรือไม่ (ไม่มี lookahead)
+    รวมถึง fib_in_zone ของแถวสุดท้ายที่ต้องมาจาก swing ที่ยืนยันแล้วเท่านั้น
+    """
+    from src.ict_signal import ICT_COLUMNS, add_ict_columns
+
+    df = build_trending_df(600)
+    full = add_ict_columns(df)
+    for col in ("mss_bullish", "mss_bearish", "fib_in_zone"):
+        assert full[col].nunique() == 2, col
+    for end in range(0, 600, 3):
+        part = add_ict_columns(df.iloc[:end + 1])
+        pd.testing.assert_frame_equal(part[ICT_COLUMNS], full[ICT_COLUMNS].iloc[:end + 1], obj=f"end={end}")
+
+    # fib_in_zone ของแถว i = close อยู่ระหว่าง fib 38.2–61.8% ของ swing ที่ pivot อยู่ไม่เกินแถว i − 2
+    pivots = detect_swing_points(df, window=5)
+    for i in range(40, 600, 37):
+        highs = pivots.index[pivots["is_swing_high"] & (pivots.index <= i - 2)]
+        lows = pivots.index[pivots["is_swing_low"] & (pivots.index <= i - 2)]
+        if not len(highs) or not len(lows):
+            assert not full.at[i, "fib_in_zone"]
+            continue
+        sh, sl = df.at[highs[-1], "high"], df.at[lows[-1], "low"]
+        fibs = compute_fibonacci_levels(sl, sh)
+        lo, hi = sorted((fibs["fib_382"], fibs["fib_618"]))
+        assert full.at[i, "fib_in_zone"] == (lo <= df.at[i, "close"] <= hi), i
@@ -0,0 +1,70 @@
+import json
+import random
+import urllib.request
+
+from src.instrumentation import (
+    LatencyHistogram, MetricsRegistry, MetricsFileWriter,
+    span, timed, start_http_server
+)
+
+
+def test_latency_histogram_percentiles_within_precision():
+    """
+    percentile จาก log-linear buckets ต้องคลาดเคลื่อนไม่เกิน ~6% ของค่าจริง
+    """
+    rng = random.Random(0)
+    values = sorted(rng.randint(1_000, 50_000_000) for _ in range(20_000))
+    h = LatencyHistogram("x")
+    for v in values:
+        h.record(v)
+
+    assert h.count == len(values)
+    assert h.min_ns == values[0] and h.max_ns == values[-1]
+    for q in (50, 90, 99):
+        exact = values[int(q / 100 * len(values)) - 1]
+        assert abs(h.percentile(q) - exact) / exact < 0.07
+
+
+def test_span_timed_and_exporters(tmp_path):
+    """
+    span/timed ต้องบันทึกลง registry และ export ได้ทั้ง Prometheus text และ JSON lines
+    """
+    reg = MetricsRegistry()
+
+    @timed("work", registry=reg)
+    def work(x):
+        return x * 2
+
+    for i in range(10):
+        assert work(i) == i * 2
+        with span("stage", registry=reg):
+            pass
+    reg.counter("bars").inc(3)
+    reg.gauge("open_positions").set(2)
+
+    text = reg.render_prometheus()
+    assert "hats_work_seconds_count 10" in text
+    assert 'hats_stage_seconds{quantile="0.99"}' in text
+    assert "hats_bars_total 3" in text
+    assert "hats_open_positions 2" in text
+
+    server = start_http_server(0, registry=reg)
+    try:
+        port = server.server_address[1]
+        body = urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5).read().decode()
+    finally:
+        server.shutdown()
+    assert "hats_work_seconds_count 10" in body
+
+    # ไฟล์ต้องหมุนเมื่อเกิน max_bytes และเก็บ backup ไม่เกิน backup_count
+    path = tmp_path / "metrics.jsonl"
+    writer = MetricsFileWriter(str(path), max_bytes=1, backup_count=2, registry=reg)
+    for _ in range(4):
+        writer.write_once()
+    assert path.exists()
+    assert (tmp_path / "metrics.jsonl.1").exists()
+    assert (tmp_path / "metrics.jsonl.2").exists()
+    assert not (tmp_path / "metrics.jsonl.3").exists()
+    snap = json.loads(path.read_text().strip().splitlines()[-1])
+    assert snap["latency"]["work"]["count"] == 10
+    assert snap["counters"]["bars"] == 3
@@ -0,0 +1,80 @@
+import pandas as pd
+import pytest
+
+from src.journal import Journal, TradeLog, journal_parts, read_journal, export_journal, RECORD_DTYPE
+from src.position_manager import PositionManager
+from src.report_generator import load_trade_log
+
+
+def test_journal_batches_rotates_and_exports(tmp_path):
+    path = tmp_path / "journal.bin"
+    # rotate หลังแต่ละ batch (ไฟล์ละ 4 record)
+    journal = Journal(path, batch_records=4, flush_interval_s=3600, fsync="none",
+                      rotate_mb=4 * RECORD_DTYPE.itemsize / (1 << 20))
+    bar = pd.Timestamp("2025-01-01 09:00")
+    for i in range(10):
+        journal.decision(bar + pd.Timedelta(minutes=i), {"source": "XGB", "side": "NoTrade", "confidence": i / 10})
+    assert len(read_journal(path)) == 8  # batch ที่ยังไม่เต็มอยู่ใน buffer
+    journal.log("order", "rejected", bar, "ICT", "Buy", price=101.5, sl=100.0)
+    journal.close()
+    assert len(journal_parts(path)) == 3
+
+    # record สุดท้ายที่เขียนไม่ครบถูกตัดทิ้ง
+    with open(journal_parts(path)[-1], "ab") as f:
+        f.write(b"\x00" * 7)
+    df = read_journal(path)
+    assert len(df) == 11 and df["ts"].is_monotonic_increasing
+    assert list(df["bar_time"][:3]) == list(pd.date_range(bar, periods=3, freq="min"))
+    assert df["confidence"][:10].tolist() == pytest.approx([i / 10 for i in range(10)])
+    last = df.iloc[-1]
+    assert (last["kind"], last["event"], last["side"], last["price"]) == ("order", "rejected", "Buy", 101.5)
+    assert df["position"].isna().all()
+    # fresh=True เริ่ม journal ใหม่ (ไฟล์เดิมยังอ่านได้ผ่านสำเนา)
+    copy = tmp_path / "copy"
+    copy.mkdir()
+    for part in journal_parts(path):
+        (copy / part.name).write_bytes(part.read_bytes())
+    Journal(path, fresh=True).close()
+    assert len(read_journal(path)) == 0
+    path = copy / "journal.bin"
+
+    export_journal(path, str(tmp_path / "journal.csv"))
+    assert len(pd.read_csv(tmp_path / "journal.csv")) == 11
+
+    pytest.importorskip("pyarrow")
+    out = export_journal(path, str(tmp_path / "journal.parquet"))
+    back = pd.read_parquet(tmp_path / "journal.parquet")
+    assert len(back) == len(out) and list(back["event"].astype(str)) == list(df["event"].astype(str))
+
+
+class FakeBroker:
+    def open_order(self, symbol, side, lot=0.01, sl=None, tp=None):
+        return True
+
+    def close_all(self, symbol):
+        return True
+
+
+def test_position_transitions_and_trade_log(tmp_path):
+    journal = Journal(tmp_path / "journal.bin", fsync="batch")
+    trades = TradeLog(tmp_path / "real_trade_log.csv")
+    closed = lambda pos, px: trades.append(pos["entry_time"], "2025-01-01 09:10", pos["side"],
+                                           pos["entry_price"], px, px - pos["entry_price"], pos["exit_reason"])
+    pm = PositionManager(FakeBroker(), "XAUUSD", on_close=closed, log=None, journal=journal)
+    sig = {"source": "ICT", "side": "Buy", "entry_time": pd.Timestamp("2025-01-01 09:00"), "entry_price": 100.0,
+           "sl": 98.0, "tp1": 102.0, "tp2": 104.0, "tp3": 106.0, "atr": 2.0}
+    assert pm.on_signal(sig, {"vwap": 110.0})
+    pm.check_tick(bid=102.0, ask=102.3)   # TP1 → SL = 101
+    pm.check_tick(bid=100.9, ask=101.2)   # SL
+    journal.close()
+
+    df = read_journal(tmp_path / "journal.bin")
+    events = list(zip(df["kind"].astype(str), df["event"].astype(str)))
+    assert events == [("order", "open"), ("transition", "open"), ("transition", "tp1"),
+                      ("transition", "sl"), ("transition", "close")]
+    assert (df["position"][1:] == 1).all()
+    assert df["sl"].iloc[2] == 101.0 and df["pnl"].iloc[-1] == pytest.approx(0.9)
+
+    log = load_trade_log(str(tmp_path / "real_trade_log.csv"))
+    assert len(log) == 1 and log["pnl"].iloc[0] == pytest.approx(0.9)
+    assert log["exit_reason"].iloc[0] == "sl" and log["entry_time"].iloc[0] == sig["entry_time"]
@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+
+from src.live_data import CsvTail, LiveFeed, lttb, health_status, write_live_state
+
+
+def write_bars(path, start, n):
+    pd.DataFrame({
+        "time": pd.date_range("2025-01-06", periods=start + n, freq="min")[start:],
+        "close": np.arange(start, start + n, dtype=float),
+    }).to_csv(path, index=False, mode="a" if start else "w", header=not start)
+
+
+def test_csv_tail_reads_only_new_rows_and_recovers_from_rewrite(tmp_path):
+    path = tmp_path / "historical.csv"
+    write_bars(path, 0, 100)
+    tail = CsvTail(path, parse_dates=["time"], initial_rows=10)
+
+    first = tail.poll()
+    assert list(first["close"]) == list(range(90, 100))  # เริ่มที่ 10 แถวท้าย ไม่อ่านทั้งไฟล์
+    assert tail.poll().empty
+
+    write_bars(path, 100, 5)
+    with open(path, "a") as f:
+        f.write("2025-01-06 01:45:00,10")  # บรรทัดที่ยังเขียนไม่จบ
+    assert list(tail.poll()["close"]) == list(range(100, 105))
+    with open(path, "a") as f:
+        f.write("5.0\n")
+    assert list(tail.poll()["close"]) == [105.0]
+
+    # เขียนไฟล์ใหม่ทั้งไฟล์ด้วยข้อมูลอื่น → tail เริ่มใหม่จากท้ายไฟล์
+    write_bars(path, 0, 3)
+    assert list(tail.poll()["close"]) == [0.0, 1.0, 2.0]
+    assert tail.resets == 1
+
+
+def test_lttb_keeps_endpoints_and_spikes():
+    x = np.arange(10_000)
+    y = np.sin(x / 500.0)
+    y[4321] = 50.0
+    idx = lttb(x, y, 200)
+    assert len(idx) == 200 and idx[0] == 0 and idx[-1] == len(x) - 1
+    assert np.all(np.diff(idx) > 0)
+    assert 4321 in idx
+    assert len(lttb(x[:50], y[:50], 200)) == 50
+
+
+def test_live_feed_and_health(tmp_path):
+    candles, trades, metrics, state = (tmp_path / n for n in
+                                       ("historical.csv", "trades.csv", "metrics.jsonl", "state.json"))
+    write_bars(candles, 0, 30)
+    pd.DataFrame({"exit_time": pd.date_range("2025-01-06", periods=3, freq="h"),
+                  "pnl": [1.0, -0.5, 2.0]}).to_csv(trades, index=False)
+    metrics.write_text('{"ts": 1736121600, "latency": {"predict": {"p99_us": 120.0}}}\n')
+    write_live_state({"updated_at": datetime.now().isoformat(), "cooldown_s": 60,
+                      "counters": {"loop_errors": 0}}, str(state))
+
+    feed = LiveFeed(str(candles), str(trades), str(metrics), str(state), window_rows=1000)
+    snap = feed.poll()
+    assert snap["health"]["status"] == "ok"
+    assert snap["n_bars"] == 30
+    np.testing.assert_allclose(feed.equity.y, [1.0, 0.5, 2.5])
+    assert feed.latency_history[0]["predict"] == 120.0
+    assert len(feed.price.downsampled(10)) == 10
+
+    old = {"updated_at": (datetime.now() - timedelta(minutes=10)).isoformat(), "cooldown_s": 60}
+    assert health_status(old)["status"] == "stale"
+    assert health_status(None)["status"] == "down"
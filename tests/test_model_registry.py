@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+import pytest
+import xgboost as xgb
+
+import src.decision_engine as de_mod
+from src.decision_engine import DecisionEngine, FEATURE_COLS
+from src.model_registry import ModelRegistry
+
+
+def save_dummy_model(path, features, n_estimators):
+    rng = np.random.default_rng(n_estimators)
+    X = pd.DataFrame(rng.normal(size=(30, len(features))), columns=features)
+    y = np.arange(30) % 3
+    clf = xgb.XGBClassifier(objective="multi:softprob", num_class=3, n_estimators=n_estimators, random_state=42)
+    clf.fit(X, y)
+    clf.save_model(str(path))
+    return str(path)
+
+
+def test_registry_versions_dedupe_and_rollback(tmp_path):
+    registry = ModelRegistry(tmp_path / "registry")
+    assert registry.active() is None and registry.stamp() is None
+    m1 = save_dummy_model(tmp_path / "m1.json", FEATURE_COLS, 2)
+    m2 = save_dummy_model(tmp_path / "m2.json", FEATURE_COLS[:5], 3)
+
+    v1 = registry.register(m1, FEATURE_COLS, "2025-01-01", "2025-06-30", {"fold_accuracy": [0.5]})
+    v2 = registry.register(m2, FEATURE_COLS[:5])
+    assert (v1["version"], v2["version"]) == (1, 2)
+    assert registry.active()["version"] == 2 and registry.active()["features"] == FEATURE_COLS[:5]
+    # ไฟล์เดิมซ้ำ → เวอร์ชันเดิม และ activate กลับมา
+    assert registry.register(m1, FEATURE_COLS)["version"] == 1
+    assert len(registry.versions()) == 2 and registry.active()["version"] == 1
+
+    assert registry.rollback()["version"] == 2
+    assert registry.rollback()["version"] == 1
+    with pytest.raises(ValueError):
+        registry.rollback()
+    assert registry.get(1)["train_end"] == "2025-06-30"
+    assert registry.verify(v1)
+    registry.model_file(v1).write_text("{}")
+    assert not registry.verify(v1)
+
+
+def test_engine_hot_swaps_between_bars_and_rolls_back(tmp_path, monkeypatch):
+    monkeypatch.setattr(de_mod, "generate_ict_signal", lambda df, idx: None)
+    registry = ModelRegistry(tmp_path / "registry")
+    registry.register(save_dummy_model(tmp_path / "m1.json", FEATURE_COLS, 2), FEATURE_COLS)
+    engine = DecisionEngine(registry=registry)
+    assert engine.model.version == 1
+
+    df = pd.DataFrame(np.random.default_rng(0).normal(size=(5, len(FEATURE_COLS))), columns=FEATURE_COLS)
+    engine.predict(df, 4)
+    watcher = engine.watch(interval_s=3600)  # ตรวจเองด้วย check_once
+    try:
+        assert not watcher.check_once()
+        registry.register(save_dummy_model(tmp_path / "m2.json", FEATURE_COLS[:5], 3), FEATURE_COLS[:5])
+        assert watcher.check_once()
+        # โหลดเสร็จแล้วแต่ยังไม่สลับจนกว่าจะเริ่มแท่งถัดไป
+        assert engine.model.version == 1 and engine._pending.version == 2
+        result = engine.predict(df, 4)
+        assert result["source"] == "XGB" and engine.model.version == 2
+        assert engine.model.features == FEATURE_COLS[:5]
+        assert not watcher.check_once()
+
+        assert engine.rollback() == 1
+        assert registry.active()["version"] == 1 and engine.model.features == FEATURE_COLS
+        # watcher เห็น active = 1 ซึ่ง engine ใช้อยู่แล้ว → ไม่โหลดซ้ำ
+        watcher.check_once()
+        assert engine._pending is None
+    finally:
+        engine.stop_watch(timeout=1)
+    assert not watcher.is_alive()
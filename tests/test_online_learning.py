@@ -0,0 +1,61 @@
+import pickle
+import time
+import pandas as pd
+import numpy as np
+
+from src.online_learning import OnlineLearner
+from src.decision_engine import FEATURE_COLS
+
+
+def make_features(value: float) -> dict:
+    """
+    สร้าง dict ฟีเจอร์ตาม FEATURE_COLS โดยให้ทุกคอลัมน์มีค่าเท่ากับ value
+    """
+    return {col: value for col in FEATURE_COLS}
+
+
+def test_online_learner_learns_and_checkpoints(tmp_path):
+    """
+    เรียนจากเทรดที่ปิดแล้ว → predict_proba ต้องแยกฝั่งชนะ/แพ้ได้
+    และ checkpoint ต้องถูกเขียนลงไฟล์ (async) แล้วโหลดกลับได้
+    """
+    model_path = tmp_path / "river_model.bin"
+    learner = OnlineLearner(model_path=str(model_path), checkpoint_every=1)
+
+    for _ in range(200):
+        learner.learn_trade(make_features(1.0), pnl=+1.0)
+        learner.learn_trade(make_features(-1.0), pnl=-1.0)
+
+    assert learner.predict_proba(make_features(1.0)) > 0.5
+    assert learner.predict_proba(make_features(-1.0)) < 0.5
+
+    # รอ background checkpoint
+    deadline = time.time() + 5
+    while not model_path.exists() and time.time() < deadline:
+        time.sleep(0.01)
+    learner.close()
+    assert model_path.exists()
+
+    with open(model_path, "rb") as fh:
+        restored = pickle.load(fh)
+    assert restored.predict_proba_one({col: 1.0 for col in FEATURE_COLS})[True] > 0.5
+
+    m = learner.metrics()
+    assert m["n_updates"] == 400
+    assert m["n_checkpoints"] >= 1
+    assert m["model_bytes"] > 0
+    assert m["avg_update_us"] > 0
+
+
+def test_online_learner_ignores_nan_features(tmp_path):
+    """
+    ฟีเจอร์ที่เป็น NaN/None ต้องไม่ทำให้โมเดลพัง
+    """
+    learner = OnlineLearner(model_path=str(tmp_path / "river_model.bin"))
+    feats = make_features(np.nan)
+    feats["atr"] = 0.5
+    feats["vwap"] = None
+    learner.learn_trade(feats, pnl=1.0)
+    p = learner.predict_proba(feats)
+    learner.close()
+    assert 0.0 <= p <= 1.0
@@ -0,0 +1,116 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from src.position_manager import PositionManager
+from src.position_monitor import PositionMonitor, exits_counter, poll_hist
+
+
+class FakeBroker:
+    def __init__(self):
+        self.closes = 0
+
+    def open_order(self, symbol, side, lot=0.01, sl=None, tp=None):
+        return True
+
+    def close_all(self, symbol):
+        self.closes += 1
+        return True
+
+
+def open_position(pm, side, entry=100.0):
+    sign = 1 if side == "Buy" else -1
+    sig = {"source": "ICT", "side": side, "entry_price": entry, "sl": entry - sign * 2,
+           "tp1": entry + sign * 2, "tp2": entry + sign * 4, "tp3": entry + sign * 6, "atr": 2.0}
+    # vwap อยู่ฝั่งที่ยังไม่ถึง breakeven
+    assert pm.on_signal(sig, {"vwap": entry + sign * 10})
+
+
+def test_check_tick_uses_bid_for_buy_and_ask_for_sell():
+    closed = []
+    pm = PositionManager(FakeBroker(), "XAUUSD", on_close=lambda pos, px: closed.append((pos["side"], px)),
+                         log=None)
+    open_position(pm, "Buy")
+    open_position(pm, "Sell")
+    # ask แตะ SL ของ Sell (102) แต่ bid ยังไม่ถึง level ใดของ Buy
+    assert pm.check_tick(bid=101.7, ask=102.0) == 1
+    assert closed == [("Sell", 102.0)]
+    # bid ถึง TP1 ของ Buy → SL เลื่อนเป็น entry + 0.5 * atr แต่ตำแหน่งยังเปิดอยู่
+    assert pm.check_tick(bid=102.0, ask=102.3) == 1
+    assert len(pm) == 1 and pm.positions[0]["tp1_hit"] and pm.positions[0]["sl"] == 101.0
+    # tick เดิมซ้ำไม่ยิง event เพิ่ม
+    assert pm.check_tick(bid=102.0, ask=102.3) == 0
+    assert pm.check_tick(bid=100.9, ask=101.2) == 1
+    assert closed[-1] == ("Buy", 100.9) and len(pm) == 0
+
+
+def test_monitor_thread_exits_spike_between_bars():
+    ticks = [SimpleNamespace(time_msc=i, bid=100.5, ask=100.8) for i in range(3)]
+    ticks.append(SimpleNamespace(time_msc=3, bid=97.5, ask=97.8))  # spike ทะลุ SL 98
+    calls = []
+
+    def tick_fn(symbol):
+        calls.append(symbol)
+        return ticks[min(len(calls), len(ticks)) - 1]
+
+    pm = PositionManager(FakeBroker(), "XAUUSD", log=None)
+    exits_before, polls_before = exits_counter.value, poll_hist.count
+    monitor = PositionMonitor(pm, interval_ms=1, tick_fn=tick_fn)
+    monitor.start()
+    try:
+        time.sleep(0.02)
+        assert not calls  # ไม่มีตำแหน่ง → ไม่ poll
+        open_position(pm, "Buy")
+        deadline = time.time() + 2
+        while len(pm) and time.time() < deadline:
+            time.sleep(0.005)
+    finally:
+        monitor.stop(timeout=1)
+    assert len(pm) == 0 and pm.broker.closes == 1
+    assert exits_counter.value == exits_before + 1
+    assert poll_hist.count - polls_before == len(calls) >= 4
+    assert not monitor.is_alive()
+
+
+class FakeMT5:
+    """
+    session ของ MT5 ที่ถูกปิดไปแล้ว (เช่น health check เดิมเรียก shutdown): ได้ tick หลัง initialize เท่านั้น
+    """
+    COPY_TICKS_INFO = 2
+
+    def __init__(self):
+        self.connected = False
+        self.initialize_calls = 0
+
+    def terminal_info(self):
+        return SimpleNamespace(connected=True) if self.connected else None
+
+    def initialize(self, **kwargs):
+        self.initialize_calls += 1
+        self.connected = True
+        return True
+
+    def last_error(self):
+        return (0, "ok")
+
+    def symbol_info_tick(self, symbol):
+        return SimpleNamespace(time_msc=1, bid=100.0, ask=100.2) if self.connected else None
+
+
+def test_mt5_tick_reinitializes_closed_session(monkeypatch):
+    import sys
+    from src.position_monitor import mt5_tick
+
+    fake = FakeMT5()
+    monkeypatch.setitem(sys.modules, "MetaTrader5", fake)
+    assert mt5_tick("XAUUSD").bid == 100.0
+    assert fake.initialize_calls == 1
+    # session เปิดอยู่แล้ว → ไม่ initialize ซ้ำ
+    assert mt5_tick("XAUUSD").ask == 100.2
+    assert fake.initialize_calls == 1
+
+    fake.connected = False
+    fake.initialize = lambda **kwargs: False
+    with pytest.raises(RuntimeError):
+        mt5_tick("XAUUSD")
@@ -0,0 +1,115 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.ict_signal import ICT_COLUMNS, generate_ict_signal
+from src.position_manager import PositionManager, SimBroker
+from src.replay import ReplayHarness
+from test_ict_signal import build_trending_df
+
+
+def make_frame(n=50):
+    close = 100 + np.arange(n) * 0.1
+    return pd.DataFrame({
+        "time": pd.date_range("2025-01-06 08:00", periods=n, freq="min"),
+        "open": close, "high": close + 0.05, "low": close - 0.05, "close": close,
+        "vwap": 200.0, "atr": 1.0,
+        "last_swing_low": close - 1, "last_swing_high": close + 1,
+        "fvg_bullish": False, "fvg_bearish": False,
+        "mss_bullish": False, "mss_bearish": False,
+    })
+
+
+class FakeEngine:
+    """
+    ออกสัญญาณ Buy ที่แท่ง entry_at เท่านั้น (SL ห่าง 5, TP1 = entry + tp1_dist)
+    """
+
+    def __init__(self, entry_at=5, tp1_dist=1.0):
+        self.entry_at = entry_at
+        self.tp1_dist = tp1_dist
+        self.calls = 0
+
+    def predict(self, df, idx):
+        self.calls += 1
+        if idx != self.entry_at:
+            return {"source": "XGB", "side": "NoTrade"}
+        price = float(df["close"].iloc[idx])
+        return {"source": "ICT", "side": "Buy", "entry_price": price, "sl": price - 5,
+                "tp1": price + self.tp1_dist, "tp2": price + 10, "tp3": price + 20, "atr": 1.0}
+
+
+def test_replay_drives_engine_and_position_manager_per_bar():
+    df = make_frame()
+    engine = FakeEngine(entry_at=5, tp1_dist=1.0)
+    closed = []
+    harness = ReplayHarness(df, engine, broker=SimBroker(spread=0.0, slippage=0.0),
+                            on_close=lambda pos, price: closed.append(price))
+    report = harness.run()
+
+    assert engine.calls == len(df)
+    assert report["bars"] == len(df)
+    assert report["n_signals"] == 1 and report["n_orders"] == 1
+    # TP1 (+1.0) ถึงที่แท่ง 15 → close_all ปิด order ที่ broker
+    trades = report["trades"]
+    assert len(trades) == 1
+    assert trades["pnl"].iloc[0] == pytest.approx(1.0, abs=1e-6)
+    assert trades["exit_time"].iloc[0] == df["time"].iloc[15]
+    assert {"bar", "predict", "open_order", "manage_positions"} <= set(report["latency"])
+    assert report["latency"]["predict"]["count"] == len(df)
+    assert report["bars_per_s"] > 0
+
+
+def test_position_manager_sl_closes_and_reports():
+    broker = SimBroker(spread=0.2, slippage=0.0)
+    closed = []
+    pm = PositionManager(broker, "XAUUSD", on_close=lambda pos, price: closed.append(price), log=None)
+    row = {"close": 100.0, "vwap": 200.0, "atr": 1.0}
+    broker.set_bar(pd.Timestamp("2025-01-06 08:00"), 100.0)
+    sig = {"source": "ICT", "side": "Buy", "entry_price": 100.0, "sl": 99.0,
+           "tp1": 101.0, "tp2": 102.0, "tp3": 103.0, "atr": 1.0}
+    assert pm.on_signal(sig, row)
+    assert not pm.on_signal({"source": "XGB", "side": "Buy"}, row)
+    assert len(pm) == 1
+
+    broker.set_bar(pd.Timestamp("2025-01-06 08:01"), 98.9)
+    pm.manage({"close": 98.9, "vwap": 200.0, "atr": 1.0})
+    assert len(pm) == 0
+    assert closed == [98.9]
+    # Buy เข้าที่ ask (100.2) ออกที่ bid (98.9)
+    assert broker.trades[0]["pnl"] == pytest.approx(98.9 - 100.2)
+
+
+
+class RecordingEngine:
+    """
+    จำคอลัมน์ ICT ที่ engine เห็น ณ แถว idx และสัญญาณ ICT ของแถวนั้น (ไม่ใช้โมเดล)
+    """
+
+    def __init__(self):
+        self.rows = {}
+        self.signals = {}
+
+    def predict(self, df, idx):
+        self.rows[idx] = df.iloc[idx][ICT_COLUMNS].to_numpy(dtype=float)
+        sig = generate_ict_signal(df, idx)
+        if sig is None:
+            return {"source": "XGB", "side": "NoTrade"}
+        self.signals[idx] = sig["side"]
+        return {**sig, "source": "ICT"}
+
+
+def test_replay_matches_live_truncated_history():
+    """
+    frame ที่คำนวณครั้งเดียวต้องให้ฟีเจอร์ ICT และสัญญาณเท่ากับแบบ live ที่คำนวณจากแท่งถึง i เท่านั้น
+    """
+    df = build_trending_df(800, seed=2)
+    engine = RecordingEngine()
+    ReplayHarness(df, engine, broker=SimBroker(spread=0.0, slippage=0.0)).run()
+    assert len(engine.signals) > 5
+
+    live = RecordingEngine()
+    for i in range(len(df)):
+        ReplayHarness(df.iloc[:i + 1], live).run(start=i)
+        np.testing.assert_array_equal(live.rows[i], engine.rows[i], err_msg=str(i))
+    assert live.signals == engine.signals
@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.report_generator import (
+    compute_metrics, breakdown, rolling_metrics, session_of, generate_report, load_trade_log,
+)
+
+
+def make_trades():
+    """
+    5 เทรด: +2, −1, −1, +3, −0.5 (เวลาออกห่างกัน 1 วันทำการ)
+    """
+    exit_time = pd.to_datetime(["2025-01-06 08:00", "2025-01-07 10:00", "2025-01-08 14:00",
+                                "2025-01-09 15:00", "2025-01-10 23:00"])
+    return pd.DataFrame({
+        "entry_time": exit_time - pd.Timedelta(minutes=30),
+        "exit_time": exit_time,
+        "side": pd.Categorical(["Buy", "Sell", "Buy", "Buy", "Sell"]),
+        "pnl": [2.0, -1.0, -1.0, 3.0, -0.5],
+        "mae": [0.5, 1.0, 1.0, 0.2, 0.5],
+        "mfe": [2.0, 0.1, 0.3, 3.0, 0.2],
+    })
+
+
+def test_compute_metrics_matches_hand_calculation():
+    m = compute_metrics(make_trades(), bucket="1D")
+    assert m["n_trades"] == 5
+    assert m["win_rate"] == pytest.approx(0.4)
+    assert m["profit_factor"] == pytest.approx(5.0 / 2.5)
+    assert m["expectancy"] == pytest.approx(0.5)
+    # equity 2, 1, 0, 3, 2.5 → drawdown สูงสุด −2 จาก peak ที่เทรดแรกถึงเทรดที่สาม
+    assert m["max_drawdown"] == pytest.approx(-2.0)
+    assert m["max_drawdown_duration"] == pd.Timedelta("2 days 06:00:00")
+    assert m["max_consecutive_losses"] == 2
+    assert m["avg_mae"] == pytest.approx(0.64)
+
+    daily = np.array([2.0, -1.0, -1.0, 3.0, -0.5])
+    sharpe = daily.mean() / daily.std(ddof=1) * np.sqrt(252)
+    sortino = daily.mean() / np.sqrt(np.mean(np.minimum(daily, 0) ** 2)) * np.sqrt(252)
+    assert m["sharpe"] == pytest.approx(sharpe)
+    assert m["sortino"] == pytest.approx(sortino)
+
+
+def test_breakdowns_and_rolling():
+    trades = make_trades()
+    by_side = breakdown(trades, "side")
+    assert by_side.loc["Buy", "trades"] == 3
+    assert by_side.loc["Buy", "total_pnl"] == pytest.approx(4.0)
+    assert by_side.loc["Sell", "profit_factor"] == pytest.approx(0.0)
+
+    sessions = session_of(trades["entry_time"])
+    assert list(sessions) == ["london", "london", "new_york", "new_york", "off_hours"]
+
+    roll = rolling_metrics(trades, window=2)
+    assert len(roll) == 4
+    np.testing.assert_allclose(roll["expectancy"], [0.5, -1.0, 1.0, 1.25])
+    assert roll["profit_factor"].iloc[0] == pytest.approx(2.0)
+    assert roll["profit_factor"].iloc[2] == pytest.approx(3.0)
+
+
+def test_generate_report_from_backtest_and_live_logs(tmp_path):
+    trades = make_trades()
+    backtest = tmp_path / "backtest_trade_log.csv"
+    trades.to_csv(backtest, index=False)
+    # real trade log ใช้ชื่อคอลัมน์ต่างกันได้ (time/profit/type)
+    live = tmp_path / "real_trade_log.csv"
+    trades.rename(columns={"exit_time": "time", "pnl": "profit", "side": "type"}) \
+          .drop(columns=["entry_time", "mae", "mfe"]).to_csv(live, index=False)
+    assert len(load_trade_log(live)) == 5
+
+    out = tmp_path / "report.html"
+    m_bt = generate_report(str(backtest), str(out), window=2)
+    page = out.read_text(encoding="utf-8")
+    assert "<svg" in page and "By session" in page and "2025-01" in page
+    m_live = generate_report(str(live), str(tmp_path / "live.html"), window=2)
+    assert m_live["total_pnl"] == pytest.approx(m_bt["total_pnl"])
+    assert "avg_mae" not in m_live
@@ -0,0 +1,38 @@
+import json
+
+import scripts.run_benchmarks as rb
+
+
+def test_compare_flags_regressions_above_threshold():
+    """
+    เวลา/หน่วยความจำที่เพิ่มเกิน threshold ต้องถูก flag และ error ใหม่นับเป็น regression
+    """
+    baseline = {"results": {
+        "compute_features@10k": {"seconds": 1.0, "peak_mb": 10.0},
+        "label_ict@10k": {"seconds": 2.0, "peak_mb": 5.0},
+        "build_labels@10k": {"seconds": 1.0},
+    }}
+    current = {"results": {
+        "compute_features@10k": {"seconds": 1.1, "peak_mb": 10.0},
+        "label_ict@10k": {"seconds": 3.0, "peak_mb": 5.1},
+        "build_labels@10k": {"error": "KeyError: 'adx'"},
+    }}
+    rows = rb.compare_results(baseline, current, threshold=0.2)
+    flagged = {(r["key"], r["metric"]) for r in rows if r["regression"]}
+    assert flagged == {("label_ict@10k", "seconds"), ("build_labels@10k", "error")}
+
+
+def test_run_suite_and_cli_compare(tmp_path, monkeypatch):
+    """
+    รัน benchmark ขนาดเล็กจริง → ได้ผลครบ และ compare กับตัวเองต้องไม่มี regression
+    """
+    monkeypatch.setattr(rb, "DATA_DIR", tmp_path / "data")
+    results = rb.run_suite(["compute_features", "compute_fvg"], ["3000"],
+                           workdir=tmp_path / "work")
+    for key in ("compute_features@3000", "compute_fvg@3000"):
+        res = results["results"][key]
+        assert res["seconds"] > 0 and res["rows_per_s"] > 0 and res["peak_mb"] > 0
+
+    path = rb.save_results(results, tmp_path / "res.json")
+    assert json.loads(path.read_text())["meta"]["git_commit"] is not None
+    assert rb.main(["compare", str(path), str(path)]) == 0
@@ -0,0 +1,69 @@
+import pandas as pd
+from pathlib import Path
+
+import scripts.run_phase1 as rp1
+
+
+def test_instrument_list_and_paths():
+    """
+    symbols × timeframes → ทุกคู่, instrument เดียวใช้พาธเดิม, หลายตัวแยก partition
+    """
+    cfg = {
+        "symbol": "XAUUSD", "timeframe": "M1",
+        "historical_data_path": "data/historical.csv",
+        "features_data_path": "data/data_with_features.csv",
+    }
+    assert rp1.instrument_list(cfg) == [("XAUUSD", "M1")]
+
+    cfg["symbols"] = ["XAUUSD", "EURUSD"]
+    cfg["timeframes"] = ["M1", "M5"]
+    assert len(rp1.instrument_list(cfg)) == 4
+
+    single = rp1.instrument_paths(cfg, "XAUUSD", "M1", partitioned=False)
+    assert single["historical"] == "data/historical.csv"
+
+    part = rp1.instrument_paths(cfg, "EURUSD", "M5", partitioned=True)
+    assert Path(part["historical"]) == Path("data/EURUSD_M5/historical.csv")
+    assert Path(part["labels"]) == Path("data/EURUSD_M5/with_labels_ict.csv")
+
+
+def test_main_runs_each_instrument_into_partition(tmp_path, monkeypatch):
+    """
+    main() ต้องรัน fetch → features → labels ต่อ instrument ลง partition ของตัวเอง
+    และคืนเวลาต่อ stage
+    """
+    cfg = {
+        "symbol": "XAUUSD", "timeframe": "M1",
+        "symbols": ["XAUUSD", "EURUSD"], "timeframes": ["M1"],
+        "phase1_workers": 1,
+        "fetch_candles_n": 3,
+        "historical_data_path": str(tmp_path / "historical.csv"),
+        "features_data_path": str(tmp_path / "data_with_features.csv"),
+    }
+    monkeypatch.setattr(rp1, "load_config", lambda: cfg)
+
+    fetched = []
+    def fake_fetch(n, symbol, timeframe):
+        fetched.append((symbol, timeframe))
+        return pd.DataFrame({
+            "time": pd.date_range("2025-01-01", periods=n, freq="min"),
+            "open": [1.0] * n, "high": [2.0] * n, "low": [0.5] * n,
+            "close": [1.5] * n, "tick_volume": [10] * n,
+        })
+    def fake_compute(in_path, out_path, **kwargs):
+        Path(out_path).write_text(Path(in_path).read_text())
+    def fake_label(in_path, out_path):
+        Path(out_path).write_text(Path(in_path).read_text())
+
+    monkeypatch.setattr(rp1, "fetch_candles", fake_fetch)
+    monkeypatch.setattr(rp1, "compute_features", fake_compute)
+    monkeypatch.setattr(rp1, "label_ict", fake_label)
+
+    results = rp1.main()
+
+    assert fetched == [("XAUUSD", "M1"), ("EURUSD", "M1")]
+    assert [(r["symbol"], r["timeframe"]) for r in results] == fetched
+    for symbol in ["XAUUSD", "EURUSD"]:
+        assert (tmp_path / f"{symbol}_M1" / "with_labels_ict.csv").exists()
+    for r in results:
+        assert r["fetch_s"] >= 0 and r["features_s"] >= 0 and r["labels_s"] >= 0
@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+
+from src.schema import (
+    apply_schema, read_feature_csv, label_codes, to_labels, frame_memory_mb, LABEL_DTYPE
+)
+
+
+def make_frame(n: int = 1000) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        "time": pd.date_range("2024-01-01", periods=n, freq="min"),
+        "open": 2000 + rng.normal(size=n),
+        "close": 2000 + rng.normal(size=n),
+        "tick_volume": rng.integers(1, 100, size=n),
+        "atr": rng.random(n),
+        "mss_bullish": rng.random(n) > 0.5,
+        "fvg_bearish": rng.random(n) > 0.5,
+        "label": rng.choice(["NoTrade", "Buy", "Sell"], size=n),
+    })
+
+
+def test_read_feature_csv_applies_compact_dtypes(tmp_path):
+    """
+    CSV (label เป็น string) → อ่านกลับได้ float32 / bool / int32 / categorical
+    และใช้หน่วยความจำน้อยกว่าครึ่งของแบบเดิม
+    """
+    df = make_frame()
+    path = tmp_path / "features.csv"
+    df.to_csv(path, index=False)
+    assert "Buy" in path.read_text()
+
+    compact = read_feature_csv(path)
+    assert compact["time"].dtype == "datetime64[ns]"
+    assert compact["open"].dtype == np.float32
+    assert compact["atr"].dtype == np.float32
+    assert compact["tick_volume"].dtype == np.int32
+    assert compact["mss_bullish"].dtype == bool
+    assert compact["label"].dtype == LABEL_DTYPE
+    assert (compact["label"].astype(str) == df["label"]).all()
+    assert np.allclose(compact["close"], df["close"], rtol=1e-6)
+
+    assert frame_memory_mb(compact) < 0.5 * frame_memory_mb(df)
+    assert apply_schema(df).dtypes.equals(compact.dtypes)
+
+
+def test_label_codes_match_model_classes():
+    """
+    NoTrade→0, Buy→1, Sell→2 ทั้งจาก string และ categorical
+    """
+    expected = [1, 2, 0, 1]
+    raw = pd.Series(["Buy", "Sell", "NoTrade", "Buy"])
+    assert label_codes(raw).tolist() == expected
+    assert label_codes(pd.Series(to_labels(raw))).tolist() == expected
+    assert label_codes(raw).dtype == np.int8
@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+from src.decision_engine import FEATURE_COLS
+from src.shadow_scoring import ShadowScorer, dropped_counter
+
+
+def save_model(path, n_estimators):
+    rng = np.random.default_rng(n_estimators)
+    X = pd.DataFrame(rng.normal(size=(60, len(FEATURE_COLS))), columns=FEATURE_COLS)
+    clf = xgb.XGBClassifier(objective="multi:softprob", num_class=3, n_estimators=n_estimators)
+    clf.fit(X, np.arange(60) % 3)
+    clf.save_model(str(path))
+    return clf
+
+
+def test_side_process_scores_every_published_row(tmp_path):
+    clfs = {"a": save_model(tmp_path / "a.json", 3), "b": save_model(tmp_path / "b.json", 5)}
+    rows = pd.DataFrame(np.random.default_rng(7).normal(size=(20, len(FEATURE_COLS))), columns=FEATURE_COLS)
+    rows["time"] = pd.date_range("2025-01-01 09:00", periods=20, freq="min")
+    log_path = tmp_path / "shadow.csv"
+
+    dropped_before = dropped_counter.value
+    shadow = ShadowScorer([str(tmp_path / "a.json"), str(tmp_path / "b.json")], capacity=64,
+                          log_path=str(log_path), poll_ms=5).start()
+    try:
+        for i in range(len(rows)):
+            assert shadow.publish(rows.iloc[i], {"side": "Buy", "confidence": 0.6})
+    finally:
+        shadow.stop(timeout=60)
+    assert shadow.process.returncode == 0 and dropped_counter.value == dropped_before
+
+    log = pd.read_csv(log_path)
+    assert len(log) == 2 * len(rows) and set(log["production"]) == {"Buy"}
+    labels = np.array(["NoTrade", "Buy", "Sell"])
+    for name, clf in clfs.items():
+        part = log[log["model"] == name]
+        assert list(pd.to_datetime(part["time"])) == list(rows["time"])
+        expected = labels[clf.predict_proba(rows[FEATURE_COLS]).argmax(axis=1)]
+        assert list(part["side"]) == list(expected)
+    assert (log["lag_ms"] >= 0).all()
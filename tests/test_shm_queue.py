@@ -0,0 +1,33 @@
+import numpy as np
+
+from src.shm_queue import ShmQueue
+
+
+def test_queue_wraps_drops_when_full_and_reads_zero_copy():
+    q = ShmQueue.create(capacity=4, width=3)
+    reader = ShmQueue.attach(q.name)
+    try:
+        for i in range(5):
+            assert q.put([i, i * 10.0, -i]) == (i < 4)
+        assert q.stats() == {"written": 4, "read": 0, "lag": 4, "dropped": 1, "capacity": 4}
+
+        seq, rows = reader.peek(3)
+        assert seq == 0 and rows[:, 0].tolist() == [0, 1, 2]
+        assert np.shares_memory(rows, reader._data)  # view ของ shared memory ไม่ใช่สำเนา
+        del rows
+        reader.advance(3)
+        assert q.put([4, 40.0, -4]) and q.put([5, 50.0, -5])
+        # ข้ามปลาย buffer: peek คืนถึงปลายก่อน แล้วรอบถัดไปเริ่มต้น buffer
+        seq, rows = reader.peek()
+        assert seq == 3 and rows[:, 0].tolist() == [3]
+        reader.advance(len(rows))
+        seq, rows = reader.peek()
+        assert seq == 4 and rows[:, 0].tolist() == [4, 5]
+        del rows
+        reader.advance(2)
+        assert not reader.closed and reader.lag() == 0
+        q.close_writer()
+        assert reader.closed
+    finally:
+        reader.close()
+        q.close()
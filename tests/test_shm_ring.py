@@ -0,0 +1,73 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.live_data import LiveFeed
+import src.shm_ring as shm_ring
+from src.shm_ring import ShmRing
+
+
+def bars(start, n):
+    df = pd.DataFrame({"time": pd.date_range(start, periods=n, freq="min")})
+    df["close"] = 100.0 + np.arange(n)
+    df["mss_bullish"] = np.arange(n) % 2 == 0
+    return df
+
+
+def test_ring_append_wrap_zero_copy_and_other_process(tmp_path):
+    ring = ShmRing.create(["time", "close", "mss_bullish", "atr"], capacity=8)
+    try:
+        df = bars("2025-01-01 09:00", 6)
+        assert ring.append_frame(df) == 6
+        assert ring.append_frame(df) == 0  # ไม่มีแท่งใหม่
+        df = bars("2025-01-01 09:00", 11)
+        assert ring.append_frame(df) == 5 and ring.count == 11 and ring.seq == 4
+
+        count, view = ring.latest(8)  # 8 แถวล่าสุดข้ามปลาย ring แต่ยังเป็น view ต่อเนื่อง
+        assert np.shares_memory(view, ring._data) and view[:, 1].tolist() == list(100.0 + np.arange(3, 11))
+        out = ring.to_frame(view.copy())
+        pd.testing.assert_series_equal(out["time"], df["time"].iloc[3:].reset_index(drop=True))
+        assert out["mss_bullish"].tolist() == df["mss_bullish"].iloc[3:].astype(float).tolist()
+        assert out["atr"].isna().all()
+        assert ring.intact(count, 8)
+        ring.write(np.zeros((1, 4)))
+        assert not ring.intact(count, 8) and ring.intact(count, 7)
+
+        # process อื่น attach ด้วยชื่ออย่างเดียว (schema อยู่ใน segment)
+        code = ("from src.shm_ring import ShmRing; r = ShmRing.attach(%r); c, rows = r.read(3); "
+                "print(c, r.columns, rows[:, 1].tolist()); del rows; r.close()" % ring.name)
+        res = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                             cwd=str(Path(shm_ring.__file__).resolve().parents[1]), check=True)
+        assert res.stdout.split()[0] == "12" and "[109.0, 110.0, 0.0]" in res.stdout
+        assert "leaked" not in res.stderr
+
+        assert ring.append_frame(df, reset=True) == 8 and ring.count == 20
+    finally:
+        del view
+        ring.close()
+
+
+def test_live_feed_reads_prices_from_ring(tmp_path):
+    candles = tmp_path / "historical.csv"
+    bars("2024-12-31 00:00", 3).to_csv(candles, index=False)
+    name = f"test_ring_{tmp_path.name}"[:30]
+    feed = LiveFeed(str(candles), str(tmp_path / "trades.csv"), None, state_path=str(tmp_path / "s.json"),
+                    ring_name=name)
+    feed.poll()
+    assert len(feed.price) == 3  # ยังไม่มี ring → อ่าน CSV
+
+    ring = ShmRing.create(["time", "close"], capacity=16, name=name)
+    try:
+        ring.append_frame(bars("2025-01-01 09:00", 5))
+        assert feed.poll()["n_bars"] == 5 and feed.price.last() == 104.0
+        ring.append_frame(bars("2025-01-01 09:00", 7))
+        assert feed.poll()["n_bars"] == 7 and feed.price.last() == 106.0
+        # เขียนหน้าต่างใหม่ทั้งหมด (resync) → feed ล้าง buffer แล้วอ่านหน้าต่างใหม่
+        ring.append_frame(bars("2025-01-01 09:00", 7), reset=True)
+        assert feed.poll()["n_bars"] == 7
+        feed.candles.ring.close()
+    finally:
+        ring.close()
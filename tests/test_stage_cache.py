@@ -0,0 +1,52 @@
+import pandas as pd
+
+from src.features import compute_features_chunked
+from src.label_ict import label_ict
+from src.stage_cache import StageCache, cached_features, cached_labels
+from src.synthetic_data import generate_xauusd_m1
+
+
+def test_features_and_labels_hit_then_extend_tail(tmp_path):
+    """
+    รันซ้ำโดย input เดิม → hit, historical ต่อท้าย → partial และผลตรงกับคำนวณใหม่ทั้งไฟล์
+    """
+    df = generate_xauusd_m1(3000, seed=3)
+    hist, feat, lab = tmp_path / "historical.csv", tmp_path / "features.csv", tmp_path / "labels.csv"
+    cache = StageCache(tmp_path / "cache")
+
+    df.iloc[:2400].to_csv(hist, index=False)
+    assert cached_features(cache, hist, feat) == "miss"
+    assert cached_labels(cache, feat, lab, overlap=300) == "miss"
+    assert cached_features(cache, hist, feat) == "hit"
+    assert cached_labels(cache, feat, lab, overlap=300) == "hit"
+
+    df.to_csv(hist, index=False)
+    assert cached_features(cache, hist, feat) == "partial"
+    assert cached_labels(cache, feat, lab, overlap=300) == "partial"
+    assert cache.summary() == {"hit": 2, "partial": 2, "miss": 2}
+
+    compute_features_chunked(str(hist), str(tmp_path / "full_features.csv"))
+    assert feat.read_bytes() == (tmp_path / "full_features.csv").read_bytes()
+    label_ict(str(tmp_path / "full_features.csv"), str(tmp_path / "full_labels.csv"))
+    got, expected = pd.read_csv(lab), pd.read_csv(tmp_path / "full_labels.csv")
+    assert len(got) == 3000
+    pd.testing.assert_frame_equal(got, expected, check_dtype=False, rtol=1e-6)
+
+
+def test_run_skips_unchanged_stage_and_reruns_on_change(tmp_path):
+    src_file, out_file = tmp_path / "in.csv", tmp_path / "out.csv"
+    src_file.write_text("a\n1\n")
+    calls = []
+
+    def stage():
+        calls.append(1)
+        out_file.write_text(src_file.read_text() + "2\n")
+
+    cache = StageCache(tmp_path / "cache")
+    code = [pd]  # module ใดก็ได้ที่มี source
+    assert cache.run("model", [out_file], [src_file], {"eta": 0.05}, code, stage) == "miss"
+    assert cache.run("model", [out_file], [src_file], {"eta": 0.05}, code, stage) == "hit"
+    assert cache.run("model", [out_file], [src_file], {"eta": 0.1}, code, stage) == "miss"
+    out_file.write_text("tampered\n")
+    assert cache.run("model", [out_file], [src_file], {"eta": 0.1}, code, stage) == "miss"
+    assert len(calls) == 3
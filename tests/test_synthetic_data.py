@@ -0,0 +1,32 @@
+import numpy as np
+
+from src.synthetic_data import generate_xauusd_m1, parse_size
+
+
+def test_generate_xauusd_m1_is_consistent_and_deterministic():
+    """
+    แท่งสังเคราะห์ต้องมี OHLC ที่สอดคล้องกัน ไม่มีวันเสาร์–อาทิตย์ และ seed เดิมได้ผลเดิม
+    """
+    df = generate_xauusd_m1(20_000, seed=7)
+    assert list(df.columns) == ["time", "open", "high", "low", "close", "tick_volume"]
+    assert len(df) == 20_000
+    assert df["time"].is_monotonic_increasing
+    assert (df["time"].dt.dayofweek < 5).all()
+    assert (df["high"] >= df[["open", "close"]].max(axis=1)).all()
+    assert (df["low"] <= df[["open", "close"]].min(axis=1)).all()
+    assert (df["tick_volume"] > 0).all()
+
+    # ช่วงราคาของทองคำ M1: การเปลี่ยนแปลงต่อแท่งเล็กมากเมื่อเทียบกับราคา
+    rel = np.abs(np.diff(np.log(df["close"].to_numpy())))
+    assert np.median(rel) < 0.001
+
+    again = generate_xauusd_m1(20_000, seed=7)
+    assert df.equals(again)
+
+
+def test_parse_size():
+    assert parse_size("10k") == 10_000
+    assert parse_size("1m") == 1_000_000
+    assert parse_size("2.5k") == 2_500
+    assert parse_size(5000) == 5000
+    assert parse_size("750") == 750
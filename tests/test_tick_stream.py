@@ -0,0 +1,116 @@
+import numpy as np
+import pandas as pd
+
+from src.tick_stream import BarRing, BAR_DTYPE, TickStream
+
+TICK_DTYPE = np.dtype([("time_msc", np.int64), ("bid", np.float64), ("ask", np.float64)])
+
+
+class FakeFeed:
+    """
+    จำลอง copy_ticks_from: คืน tick ที่เวลา >= from_s (วินาที) และมาถึงแล้ว (<= now_ms) สูงสุด count tick
+    """
+
+    def __init__(self, ticks):
+        self.ticks = ticks
+        self.now_ms = 0
+        self.calls = 0
+
+    def __call__(self, symbol, from_s, count):
+        self.calls += 1
+        t = self.ticks["time_msc"]
+        sel = self.ticks[(t >= from_s * 1000) & (t <= self.now_ms)]
+        return sel[:count]
+
+
+def make_ticks(n=5000, seed=0):
+    """
+    tick ตลอด ~40 นาที (มีหลาย tick ที่ ms เดียวกัน)
+    """
+    rng = np.random.default_rng(seed)
+    start_ms = int(pd.Timestamp("2025-01-06 08:00:10").value // 10**6)
+    times = start_ms + np.sort(rng.integers(0, 40 * 60_000, n))
+    times[100:110] = times[100]  # tick ซ้อนกันที่ ms เดียว
+    ticks = np.zeros(n, dtype=TICK_DTYPE)
+    ticks["time_msc"] = times
+    ticks["bid"] = 2000 + np.cumsum(rng.normal(0, 0.1, n))
+    ticks["ask"] = ticks["bid"] + 0.2
+    return ticks
+
+
+def expected_bars(ticks, freq):
+    s = pd.Series(ticks["bid"], index=pd.to_datetime(ticks["time_msc"], unit="ms"))
+    g = s.groupby(s.index.floor(freq))
+    return pd.DataFrame({"open": g.first(), "high": g.max(), "low": g.min(),
+                         "close": g.last(), "tick_volume": g.size()})
+
+
+def test_stream_builds_bars_incrementally_and_matches_resample():
+    ticks = make_ticks()
+    feed = FakeFeed(ticks)
+    stream = TickStream("XAUUSD", timeframes=["M1", "M5"], capacity=64, max_ticks=300, fetch=feed)
+    closed, partials = [], []
+    stream.subscribe(on_bar=lambda tf, bar: closed.append((tf, int(bar["time"]))),
+                     on_partial=lambda tf, bar: partials.append(tf))
+
+    first_s = int(ticks["time_msc"][0] // 1000)
+    # poll ทุก 7 วินาที (ได้ทั้ง partial update ระหว่างแท่งและ batch ที่เกิน max_ticks)
+    drained = []
+    for now_ms in range(int(ticks["time_msc"][0]), int(ticks["time_msc"][-1]) + 7000, 7000):
+        feed.now_ms = now_ms
+        stream.poll(now_s=first_s)
+        drained.append(stream.drain_closed("M1"))
+
+    m1 = pd.concat(drained, ignore_index=True).set_index("time")
+    exp = expected_bars(ticks, "1min")
+    # แท่งสุดท้ายยังไม่ปิด (อยู่ใน partial)
+    pd.testing.assert_frame_equal(m1, exp.iloc[:-1], check_dtype=False, check_names=False, check_freq=False)
+    assert stream.partial("M1")["close"] == ticks["bid"][-1]
+    assert stream.partial("M1")["tick_volume"] == exp["tick_volume"].iloc[-1]
+    assert (m1["tick_volume"].sum() + exp["tick_volume"].iloc[-1]) == len(ticks)
+
+    m5 = stream.bars("M5")
+    pd.testing.assert_frame_equal(m5.set_index("time"), expected_bars(ticks, "5min").iloc[:-1],
+                                  check_dtype=False, check_names=False, check_freq=False)
+    assert sum(1 for tf, _ in closed if tf == "M1") == len(exp) - 1
+    assert partials.count("M5") > len(m5)
+    # ไม่มี drain ค้าง
+    assert stream.drain_closed("M1").empty
+
+
+def test_bar_ring_keeps_latest_capacity_bars_in_order():
+    ring = BarRing(capacity=5)
+    for start in (0, 3, 6):
+        bars = np.zeros(3, dtype=BAR_DTYPE)
+        bars["time"] = np.arange(start, start + 3)
+        ring.extend(bars)
+    assert len(ring) == 5 and ring.total == 9
+    assert list(ring.last()["time"]) == [4, 5, 6, 7, 8]
+    assert list(ring.last(2)["time"]) == [7, 8]
+    big = np.zeros(12, dtype=BAR_DTYPE)
+    big["time"] = np.arange(100, 112)
+    ring.extend(big)
+    assert list(ring.last()["time"]) == [107, 108, 109, 110, 111]
+
+
+def test_poll_after_warmup_without_ticks_starts_at_warmup_end():
+    """
+    warmup ช่วงตลาดปิด (ไม่มี tick) → poll โดยไม่ระบุ now_s ต้องไม่ error และเริ่มที่ปลาย warmup
+    """
+    ticks = make_ticks(500, seed=1)
+    feed = FakeFeed(ticks)
+    end_s = int(ticks["time_msc"][0] // 1000) - 30
+    stream = TickStream("XAUUSD", timeframes=["M1"], fetch=feed,
+                        fetch_range=lambda symbol, start_s, stop_s: np.empty(0, dtype=TICK_DTYPE))
+    stream.warmup(end_s - 300, end_s)
+    assert stream.cursor_msc is None and stream.start_s == end_s
+
+    assert stream.poll() == 0  # ยังไม่มี tick มาถึง
+    feed.now_ms = int(ticks["time_msc"][-1])
+    assert stream.poll() == len(ticks)
+    m1 = stream.drain_closed("M1").set_index("time")
+    pd.testing.assert_frame_equal(m1, expected_bars(ticks, "1min").iloc[:-1],
+                                  check_dtype=False, check_names=False, check_freq=False)
+
+    fresh = TickStream("XAUUSD", timeframes=["M1"], fetch=feed)
+    assert fresh.poll() == 0 and fresh.start_s is not None  # ไม่มี warmup → เริ่มที่เวลาปัจจุบัน
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from src.ict_signal import add_ict_columns, generate_ict_signal, signal_levels
+from src.triple_barrier import first_touch, triple_barrier_labels, TP_HIT, SL_HIT, TIME_OUT
+from test_ict_signal import build_trending_df
+
+
+def test_first_touch_barriers_gaps_and_intrabar_rule():
+    #             0      1      2      3      4      5
+    high = np.array([101.0, 101.5, 103.2, 101.0, 100.5, 100.4])
+    low = np.array([99.0, 99.5, 98.8, 97.0, 99.5, 99.6])
+    open_ = np.array([100.0, 100.0, 100.0, 97.5, 100.0, 100.0])
+    close = np.array([100.0, 101.0, 102.0, 98.0, 100.0, 100.0])
+    start = np.array([1, 1, 1, 4, 1])
+    side = np.array([1, 1, -1, 1, 1], dtype=np.int8)
+    sl = np.array([99.0, 99.0, 103.0, 99.0, 97.8])
+    tp = np.array([103.0, 103.0, 98.9, 103.0, 110.0])
+
+    outcome, bars = first_touch(high, low, open_, close, start, side, sl, tp,
+                                max_bars=5, spread=0.2, intrabar_rule="ohlc_path")
+    # 0/1: SL และ TP ในแท่ง 2 (แท่งเขียว O→L→H) → SL ก่อน
+    # 2: Sell แท่ง 2 ask high 103.4 ≥ SL 103 และ ask low 99.0 > TP 98.9 → SL
+    # 3: ไม่แตะภายใน 2 แท่งที่เหลือ → หมดเวลา (bars = แท่งที่มีจริง)
+    # 4: แท่ง 3 เปิด gap ต่ำกว่า SL
+    assert list(outcome) == [SL_HIT, SL_HIT, SL_HIT, TIME_OUT, SL_HIT]
+    assert list(bars) == [2, 2, 2, 2, 3]
+
+    outcome, _ = first_touch(high, low, open_, close, start[:2], side[:2], sl[:2], tp[:2],
+                             max_bars=5, intrabar_rule="tp_first")
+    assert list(outcome) == [TP_HIT, TP_HIT]
+    with pytest.raises(ValueError):
+        first_touch(high, low, open_, close, start, side, sl, tp, intrabar_rule="random")
+
+
+def test_triple_barrier_labels_use_generate_ict_signal_levels():
+    df = add_ict_columns(build_trending_df(3000, seed=1))
+    levels = signal_levels(df)
+    assert len(levels["index"]) > 10
+    for k, i in enumerate(levels["index"]):
+        sig = generate_ict_signal(df, int(i))
+        assert sig is not None and (sig["side"] == "Buy") == (levels["side"][k] > 0)
+        for key in ("entry_price", "sl", "tp1", "tp2", "tp3"):
+            assert levels[key][k] == pytest.approx(sig[key])
+
+    out = triple_barrier_labels(df.copy(), max_bars=60)
+    idx = levels["index"]
+    signal = np.zeros(len(out), dtype=bool)
+    signal[idx] = True
+    won = out["tb_outcome"].to_numpy() == TP_HIT
+    # label = side เฉพาะสัญญาณที่แตะ TP ก่อน; ที่เหลือ NoTrade
+    assert (out["label"][~(signal & won)] == "NoTrade").all()
+    expected = np.where(levels["side"] > 0, "Buy", "Sell")[won[idx]]
+    assert list(out["label"][signal & won]) == list(expected)
+    assert (out["tb_outcome"][~signal] == TIME_OUT).all()
+    assert won.sum() > 0 and (out["tb_outcome"] == SL_HIT).sum() > 0
+    assert out["tb_bars"][signal].between(0, 60).all()